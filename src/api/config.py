@@ -23,6 +23,156 @@ if not exists(log_dir):
 sqlite_db_path = f"{data_root_dir}/db.sqlite"
 log_file_path = f"{log_dir}/backend.log"
 
+# number of idle sqlite connections kept open for reuse across requests
+sqlite_pool_size = 8
+# idle connections older than this (in seconds) are pinged before being handed out
+sqlite_pool_health_check_interval = 30
+# "pooled": every pooled connection both reads and writes
+# "single_writer": one writer connection that group-commits queued writes, with a
+# separate pool of query_only connections serving all reads
+sqlite_storage_mode = "pooled"
+# maximum number of queued writes committed together in single_writer mode
+sqlite_writer_max_batch_size = 64
+
+# fraction of db connection checkouts whose statements are profiled (0 disables profiling)
+sql_profiler_sample_rate = 0.0
+# statements slower than this (in ms) are logged; None disables the slow query log
+sql_slow_query_threshold_ms = None
+# cap on distinct statement fingerprints kept in memory by the profiler
+sql_profiler_max_fingerprints = 500
+
+# maximum number of rendered prompt contexts (task/question/knowledge base) kept in memory
+prompt_context_cache_max_entries = 2048
+# cap on the total characters held by the prompt context cache
+prompt_context_cache_max_chars = 16_000_000
+# how long a rendered prompt context is reused; bounds how stale it can be after an
+# edit made through another process
+prompt_context_cache_ttl_seconds = 300
+
+# connection pool limits for the shared OpenAI http clients (one pool per api key)
+openai_max_connections = 100
+openai_max_keepalive_connections = 20
+# seconds an idle keep-alive connection to the OpenAI API is held open for reuse
+openai_keepalive_expiry = 60
+
+# admission control for LLM calls made with the shared OpenAI key: requests and
+# tokens (prompt + max completion tokens) per minute, across all orgs and per org
+llm_global_requests_per_minute = 5000
+llm_global_tokens_per_minute = 2_000_000
+llm_org_requests_per_minute = 1000
+llm_org_tokens_per_minute = 800_000
+# maximum number of calls in flight per model; "default" applies to unlisted models
+llm_model_max_concurrency = {"default": 32}
+# share of every rate limit and of each model's concurrency that background work
+# (e.g. course generation) may use; the rest is held back for interactive chat
+llm_background_share = 0.7
+
+# failed LLM calls are retried up to this many attempts in total, with jittered
+# exponential backoff between attempts
+llm_max_attempts = 3
+llm_retry_base_delay_seconds = 0.5
+llm_retry_max_delay_seconds = 8
+# retries and hedged requests made in any minute may add at most this share of the
+# calls made in that minute, plus a small floor so that a quiet service can retry
+llm_retry_budget_ratio = 0.2
+llm_retry_budget_min_per_minute = 10
+# a model's circuit opens after this many consecutive failures; calls then go to the
+# fallback model plan (or fail fast) until a trial call succeeds after the reset time
+llm_circuit_breaker_failure_threshold = 5
+llm_circuit_breaker_reset_seconds = 30
+llm_fallback_model_plans = {
+    "reasoning": "text",
+    "text": "text-mini",
+    "text-mini": "text",
+    "router": "text",
+}
+# the router and query rewrite calls send a second, identical request if the first
+# has not answered within this many seconds and use whichever answers first
+llm_hedge_after_seconds = 2.0
+
+# course tasks generated at the same time; the next task starts as soon as one finishes
+course_generation_max_concurrency = 25
+# seconds after which a single course structure or task generation is abandoned
+course_generation_timeout_seconds = 900
+# modules and tasks found while a course structure streams are written in batches
+# at most this often, or sooner once this many are waiting
+course_structure_flush_interval_seconds = 0.5
+course_structure_flush_max_items = 50
+# also announce each module and task of a batch with the module_created and
+# task_created events that preceded structure_items_created, for clients that have
+# not moved to it yet; to be turned off once they have
+course_structure_legacy_events = True
+# reference materials are read in chunks of this size and kept in memory up to the
+# spool size (on disk beyond it) while they are hashed and uploaded
+reference_material_chunk_bytes = 1024 * 1024
+reference_material_spool_max_bytes = 16 * 1024 * 1024
+# an uploaded reference material is reused for identical uploads (by content hash)
+# for this long before it is uploaded again
+provider_file_ttl_seconds = 7 * 24 * 60 * 60
+
+# generation jobs are run by workers that lease them from the job tables:
+# "in_process": every API process runs a worker
+# "external": jobs are only run by separate `python -m api.worker` processes
+generation_worker_mode = "in_process"
+# a worker renews the lease of each running job every heartbeat; a job whose lease
+# expires (e.g. its worker died) is run again by any worker
+generation_job_lease_seconds = 120
+generation_job_heartbeat_seconds = 30
+# how often an idle worker checks the job tables for new jobs
+generation_worker_poll_seconds = 5
+# failed jobs are retried with exponential backoff and marked failed after this many
+# attempts
+generation_job_max_attempts = 3
+generation_job_retry_delay_seconds = 30
+
+# every websocket client has its own queue of outgoing updates; a client whose queue
+# fills up, or that takes longer than this to accept a message, is disconnected
+websocket_send_timeout_seconds = 5
+websocket_queue_max_messages = 256
+# how websocket updates reach the API processes the clients are connected to:
+# "in_process": only clients of the process that published the update get it (a
+# single API process that also runs the generation worker)
+# "sqlite": updates are written to the generation events table and every process
+# polls it, so updates from any API or worker process reach every client
+websocket_event_bus = "in_process"
+websocket_event_poll_seconds = 0.25
+# events are kept in the table for this long so that slow pollers do not miss them
+websocket_event_retention_seconds = 10 * 60
+# the latest events of each course are kept in memory so that clients connecting with
+# `since=<seq>` get the events they missed instead of re-fetching the course
+websocket_replay_buffer_size = 200
+websocket_replay_max_courses = 1000
+# consecutive task_completed events of a course this close together are kept as one
+websocket_replay_coalesce_seconds = 2
+# clients connecting with `protocol=<version>` of at least this are replayed the
+# coalesced events, which list all their tasks in `tasks`; older clients are replayed
+# every task_completed event, each with its own `task`
+websocket_coalesced_replay_protocol_version = 2
+
+# how /ai/chat picks between the reasoning and text models before streaming:
+# "sequential": router (and learning material query rewrite) calls run before streaming
+# "heuristic": model picked from the question and cached router decisions; only short
+# follow-up queries are rewritten
+# "speculative": the text model starts streaming while the router runs and is cancelled
+# if the router picks the reasoning model; query rewrite as in "heuristic"
+chat_pipeline_mode = "sequential"
+
+# prepared (base64) audio messages are cached in memory and, when recordings live on
+# s3, on local disk so that audio chat history is not re-downloaded on every turn
+audio_cache_dir = f"{data_root_dir}/audio_cache"
+audio_cache_max_memory_bytes = 64 * 1024 * 1024
+audio_cache_max_disk_bytes = 1024 * 1024 * 1024
+# maximum number of recordings downloaded at the same time
+audio_cache_max_concurrent_fetches = 8
+
+# learner recordings are downmixed to mono 16-bit audio at this sample rate before
+# being sent to the audio model
+audio_model_sample_rate = 16000
+# leading/trailing audio quieter than this is trimmed as silence
+audio_silence_threshold_dbfs = -50
+# silence (in ms) left at either end after trimming so words are not clipped
+audio_keep_silence_ms = 200
+
 chat_history_table_name = "chat_history"
 tasks_table_name = "tasks"
 questions_table_name = "questions"
@@ -52,8 +202,12 @@ group_role_learner = "learner"
 group_role_mentor = "mentor"
 course_generation_jobs_table_name = "course_generation_jobs"
 task_generation_jobs_table_name = "task_generation_jobs"
+task_generation_progress_table_name = "task_generation_progress"
 org_api_keys_table_name = "org_api_keys"
 code_drafts_table_name = "code_drafts"
+chat_history_summaries_table_name = "chat_history_summaries"
+provider_files_table_name = "provider_files"
+generation_events_table_name = "generation_events"
 
 UPLOAD_FOLDER_NAME = "uploads"
 
@@ -67,3 +221,18 @@ openai_plan_to_model_name = {
     "audio": "gpt-4o-audio-preview-2024-12-17",
     "router": "gpt-4.1-mini-2025-04-14",
 }
+
+# token budget for the verbatim chat history sent to each model plan; older turns
+# are folded into a rolling summary
+chat_history_token_budget = {
+    "reasoning": 16000,
+    "text": 16000,
+    "text-mini": 8000,
+    "audio": 8000,
+    "router": 4000,
+}
+# when the budget is exceeded, only this fraction of it is kept verbatim so that the
+# summary does not need to be refreshed on every turn
+chat_history_window_ratio = 0.5
+# estimated tokens for a recorded audio message, whose content is an upload uuid
+chat_history_audio_message_tokens = 1000
@@ -21,8 +21,12 @@ from api.config import (
     question_scorecards_table_name,
     course_generation_jobs_table_name,
     task_generation_jobs_table_name,
+    task_generation_progress_table_name,
     org_api_keys_table_name,
     code_drafts_table_name,
+    chat_history_summaries_table_name,
+    provider_files_table_name,
+    generation_events_table_name,
 )
 
 
@@ -400,6 +404,11 @@ async def create_course_generation_jobs_table(cursor):
                 course_id INTEGER NOT NULL,
                 status TEXT NOT NULL,
                 job_details TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                locked_by TEXT,
+                locked_until REAL,
+                run_after REAL,
+                last_error TEXT,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (course_id) REFERENCES {courses_table_name}(id) ON DELETE CASCADE
             )"""
@@ -419,6 +428,11 @@ async def create_task_generation_jobs_table(cursor):
                 course_id INTEGER NOT NULL,
                 status TEXT NOT NULL,
                 job_details TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                locked_by TEXT,
+                locked_until REAL,
+                run_after REAL,
+                last_error TEXT,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (task_id) REFERENCES {tasks_table_name}(id) ON DELETE CASCADE,
                 FOREIGN KEY (course_id) REFERENCES {courses_table_name}(id) ON DELETE CASCADE
@@ -434,6 +448,85 @@ async def create_task_generation_jobs_table(cursor):
     )
 
 
+async def create_task_generation_progress_table(cursor):
+    # number of task generation jobs of each course in each status, kept up to date
+    # by triggers so that progress is not counted by scanning every job of a course
+    await cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {task_generation_progress_table_name} (
+                course_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (course_id, status),
+                FOREIGN KEY (course_id) REFERENCES {courses_table_name}(id) ON DELETE CASCADE
+            )"""
+    )
+
+    await cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS {task_generation_progress_table_name}_insert
+            AFTER INSERT ON {task_generation_jobs_table_name}
+            BEGIN
+                INSERT INTO {task_generation_progress_table_name} (course_id, status, count)
+                VALUES (NEW.course_id, NEW.status, 1)
+                ON CONFLICT(course_id, status) DO UPDATE SET count = count + 1;
+            END"""
+    )
+
+    await cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS {task_generation_progress_table_name}_update
+            AFTER UPDATE OF course_id, status ON {task_generation_jobs_table_name}
+            WHEN OLD.course_id IS NOT NEW.course_id OR OLD.status IS NOT NEW.status
+            BEGIN
+                UPDATE {task_generation_progress_table_name} SET count = count - 1
+                WHERE course_id = OLD.course_id AND status = OLD.status;
+                INSERT INTO {task_generation_progress_table_name} (course_id, status, count)
+                VALUES (NEW.course_id, NEW.status, 1)
+                ON CONFLICT(course_id, status) DO UPDATE SET count = count + 1;
+            END"""
+    )
+
+    await cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS {task_generation_progress_table_name}_delete
+            AFTER DELETE ON {task_generation_jobs_table_name}
+            BEGIN
+                UPDATE {task_generation_progress_table_name} SET count = count - 1
+                WHERE course_id = OLD.course_id AND status = OLD.status;
+            END"""
+    )
+
+    # count the jobs created before the triggers existed; a no-op afterwards since
+    # the triggers add a row for every course and status that has jobs
+    await cursor.execute(
+        f"""INSERT OR IGNORE INTO {task_generation_progress_table_name} (course_id, status, count)
+            SELECT course_id, status, COUNT(*) FROM {task_generation_jobs_table_name}
+            GROUP BY course_id, status"""
+    )
+
+
+async def add_generation_job_lease_columns(cursor, table_name: str):
+    # job tables created before jobs were leased to workers lack these columns
+    await cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = [column[1] for column in await cursor.fetchall()]
+
+    for column, definition in [
+        ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+        ("locked_by", "TEXT"),
+        ("locked_until", "REAL"),
+        ("run_after", "REAL"),
+        ("last_error", "TEXT"),
+    ]:
+        if column not in columns:
+            await cursor.execute(
+                f"ALTER TABLE {table_name} ADD COLUMN {column} {definition}"
+            )
+
+    await cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{table_name}_status ON {table_name} (status)"
+    )
+    await cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{table_name}_uuid ON {table_name} (uuid)"
+    )
+
+
 async def create_code_drafts_table(cursor):
     await cursor.execute(
         f"""CREATE TABLE IF NOT EXISTS {code_drafts_table_name} (
@@ -458,6 +551,52 @@ async def create_code_drafts_table(cursor):
     )
 
 
+async def create_chat_history_summaries_table(cursor):
+    await cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {chat_history_summaries_table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                summarized_until_id INTEGER NOT NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, question_id),
+                FOREIGN KEY (user_id) REFERENCES {users_table_name}(id) ON DELETE CASCADE,
+                FOREIGN KEY (question_id) REFERENCES {questions_table_name}(id) ON DELETE CASCADE
+            )"""
+    )
+
+
+async def create_provider_files_table(cursor):
+    # files uploaded to the LLM provider, keyed by the hash of their content
+    await cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {provider_files_table_name} (
+                content_hash TEXT PRIMARY KEY,
+                provider_file_id TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )"""
+    )
+
+
+async def create_generation_events_table(cursor):
+    # course generation updates, read by every process with websocket clients; the
+    # id orders the events
+    await cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {generation_events_table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+    )
+
+    await cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_generation_events_created_at
+        ON {generation_events_table_name} (created_at)"""
+    )
+
+
 # ========= PART 2: NEW Hiring Workflow Schema (Prefixed with NEW_) =========
 # These tables support the skills-first hiring workflow, referencing the
 # original tables where necessary (e.g., users, organizations, tasks).
@@ -763,7 +902,15 @@ async def init_db():
         await create_course_milestones_table(cursor)
         await create_course_generation_jobs_table(cursor)
         await create_task_generation_jobs_table(cursor)
+        await add_generation_job_lease_columns(
+            cursor, course_generation_jobs_table_name
+        )
+        await add_generation_job_lease_columns(cursor, task_generation_jobs_table_name)
+        await create_task_generation_progress_table(cursor)
         await create_code_drafts_table(cursor)
+        await create_chat_history_summaries_table(cursor)
+        await create_provider_files_table(cursor)
+        await create_generation_events_table(cursor)
 
         # New tables
         await create_new_candidate_profiles_table(cursor)
@@ -1,6 +1,6 @@
 import sqlite3
 from typing import List, Optional
-from api.utils.db import get_new_db_connection
+from api.utils.db import get_new_db_connection, get_db_read_connection
 from api.models import NewApplicationCreate, NewApplicationRead, NewJobPostingRead
 from datetime import datetime
 from api.db.job_posting_db import get_job_posting
@@ -46,7 +46,7 @@ async def get_application_details_from_db(conn: sqlite3.Connection, application_
     return None
 
 async def get_application_for_user_and_job(user_id: int, job_posting_id: int) -> Optional[NewApplicationRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT
@@ -81,7 +81,7 @@ async def update_application_status(application_id: int, status: str) -> bool:
         return cursor.rowcount > 0
 
 async def get_applications_for_job(job_posting_id: int) -> List[NewApplicationRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT
@@ -105,7 +105,7 @@ async def get_applications_for_job(job_posting_id: int) -> List[NewApplicationRe
         return applications
 
 async def get_applications_for_user(user_id: int) -> List[NewApplicationRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT
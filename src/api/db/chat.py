@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from api.utils.db import get_new_db_connection, execute_db_operation
 from api.config import (
@@ -7,6 +7,7 @@ from api.config import (
     tasks_table_name,
     users_table_name,
     task_completions_table_name,
+    chat_history_summaries_table_name,
 )
 from api.models import StoreMessageRequest, ChatMessage, TaskType
 from api.db.task import get_task_from_db
@@ -135,6 +136,34 @@ async def get_question_chat_history_for_user(
     return [convert_chat_message_to_dict(row) for row in chat_history]
 
 
+async def get_chat_history_summary(question_id: int, user_id: int) -> Optional[Dict]:
+    row = await execute_db_operation(
+        f"""SELECT summary, summarized_until_id FROM {chat_history_summaries_table_name}
+        WHERE question_id = ? AND user_id = ?""",
+        (question_id, user_id),
+        fetch_one=True,
+    )
+
+    if not row:
+        return None
+
+    return {"summary": row[0], "summarized_until_id": row[1]}
+
+
+async def upsert_chat_history_summary(
+    question_id: int, user_id: int, summary: str, summarized_until_id: int
+):
+    await execute_db_operation(
+        f"""INSERT INTO {chat_history_summaries_table_name} (user_id, question_id, summary, summarized_until_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, question_id) DO UPDATE SET
+            summary = excluded.summary,
+            summarized_until_id = excluded.summarized_until_id,
+            updated_at = CURRENT_TIMESTAMP""",
+        (user_id, question_id, summary, summarized_until_id),
+    )
+
+
 async def get_task_chat_history_for_user(
     task_id: int, user_id: int
 ) -> List[ChatMessage]:
@@ -23,17 +23,17 @@ from api.config import (
     group_role_learner,
 )
 from api.db.task import (
-    get_task,
+    get_tasks_bulk,
     create_draft_task_for_course,
     update_learning_material_task,
     update_draft_quiz,
-    get_scorecard,
     create_scorecard,
 )
 from api.db.utils import EnumEncoder, get_org_id_for_course
 from api.utils.db import (
     execute_db_operation,
     get_new_db_connection,
+    get_db_read_connection,
     execute_multiple_db_operations,
     execute_many_db_operation,
     deserialise_list_from_str,
@@ -189,7 +189,7 @@ async def store_course_generation_request(course_id: int, job_details: Dict) ->
 
 
 async def get_course_generation_job_details(job_uuid: str) -> Dict:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
 
         await cursor.execute(
@@ -210,13 +210,17 @@ async def duplicate_course_to_org(course_id: int, org_id: int):
 
     new_course_id = await create_course(course["name"], org_id)
 
+    task_id_to_details = await get_tasks_bulk(
+        [task["id"] for milestone in course["milestones"] for task in milestone["tasks"]]
+    )
+
     for milestone in course["milestones"]:
         new_milestone_id, _ = await add_milestone_to_course(
             new_course_id, milestone["name"], milestone["color"]
         )
 
         for task in milestone["tasks"]:
-            task_details = await get_task(task["id"])
+            task_details = task_id_to_details[task["id"]]
 
             new_task_id, _ = await create_draft_task_for_course(
                 task_details["title"],
@@ -243,10 +247,8 @@ async def duplicate_course_to_org(course_id: int, org_id: int):
 
                         # Check if we've already duplicated this scorecard
                         if original_scorecard_id not in scorecard_mapping:
-                            # Get the original scorecard
-                            original_scorecard = await get_scorecard(
-                                original_scorecard_id
-                            )
+                            # The original scorecard is loaded along with the task
+                            original_scorecard = question["scorecard"]
 
                             # Create new scorecard for the new org
                             new_scorecard = await create_scorecard(
@@ -283,7 +285,7 @@ async def update_course_generation_job_status_and_details(
         cursor = await conn.cursor()
 
         await cursor.execute(
-            f"UPDATE {course_generation_jobs_table_name} SET status = ?, job_details = ? WHERE uuid = ?",
+            f"UPDATE {course_generation_jobs_table_name} SET status = ?, job_details = ?, locked_by = NULL, locked_until = NULL WHERE uuid = ?",
             (str(status), json.dumps(details, cls=EnumEncoder), job_uuid),
         )
 
@@ -297,32 +299,13 @@ async def update_course_generation_job_status(
         cursor = await conn.cursor()
 
         await cursor.execute(
-            f"UPDATE {course_generation_jobs_table_name} SET status = ? WHERE uuid = ?",
+            f"UPDATE {course_generation_jobs_table_name} SET status = ?, locked_by = NULL, locked_until = NULL WHERE uuid = ?",
             (str(status), job_uuid),
         )
 
         await conn.commit()
 
 
-async def get_all_pending_course_structure_generation_jobs() -> List[Dict]:
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
-        await cursor.execute(
-            f"SELECT uuid, course_id, job_details FROM {course_generation_jobs_table_name} WHERE status = ?",
-            (str(GenerateCourseJobStatus.STARTED),),
-        )
-
-        return [
-            {
-                "uuid": row[0],
-                "course_id": row[1],
-                "job_details": json.loads(row[2]),
-            }
-            for row in await cursor.fetchall()
-        ]
-
-
 async def add_course_modules(course_id: int, modules: List[Dict]):
     import random
 
@@ -876,6 +859,179 @@ async def add_milestone_to_course(
         return milestone_id, next_order
 
 
+async def add_milestones_and_draft_tasks_to_course(
+    course_id: int,
+    milestones: List[Dict],
+    tasks: List[Dict],
+    job_uuid: Optional[str] = None,
+) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Append `milestones` (each with a `name` and `color`) to a course and draft
+    `tasks` (each with a `title`, a `type` and either the `milestone_id` of an
+    existing milestone or the `milestone_index` of one of `milestones`) to the end of
+    their milestones, all in a single transaction.
+
+    The ids of what is added are recorded in the details of the course generation
+    job `job_uuid`, in the same transaction, so that a retry of a job that failed
+    midway can remove them with `delete_partial_course_structure`.
+
+    Returns the (id, ordering) of each milestone and the (id, ordering) of each
+    task, the ordering of a task being its position among the non-deleted tasks of
+    its milestone, as returned by `create_draft_task_for_course`.
+    """
+    org_id = await get_org_id_for_course(course_id)
+
+    async with get_new_db_connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute(
+            f"SELECT COALESCE(MAX(ordering), -1) FROM {course_milestones_table_name} WHERE course_id = ?",
+            (course_id,),
+        )
+        next_milestone_ordering = (await cursor.fetchone())[0] + 1
+
+        added_milestones = []
+
+        for milestone in milestones:
+            await cursor.execute(
+                f"INSERT INTO {milestones_table_name} (name, color, org_id) VALUES (?, ?, ?)",
+                (milestone["name"], milestone["color"], org_id),
+            )
+            milestone_id = cursor.lastrowid
+
+            await cursor.execute(
+                f"INSERT INTO {course_milestones_table_name} (course_id, milestone_id, ordering) VALUES (?, ?, ?)",
+                (course_id, milestone_id, next_milestone_ordering),
+            )
+
+            added_milestones.append((milestone_id, next_milestone_ordering))
+            next_milestone_ordering += 1
+
+        task_milestone_ids = [
+            (
+                task["milestone_id"]
+                if task.get("milestone_id") is not None
+                else added_milestones[task["milestone_index"]][0]
+            )
+            for task in tasks
+        ]
+
+        # where the tasks of each milestone start, looked up once per batch
+        next_task_orderings = defaultdict(int)
+        next_visible_orderings = defaultdict(int)
+        existing_milestone_ids = list(
+            set(task_milestone_ids) - {milestone_id for milestone_id, _ in added_milestones}
+        )
+
+        if existing_milestone_ids:
+            placeholders = ", ".join(["?"] * len(existing_milestone_ids))
+            await cursor.execute(
+                f"""SELECT ct.milestone_id, MAX(ct.ordering) + 1,
+                SUM(CASE WHEN t.deleted_at IS NULL THEN 1 ELSE 0 END)
+                FROM {course_tasks_table_name} ct
+                INNER JOIN {tasks_table_name} t ON ct.task_id = t.id
+                WHERE ct.course_id = ? AND ct.milestone_id IN ({placeholders})
+                GROUP BY ct.milestone_id""",
+                (course_id, *existing_milestone_ids),
+            )
+
+            for milestone_id, next_ordering, visible_count in await cursor.fetchall():
+                next_task_orderings[milestone_id] = next_ordering
+                next_visible_orderings[milestone_id] = visible_count
+
+        added_tasks = []
+
+        for task, milestone_id in zip(tasks, task_milestone_ids):
+            await cursor.execute(
+                f"INSERT INTO {tasks_table_name} (org_id, type, title, status) VALUES (?, ?, ?, ?)",
+                (org_id, str(task["type"]), task["title"], "draft"),
+            )
+            task_id = cursor.lastrowid
+
+            await cursor.execute(
+                f"INSERT INTO {course_tasks_table_name} (course_id, task_id, milestone_id, ordering) VALUES (?, ?, ?, ?)",
+                (course_id, task_id, milestone_id, next_task_orderings[milestone_id]),
+            )
+
+            added_tasks.append((task_id, next_visible_orderings[milestone_id]))
+            next_task_orderings[milestone_id] += 1
+            next_visible_orderings[milestone_id] += 1
+
+        if job_uuid is not None:
+            await cursor.execute(
+                f"SELECT job_details FROM {course_generation_jobs_table_name} WHERE uuid = ?",
+                (job_uuid,),
+            )
+            job_details = json.loads((await cursor.fetchone())[0])
+
+            job_details["written_milestone_ids"] = job_details.get(
+                "written_milestone_ids", []
+            ) + [milestone_id for milestone_id, _ in added_milestones]
+            job_details["written_task_ids"] = job_details.get(
+                "written_task_ids", []
+            ) + [task_id for task_id, _ in added_tasks]
+
+            await cursor.execute(
+                f"UPDATE {course_generation_jobs_table_name} SET job_details = ? WHERE uuid = ?",
+                (json.dumps(job_details, cls=EnumEncoder), job_uuid),
+            )
+
+        await conn.commit()
+
+    return added_milestones, added_tasks
+
+
+async def delete_partial_course_structure(job_uuid: str) -> Tuple[List[int], List[int]]:
+    """
+    Delete the milestones and draft tasks written by an earlier attempt of the
+    course generation job `job_uuid`, as recorded by
+    `add_milestones_and_draft_tasks_to_course`, so that the job can run again
+    without duplicating them. Returns the ids of the deleted milestones and tasks.
+    """
+    async with get_new_db_connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute(
+            f"SELECT job_details FROM {course_generation_jobs_table_name} WHERE uuid = ?",
+            (job_uuid,),
+        )
+        job_details = json.loads((await cursor.fetchone())[0])
+
+        milestone_ids = job_details.pop("written_milestone_ids", [])
+        task_ids = job_details.pop("written_task_ids", [])
+
+        if task_ids:
+            placeholders = ", ".join(["?"] * len(task_ids))
+            await cursor.execute(
+                f"DELETE FROM {course_tasks_table_name} WHERE task_id IN ({placeholders})",
+                task_ids,
+            )
+            await cursor.execute(
+                f"DELETE FROM {tasks_table_name} WHERE id IN ({placeholders})",
+                task_ids,
+            )
+
+        if milestone_ids:
+            placeholders = ", ".join(["?"] * len(milestone_ids))
+            await cursor.execute(
+                f"DELETE FROM {course_milestones_table_name} WHERE milestone_id IN ({placeholders})",
+                milestone_ids,
+            )
+            await cursor.execute(
+                f"DELETE FROM {milestones_table_name} WHERE id IN ({placeholders})",
+                milestone_ids,
+            )
+
+        await cursor.execute(
+            f"UPDATE {course_generation_jobs_table_name} SET job_details = ? WHERE uuid = ?",
+            (json.dumps(job_details, cls=EnumEncoder), job_uuid),
+        )
+
+        await conn.commit()
+
+    return milestone_ids, task_ids
+
+
 async def update_milestone_orders(milestone_orders: List[Tuple[int, int]]):
     await execute_many_db_operation(
         f"UPDATE {course_milestones_table_name} SET ordering = ? WHERE id = ?",
@@ -895,7 +1051,7 @@ async def get_user_courses(user_id: int) -> List[Dict]:
     Returns:
         List of course dictionaries with their details and user's role
     """
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
 
         # Get all courses where the user is a learner or mentor through cohorts
@@ -0,0 +1,42 @@
+import time
+from typing import List, Tuple
+from api.config import generation_events_table_name
+from api.utils.db import execute_db_operation, execute_many_db_operation
+
+
+async def add_generation_events(events: List[Tuple[int, str]]):
+    """Append (course_id, payload) events in the order given."""
+    now = time.time()
+
+    await execute_many_db_operation(
+        f"INSERT INTO {generation_events_table_name} (course_id, payload, created_at) VALUES (?, ?, ?)",
+        [(course_id, payload, now) for course_id, payload in events],
+    )
+
+
+async def get_generation_events_after(
+    event_id: int, limit: int
+) -> List[Tuple[int, int, str]]:
+    """Return up to `limit` (id, course_id, payload) events added after `event_id`."""
+    return await execute_db_operation(
+        f"""SELECT id, course_id, payload FROM {generation_events_table_name}
+        WHERE id > ? ORDER BY id LIMIT ?""",
+        (event_id, limit),
+        fetch_all=True,
+    )
+
+
+async def get_last_generation_event_id() -> int:
+    row = await execute_db_operation(
+        f"SELECT MAX(id) FROM {generation_events_table_name}",
+        fetch_one=True,
+    )
+
+    return (row[0] or 0) if row else 0
+
+
+async def delete_generation_events_before(timestamp: float):
+    await execute_db_operation(
+        f"DELETE FROM {generation_events_table_name} WHERE created_at < ?",
+        (timestamp,),
+    )
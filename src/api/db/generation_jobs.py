@@ -0,0 +1,161 @@
+import json
+import time
+from typing import Dict, List
+from api.utils.db import get_new_db_connection
+
+
+def _to_job(row) -> Dict:
+    return {
+        "uuid": row[0],
+        "course_id": row[1],
+        "job_details": json.loads(row[2]),
+        "attempts": row[3],
+    }
+
+
+async def fail_expired_generation_jobs(
+    table_name: str,
+    pending_status: str,
+    failed_status: str,
+    max_attempts: int,
+) -> List[Dict]:
+    """
+    Mark `failed_status` the jobs whose lease expired on their last allowed
+    attempt, i.e. whose worker died or stopped renewing the lease too many times,
+    and return them so that their failure can be reported.
+    """
+    async with get_new_db_connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute(
+            f"""UPDATE {table_name}
+            SET status = ?, locked_by = NULL, locked_until = NULL, last_error = ?
+            WHERE status = ? AND locked_until < ? AND attempts >= ?
+            RETURNING uuid, course_id, job_details, attempts""",
+            (
+                str(failed_status),
+                "lease expired",
+                str(pending_status),
+                time.time(),
+                max_attempts,
+            ),
+        )
+
+        rows = await cursor.fetchall()
+
+        await conn.commit()
+
+    return [_to_job(row) for row in rows]
+
+
+async def claim_generation_jobs(
+    table_name: str,
+    pending_status: str,
+    worker_id: str,
+    limit: int,
+    lease_seconds: float,
+    max_attempts: int,
+) -> List[Dict]:
+    """
+    Lease up to `limit` jobs with `pending_status` from `table_name` to `worker_id`.
+
+    A job can be claimed once it is due and not leased, or once its lease has
+    expired because its worker stopped renewing it, as long as it has attempts
+    left; jobs without are left to `fail_expired_generation_jobs`. Each claim
+    counts as an attempt.
+    """
+    now = time.time()
+
+    async with get_new_db_connection() as conn:
+        cursor = await conn.cursor()
+
+        # a single statement, so two workers can never claim the same job
+        await cursor.execute(
+            f"""UPDATE {table_name}
+            SET locked_by = ?, locked_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM {table_name}
+                WHERE status = ?
+                AND (locked_until IS NULL OR locked_until < ?)
+                AND (run_after IS NULL OR run_after <= ?)
+                AND attempts < ?
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING uuid, course_id, job_details, attempts""",
+            (
+                worker_id,
+                now + lease_seconds,
+                str(pending_status),
+                now,
+                now,
+                max_attempts,
+                limit,
+            ),
+        )
+
+        rows = await cursor.fetchall()
+
+        await conn.commit()
+
+    return [_to_job(row) for row in rows]
+
+
+async def renew_generation_job_lease(
+    table_name: str, job_uuid: str, worker_id: str, lease_seconds: float
+) -> bool:
+    """
+    Extend the lease of a job held by `worker_id`. Returns False if the worker no
+    longer holds the lease.
+    """
+    async with get_new_db_connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute(
+            f"UPDATE {table_name} SET locked_until = ? WHERE uuid = ? AND locked_by = ?",
+            (time.time() + lease_seconds, job_uuid, worker_id),
+        )
+
+        await conn.commit()
+
+        return cursor.rowcount > 0
+
+
+async def fail_generation_job(
+    table_name: str,
+    job_uuid: str,
+    worker_id: str,
+    error: str,
+    retry_delay_seconds: float,
+    max_attempts: int,
+    failed_status: str,
+) -> bool:
+    """
+    Release a job whose attempt failed so that it is retried after
+    `retry_delay_seconds`, or mark it `failed_status` if it has used all its
+    attempts. Returns whether the job was marked failed.
+    """
+    async with get_new_db_connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute(
+            f"""UPDATE {table_name}
+            SET status = CASE WHEN attempts >= ? THEN ? ELSE status END,
+            run_after = ?, last_error = ?, locked_by = NULL, locked_until = NULL
+            WHERE uuid = ? AND locked_by = ?
+            RETURNING status""",
+            (
+                max_attempts,
+                str(failed_status),
+                time.time() + retry_delay_seconds,
+                error,
+                job_uuid,
+                worker_id,
+            ),
+        )
+
+        row = await cursor.fetchone()
+
+        await conn.commit()
+
+    return row is not None and row[0] == str(failed_status)
@@ -1,6 +1,6 @@
 import sqlite3
 from typing import List, Optional
-from api.utils.db import get_new_db_connection
+from api.utils.db import get_new_db_connection, get_db_read_connection
 from api.models import NewInterviewCreate, NewInterviewRead, NewInterviewFeedbackCreate, NewInterviewFeedbackRead
 from datetime import datetime
 
@@ -30,7 +30,7 @@ async def schedule_interview(interview: NewInterviewCreate) -> NewInterviewRead:
         )
 
 async def get_interview_details(interview_id: int) -> Optional[NewInterviewRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT
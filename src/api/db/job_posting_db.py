@@ -1,6 +1,6 @@
 import sqlite3
 from typing import List, Optional
-from api.utils.db import get_new_db_connection
+from api.utils.db import get_new_db_connection, get_db_read_connection
 from api.models import NewJobPostingCreate, NewJobPostingRead
 from datetime import datetime
 
@@ -84,11 +84,11 @@ async def get_job_posting(conn: sqlite3.Connection, job_id: int) -> Optional[New
     return None
 
 async def get_job_posting_by_id(job_posting_id: int) -> Optional[NewJobPostingRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         return await get_job_posting(conn, job_posting_id)
 
 async def get_open_job_postings_for_org(org_id: int) -> List[NewJobPostingRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT
@@ -125,7 +125,7 @@ async def get_open_job_postings_for_org(org_id: int) -> List[NewJobPostingRead]:
 
 async def get_job_postings_for_org(org_id: int) -> List[NewJobPostingRead]:
     # Reusing the get_open_job_postings_for_org logic and removing the status filter for simplicity or creating a new function
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT
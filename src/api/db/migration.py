@@ -12,9 +12,16 @@ from api.db.course import (
 from api.models import TaskStatus, TaskType, QuestionType, TaskAIResponseType
 from api.utils.db import get_new_db_connection
 from api.config import questions_table_name
+from api.utils.markdown import convert_markdown_to_blocks, AmbiguousMarkdownError
 
 
 def convert_content_to_blocks(content: str) -> List[Dict]:
+    try:
+        return convert_markdown_to_blocks(content)
+    except AmbiguousMarkdownError:
+        # keep the content as it is, one paragraph per line
+        pass
+
     lines = content.split("\n")
     blocks = []
     for line in lines:
@@ -165,7 +172,7 @@ async def migrate_course(course_id: int, course_details: Dict):
 
 async def migrate_task_description_to_blocks(course_details: Dict):
     from api.routes.ai import migrate_content_to_blocks
-    from api.utils.concurrency import async_batch_gather
+    from api.utils.concurrency import run_with_bounded_concurrency
 
     coroutines = []
 
@@ -175,7 +182,7 @@ async def migrate_task_description_to_blocks(course_details: Dict):
         #     break
         # break
 
-    results = await async_batch_gather(coroutines)
+    results = await run_with_bounded_concurrency(coroutines)
 
     current_index = 0
     for milestone in course_details["milestones"]:
@@ -4,6 +4,7 @@ import hashlib
 
 from api.utils.db import (
     get_new_db_connection,
+    get_db_read_connection,
     execute_db_operation,
     execute_multiple_db_operations,
 )
@@ -20,7 +21,7 @@ from api.slack import (
 
 
 async def get_all_orgs() -> List[Dict]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
 
         await cursor.execute(f"SELECT id, name, slug FROM {organizations_table_name}")
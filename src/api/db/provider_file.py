@@ -0,0 +1,29 @@
+import time
+from typing import Optional
+from api.config import provider_files_table_name
+from api.utils.db import execute_db_operation
+
+
+async def get_provider_file_id(content_hash: str) -> Optional[str]:
+    """Return the id of the unexpired provider file with the given content hash."""
+    row = await execute_db_operation(
+        f"SELECT provider_file_id FROM {provider_files_table_name} WHERE content_hash = ? AND expires_at > ?",
+        (content_hash, time.time()),
+        fetch_one=True,
+    )
+
+    return row[0] if row else None
+
+
+async def store_provider_file_id(
+    content_hash: str, provider_file_id: str, ttl_seconds: float
+):
+    await execute_db_operation(
+        f"""INSERT INTO {provider_files_table_name} (content_hash, provider_file_id, expires_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(content_hash) DO UPDATE SET
+            provider_file_id = excluded.provider_file_id,
+            expires_at = excluded.expires_at,
+            created_at = CURRENT_TIMESTAMP""",
+        (content_hash, provider_file_id, time.time() + ttl_seconds),
+    )
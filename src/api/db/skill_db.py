@@ -1,6 +1,6 @@
 import sqlite3
 from typing import List, Optional
-from api.utils.db import get_new_db_connection
+from api.utils.db import get_new_db_connection, get_db_read_connection
 from api.models import NewSkillCreate, NewSkillRead, NewCandidateProfileUpdate, NewCandidateProfileRead
 
 async def create_skill(skill: NewSkillCreate) -> NewSkillRead:
@@ -15,7 +15,7 @@ async def create_skill(skill: NewSkillCreate) -> NewSkillRead:
         return NewSkillRead(new_id=new_id, new_name=skill.new_name, new_category=skill.new_category)
 
 async def get_skill_by_id(skill_id: int) -> Optional[NewSkillRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT NEW_id, NEW_name, NEW_category FROM NEW_skills WHERE NEW_id = ?""",
@@ -27,7 +27,7 @@ async def get_skill_by_id(skill_id: int) -> Optional[NewSkillRead]:
         return None
 
 async def get_all_skills() -> List[NewSkillRead]:
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT NEW_id, NEW_name, NEW_category FROM NEW_skills"""
@@ -16,12 +16,15 @@ from api.config import (
     course_cohorts_table_name,
     task_completions_table_name,
     task_generation_jobs_table_name,
+    task_generation_progress_table_name,
 )
 from api.utils.db import (
     get_new_db_connection,
+    get_db_read_connection,
     execute_db_operation,
     serialise_list_to_str,
 )
+from api.utils.prompt_cache import prompt_context_cache
 from api.models import (
     TaskType,
     TaskStatus,
@@ -254,6 +257,103 @@ async def get_task(task_id: int):
     return task_data
 
 
+async def get_tasks_bulk(task_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Loads the same details as `get_task` for many tasks at once, with each question
+    also carrying its `scorecard`, in at most three queries however many tasks there
+    are. Returns a dict keyed by task id; deleted or missing tasks are left out.
+    """
+    task_ids = list(dict.fromkeys(int(task_id) for task_id in task_ids))
+
+    if not task_ids:
+        return {}
+
+    tasks = await execute_db_operation(
+        f"""
+        SELECT id, title, type, status, org_id, scheduled_publish_at, blocks
+        FROM {tasks_table_name}
+        WHERE id IN ({','.join(['?'] * len(task_ids))}) AND deleted_at IS NULL
+        """,
+        tuple(task_ids),
+        fetch_all=True,
+    )
+
+    task_id_to_task = {}
+    quiz_ids = []
+
+    for task in tasks:
+        task_data = {
+            "id": task[0],
+            "title": task[1],
+            "type": task[2],
+            "status": task[3],
+            "org_id": task[4],
+            "scheduled_publish_at": task[5],
+        }
+
+        if task_data["type"] == TaskType.LEARNING_MATERIAL:
+            task_data["blocks"] = json.loads(task[6]) if task[6] else []
+        elif task_data["type"] == TaskType.QUIZ:
+            task_data["questions"] = []
+            quiz_ids.append(task_data["id"])
+
+        task_id_to_task[task_data["id"]] = task_data
+
+    if not quiz_ids:
+        return task_id_to_task
+
+    questions = await execute_db_operation(
+        f"""
+        SELECT q.id, q.type, q.blocks, q.answer, q.input_type, q.response_type, qs.scorecard_id, q.context, q.coding_language, q.max_attempts, q.is_feedback_shown, q.title, q.task_id
+        FROM {questions_table_name} q
+        LEFT JOIN {question_scorecards_table_name} qs ON q.id = qs.question_id
+        WHERE q.task_id IN ({','.join(['?'] * len(quiz_ids))})
+        ORDER BY q.task_id, q.position ASC
+        """,
+        tuple(quiz_ids),
+        fetch_all=True,
+    )
+
+    scorecard_ids = list(
+        dict.fromkeys(
+            question[6] for question in questions if question[6] is not None
+        )
+    )
+
+    scorecard_id_to_scorecard = {}
+    if scorecard_ids:
+        scorecards = await execute_db_operation(
+            f"""
+            SELECT id, title, criteria, status FROM {scorecards_table_name}
+            WHERE id IN ({','.join(['?'] * len(scorecard_ids))})
+            """,
+            tuple(scorecard_ids),
+            fetch_all=True,
+        )
+
+        scorecard_id_to_scorecard = {
+            scorecard[0]: {
+                "id": scorecard[0],
+                "title": scorecard[1],
+                "criteria": json.loads(scorecard[2]),
+                "status": scorecard[3],
+            }
+            for scorecard in scorecards
+        }
+
+    for question in questions:
+        question_dict = convert_question_db_to_dict(question)
+
+        if question_dict["scorecard_id"] is not None:
+            question_dict["scorecard"] = scorecard_id_to_scorecard.get(
+                question_dict["scorecard_id"]
+            )
+
+        task_id_to_task[question[12]]["questions"].append(question_dict)
+
+    return task_id_to_task
+
+
 async def get_task_metadata(task_id: int) -> Dict:
     result = await execute_db_operation(
         f"""
@@ -339,7 +439,9 @@ async def update_learning_material_task(
 
         await conn.commit()
 
-        return await get_task(task_id)
+    prompt_context_cache.bump_version("task", task_id)
+
+    return await get_task(task_id)
 
 
 async def update_draft_quiz(
@@ -361,10 +463,20 @@ async def update_draft_quiz(
 
     scorecard_uuid_to_id = {}
 
+    # ids of both the replaced and the newly inserted questions whose cached
+    # prompt context needs to be invalidated, as sqlite can reuse deleted ids
+    question_ids = []
+
     # Execute all operations in a single transaction
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
 
+        await cursor.execute(
+            f"SELECT id FROM {questions_table_name} WHERE task_id = ?",
+            (task_id,),
+        )
+        question_ids += [row[0] for row in await cursor.fetchall()]
+
         await cursor.execute(
             f"DELETE FROM {question_scorecards_table_name} WHERE question_id IN (SELECT id FROM {questions_table_name} WHERE task_id = ?)",
             (task_id,),
@@ -411,6 +523,7 @@ async def update_draft_quiz(
             )
 
             question_id = cursor.lastrowid
+            question_ids.append(question_id)
 
             scorecard_id = None
             if question.get("scorecard_id") is not None:
@@ -447,7 +560,9 @@ async def update_draft_quiz(
 
         await conn.commit()
 
-        return await get_task(task_id)
+    prompt_context_cache.bump_version("question", *question_ids)
+
+    return await get_task(task_id)
 
 
 async def update_published_quiz(
@@ -461,9 +576,11 @@ async def update_published_quiz(
         cursor = await conn.cursor()
 
         scorecards_to_publish = []
+        question_ids = []
 
         for question in questions:
             question = question.model_dump()
+            question_ids.append(question["id"])
 
             await cursor.execute(
                 f"""
@@ -535,7 +652,9 @@ async def update_published_quiz(
 
         await conn.commit()
 
-        return await get_task(task_id)
+    prompt_context_cache.bump_version("question", *question_ids)
+
+    return await get_task(task_id)
 
 
 async def duplicate_task(task_id: int, course_id: int, milestone_id: int) -> int:
@@ -598,6 +717,23 @@ async def duplicate_task(task_id: int, course_id: int, milestone_id: int) -> int
     }
 
 
+async def bump_deleted_task_versions(task_ids: List[int]):
+    """
+    Cached prompts rendered from deleted tasks, or from their questions, must not
+    be reused.
+    """
+    question_rows = await execute_db_operation(
+        f"""
+        SELECT id FROM {questions_table_name} WHERE task_id IN ({','.join(['?'] * len(task_ids))})
+        """,
+        tuple(task_ids),
+        fetch_all=True,
+    )
+
+    prompt_context_cache.bump_version("task", *task_ids)
+    prompt_context_cache.bump_version("question", *[row[0] for row in question_rows])
+
+
 async def delete_task(task_id: int):
     await execute_db_operation(
         f"""
@@ -606,6 +742,8 @@ async def delete_task(task_id: int):
         (datetime.now(), task_id),
     )
 
+    await bump_deleted_task_versions([task_id])
+
 
 async def delete_tasks(task_ids: List[int]):
     task_ids_as_str = serialise_list_to_str(map(str, task_ids))
@@ -617,6 +755,9 @@ async def delete_tasks(task_ids: List[int]):
         (datetime.now(),),
     )
 
+    if task_ids:
+        await bump_deleted_task_versions(task_ids)
+
 
 async def get_solved_tasks_for_user(
     user_id: int,
@@ -756,52 +897,35 @@ async def update_task_generation_job_status(
         cursor = await conn.cursor()
 
         await cursor.execute(
-            f"UPDATE {task_generation_jobs_table_name} SET status = ? WHERE uuid = ?",
+            f"UPDATE {task_generation_jobs_table_name} SET status = ?, locked_by = NULL, locked_until = NULL WHERE uuid = ?",
             (str(status), job_uuid),
         )
 
         await conn.commit()
 
 
-async def get_course_task_generation_jobs_status(course_id: int) -> List[str]:
-    async with get_new_db_connection() as conn:
+async def get_course_task_generation_jobs_status(course_id: int) -> Dict[str, int]:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
 
+        # maintained by triggers on the jobs table, so this does not scan the jobs
         await cursor.execute(
-            f"SELECT status FROM {task_generation_jobs_table_name} WHERE course_id = ?",
+            f"SELECT status, count FROM {task_generation_progress_table_name} WHERE course_id = ?",
             (course_id,),
         )
 
-        statuses = [row[0] for row in await cursor.fetchall()]
+        counts = dict(await cursor.fetchall())
 
         return {
-            str(GenerateTaskJobStatus.COMPLETED): statuses.count(
-                str(GenerateTaskJobStatus.COMPLETED)
+            str(GenerateTaskJobStatus.COMPLETED): counts.get(
+                str(GenerateTaskJobStatus.COMPLETED), 0
             ),
-            str(GenerateTaskJobStatus.STARTED): statuses.count(
-                str(GenerateTaskJobStatus.STARTED)
+            str(GenerateTaskJobStatus.STARTED): counts.get(
+                str(GenerateTaskJobStatus.STARTED), 0
             ),
         }
 
 
-async def get_all_pending_task_generation_jobs() -> List[Dict]:
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
-        await cursor.execute(
-            f"SELECT uuid, job_details FROM {task_generation_jobs_table_name} WHERE status = ?",
-            (str(GenerateTaskJobStatus.STARTED),),
-        )
-
-        return [
-            {
-                "uuid": row[0],
-                "job_details": json.loads(row[1]),
-            }
-            for row in await cursor.fetchall()
-        ]
-
-
 async def drop_task_completions_table():
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
@@ -860,6 +984,8 @@ async def update_scorecard(scorecard_id: int, scorecard: BaseScorecard):
         (scorecard["title"], json.dumps(scorecard["criteria"]), scorecard_id),
     )
 
+    prompt_context_cache.bump_version("scorecard", scorecard_id)
+
     return await get_scorecard(scorecard_id)
 
 
@@ -874,6 +1000,9 @@ async def undo_task_delete(task_id: int):
 
         await conn.commit()
 
+    # linked materials missing while the task was deleted must show up again
+    prompt_context_cache.bump_version("task", task_id)
+
 
 async def publish_scheduled_tasks():
     """Publish all tasks whose scheduled time has arrived"""
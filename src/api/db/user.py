@@ -17,7 +17,10 @@ from api.config import (
 from api.slack import send_slack_notification_for_new_user
 from api.models import UserCohort
 from api.utils import generate_random_color, get_date_from_str
-from api.utils.db import execute_db_operation, get_new_db_connection
+from api.utils.db import (
+    execute_db_operation,
+    get_db_read_connection,
+)
 from api.models import NewCandidateProfileRead, NewCandidateProfileUpdate
 import sqlite3
 from api.models import User
@@ -466,7 +469,7 @@ async def update_candidate_profile(conn: sqlite3.Connection, user_id: int, profi
 
 async def get_candidate_profile(user_id: int) -> Optional[NewCandidateProfileRead]:
     """Retrieves a candidate profile by user ID."""
-    async with get_new_db_connection() as conn:
+    async with get_db_read_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute(
             """SELECT NEW_user_id, NEW_phone_number, NEW_location, NEW_bio, NEW_resume_url, NEW_linkedin_profile, NEW_portfolio_url, NEW_status, NEW_cooldown_until, NEW_updated_at
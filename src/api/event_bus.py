@@ -0,0 +1,187 @@
+import asyncio
+import time
+from typing import Callable, List, Optional, Tuple
+from api.config import (
+    websocket_event_bus,
+    websocket_event_poll_seconds,
+    websocket_event_retention_seconds,
+)
+from api.db.generation_event import (
+    add_generation_events,
+    get_generation_events_after,
+    get_last_generation_event_id,
+    delete_generation_events_before,
+)
+from api.utils.logging import logger
+
+# called with the sequence number of the event, its course id and the serialized event
+EventHandler = Callable[[int, int, str], None]
+
+
+class EventBus:
+    """
+    Carries serialized course generation events from the process that publishes
+    them to every process with websocket clients.
+    """
+
+    async def start(self, handler: Optional[EventHandler] = None) -> int:
+        """
+        Start the bus; events published by any process are passed to `handler`.
+        Processes without websocket clients start it without a handler. Returns the
+        sequence number of the latest event published before the bus started; the
+        events after it get increasing sequence numbers.
+        """
+        raise NotImplementedError
+
+    def publish(self, course_id: int, message: str):
+        """Publish an event without waiting for it to be delivered."""
+        raise NotImplementedError
+
+    async def stop(self):
+        raise NotImplementedError
+
+
+class InProcessEventBus(EventBus):
+    """Delivers events to the publishing process only."""
+
+    def __init__(self):
+        self.handler: Optional[EventHandler] = None
+        self.last_seq = 0
+
+    async def start(self, handler: Optional[EventHandler] = None) -> int:
+        self.handler = handler
+        # numbered from the start time so that the numbers keep increasing across
+        # restarts and clients resuming with a number from before are told to resync
+        self.last_seq = max(self.last_seq, int(time.time() * 1000))
+        return self.last_seq
+
+    def publish(self, course_id: int, message: str):
+        if self.handler:
+            self.last_seq += 1
+            self.handler(self.last_seq, course_id, message)
+
+    async def stop(self):
+        self.handler = None
+
+
+class SQLiteEventBus(EventBus):
+    """
+    Shares events through the generation events table: published events are
+    appended in batches by a writer task and every subscribed process polls the
+    table for events added since the last one it has seen.
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float = websocket_event_poll_seconds,
+        retention_seconds: float = websocket_event_retention_seconds,
+        batch_size: int = 500,
+    ):
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.batch_size = batch_size
+        self.handler: Optional[EventHandler] = None
+        self.pending: List[Tuple[int, str]] = []
+        self.has_pending = asyncio.Event()
+        self.stopping = False
+        self.writer: Optional[asyncio.Task] = None
+        self.reader: Optional[asyncio.Task] = None
+        self.last_event_id = 0
+        self.pruned_at = 0.0
+
+    async def start(self, handler: Optional[EventHandler] = None) -> int:
+        self.stopping = False
+        self.writer = asyncio.create_task(self.write_events())
+
+        # only events published from now on are delivered; the ids of the events
+        # are their sequence numbers
+        self.last_event_id = await get_last_generation_event_id()
+
+        if handler:
+            self.handler = handler
+            self.reader = asyncio.create_task(self.read_events())
+
+        return self.last_event_id
+
+    def publish(self, course_id: int, message: str):
+        if self.writer is None:
+            logger.warning(f"Dropping event of course {course_id}: event bus not started")
+            return
+
+        self.pending.append((course_id, message))
+        self.has_pending.set()
+
+    async def write_pending(self):
+        events, self.pending = self.pending, []
+        self.has_pending.clear()
+
+        if not events:
+            return
+
+        try:
+            await add_generation_events(events)
+        except Exception as exception:
+            logger.error(f"Failed to publish {len(events)} generation events: {exception}")
+
+    async def write_events(self):
+        while not self.stopping:
+            await self.has_pending.wait()
+            await self.write_pending()
+
+        await self.write_pending()
+
+    async def read_new_events(self):
+        while True:
+            events = await get_generation_events_after(
+                self.last_event_id, self.batch_size
+            )
+
+            for event_id, course_id, payload in events:
+                self.last_event_id = event_id
+                self.handler(event_id, course_id, payload)
+
+            if len(events) < self.batch_size:
+                return
+
+    async def prune_events(self):
+        now = time.time()
+        if now - self.pruned_at < self.retention_seconds:
+            return
+
+        self.pruned_at = now
+        await delete_generation_events_before(now - self.retention_seconds)
+
+    async def read_events(self):
+        while True:
+            try:
+                await self.read_new_events()
+                await self.prune_events()
+            except Exception as exception:
+                logger.error(f"Failed to read generation events: {exception}")
+
+            await asyncio.sleep(self.poll_seconds)
+
+    async def stop(self):
+        if self.reader:
+            self.reader.cancel()
+            try:
+                await self.reader
+            except asyncio.CancelledError:
+                pass
+
+        # events published just before stopping still reach the other processes
+        if self.writer:
+            self.stopping = True
+            self.has_pending.set()
+            await self.writer
+
+        self.reader = None
+        self.writer = None
+        self.handler = None
+
+
+def create_event_bus(kind: str = websocket_event_bus) -> EventBus:
+    if kind == "sqlite":
+        return SQLiteEventBus()
+
+    return InProcessEventBus()
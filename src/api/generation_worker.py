@@ -0,0 +1,302 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from uuid import uuid4
+from api.config import (
+    course_generation_jobs_table_name,
+    task_generation_jobs_table_name,
+    course_generation_max_concurrency,
+    course_generation_timeout_seconds,
+    generation_job_lease_seconds,
+    generation_job_heartbeat_seconds,
+    generation_worker_poll_seconds,
+    generation_job_max_attempts,
+    generation_job_retry_delay_seconds,
+)
+from api.db.generation_jobs import (
+    fail_expired_generation_jobs,
+    claim_generation_jobs,
+    renew_generation_job_lease,
+    fail_generation_job,
+)
+from api.models import GenerateCourseJobStatus, GenerateTaskJobStatus
+from api.utils.logging import logger
+
+
+async def run_course_structure_job(job: Dict):
+    from api.routes.ai import run_course_structure_generation_job
+
+    await run_course_structure_generation_job(job)
+
+
+async def run_task_job(job: Dict):
+    from api.routes.ai import run_task_generation_job
+
+    await run_task_generation_job(job)
+
+
+async def on_task_job_failed(job: Dict):
+    from api.routes.ai import on_task_generation_job_failed
+
+    await on_task_generation_job_failed(job)
+
+
+class GenerationJobKind:
+    def __init__(
+        self,
+        name: str,
+        table_name: str,
+        pending_status: str,
+        failed_status: str,
+        run: Callable[[Dict], Awaitable[None]],
+        on_failed: Optional[Callable[[Dict], Awaitable[None]]] = None,
+    ):
+        self.name = name
+        self.table_name = table_name
+        self.pending_status = pending_status
+        self.failed_status = failed_status
+        self.run = run
+        self.on_failed = on_failed
+
+
+# course structures are claimed first as the task jobs of a course depend on them
+generation_job_kinds = [
+    GenerationJobKind(
+        "course_structure",
+        course_generation_jobs_table_name,
+        GenerateCourseJobStatus.STARTED,
+        GenerateCourseJobStatus.FAILED,
+        run_course_structure_job,
+    ),
+    GenerationJobKind(
+        "task",
+        task_generation_jobs_table_name,
+        GenerateTaskJobStatus.STARTED,
+        GenerateTaskJobStatus.FAILED,
+        run_task_job,
+        on_task_job_failed,
+    ),
+]
+
+
+class GenerationJobWorker:
+    """
+    Runs course structure and task generation jobs from the job tables.
+
+    Jobs are claimed with a lease that the worker renews while they run, so any
+    number of workers (inside the API processes or started with
+    `python -m api.worker`) can share the tables without running a job twice, and
+    the jobs of a worker that dies are picked up by another once their lease
+    expires. Failed attempts are retried with exponential backoff until the job runs
+    out of attempts, at which point it is marked failed and left for inspection.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        poll_seconds: float,
+        lease_seconds: float,
+        heartbeat_seconds: float,
+        timeout_seconds: float,
+        max_attempts: int,
+        retry_delay_seconds: float,
+        worker_id: Optional[str] = None,
+    ):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.worker_id = (
+            worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+        )
+        self._running: Dict[asyncio.Task, Dict] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """Look for new jobs right away instead of at the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        self._loop_task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Stop claiming jobs and cancel the ones running. Their leases are left to
+        expire so that they are run again by this or another worker.
+        """
+        tasks = list(self._running)
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def claim(self) -> int:
+        claimed = 0
+
+        for kind in generation_job_kinds:
+            free = self.concurrency - len(self._running)
+            if free <= 0:
+                break
+
+            for job in await fail_expired_generation_jobs(
+                kind.table_name,
+                kind.pending_status,
+                kind.failed_status,
+                self.max_attempts,
+            ):
+                logger.error(
+                    f"{kind.name} generation job {job['uuid']} failed for the last "
+                    f"time: lease expired"
+                )
+                await self.report_failed(kind, job)
+
+            jobs = await claim_generation_jobs(
+                kind.table_name,
+                kind.pending_status,
+                self.worker_id,
+                free,
+                self.lease_seconds,
+                self.max_attempts,
+            )
+
+            for job in jobs:
+                task = asyncio.create_task(self.run_job(kind, job))
+                self._running[task] = job
+                task.add_done_callback(self._running.pop)
+
+            claimed += len(jobs)
+
+        return claimed
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        logger.info(f"Generation worker {self.worker_id} started")
+
+        while True:
+            self._wakeup.clear()
+
+            try:
+                await self.claim()
+            except Exception as exception:
+                logger.error(f"Failed to claim generation jobs: {exception!r}")
+
+            wakeup = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                # a finished job frees a slot, so look for more jobs right away
+                await asyncio.wait(
+                    [wakeup, *self._running],
+                    timeout=self.poll_seconds,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                wakeup.cancel()
+
+    async def report_failed(self, kind: GenerationJobKind, job: Dict):
+        if kind.on_failed is None:
+            return
+
+        try:
+            await kind.on_failed(job)
+        except Exception as exception:
+            logger.error(
+                f"Failed to report the failure of {kind.name} generation job "
+                f"{job['uuid']}: {exception!r}"
+            )
+
+    async def heartbeat(self, kind: GenerationJobKind, job: Dict, task: asyncio.Task):
+        renewed_at = time.monotonic()
+
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+
+            try:
+                renewed = await renew_generation_job_lease(
+                    kind.table_name, job["uuid"], self.worker_id, self.lease_seconds
+                )
+            except Exception as exception:
+                logger.warning(
+                    f"Failed to renew the lease on {kind.name} generation job "
+                    f"{job['uuid']}: {exception!r}"
+                )
+
+                # keep trying while the lease cannot have expired before the next
+                # attempt; past that another worker may claim the job
+                if time.monotonic() - renewed_at + self.heartbeat_seconds < (
+                    self.lease_seconds
+                ):
+                    continue
+
+                renewed = False
+
+            if not renewed:
+                logger.warning(
+                    f"Lost the lease on {kind.name} generation job {job['uuid']}"
+                )
+                job["lease_lost"] = True
+                task.cancel()
+                return
+
+            renewed_at = time.monotonic()
+
+    async def run_job(self, kind: GenerationJobKind, job: Dict):
+        heartbeat = asyncio.create_task(
+            self.heartbeat(kind, job, asyncio.current_task())
+        )
+
+        try:
+            await asyncio.wait_for(kind.run(job), self.timeout_seconds)
+        except asyncio.CancelledError:
+            if job.get("lease_lost"):
+                # another worker owns the job now
+                return
+            raise
+        except Exception as exception:
+            failed = await fail_generation_job(
+                kind.table_name,
+                job["uuid"],
+                self.worker_id,
+                repr(exception),
+                self.retry_delay_seconds * 2 ** (job["attempts"] - 1),
+                self.max_attempts,
+                kind.failed_status,
+            )
+
+            logger.error(
+                f"{kind.name} generation job {job['uuid']} failed on attempt "
+                f"{job['attempts']}{' for the last time' if failed else ''}: "
+                f"{exception!r}"
+            )
+
+            if failed:
+                await self.report_failed(kind, job)
+        finally:
+            heartbeat.cancel()
+            (result,) = await asyncio.gather(heartbeat, return_exceptions=True)
+
+            if isinstance(result, Exception):
+                logger.error(
+                    f"Heartbeat of {kind.name} generation job {job['uuid']} failed: "
+                    f"{result!r}"
+                )
+
+
+generation_worker = GenerationJobWorker(
+    course_generation_max_concurrency,
+    generation_worker_poll_seconds,
+    generation_job_lease_seconds,
+    generation_job_heartbeat_seconds,
+    course_generation_timeout_seconds,
+    generation_job_max_attempts,
+    generation_job_retry_delay_seconds,
+)
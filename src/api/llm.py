@@ -1,17 +1,817 @@
-from typing import Dict, List
+import asyncio
+import importlib.util
+import random
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import lru_cache
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
 import backoff
+import httpx
 import openai
 import instructor
 
 from openai import OpenAI
+from openai.types import CompletionUsage
+from instructor.exceptions import InstructorRetryException
+from instructor.process_response import handle_response_model
 
 from pydantic import BaseModel
 
+from api.config import (
+    openai_max_connections,
+    openai_max_keepalive_connections,
+    openai_keepalive_expiry,
+    llm_global_requests_per_minute,
+    llm_global_tokens_per_minute,
+    llm_org_requests_per_minute,
+    llm_org_tokens_per_minute,
+    llm_model_max_concurrency,
+    llm_background_share,
+    llm_max_attempts,
+    llm_retry_base_delay_seconds,
+    llm_retry_max_delay_seconds,
+    llm_retry_budget_ratio,
+    llm_retry_budget_min_per_minute,
+    llm_circuit_breaker_failure_threshold,
+    llm_circuit_breaker_reset_seconds,
+    llm_fallback_model_plans,
+    openai_plan_to_model_name,
+)
+from api.utils.chat_history import count_messages_tokens
 from api.utils.logging import logger
 
 # Test log message
 logger.info("Logging system initialized")
 
+# HTTP/2 is only negotiated when the optional h2 package is installed
+http2_available = importlib.util.find_spec("h2") is not None
+
+
+class LLMClientRegistry:
+    """
+    Long-lived OpenAI clients keyed by API key, so that every LLM call reuses the same
+    keep-alive connection pool instead of paying for a new TLS handshake. Async
+    clients are bound to the event loop that created them and are recreated if a
+    different loop asks for one.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        http2: bool = False,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self._async_clients: Dict[
+            str, Tuple[asyncio.AbstractEventLoop, openai.AsyncOpenAI]
+        ] = {}
+        self._instructor_clients: Dict[
+            str, Tuple[openai.AsyncOpenAI, instructor.AsyncInstructor]
+        ] = {}
+        self._sync_clients: Dict[str, openai.OpenAI] = {}
+
+    def get_async_client(self, api_key: str) -> openai.AsyncOpenAI:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        entry = self._async_clients.get(api_key)
+        if entry is None or entry[0] is not loop or entry[1].is_closed():
+            client = openai.AsyncOpenAI(
+                api_key=api_key,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=self.limits, http2=self.http2
+                ),
+            )
+            entry = (loop, client)
+            self._async_clients[api_key] = entry
+
+        return entry[1]
+
+    def get_instructor_client(self, api_key: str) -> instructor.AsyncInstructor:
+        client = self.get_async_client(api_key)
+
+        entry = self._instructor_clients.get(api_key)
+        if entry is None or entry[0] is not client:
+            entry = (client, instructor.from_openai(client))
+            self._instructor_clients[api_key] = entry
+
+        return entry[1]
+
+    def get_sync_client(self, api_key: str) -> openai.OpenAI:
+        client = self._sync_clients.get(api_key)
+        if client is None or client.is_closed():
+            client = openai.OpenAI(
+                api_key=api_key,
+                http_client=openai.DefaultHttpxClient(
+                    limits=self.limits, http2=self.http2
+                ),
+            )
+            self._sync_clients[api_key] = client
+
+        return client
+
+    async def close(self):
+        async_clients = [client for _, client in self._async_clients.values()]
+        sync_clients = list(self._sync_clients.values())
+
+        self._async_clients.clear()
+        self._instructor_clients.clear()
+        self._sync_clients.clear()
+
+        for client in async_clients:
+            try:
+                await client.close()
+            except Exception as exception:
+                # clients created on an event loop that is gone can't be closed
+                logger.warning(f"Failed to close OpenAI client: {exception}")
+
+        for client in sync_clients:
+            client.close()
+
+
+llm_clients = LLMClientRegistry(
+    openai_max_connections,
+    openai_max_keepalive_connections,
+    openai_keepalive_expiry,
+    http2_available,
+)
+
+
+def get_openai_client(api_key: str) -> openai.AsyncOpenAI:
+    return llm_clients.get_async_client(api_key)
+
+
+def get_instructor_client(api_key: str) -> instructor.AsyncInstructor:
+    return llm_clients.get_instructor_client(api_key)
+
+
+async def close_llm_clients():
+    await llm_clients.close()
+
+
+class LLMPriority(IntEnum):
+    # lower values are admitted first
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+    def __str__(self):
+        return self.name.lower()
+
+
+class TokenBucket:
+    """
+    Rate limit of `per_minute` units that refills continuously and allows bursts of
+    up to a full minute's worth.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float, reserve: float = 0) -> float:
+        """
+        Seconds until `amount` can be taken while leaving `reserve` (a fraction of
+        the capacity) in the bucket; 0 if it can be taken right away.
+        """
+        self._refill(now)
+        # a request larger than the bucket would otherwise never be admitted
+        needed = min(amount, self.capacity * (1 - reserve)) + self.capacity * reserve
+
+        if self.tokens >= needed:
+            return 0
+
+        return (needed - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+_llm_request_context: ContextVar[Tuple[LLMPriority, Optional[int]]] = ContextVar(
+    "llm_request_context", default=(LLMPriority.INTERACTIVE, None)
+)
+
+
+@contextmanager
+def llm_request_context(
+    priority: LLMPriority = LLMPriority.INTERACTIVE, org_id: Optional[int] = None
+):
+    """
+    Priority and org that LLM calls made within this context (and the tasks it
+    spawns) are admitted under by the scheduler.
+    """
+    token = _llm_request_context.set((priority, org_id))
+    try:
+        yield
+    finally:
+        _llm_request_context.reset(token)
+
+
+def get_llm_request_context() -> Tuple[LLMPriority, Optional[int]]:
+    """Priority and org of the current `llm_request_context`."""
+    return _llm_request_context.get()
+
+
+class LLMTicket:
+    def __init__(
+        self,
+        model: str,
+        tokens: int,
+        priority: LLMPriority,
+        org_id: Optional[int],
+    ):
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.org_id = org_id
+        self.enqueued_at = time.monotonic()
+        self.queue_ms = None
+        self.future: Optional[asyncio.Future] = None
+        self.released = False
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls sharing the same API key.
+
+    Every call waits in a priority queue until its model has a free concurrency slot
+    and the global and per-org request and token buckets can cover it. Calls are
+    admitted in priority order and, within a priority, in arrival order. Background
+    calls may only use `background_share` of every limit, so interactive calls
+    always find headroom and go ahead of any queued background work.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        org_requests_per_minute: int,
+        org_tokens_per_minute: int,
+        model_max_concurrency: Dict[str, int],
+        background_share: float,
+    ):
+        self.org_requests_per_minute = org_requests_per_minute
+        self.org_tokens_per_minute = org_tokens_per_minute
+        self.model_max_concurrency = model_max_concurrency
+        self.background_share = background_share
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._org_buckets: Dict[int, Tuple[TokenBucket, TokenBucket]] = {}
+        self._queue: List[LLMTicket] = []
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._background_in_flight: Dict[str, int] = defaultdict(int)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._admitted: Dict[str, int] = defaultdict(int)
+        self._queue_ms_total: Dict[str, float] = defaultdict(float)
+        self._queue_ms_max: Dict[str, float] = defaultdict(float)
+
+    def get_max_concurrency(self, model: str) -> int:
+        return self.model_max_concurrency.get(
+            model, self.model_max_concurrency["default"]
+        )
+
+    def _has_free_slot(self, ticket: LLMTicket) -> bool:
+        limit = self.get_max_concurrency(ticket.model)
+
+        if self._in_flight[ticket.model] >= limit:
+            return False
+
+        if ticket.priority == LLMPriority.INTERACTIVE:
+            return True
+
+        return self._background_in_flight[ticket.model] < max(
+            1, int(limit * self.background_share)
+        )
+
+    def _get_buckets(self, ticket: LLMTicket) -> List[Tuple[str, TokenBucket, int]]:
+        buckets = [
+            ("global", self._request_bucket, 1),
+            ("global", self._token_bucket, ticket.tokens),
+        ]
+
+        if ticket.org_id is not None:
+            if ticket.org_id not in self._org_buckets:
+                self._org_buckets[ticket.org_id] = (
+                    TokenBucket(self.org_requests_per_minute),
+                    TokenBucket(self.org_tokens_per_minute),
+                )
+            request_bucket, token_bucket = self._org_buckets[ticket.org_id]
+            buckets += [
+                ("org", request_bucket, 1),
+                ("org", token_bucket, ticket.tokens),
+            ]
+
+        return buckets
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.monotonic()
+        retry_in = None
+        global_blocked = False
+        blocked_models = set()
+        blocked_orgs = set()
+
+        for ticket in sorted(self._queue, key=lambda t: (t.priority, t.enqueued_at)):
+            if ticket.future.done():
+                # cancelled while waiting
+                self._queue.remove(ticket)
+                continue
+
+            # a call never overtakes an earlier (or more urgent) call it competes with
+            if (
+                global_blocked
+                or ticket.model in blocked_models
+                or ticket.org_id in blocked_orgs
+            ):
+                continue
+
+            if not self._has_free_slot(ticket):
+                blocked_models.add(ticket.model)
+                continue
+
+            reserve = (
+                0
+                if ticket.priority == LLMPriority.INTERACTIVE
+                else 1 - self.background_share
+            )
+            buckets = self._get_buckets(ticket)
+            wait = 0
+            for scope, bucket, amount in buckets:
+                bucket_wait = bucket.wait_time(amount, now, reserve)
+                if not bucket_wait:
+                    continue
+
+                wait = max(wait, bucket_wait)
+                if scope == "global":
+                    global_blocked = True
+                else:
+                    blocked_orgs.add(ticket.org_id)
+
+            if wait:
+                retry_in = wait if retry_in is None else min(retry_in, wait)
+                continue
+
+            for _, bucket, amount in buckets:
+                bucket.take(amount)
+
+            self._queue.remove(ticket)
+            self._in_flight[ticket.model] += 1
+            if ticket.priority != LLMPriority.INTERACTIVE:
+                self._background_in_flight[ticket.model] += 1
+            self._record_admission(ticket, now)
+            ticket.future.set_result(None)
+
+        if retry_in is not None:
+            self._timer = asyncio.get_running_loop().call_later(
+                retry_in, self._dispatch
+            )
+
+    def _record_admission(self, ticket: LLMTicket, now: float):
+        ticket.queue_ms = (now - ticket.enqueued_at) * 1000
+        priority = str(ticket.priority)
+        self._admitted[priority] += 1
+        self._queue_ms_total[priority] += ticket.queue_ms
+        self._queue_ms_max[priority] = max(
+            self._queue_ms_max[priority], ticket.queue_ms
+        )
+
+    async def acquire(
+        self,
+        model: str,
+        tokens: int,
+        priority: Optional[LLMPriority] = None,
+        org_id: Optional[int] = None,
+    ) -> LLMTicket:
+        """
+        Wait until a call to `model` estimated at `tokens` tokens can be made.
+        Priority and org default to those of the current `llm_request_context`.
+        The returned ticket must be passed to `release` once the call is over.
+        """
+        context_priority, context_org_id = _llm_request_context.get()
+        ticket = LLMTicket(
+            model,
+            tokens,
+            context_priority if priority is None else priority,
+            context_org_id if org_id is None else org_id,
+        )
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queue.append(ticket)
+        self._dispatch()
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # admitted just as the caller was cancelled
+                self.release(ticket)
+            else:
+                self._dispatch()
+            raise
+
+        return ticket
+
+    def release(self, ticket: LLMTicket):
+        if ticket.released:
+            return
+
+        ticket.released = True
+        self._in_flight[ticket.model] -= 1
+        if ticket.priority != LLMPriority.INTERACTIVE:
+            self._background_in_flight[ticket.model] -= 1
+        if self._queue:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, model: str, messages: List, max_completion_tokens: int):
+        ticket = await self.acquire(
+            model, estimate_llm_call_tokens(model, messages, max_completion_tokens)
+        )
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict:
+        queued = defaultdict(int)
+        for ticket in self._queue:
+            queued[str(ticket.priority)] += 1
+
+        return {
+            "queued": dict(queued),
+            "in_flight": {
+                model: count for model, count in self._in_flight.items() if count
+            },
+            "admitted": dict(self._admitted),
+            "mean_queue_ms": {
+                priority: self._queue_ms_total[priority] / count
+                for priority, count in self._admitted.items()
+            },
+            "max_queue_ms": dict(self._queue_ms_max),
+        }
+
+
+def estimate_llm_call_tokens(
+    model: str, messages: List, max_completion_tokens: int
+) -> int:
+    # the API counts max completion tokens against the token rate limit up front
+    return count_messages_tokens(messages, model) + max_completion_tokens
+
+
+llm_scheduler = LLMScheduler(
+    llm_global_requests_per_minute,
+    llm_global_tokens_per_minute,
+    llm_org_requests_per_minute,
+    llm_org_tokens_per_minute,
+    llm_model_max_concurrency,
+    llm_background_share,
+)
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised without calling the API when the circuits of a model and of its
+    fallback model are both open.
+    """
+
+
+# status codes that mean the request may succeed if sent again
+retryable_status_codes = {408, 409, 429}
+
+
+def get_llm_error_cause(exception: BaseException) -> BaseException:
+    # instructor wraps the API error once its own (validation) retries give up
+    if isinstance(exception, InstructorRetryException) and exception.args:
+        if isinstance(exception.args[0], BaseException):
+            return exception.args[0]
+
+    return exception
+
+
+def is_retryable_llm_error(exception: BaseException) -> bool:
+    """
+    Whether `exception` is a transient provider or network failure. Invalid
+    requests, authentication errors and responses that do not match the response
+    model are not retried.
+    """
+    exception = get_llm_error_cause(exception)
+
+    if isinstance(exception, openai.APIStatusError):
+        return (
+            exception.status_code in retryable_status_codes
+            or exception.status_code >= 500
+        )
+
+    return isinstance(
+        exception,
+        (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError),
+    )
+
+
+def get_retry_delay(exception: BaseException, attempt: int) -> float:
+    delay = random.uniform(
+        0,
+        min(
+            llm_retry_max_delay_seconds,
+            llm_retry_base_delay_seconds * 2 ** (attempt - 1),
+        ),
+    )
+
+    exception = get_llm_error_cause(exception)
+    if isinstance(exception, openai.APIStatusError):
+        try:
+            retry_after = float(exception.response.headers.get("retry-after", 0))
+        except ValueError:
+            retry_after = 0
+        delay = max(delay, min(retry_after, llm_retry_max_delay_seconds))
+
+    return delay
+
+
+class RetryBudget:
+    """
+    Caps retries to `ratio` of the calls made over the last minute plus
+    `min_per_minute`, so that retries cannot multiply the load on a provider that
+    is already failing.
+    """
+
+    def __init__(self, ratio: float, min_per_minute: int):
+        self.ratio = ratio
+        self.min_per_minute = min_per_minute
+        self._calls = deque()
+        self._retries = deque()
+
+    def _prune(self, now: float):
+        for timestamps in (self._calls, self._retries):
+            while timestamps and now - timestamps[0] > 60:
+                timestamps.popleft()
+
+    def record_call(self):
+        self._calls.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+
+        if len(self._retries) >= len(self._calls) * self.ratio + self.min_per_minute:
+            return False
+
+        self._retries.append(now)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Stops sending calls to a model after `failure_threshold` consecutive failures.
+    Once `reset_seconds` have passed a single trial call is let through, which
+    closes the circuit again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started_at = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if not self.is_open:
+            return True
+
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_seconds:
+            return False
+
+        # a trial whose caller went away without reporting back is replaced
+        if (
+            self._trial_started_at is not None
+            and now - self._trial_started_at < self.reset_seconds
+        ):
+            return False
+
+        self._trial_started_at = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+
+        if self.is_open or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._trial_started_at = None
+
+
+llm_retry_budget = RetryBudget(llm_retry_budget_ratio, llm_retry_budget_min_per_minute)
+
+llm_circuit_breakers: Dict[str, CircuitBreaker] = defaultdict(
+    lambda: CircuitBreaker(
+        llm_circuit_breaker_failure_threshold, llm_circuit_breaker_reset_seconds
+    )
+)
+
+llm_fallback_models = {
+    openai_plan_to_model_name[plan]: openai_plan_to_model_name[fallback_plan]
+    for plan, fallback_plan in llm_fallback_model_plans.items()
+}
+
+
+def select_llm_model(model: str) -> str:
+    """
+    Return `model`, or its fallback model while the circuit of `model` is open.
+    """
+    if llm_circuit_breakers[model].allow():
+        return model
+
+    fallback_model = llm_fallback_models.get(model)
+    if fallback_model and llm_circuit_breakers[fallback_model].allow():
+        logger.warning(f"Circuit open for {model}, falling back to {fallback_model}")
+        return fallback_model
+
+    raise LLMUnavailableError(f"Circuit open for {model}")
+
+
+def record_llm_failure(
+    exception: BaseException, model: str, attempt: int
+) -> Optional[float]:
+    """
+    Record a failed attempt at calling `model` and return how long to wait before
+    the next attempt, or None if the call should not be retried.
+    """
+    if not is_retryable_llm_error(exception):
+        # the model answered; the request itself was at fault
+        llm_circuit_breakers[model].record_success()
+        return None
+
+    llm_circuit_breakers[model].record_failure()
+
+    if attempt >= llm_max_attempts or not llm_retry_budget.try_spend():
+        return None
+
+    logger.warning(f"Retrying call to {model} after attempt {attempt}: {exception}")
+    return get_retry_delay(exception, attempt)
+
+
+async def hedge_llm_call(
+    call: Callable[[str], Awaitable[Any]], model: str, hedge_after: float
+) -> Any:
+    """
+    Run `call(model)` and, if it has not finished within `hedge_after` seconds,
+    a second identical call; return whichever succeeds first.
+    """
+    calls = {asyncio.ensure_future(call(model))}
+
+    try:
+        done, _ = await asyncio.wait(calls, timeout=hedge_after)
+        if not done and llm_retry_budget.try_spend():
+            calls.add(asyncio.ensure_future(call(model)))
+
+        while True:
+            done, calls = await asyncio.wait(
+                calls, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+
+            if not calls:
+                # every call failed; raise the last failure
+                return task.result()
+    finally:
+        for task in calls:
+            task.cancel()
+
+
+async def call_llm_with_retries(
+    call: Callable[[str], Awaitable[Any]],
+    model: str,
+    hedge_after: Optional[float] = None,
+) -> Any:
+    """
+    Run `call` with `model` (or its fallback while the circuit of `model` is
+    open), retrying transient failures within the retry budget.
+    """
+    llm_retry_budget.record_call()
+    attempt = 0
+
+    while True:
+        attempt += 1
+        selected_model = select_llm_model(model)
+
+        try:
+            if hedge_after is None:
+                result = await call(selected_model)
+            else:
+                result = await hedge_llm_call(call, selected_model, hedge_after)
+        except Exception as exception:
+            delay = record_llm_failure(exception, selected_model, attempt)
+            if delay is None:
+                raise
+
+            await asyncio.sleep(delay)
+            continue
+
+        llm_circuit_breakers[selected_model].record_success()
+        return result
+
+
+async def stream_llm_with_retries(
+    open_stream: Callable[[str], Awaitable[AsyncGenerator]], model: str
+) -> AsyncGenerator:
+    """
+    Streaming counterpart of `call_llm_with_retries`. Failures while opening the
+    stream or before its first chunk are retried; once a chunk has been passed on,
+    a failure is raised since the caller has already used part of the output.
+    """
+    llm_retry_budget.record_call()
+    attempt = 0
+    # the stream may be reopened wherever it is consumed, outside of the context
+    # it was first opened in
+    request_context = get_llm_request_context()
+
+    async def open_with_retries() -> Tuple[str, AsyncGenerator]:
+        nonlocal attempt
+
+        while True:
+            attempt += 1
+            selected_model = select_llm_model(model)
+
+            try:
+                with llm_request_context(*request_context):
+                    return selected_model, await open_stream(selected_model)
+            except Exception as exception:
+                delay = record_llm_failure(exception, selected_model, attempt)
+                if delay is None:
+                    raise
+
+                await asyncio.sleep(delay)
+
+    selected_model, stream = await open_with_retries()
+
+    async def iterate():
+        nonlocal selected_model, stream
+        started = False
+
+        while True:
+            try:
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+            except Exception as exception:
+                if started:
+                    if is_retryable_llm_error(exception):
+                        llm_circuit_breakers[selected_model].record_failure()
+                    raise
+
+                delay = record_llm_failure(exception, selected_model, attempt)
+                if delay is None:
+                    raise
+
+                await asyncio.sleep(delay)
+                selected_model, stream = await open_with_retries()
+                continue
+
+            llm_circuit_breakers[selected_model].record_success()
+            return
+
+    return iterate()
+
 
 def is_reasoning_model(model: str) -> bool:
     return model in [
@@ -40,68 +840,156 @@ def validate_openai_api_key(openai_api_key: str) -> bool:
         return None
 
 
-@backoff.on_exception(backoff.expo, Exception, max_tries=5, factor=2)
 async def run_llm_with_instructor(
     api_key: str,
     model: str,
     messages: List,
     response_model: BaseModel,
     max_completion_tokens: int,
+    hedge_after: Optional[float] = None,
 ):
-    client = instructor.from_openai(openai.AsyncOpenAI(api_key=api_key))
+    client = get_instructor_client(api_key)
 
-    model_kwargs = {}
+    async def call(model: str):
+        model_kwargs = {}
 
-    if not is_reasoning_model(model):
-        model_kwargs["temperature"] = 0
+        if not is_reasoning_model(model):
+            model_kwargs["temperature"] = 0
 
-    return await client.chat.completions.create(
-        model=model,
-        messages=messages,
-        response_model=response_model,
-        max_completion_tokens=max_completion_tokens,
-        store=True,
-        **model_kwargs,
+        async with llm_scheduler.admit(model, messages, max_completion_tokens):
+            return await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_model=response_model,
+                max_completion_tokens=max_completion_tokens,
+                store=True,
+                **model_kwargs,
+            )
+
+    return await call_llm_with_retries(call, model, hedge_after)
+
+
+async def release_after_stream(stream: AsyncGenerator, ticket: LLMTicket):
+    # the scheduler slot is held until the stream is exhausted or abandoned
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        llm_scheduler.release(ticket)
+
+
+def get_cached_prompt_tokens(usage: CompletionUsage) -> int:
+    if not usage.prompt_tokens_details:
+        return 0
+
+    return usage.prompt_tokens_details.cached_tokens or 0
+
+
+@lru_cache(maxsize=None)
+def get_partial_response_model(response_model: BaseModel):
+    # instructor builds a new partial model class on every call otherwise
+    return instructor.Partial[response_model]
+
+
+async def stream_partial_with_usage(
+    api_key: str,
+    response_model: BaseModel,
+    on_usage: Callable[[CompletionUsage], None],
+    **kwargs,
+):
+    """
+    Equivalent of instructor's `create_partial` that also reports the token usage
+    of the completion, which instructor drops from the stream.
+    """
+    partial_model, create_kwargs = handle_response_model(
+        get_partial_response_model(response_model),
+        mode=instructor.Mode.TOOLS,
+        **kwargs,
+    )
+
+    completion = await get_openai_client(api_key).chat.completions.create(
+        stream_options={"include_usage": True}, **create_kwargs
+    )
+
+    async def chunks():
+        async for chunk in completion:
+            if chunk.usage:
+                on_usage(chunk.usage)
+            yield chunk
+
+    return await partial_model.from_streaming_response_async(
+        chunks(), mode=instructor.Mode.TOOLS
     )
 
 
-@backoff.on_exception(backoff.expo, Exception, max_tries=5, factor=2)
 async def stream_llm_with_instructor(
     api_key: str,
     model: str,
     messages: List,
     response_model: BaseModel,
     max_completion_tokens: int,
+    on_usage: Optional[Callable[[CompletionUsage], None]] = None,
     **kwargs,
 ):
-    client = instructor.from_openai(openai.AsyncOpenAI(api_key=api_key))
+    async def open_stream(model: str):
+        model_kwargs = {}
 
-    model_kwargs = {}
+        if not is_reasoning_model(model):
+            model_kwargs["temperature"] = 0
 
-    if not is_reasoning_model(model):
-        model_kwargs["temperature"] = 0
+        model_kwargs.update(kwargs)
 
-    model_kwargs.update(kwargs)
+        ticket = await llm_scheduler.acquire(
+            model, estimate_llm_call_tokens(model, messages, max_completion_tokens)
+        )
 
-    return client.chat.completions.create_partial(
-        model=model,
-        messages=messages,
-        response_model=response_model,
-        stream=True,
-        max_completion_tokens=max_completion_tokens,
-        store=True,
-        **model_kwargs,
-    )
+        try:
+            if on_usage:
+                stream = await stream_partial_with_usage(
+                    api_key,
+                    response_model,
+                    on_usage,
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    max_completion_tokens=max_completion_tokens,
+                    store=True,
+                    **model_kwargs,
+                )
+            else:
+                client = get_instructor_client(api_key)
+
+                stream = client.chat.completions.create_partial(
+                    model=model,
+                    messages=messages,
+                    response_model=response_model,
+                    stream=True,
+                    max_completion_tokens=max_completion_tokens,
+                    store=True,
+                    **model_kwargs,
+                )
+        except BaseException:
+            llm_scheduler.release(ticket)
+            raise
+
+        return release_after_stream(stream, ticket)
+
+    return await stream_llm_with_retries(open_stream, model)
 
 
-@backoff.on_exception(backoff.expo, Exception, max_tries=5, factor=2)
+@backoff.on_exception(
+    backoff.expo,
+    Exception,
+    max_tries=llm_max_attempts,
+    giveup=lambda exception: not is_retryable_llm_error(exception),
+)
 def stream_llm_with_openai(
     api_key: str,
     model: str,
     messages: List,
     max_completion_tokens: int,
 ):
-    client = openai.OpenAI(api_key=api_key)
+    client = llm_clients.get_sync_client(api_key)
 
     model_kwargs = {}
 
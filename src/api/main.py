@@ -1,4 +1,3 @@
-import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,7 +5,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 import os
 from os.path import exists
-from api.config import UPLOAD_FOLDER_NAME
+from api.config import UPLOAD_FOLDER_NAME, generation_worker_mode
 from api.routes import (
     auth,
     code,
@@ -24,14 +23,14 @@ from api.routes import (
     jobs,
     applications,
     interviews,
+    admin,
 )
-from api.routes.ai import (
-    resume_pending_task_generation_jobs,
-    resume_pending_course_structure_generation_jobs,
-)
-from api.ws_manager import router as websocket_router
+from api.generation_worker import generation_worker
+from api.ws_manager import router as websocket_router, manager as websocket_manager
 from api.scheduler import scheduler
 from api.settings import settings
+from api.utils.db import close_db_pool
+from api.llm import close_llm_clients
 import bugsnag
 from bugsnag.asgi import BugsnagMiddleware
 
@@ -43,12 +42,18 @@ async def lifespan(app: FastAPI):
     # Create the uploads directory if it doesn't exist
     os.makedirs(settings.local_upload_folder, exist_ok=True)
 
-    # Add recovery logic for interrupted tasks
-    asyncio.create_task(resume_pending_task_generation_jobs())
-    asyncio.create_task(resume_pending_course_structure_generation_jobs())
+    await websocket_manager.start()
+
+    # jobs interrupted by a restart are claimed again once their lease expires
+    if generation_worker_mode == "in_process":
+        generation_worker.start()
 
     yield
+    await generation_worker.stop()
+    await websocket_manager.stop()
     scheduler.shutdown()
+    await close_db_pool()
+    await close_llm_clients()
 
 
 if settings.bugsnag_api_key:
@@ -120,6 +125,7 @@ app.include_router(scorecard.router, prefix="/scorecards", tags=["scorecards"])
 app.include_router(code.router, prefix="/code", tags=["code"])
 app.include_router(hva.router, prefix="/hva", tags=["hva"])
 app.include_router(websocket_router, prefix="/ws", tags=["websockets"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 # Include new routers
 app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
@@ -445,6 +445,14 @@ class ChatResponseType(str, Enum):
     AUDIO = "audio"
 
 
+class ChatStreamProtocol(str, Enum):
+    # every line is the full response object accumulated so far
+    FULL = "full"
+    # every line holds only the changes since the previous line, with a full
+    # snapshot as the last line
+    DELTA = "delta"
+
+
 class ChatMessage(BaseModel):
     id: int
     created_at: str
@@ -649,6 +657,7 @@ class AIChatRequest(BaseModel):
     user_id: int
     task_id: int
     response_type: Optional[ChatResponseType] = None
+    stream_protocol: ChatStreamProtocol = ChatStreamProtocol.FULL
 
 
 class MarkTaskCompletedRequest(BaseModel):
@@ -836,3 +845,9 @@ class NewInternshipCreate(NewInternshipBase):
 class NewInternshipRead(NewInternshipBase):
     new_id: int
     new_status: str
+
+
+class UpdateSQLProfilerRequest(BaseModel):
+    sample_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    slow_query_threshold_ms: Optional[float] = Field(default=None, ge=0)
+    disable_slow_query_log: bool = False
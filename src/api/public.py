@@ -12,7 +12,7 @@ from api.db.course import (
     get_course as get_course_from_db,
     get_course_org_id,
 )
-from api.db.task import get_task as get_task_from_db
+from api.db.task import get_tasks_bulk
 from api.db.org import get_org_id_from_api_key
 
 
@@ -81,9 +81,13 @@ async def get_tasks_for_course(
 
     course = await get_course_from_db(course_id=course_id)
 
+    task_id_to_details = await get_tasks_bulk(
+        [task["id"] for milestone in course["milestones"] for task in milestone["tasks"]]
+    )
+
     for milestone in course["milestones"]:
         for task in milestone["tasks"]:
-            task_details = await get_task_from_db(task["id"])
+            task_details = task_id_to_details[task["id"]]
 
             if task["type"] == TaskType.LEARNING_MATERIAL:
                 task["blocks"] = task_details["blocks"]
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict
+from api.models import UpdateSQLProfilerRequest
+from api.utils.db import get_db_engine_stats
+from api.utils.sql_profiler import profiler
+from api.utils.prompt_cache import prompt_context_cache
+from api.utils.audio_cache import audio_message_cache
+from api.llm import llm_scheduler
+from api.utils.security import require_platform_operator
+
+# every route exposes or changes process-wide state shared by all orgs, so all of
+# them are limited to platform operators rather than org admins
+router = APIRouter(dependencies=[Depends(require_platform_operator)])
+
+
+@router.get("/db/stats")
+async def get_db_stats() -> Dict:
+    return get_db_engine_stats()
+
+
+@router.get("/db/sql_profile")
+async def get_sql_profile(top_n: int = 20, sort_by: str = "total") -> Dict:
+    if sort_by not in profiler.sort_keys:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort_by must be one of {', '.join(profiler.sort_keys)}",
+        )
+
+    return profiler.report(top_n, sort_by)
+
+
+@router.put("/db/sql_profile")
+async def update_sql_profiler(request: UpdateSQLProfilerRequest) -> Dict:
+    profiler.configure(
+        sample_rate=request.sample_rate,
+        slow_query_threshold_ms=request.slow_query_threshold_ms,
+        disable_slow_query_log=request.disable_slow_query_log,
+    )
+
+    return {
+        "sample_rate": profiler.sample_rate,
+        "slow_query_threshold_ms": profiler.slow_query_threshold_ms,
+    }
+
+
+@router.delete("/db/sql_profile")
+async def reset_sql_profile() -> Dict:
+    profiler.reset()
+    return {"success": True}
+
+
+@router.get("/prompt_cache/stats")
+async def get_prompt_cache_stats() -> Dict:
+    return prompt_context_cache.stats()
+
+
+@router.get("/audio_cache/stats")
+async def get_audio_cache_stats() -> Dict:
+    return audio_message_cache.stats()
+
+
+@router.get("/llm_scheduler/stats")
+async def get_llm_scheduler_stats() -> Dict:
+    return llm_scheduler.stats()
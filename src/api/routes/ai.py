@@ -1,77 +1,122 @@
 from ast import List
-import os
-import tempfile
 import random
 from collections import defaultdict
 import asyncio
-from fastapi import APIRouter, HTTPException, Body, BackgroundTasks
+import time
+from fastapi import APIRouter, HTTPException, Body
 from fastapi.responses import StreamingResponse
-from typing import List, Optional, Dict, Literal, AsyncGenerator
+from typing import List, Optional, Dict, AsyncGenerator, Tuple
 import json
-import instructor
-import openai
-from pydantic import BaseModel, Field
-from langchain_core.output_parsers import PydanticOutputParser
-from api.config import openai_plan_to_model_name
+from pydantic import BaseModel
+from openai.types import CompletionUsage
+from api.config import (
+    openai_plan_to_model_name,
+    chat_pipeline_mode,
+    chat_history_audio_message_tokens,
+    llm_hedge_after_seconds,
+    course_structure_flush_interval_seconds,
+    course_structure_flush_max_items,
+    course_structure_legacy_events,
+)
 from api.models import (
-    TaskAIResponseType,
     AIChatRequest,
     ChatResponseType,
+    ChatStreamProtocol,
     TaskType,
     GenerateCourseStructureRequest,
     GenerateCourseJobStatus,
     GenerateTaskJobStatus,
     QuestionType,
+    TaskInputType,
+)
+from api.llm import (
+    llm_request_context,
+    get_llm_request_context,
+    llm_scheduler,
+    LLMPriority,
+    call_llm_with_retries,
+    run_llm_with_instructor,
+    stream_llm_with_instructor,
+    get_cached_prompt_tokens,
+    get_instructor_client,
 )
-from api.llm import run_llm_with_instructor, stream_llm_with_instructor
 from api.settings import settings
 from api.utils.logging import logger
-from api.utils.concurrency import async_batch_gather
+from api.utils.concurrency import stream_speculatively
+from api.utils.prompt_cache import prompt_context_cache
+from api.utils.json_delta import JSONDeltaEncoder
+from api.utils.markdown import convert_markdown_to_blocks, AmbiguousMarkdownError
+from api.schemas import (
+    RouterDecision,
+    RewrittenQuery,
+    ChatHistorySummary,
+    MigratedContent,
+    CourseStructure,
+    get_chat_response_model,
+    get_task_generation_model,
+    get_format_instructions,
+    get_json_schema,
+    get_response_model,
+)
+from api.prompts import (
+    query_rewrite_system_prompt,
+    get_chat_system_prompt,
+    get_task_context_for_prompt,
+    build_chat_messages,
+)
+from api.utils.chat_history import (
+    count_message_tokens,
+    count_messages_tokens,
+    get_history_token_budget,
+    window_chat_history,
+)
 from api.ws_manager import get_manager
+from api.generation_worker import generation_worker
 from api.db.task import (
     get_task_metadata,
     get_question,
     get_task,
+    get_tasks_bulk,
     get_scorecard,
-    create_draft_task_for_course,
     store_task_generation_request,
     update_task_generation_job_status,
     get_course_task_generation_jobs_status,
     add_generated_learning_material,
     add_generated_quiz,
-    get_all_pending_task_generation_jobs,
 )
 from api.db.course import (
     store_course_generation_request,
     get_course_generation_job_details,
     update_course_generation_job_status_and_details,
     update_course_generation_job_status,
-    get_all_pending_course_structure_generation_jobs,
-    add_milestone_to_course,
+    add_milestones_and_draft_tasks_to_course,
+    delete_partial_course_structure,
+)
+from api.db.chat import (
+    get_question_chat_history_for_user,
+    get_chat_history_summary,
+    upsert_chat_history_summary,
 )
-from api.db.chat import get_question_chat_history_for_user
-from api.db.utils import construct_description_from_blocks
-from api.utils.s3 import (
-    download_file_from_s3_as_bytes,
-    get_media_upload_s3_key_from_uuid,
+from api.db.utils import construct_description_from_blocks, get_org_id_for_course
+from api.utils.reference_material import (
+    ingest_reference_material,
+    get_reference_material_file_id,
 )
-from api.utils.audio import prepare_audio_input_for_ai
+from api.utils.audio_cache import audio_message_cache
 from api.settings import tracer
 from opentelemetry.trace import StatusCode, Status
 from openinference.instrumentation import using_attributes
 
 router = APIRouter()
 
+# follow-up queries up to this many words are rewritten outside "sequential" mode
+rewrite_query_max_words = 12
+# objective questions switch to the reasoning model after this many learner turns
+# when routing heuristically
+heuristic_reasoning_min_user_turns = 5
 
-def get_user_audio_message_for_chat_history(uuid: str) -> List[Dict]:
-    if settings.s3_folder_name:
-        audio_data = download_file_from_s3_as_bytes(
-            get_media_upload_s3_key_from_uuid(uuid, "wav")
-        )
-    else:
-        with open(os.path.join(settings.local_upload_folder, f"{uuid}.wav"), "rb") as f:
-            audio_data = f.read()
 
+def get_user_audio_message_for_chat_history(prepared_audio: str) -> List[Dict]:
     return [
         {
             "type": "text",
@@ -80,7 +125,7 @@ def get_user_audio_message_for_chat_history(uuid: str) -> List[Dict]:
         {
             "type": "input_audio",
             "input_audio": {
-                "data": prepare_audio_input_for_ai(audio_data),
+                "data": prepared_audio,
                 "format": "wav",
             },
         },
@@ -116,6 +161,387 @@ def get_user_message_for_chat_history(user_response: str) -> str:
     return f"""Student's Response:\n```\n{user_response}\n```"""
 
 
+def get_reference_material_for_prompt(task: Dict) -> str:
+    reference_material = construct_description_from_blocks(task["blocks"])
+    return f"""Reference Material:\n```\n{reference_material}\n```"""
+
+
+def get_question_details_for_prompt(question: Dict) -> str:
+    question_description = construct_description_from_blocks(question["blocks"])
+    question_details = f"""Task:\n```\n{question_description}\n```"""
+
+    if question["type"] == QuestionType.OBJECTIVE:
+        answer_as_prompt = construct_description_from_blocks(question["answer"])
+        question_details += f"""\n\nReference Solution (never to be shared with the learner):\n```\n{answer_as_prompt}\n```"""
+    else:
+        scoring_criteria_as_prompt = ""
+
+        for criterion in question["scorecard"]["criteria"]:
+            scoring_criteria_as_prompt += f"""- **{criterion['name']}** [min: {criterion['min_score']}, max: {criterion['max_score']}, pass: {criterion.get('pass_score', criterion['max_score'])}]: {criterion['description']}\n"""
+
+        question_details += (
+            f"""\n\nScoring Criteria:\n```\n{scoring_criteria_as_prompt}\n```"""
+        )
+
+    return question_details
+
+
+def get_knowledge_base_for_prompt(
+    question: Dict, linked_tasks: Dict[int, Dict]
+) -> str:
+    if not question["context"]:
+        return ""
+
+    linked_learning_material_ids = question["context"]["linkedMaterialIds"]
+    knowledge_blocks = list(question["context"]["blocks"])
+
+    if linked_learning_material_ids:
+        for id in linked_learning_material_ids:
+            task = linked_tasks.get(int(id))
+            if task:
+                knowledge_blocks += task["blocks"]
+
+    return construct_description_from_blocks(knowledge_blocks)
+
+
+def get_cached_question_context(question: Dict, linked_tasks: Dict[int, Dict]):
+    """
+    Rendered question details and knowledge base for a saved question, shared across
+    every learner attempting it until the question, its scorecard or any linked
+    learning material is updated.
+    """
+    question_refs = [("question", question["id"])]
+    if question["scorecard_id"] is not None:
+        question_refs.append(("scorecard", question["scorecard_id"]))
+
+    question_details = prompt_context_cache.get_or_render(
+        "question_details",
+        question_refs,
+        lambda: get_question_details_for_prompt(question),
+    )
+
+    knowledge_base_refs = [("question", question["id"])]
+    if question["context"] and question["context"]["linkedMaterialIds"]:
+        knowledge_base_refs += [
+            ("task", id) for id in question["context"]["linkedMaterialIds"]
+        ]
+
+    knowledge_base = prompt_context_cache.get_or_render(
+        "knowledge_base",
+        knowledge_base_refs,
+        lambda: get_knowledge_base_for_prompt(question, linked_tasks),
+    )
+
+    return question_details, knowledge_base
+
+
+def get_elapsed_ms(start_time: float) -> float:
+    return round((time.perf_counter() - start_time) * 1000, 1)
+
+
+def should_rewrite_query(chat_history: List[Dict], user_response: str) -> bool:
+    """
+    The rewrite only adds value for short follow-ups that lean on earlier turns (e.g.
+    "why?" or "explain that again").
+    """
+    if not chat_history:
+        return False
+
+    return len(user_response.split()) <= rewrite_query_max_words
+
+
+def choose_model_plan_heuristically(
+    question: Optional[Dict], chat_history: List[Dict]
+) -> str:
+    if question is None:
+        return "text"
+
+    if question["input_type"] == TaskInputType.CODE or question.get(
+        "coding_languages"
+    ):
+        return "reasoning"
+
+    # learners stuck on an objective question for many turns get the stronger model
+    num_user_turns = sum(1 for message in chat_history if message["role"] == "user")
+    if (
+        question["type"] == QuestionType.OBJECTIVE
+        and num_user_turns > heuristic_reasoning_min_user_turns
+    ):
+        return "reasoning"
+
+    return "text"
+
+
+async def route_model_plan(
+    chat_history: List[Dict], session_id: str, user_id: int, metadata: Dict
+) -> str:
+    format_instructions = get_format_instructions(RouterDecision)
+
+    system_prompt = f"""You are an intelligent routing agent that decides which type of language model should be used to evaluate a student's response to a given task. You will receive the details of a task, the conversation history with the student and the student's latest query/message.\n\nYou have two options:\n- Reasoning Model (e.g. o3): Best for complex tasks involving logical deduction, problem-solving, code generation, mathematics, research reasoning, multi-step analysis, or edge-case handling.\n- General-Purpose Model (e.g. gpt-4o): Best for everyday conversation, writing help, summaries, rephrasing, explanations, casual queries, grammar correction, and general knowledge Q&A.\n\nYour job is to classify which of the two options is best suited to evaluate the student's response for the given task. If a task can be solved by a general purpose model, avoid using a reasoning model as it takes longer and costs more. At the same time, accuracy cannot be compromised.\n\n{format_instructions}"""
+
+    messages = [
+        {
+            "role": "system",
+            "content": system_prompt,
+        }
+    ] + chat_history
+
+    with using_attributes(
+        session_id=session_id,
+        user_id=str(user_id),
+        metadata={"stage": "router", **metadata},
+    ):
+        router_output = await run_llm_with_instructor(
+            api_key=settings.openai_api_key,
+            model=openai_plan_to_model_name["router"],
+            messages=messages,
+            response_model=get_response_model(RouterDecision),
+            max_completion_tokens=4096,
+            hedge_after=llm_hedge_after_seconds,
+        )
+
+    return "reasoning" if router_output.use_reasoning_model else "text"
+
+
+async def get_linked_learning_materials(question: Dict) -> Dict[int, Dict]:
+    if not question or not question["context"]:
+        return {}
+
+    linked_learning_material_ids = question["context"].get("linkedMaterialIds")
+    if not linked_learning_material_ids:
+        return {}
+
+    return await get_tasks_bulk(linked_learning_material_ids)
+
+
+async def prefetch_chat_context(request: AIChatRequest) -> Dict:
+    """
+    Fetch everything needed to build the chat prompt with the independent lookups
+    running concurrently. The linked learning materials depend on the question, so
+    they are chained onto the question lookup instead of waiting for the others.
+    """
+    if request.task_type == TaskType.LEARNING_MATERIAL:
+        task, task_metadata = await asyncio.gather(
+            get_task(request.task_id), get_task_metadata(request.task_id)
+        )
+        return {"task": task, "task_metadata": task_metadata}
+
+    async def fetch_question():
+        if request.question_id:
+            question = await get_question(request.question_id)
+            return question, await get_linked_learning_materials(question)
+
+        question = request.question.model_dump()
+        question["scorecard"], linked_tasks = await asyncio.gather(
+            get_scorecard(question["scorecard_id"]),
+            get_linked_learning_materials(question),
+        )
+        return question, linked_tasks
+
+    async def fetch_chat_history():
+        if not request.question_id:
+            return request.chat_history, None
+
+        return await asyncio.gather(
+            get_question_chat_history_for_user(request.question_id, request.user_id),
+            get_chat_history_summary(request.question_id, request.user_id),
+        )
+
+    (
+        (question, linked_tasks),
+        (chat_history, chat_history_summary),
+        task_metadata,
+    ) = await asyncio.gather(
+        fetch_question(), fetch_chat_history(), get_task_metadata(request.task_id)
+    )
+
+    return {
+        "question": question,
+        "linked_tasks": linked_tasks,
+        "chat_history": chat_history,
+        "chat_history_summary": chat_history_summary,
+        "task_metadata": task_metadata,
+    }
+
+
+def get_chat_history_transcript(
+    chat_history: List[Dict], response_type: ChatResponseType
+) -> str:
+    transcript = []
+    for message in chat_history:
+        if message["role"] == "user":
+            content = (
+                "[audio response]"
+                if response_type == ChatResponseType.AUDIO
+                else message["content"]
+            )
+            transcript.append(f"Student: {content}")
+        else:
+            transcript.append(f"Tutor: {message['content']}")
+
+    return "\n\n".join(transcript)
+
+
+async def summarize_chat_history(
+    previous_summary: Optional[str],
+    chat_history: List[Dict],
+    response_type: ChatResponseType,
+    session_id: str,
+    user_id: int,
+    metadata: Dict,
+) -> str:
+    format_instructions = get_format_instructions(ChatHistorySummary)
+
+    system_prompt = f"""You maintain a running summary of a tutoring conversation between a tutor and a student working on a task.\n\nYou will receive:\n- The summary of the conversation so far (if any)\n- The next part of the conversation\n\nUpdate the summary so that it also covers the next part of the conversation. Keep track of the approaches the student has tried, their misconceptions, the hints and feedback they have already received and how far they have progressed towards the solution. Be concise and do not add anything that is not in the conversation.\n\n{format_instructions}"""
+
+    conversation = get_chat_history_transcript(chat_history, response_type)
+    user_prompt = f"""Summary so far:\n```\n{previous_summary or "None"}\n```\n\nNext part of the conversation:\n```\n{conversation}\n```"""
+
+    with using_attributes(
+        session_id=session_id,
+        user_id=str(user_id),
+        metadata={"stage": "history_summary", **metadata},
+    ):
+        output = await run_llm_with_instructor(
+            api_key=settings.openai_api_key,
+            model=openai_plan_to_model_name["text-mini"],
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            response_model=get_response_model(ChatHistorySummary),
+            max_completion_tokens=2048,
+        )
+
+    return output.summary
+
+
+# rolling chat history summaries being refreshed, by (question_id, user_id)
+chat_history_summary_refreshes: Dict[Tuple[int, int], asyncio.Task] = {}
+
+
+async def refresh_chat_history_summary(
+    request: AIChatRequest,
+    previous_summary: Optional[str],
+    to_summarize: List[Dict],
+    session_id: str,
+    metadata: Dict,
+):
+    try:
+        summary = await summarize_chat_history(
+            previous_summary,
+            to_summarize,
+            request.response_type,
+            session_id,
+            request.user_id,
+            metadata,
+        )
+        await upsert_chat_history_summary(
+            request.question_id,
+            request.user_id,
+            summary,
+            to_summarize[-1]["id"],
+        )
+    except Exception as exception:
+        logger.error(
+            f"Failed to refresh the chat history summary for {session_id}: {exception}"
+        )
+
+
+def schedule_chat_history_summary_refresh(
+    request: AIChatRequest,
+    previous_summary: Optional[str],
+    to_summarize: List[Dict],
+    session_id: str,
+    metadata: Dict,
+):
+    key = (request.question_id, request.user_id)
+    if key in chat_history_summary_refreshes:
+        # a later turn folds in whatever the refresh in flight leaves out
+        return
+
+    # nobody waits for the refresh, so it must not take interactive capacity
+    _, org_id = get_llm_request_context()
+    with llm_request_context(LLMPriority.BACKGROUND, org_id):
+        task = asyncio.create_task(
+            refresh_chat_history_summary(
+                request, previous_summary, to_summarize, session_id, dict(metadata)
+            )
+        )
+    chat_history_summary_refreshes[key] = task
+    task.add_done_callback(lambda _: chat_history_summary_refreshes.pop(key, None))
+
+
+async def window_chat_history_for_prompt(
+    request: AIChatRequest,
+    chat_history: List[Dict],
+    chat_history_summary: Optional[Dict],
+    session_id: str,
+    metadata: Dict,
+):
+    """
+    Keep the most recent turns of the chat history verbatim within the token budget
+    of the models that may receive them. For saved questions, older turns are
+    folded into a rolling summary stored alongside the chat history; otherwise they
+    are dropped. The summary is refreshed in the background so that the response
+    never waits for it: each turn is sent with the summary stored so far, which
+    may not cover the turns that only just left the window yet.
+
+    Returns the messages to send verbatim, the summary (if any) and token stats.
+    """
+    model = openai_plan_to_model_name["text"]
+
+    if request.response_type == ChatResponseType.AUDIO:
+        budget = get_history_token_budget("audio")
+    else:
+        budget = get_history_token_budget("text", "reasoning")
+
+    def count(message: Dict) -> int:
+        if (
+            message["role"] == "user"
+            and request.response_type == ChatResponseType.AUDIO
+        ):
+            # the content is the uuid of the recording
+            return chat_history_audio_message_tokens
+
+        return count_message_tokens(message, model)
+
+    summary = None
+    summarized_until_id = None
+    # a summary whose last message no longer exists belongs to a deleted history
+    if chat_history_summary and any(
+        message["id"] == chat_history_summary["summarized_until_id"]
+        for message in chat_history
+    ):
+        summary = chat_history_summary["summary"]
+        summarized_until_id = chat_history_summary["summarized_until_id"]
+
+    to_summarize, recent = window_chat_history(
+        chat_history, budget, count, summarized_until_id
+    )
+
+    stats = {
+        "history_messages": len(recent),
+        "history_tokens": sum(count(message) for message in recent),
+        "history_summarized_messages": len(to_summarize),
+    }
+
+    if to_summarize:
+        if request.question_id:
+            schedule_chat_history_summary_refresh(
+                request, summary, to_summarize, session_id, metadata
+            )
+        else:
+            logger.info(
+                f"Dropped {len(to_summarize)} chat history messages over the token budget for {session_id}"
+            )
+
+    recent = [
+        {"role": message["role"], "content": message["content"]} for message in recent
+    ]
+    return recent, summary, stats
+
+
 @router.post("/chat")
 async def ai_response_for_question(request: AIChatRequest):
     metadata = {"task_id": request.task_id, "user_id": request.user_id}
@@ -158,41 +584,38 @@ async def ai_response_for_question(request: AIChatRequest):
             )
         session_id = f"lm_{request.task_id}_{request.user_id}"
 
+    context = await prefetch_chat_context(request)
+
     if request.task_type == TaskType.LEARNING_MATERIAL:
         metadata["type"] = "learning_material"
-        task = await get_task(request.task_id)
+        task = context["task"]
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
 
         chat_history = request.chat_history
 
-        reference_material = construct_description_from_blocks(task["blocks"])
-        question_details = f"""Reference Material:\n```\n{reference_material}\n```"""
+        question_details = prompt_context_cache.get_or_render(
+            "reference_material",
+            [("task", task["id"])],
+            lambda: get_reference_material_for_prompt(task),
+        )
+        knowledge_base = ""
     else:
         metadata["type"] = "quiz"
 
+        question = context["question"]
+        linked_tasks = context["linked_tasks"]
+
         if request.question_id:
-            question = await get_question(request.question_id)
             if not question:
                 raise HTTPException(status_code=404, detail="Question not found")
 
             metadata["question_id"] = request.question_id
-
-            chat_history = await get_question_chat_history_for_user(
-                request.question_id, request.user_id
-            )
-            chat_history = [
-                {"role": message["role"], "content": message["content"]}
-                for message in chat_history
-            ]
         else:
-            question = request.question.model_dump()
-            chat_history = request.chat_history
-
-            question["scorecard"] = await get_scorecard(question["scorecard_id"])
-
             metadata["question_id"] = None
 
+        chat_history = context["chat_history"]
+
         metadata["question_type"] = question["type"]
         metadata["question_purpose"] = (
             "practice" if question["response_type"] == "chat" else "exam"
@@ -200,18 +623,51 @@ async def ai_response_for_question(request: AIChatRequest):
         metadata["question_input_type"] = question["input_type"]
         metadata["question_has_context"] = bool(question["context"])
 
-        question_description = construct_description_from_blocks(question["blocks"])
-        question_details = f"""Task:\n```\n{question_description}\n```"""
+        if request.question_id:
+            question_details, knowledge_base = get_cached_question_context(
+                question, linked_tasks
+            )
+        else:
+            question_details = get_question_details_for_prompt(question)
+            knowledge_base = get_knowledge_base_for_prompt(question, linked_tasks)
 
-    task_metadata = await get_task_metadata(request.task_id)
+    task_metadata = context["task_metadata"]
     if task_metadata:
         metadata.update(task_metadata)
 
+    org_id = task_metadata["org"]["id"] if task_metadata else None
+
+    with llm_request_context(LLMPriority.INTERACTIVE, org_id):
+        (
+            chat_history,
+            history_summary,
+            history_stats,
+        ) = await window_chat_history_for_prompt(
+            request,
+            chat_history,
+            context.get("chat_history_summary"),
+            session_id,
+            metadata,
+        )
+    metadata["history_tokens"] = history_stats["history_tokens"]
+
+    if request.response_type == ChatResponseType.AUDIO:
+        # every recording in the conversation is fetched concurrently and served
+        # from the cache on later turns
+        prepared_audio = await audio_message_cache.get_many(
+            [
+                message["content"]
+                for message in chat_history
+                if message["role"] == "user"
+            ]
+            + [request.user_response]
+        )
+
     for message in chat_history:
         if message["role"] == "user":
             if request.response_type == ChatResponseType.AUDIO:
                 message["content"] = get_user_audio_message_for_chat_history(
-                    message["content"]
+                    prepared_audio[message["content"]]
                 )
             else:
                 message["content"] = get_user_message_for_chat_history(
@@ -224,229 +680,191 @@ async def ai_response_for_question(request: AIChatRequest):
             message["content"] = get_ai_message_for_chat_history(message["content"])
 
     user_message = (
-        get_user_audio_message_for_chat_history(request.user_response)
+        get_user_audio_message_for_chat_history(
+            prepared_audio[request.user_response]
+        )
         if request.response_type == ChatResponseType.AUDIO
         else get_user_message_for_chat_history(request.user_response)
     )
 
     user_message = {"role": "user", "content": user_message}
 
-    if request.task_type == TaskType.QUIZ:
-        if question["type"] == QuestionType.OBJECTIVE:
-            answer_as_prompt = construct_description_from_blocks(question["answer"])
-            question_details += f"""\n\nReference Solution (never to be shared with the learner):\n```\n{answer_as_prompt}\n```"""
-        else:
-            scoring_criteria_as_prompt = ""
-
-            for criterion in question["scorecard"]["criteria"]:
-                scoring_criteria_as_prompt += f"""- **{criterion['name']}** [min: {criterion['min_score']}, max: {criterion['max_score']}, pass: {criterion.get('pass_score', criterion['max_score'])}]: {criterion['description']}\n"""
-
-            question_details += (
-                f"""\n\nScoring Criteria:\n```\n{scoring_criteria_as_prompt}\n```"""
-            )
-
-    chat_history = (
-        chat_history
-        + [user_message]
-        + [
-            {
-                "role": "user",
-                "content": question_details,
-            }
-        ]
+    # the task context goes before the history so that it stays in the cached prefix
+    conversation = build_chat_messages(
+        None,
+        get_task_context_for_prompt(question_details, knowledge_base),
+        chat_history,
+        user_message,
+        history_summary,
     )
 
     # Define an async generator for streaming
     async def stream_response() -> AsyncGenerator[str, None]:
         with tracer.start_as_current_span(
             "ai_chat", openinference_span_kind="llm"
-        ) as span:
-            span.set_input(chat_history)
+        ) as span, llm_request_context(LLMPriority.INTERACTIVE, org_id):
+            span.set_input(conversation)
+
+            timings = {}
+            usage_stats = {}
+            start_time = time.perf_counter()
+
+            if request.task_type == TaskType.LEARNING_MATERIAL and (
+                chat_pipeline_mode == "sequential"
+                or should_rewrite_query(chat_history, request.user_response)
+            ):
+                stage_start_time = time.perf_counter()
 
-            if request.task_type == TaskType.LEARNING_MATERIAL:
                 with using_attributes(
                     session_id=session_id,
                     user_id=str(request.user_id),
                     metadata={"stage": "query_rewrite", **metadata},
                 ):
-                    system_prompt = f"""You are a very good communicator.\n\nYou will receive:\n- A Reference Material\n- Conversation history with a student\n- The student's latest query/message.\n\nYour role: You need to rewrite the student's latest query/message by taking the reference material and the conversation history into consideration so that the query becomes more specific, detailed and clear, reflecting the actual intent of the student."""
-
                     model = openai_plan_to_model_name["text-mini"]
 
                     messages = [
-                        {"role": "system", "content": system_prompt}
-                    ] + chat_history
-
-                    class Output(BaseModel):
-                        rewritten_query: str = Field(
-                            description="The rewritten query/message of the student"
-                        )
+                        {"role": "system", "content": query_rewrite_system_prompt}
+                    ] + conversation
 
                     pred = await run_llm_with_instructor(
                         api_key=settings.openai_api_key,
                         model=model,
                         messages=messages,
-                        response_model=Output,
+                        response_model=get_response_model(RewrittenQuery),
                         max_completion_tokens=8192,
+                        hedge_after=llm_hedge_after_seconds,
                     )
 
-                    chat_history[-2]["content"] = get_user_message_for_chat_history(
+                    user_message["content"] = get_user_message_for_chat_history(
                         pred.rewritten_query
                     )
 
+                timings["query_rewrite_ms"] = get_elapsed_ms(stage_start_time)
+
             output_buffer = []
 
             try:
-                if request.response_type == ChatResponseType.AUDIO:
-                    model = openai_plan_to_model_name["audio"]
-                else:
+                question_type = (
+                    question["type"] if request.task_type == TaskType.QUIZ else None
+                )
+                response_model = get_chat_response_model(
+                    request.task_type, question_type
+                )
+                format_instructions = get_format_instructions(response_model)
 
-                    class Output(BaseModel):
-                        use_reasoning_model: bool = Field(
-                            description="Whether to use a reasoning model to evaluate the student's response"
-                        )
+                system_prompt = get_chat_system_prompt(
+                    request.task_type,
+                    question_type,
+                    format_instructions,
+                    bool(knowledge_base),
+                )
 
-                    format_instructions = PydanticOutputParser(
-                        pydantic_object=Output
-                    ).get_format_instructions()
+                messages = [{"role": "system", "content": system_prompt}] + conversation
 
-                    system_prompt = f"""You are an intelligent routing agent that decides which type of language model should be used to evaluate a student's response to a given task. You will receive the details of a task, the conversation history with the student and the student's latest query/message.\n\nYou have two options:\n- Reasoning Model (e.g. o3): Best for complex tasks involving logical deduction, problem-solving, code generation, mathematics, research reasoning, multi-step analysis, or edge-case handling.\n- General-Purpose Model (e.g. gpt-4o): Best for everyday conversation, writing help, summaries, rephrasing, explanations, casual queries, grammar correction, and general knowledge Q&A.\n\nYour job is to classify which of the two options is best suited to evaluate the student's response for the given task. If a task can be solved by a general purpose model, avoid using a reasoning model as it takes longer and costs more. At the same time, accuracy cannot be compromised.\n\n{format_instructions}"""
+                def record_usage(usage: CompletionUsage):
+                    usage_stats["prompt_tokens"] = usage.prompt_tokens
+                    usage_stats["cached_tokens"] = get_cached_prompt_tokens(usage)
+                    usage_stats["completion_tokens"] = usage.completion_tokens
 
-                    messages = [
-                        {
-                            "role": "system",
-                            "content": system_prompt,
-                        }
-                    ] + chat_history
+                async def open_stream(model_plan: str) -> AsyncGenerator:
+                    model = openai_plan_to_model_name[model_plan]
+                    prompt_tokens = count_messages_tokens(messages, model)
+                    span.set_attribute("chat.prompt_tokens", prompt_tokens)
 
                     with using_attributes(
-                        session_id=session_id,
+                        session_id=f"{session_id}",
                         user_id=str(request.user_id),
-                        metadata={"stage": "router", **metadata},
+                        metadata={
+                            "stage": "feedback",
+                            "prompt_tokens": prompt_tokens,
+                            **metadata,
+                        },
                     ):
-                        router_output = await run_llm_with_instructor(
+                        stream = await stream_llm_with_instructor(
                             api_key=settings.openai_api_key,
-                            model=openai_plan_to_model_name["router"],
+                            model=model,
                             messages=messages,
-                            response_model=Output,
+                            response_model=get_response_model(response_model),
                             max_completion_tokens=4096,
+                            on_usage=record_usage,
                         )
+                        async for chunk in stream:
+                            yield chunk
 
-                    if router_output.use_reasoning_model:
-                        model = openai_plan_to_model_name["reasoning"]
-                    else:
-                        model = openai_plan_to_model_name["text"]
-
-                # print(f"Using model: {model}")
-
-                if request.task_type == TaskType.QUIZ:
-                    if question["type"] == QuestionType.OBJECTIVE:
-
-                        class Output(BaseModel):
-                            analysis: str = Field(
-                                description="A detailed analysis of the student's response"
-                            )
-                            feedback: str = Field(
-                                description="Feedback on the student's response; add newline characters to the feedback to make it more readable where necessary"
-                            )
-                            is_correct: bool = Field(
-                                description="Whether the student's response correctly solves the original task that the student is supposed to solve. For this to be true, the original task needs to be completely solved and not just partially solved. Giving the right answer to one step of the task does not count as solving the entire task."
-                            )
-
-                    else:
-
-                        class Feedback(BaseModel):
-                            correct: Optional[str] = Field(
-                                description="What worked well in the student's response for this category based on the scoring criteria"
-                            )
-                            wrong: Optional[str] = Field(
-                                description="What needs improvement in the student's response for this category based on the scoring criteria"
-                            )
+                async def route() -> str:
+                    stage_start_time = time.perf_counter()
+                    model_plan = await route_model_plan(
+                        conversation, session_id, request.user_id, metadata
+                    )
+                    timings["router_ms"] = get_elapsed_ms(stage_start_time)
 
-                        class Row(BaseModel):
-                            category: str = Field(
-                                description="Category from the scoring criteria for which the feedback is being provided"
-                            )
-                            feedback: Feedback = Field(
-                                description="Detailed feedback for the student's response for this category"
-                            )
-                            score: int = Field(
-                                description="Score given within the min/max range for this category based on the student's response - the score given should be in alignment with the feedback provided"
-                            )
-                            max_score: int = Field(
-                                description="Maximum score possible for this category as per the scoring criteria"
-                            )
-                            pass_score: int = Field(
-                                description="Pass score possible for this category as per the scoring criteria"
-                            )
+                    if request.question_id:
+                        prompt_context_cache.set(
+                            "model_plan",
+                            [("question", request.question_id)],
+                            model_plan,
+                        )
 
-                        class Output(BaseModel):
-                            feedback: str = Field(
-                                description="A single, comprehensive summary based on the scoring criteria"
-                            )
-                            scorecard: Optional[List[Row]] = Field(
-                                description="List of rows with one row for each category from scoring criteria; only include this in the response if the student's response is an answer to the task"
-                            )
+                    return model_plan
 
+                if request.response_type == ChatResponseType.AUDIO:
+                    stream = open_stream("audio")
+                elif chat_pipeline_mode == "sequential":
+                    stream = open_stream(await route())
                 else:
-
-                    class Output(BaseModel):
-                        response: str = Field(
-                            description="Response to the student's query; add proper formatting to the response to make it more readable where necessary"
+                    model_plan = None
+                    if request.question_id:
+                        # the router already decided for this version of the question
+                        model_plan = prompt_context_cache.get(
+                            "model_plan", [("question", request.question_id)]
                         )
 
-                parser = PydanticOutputParser(pydantic_object=Output)
-                format_instructions = parser.get_format_instructions()
-
-                if request.task_type == TaskType.QUIZ:
-                    knowledge_base = None
-
-                    if question["context"]:
-                        linked_learning_material_ids = question["context"][
-                            "linkedMaterialIds"
-                        ]
-                        knowledge_blocks = question["context"]["blocks"]
-
-                        if linked_learning_material_ids:
-                            for id in linked_learning_material_ids:
-                                task = await get_task(int(id))
-                                if task:
-                                    knowledge_blocks += task["blocks"]
-
-                        knowledge_base = construct_description_from_blocks(
-                            knowledge_blocks
+                    if model_plan:
+                        stream = open_stream(model_plan)
+                    elif chat_pipeline_mode == "heuristic":
+                        stream = open_stream(
+                            choose_model_plan_heuristically(
+                                (
+                                    question
+                                    if request.task_type == TaskType.QUIZ
+                                    else None
+                                ),
+                                chat_history,
+                            )
+                        )
+                    else:
+                        stream = stream_speculatively(
+                            route(),
+                            open_stream,
+                            "text",
+                            on_decision_error=lambda error: logger.warning(
+                                f"Router failed, continuing with the text model: {error}"
+                            ),
                         )
 
-                    context_instructions = ""
-                    if knowledge_base:
-                        context_instructions = f"""\n\nMake sure to use only the information provided within ``` below for responding to the student while ignoring any other information that contradicts the information provided:\n\n```\n{knowledge_base}\n```"""
+                delta_encoder = (
+                    JSONDeltaEncoder()
+                    if request.stream_protocol == ChatStreamProtocol.DELTA
+                    else None
+                )
 
-                    if question["type"] == QuestionType.OBJECTIVE:
-                        system_prompt = f"""You are a Socratic tutor who guides a student step-by-step as a coach would, encouraging them to arrive at the correct answer on their own without ever giving away the right answer to the student straight away.\n\nYou will receive:\n\n- Task description\n- Conversation history with the student\n- Task solution (for your reference only; do not reveal){context_instructions}\n\nYou need to evaluate the student's response for correctness and give your feedback that can be shared with the student.\n\n{format_instructions}\n\nGuidelines on assessing correctness of the student's answer:\n\n- Once the student has provided an answer that is correct with respect to the solution provided at the start, clearly acknowledge that they have got the correct answer and stop asking any more reflective questions. Your response should make them feel a sense of completion and accomplishment at a job well done.\n- If the question is one where the answer does not need to match word-for-word with the solution (e.g. definition of a term, programming question where the logic needs to be right but the actual code can vary, etc.), only assess whether the student's answer covers the entire essence of the correct solution.\n- Avoid bringing in your judgement of what the right answer should be. What matters for evaluation is the solution provided to you and the response of the student. Keep your biases outside. Be objective in comparing these two. As soon as the student gets the answer correct, stop asking any further reflective questions.\n- The response is correct only if the question has been solved in its entirety. Partially solving a question is not acceptable.\n\nGuidelines on your feedback:\n\n- Praise → Prompt → Path: 1–2 words of praise, a targeted prompt, then one actionable path forward.\n- If the student's response is completely correct, just appreciate them. No need to give any more suggestions or areas of improvement.\n- If the student's response has areas of improvement, point them out through a single reflective actionable question. Never ever give a vague feedback that is not clearly actionable. The student should get a clear path for how they can improve their response.\n- If the question has multiple steps to reach to the final solution, assess the current step at which the student is and frame your reflection question such that it nudges them towards the right direction without giving away the answer in any shape or form.\n- Your feedback should not be generic and must be tailored to the response given by the student. This does not mean that you repeat the student's response. The question should be a follow-up for the answer given by the student. Don't just paste the student's response on top of a generic question. That would be laziness.\n- The student might get the answer right without any probing required from your side in the first couple of attempts itself. In that case, remember the instruction provided above to acknowledge their answer's correctness and to stop asking further questions.\n- Never provide the right answer or the solution, despite all their attempts to ask for it or their frustration.\n- Never explain the solution to the student unless the student has given the solution first.\n- The student does not have access to the solution. The solution has only been given to you for evaluating the student's response. Keep this in mind while responding to the student.\n\nGuidelines on the style of feedback:\n\n1. Avoid sounding monotonous.\n2. Absolutely AVOID repeating back what the student has said as a manner of acknowledgement in your summary. It makes your summary too long and boring to read.\n3. Occasionally include emojis to maintain warmth and engagement.\n4. Ask only one reflective question per response otherwise the student will get overwhelmed.\n5. Avoid verbosity in your summary. Be crisp and concise, with no extra words.\n6. Do not do any analysis of the user's intent in your overall summary or repeat any part of what the user has said. The summary section is meant to summarise the next steps. The summary section does not need a summary of the user's response.\n\nGuidelines on maintaining the focus of the conversation:\n\n- Your role is that of a tutor for this particular task and related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task given to you and its related concepts.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back to the task.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task given to you and its related concepts at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back. Do not let the conversation drift away."""
-                    else:
-                        system_prompt = f"""You are a Socratic tutor who guides a student step-by-step as a coach would, encouraging them to arrive at the correct answer on their own without ever giving away the right answer to the student straight away.\n\nYou will receive:\n\n- Task description\n- Conversation history with the student\n- Scoring Criteria to evaluate the answer of the student{context_instructions}\n\nYou need to evaluate the student's response and return the following:\n\n- A scorecard based on the scoring criteria given to you with areas of improvement and/or strengths along each criterion\n- An overall summary based on the generated scorecard to be shared with the student.\n\n{format_instructions}\n\nGuidelines for scorecard feedback:\n\n- If there is nothing to praise about the student's response for a given criterion in the scoring criteria, never mention what worked well (i.e. return `correct` as null) in the scorecard output for that criterion.\n- If the student did something well for a given criterion, make sure to highlight what worked well in the scorecard output for that criterion.\n- If there is nothing left to improve in their response for a criterion, avoid unnecessarily suggesting an improvement in the scorecard output for that criterion (i.e. return `wrong` as null). Also, the score assigned for that criterion should be the maximum score possible in that criterion in this case.\n- Make sure that the feedback for one criterion of the scorecard does not bias the feedback for another criterion.\n- When giving the feedback for one criterion of the scorecard, focus on the description of the criterion provided in the scoring criteria and only evaluate the student's response based on that.\n- For every criterion of the scorecard, your feedback for that criterion in the scorecard output must cite specific words or phrases from the student's response to back your feedback so that the student understands it better and give concrete examples for how they can improve their response as well.\n- Never ever give a vague feedback that is not clearly actionable. The student should get a clear path for how they can improve their response.\n- Avoid bringing your judgement of what the right answer should be. What matters for feedback is the scoring criteria provided to you and the response of the student. Keep your biases outside. Be objective in comparing these two.\n- The student might get the answer right without any probing required from your side in the first couple of attempts itself. In that case, remember the instruction provided above to acknowledge their answer's correctness and to stop asking further questions.\n- If you don't assign the maximum score to the student's response for any criterion in the scorecard, make sure to always include the area of improvement containing concrete steps they can take to improve their response in your feedback for that criterion in the scorecard output (i.e. `wrong` cannot be null).\n\nGuidelines for scorecard feedback style:\n\n1. Avoid sounding monotonous.\n2. Be crisp and concise, with no extra words.\n\nGuidelines for summary:\n- Praise → Prompt → Path: 1–2 words of praise, a targeted prompt, then one actionable path forward.\n- It should clearly outline what the next steps need to be based on the scoring criteria. It should be very crisp and only contain the summary of the next steps outlined in the scorecard feedback.\n- Your overall summary does not need to quote specific words from the user's response or reflect back what the user's response means. Keep that for the feedback in the scorecard output.\n- If the student's response is completely correct, just appreciate them. No need to give any more suggestions or areas of improvement.\n- If the student's response has areas of improvement, point them out through a single reflective actionable question.\n- Your summary and follow-up question should not be generic and must be tailored to the response given by the student. This does not mean that you repeat the student's response. The question should be a follow-up for the answer given by the student. Don't just paste the student's response on top of a generic question. That would be laziness.\n- Never provide the right answer or the solution, despite all their attempts to ask for it or their frustration.\n- Never explain the solution to the student unless the student has given the solution first.\n\nGuidelines for style of summary:\n\n1. Avoid sounding monotonous.\n2. Absolutely AVOID repeating back what the student has said as a manner of acknowledgement in your summary. It makes your summary too long and boring to read.\n3. Occasionally include emojis to maintain warmth and engagement.\n4. Ask only one reflective question per response otherwise the student will get overwhelmed.\n5. Avoid verbosity in your summary.\n6. Do not do any analysis of the user's intent in your overall summary or repeat any part of what the user has said. The summary section is meant to summarise the next steps. The summary section does not need a summary of the user's response.\n\nGuidelines on maintaining the focus of the conversation:\n\n- Your role is that of a tutor for this particular task and related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task given to you and its related concepts.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back to the task.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task given to you and its related concepts at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back. Do not let the conversation drift away.\n\nGuidelines on when to show the scorecard:\n\n- If the response by the student is not a valid answer to the actual task given to them (e.g. if their response is an acknowledgement of the previous messages or a doubt or a question or something irrelevant to the task), do not provide any scorecard in that case and only return a summary addressing their response.\n- For messages of acknowledgement, you do not need to explicitly call it out as an acknowledgement. Simply respond to it normally."""
-                else:
-                    system_prompt = f"""You are a teaching assistant.\n\nYou will receive:\n- A Reference Material\n- Conversation history with a student\n- The student's latest query/message.\n\nYour role:\n- You need to respond to the student's message based on the content in the reference material provided to you.\n- If the student's query is absolutely not relevant to the reference material or goes beyond the scope of the reference material, clearly saying so without indulging their irrelevant queries. The only exception is when they are asking deeper questions related to the learning material that might not be mentioned in the reference material itself to clarify their conceptual doubts. In this case, you can provide the answer and help them.\n- Remember that the reference material is in read-only mode for the student. So, they cannot make any changes to it.\n\n{format_instructions}\n\nGuidelines on your response style:\n- Be crisp, concise and to the point.\n- Vary your phrasing to avoid monotony; occasionally include emojis to maintain warmth and engagement.\n- Playfully redirect irrelevant responses back to the task without judgment.\n- If the task involves code, format code snippets or variable/function names with backticks (`example`).\n- If including HTML, wrap tags in backticks (`<html>`).\n- If your response includes rich text format like lists, font weights, tables, etc. always render them as markdown.\n- Avoid being unnecessarily verbose in your response.\n\nGuideline on maintaining focus:\n- Your role is that of a teaching assistant for this particular task and its related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task and its related concepts give to you.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task and its related concepts given to you at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back to the task and its related concepts. Do not let the conversation drift away."""
+                async for chunk in stream:
+                    if "ttft_ms" not in timings:
+                        timings["ttft_ms"] = get_elapsed_ms(start_time)
 
-                messages = [{"role": "system", "content": system_prompt}] + chat_history
+                    if delta_encoder:
+                        content = delta_encoder.encode(chunk.model_dump())
+                        if content:
+                            yield content
+                        continue
 
-                with using_attributes(
-                    session_id=f"{session_id}",
-                    user_id=str(request.user_id),
-                    metadata={"stage": "feedback", **metadata},
-                ):
-                    stream = await stream_llm_with_instructor(
-                        api_key=settings.openai_api_key,
-                        model=model,
-                        messages=messages,
-                        response_model=Output,
-                        max_completion_tokens=4096,
-                    )
-                    # Process the async generator
-                    async for chunk in stream:
-                        content = json.dumps(chunk.model_dump()) + "\n"
-                        output_buffer = content
-                        yield content
+                    content = json.dumps(chunk.model_dump()) + "\n"
+                    output_buffer = content
+                    yield content
+
+                if delta_encoder and delta_encoder.started:
+                    output_buffer = delta_encoder.finish()
+                    yield output_buffer
             except Exception as error:
                 span.record_exception(error)
                 span.set_status(Status(StatusCode.ERROR))
@@ -454,6 +872,21 @@ async def ai_response_for_question(request: AIChatRequest):
             else:
                 span.set_output("".join(output_buffer))
                 span.set_status(Status(StatusCode.OK))
+            finally:
+                timings["total_ms"] = get_elapsed_ms(start_time)
+                for stage, elapsed_ms in timings.items():
+                    span.set_attribute(f"chat.timing.{stage}", elapsed_ms)
+                for name, value in usage_stats.items():
+                    span.set_attribute(f"chat.usage.{name}", value)
+                span.set_attribute("chat.history_tokens", history_stats["history_tokens"])
+                span.set_attribute(
+                    "chat.history_summarized_messages",
+                    history_stats["history_summarized_messages"],
+                )
+
+                logger.info(
+                    f"Chat pipeline ({chat_pipeline_mode}) timings for {session_id}: {timings}, usage: {usage_stats}"
+                )
 
     # Return a streaming response
     return StreamingResponse(
@@ -463,61 +896,11 @@ async def ai_response_for_question(request: AIChatRequest):
 
 
 async def migrate_content_to_blocks(content: str) -> List[Dict]:
-    class BlockProps(BaseModel):
-        level: Optional[Literal[1, 2, 3]] = Field(
-            description="The level of a heading block"
-        )
-        checked: Optional[bool] = Field(
-            description="Whether the block is checked (for a checkListItem block)"
-        )
-        language: Optional[str] = Field(
-            description="The language of the code block (for a codeBlock block); always the full name of the language in lowercase (e.g. python, javascript, sql, html, css, etc.)"
-        )
-        name: Optional[str] = Field(
-            description="The name of the image (for an image block)"
-        )
-        url: Optional[str] = Field(
-            description="The URL of the image (for an image block)"
-        )
-
-    class BlockContentStyle(BaseModel):
-        bold: Optional[bool] = Field(description="Whether the text is bold")
-        italic: Optional[bool] = Field(description="Whether the text is italic")
-        underline: Optional[bool] = Field(description="Whether the text is underlined")
-
-    class BlockContentText(BaseModel):
-        type: Literal["text"] = Field(description="The type of the block content")
-        text: str = Field(
-            description="The text of the block; if the block is a code block, this should contain the code with newlines and tabs as appropriate"
-        )
-        styles: BlockContentStyle | dict = Field(
-            default={}, description="The styles of the block content"
-        )
-
-    class BlockContentLink(BaseModel):
-        type: Literal["link"] = Field(description="The type of the block content")
-        href: str = Field(description="The URL of the link")
-        content: List[BlockContentText] = Field(description="The content of the link")
-
-    class Block(BaseModel):
-        type: Literal[
-            "heading",
-            "paragraph",
-            "bulletListItem",
-            "numberedListItem",
-            "codeBlock",
-            "checkListItem",
-            "image",
-        ] = Field(description="The type of block")
-        props: Optional[BlockProps | dict] = Field(
-            default={}, description="The properties of the block"
-        )
-        content: List[BlockContentText | BlockContentLink] = Field(
-            description="The content of the block; empty for image blocks"
-        )
-
-    class Output(BaseModel):
-        blocks: List[Block] = Field(description="The blocks of the content")
+    try:
+        return convert_markdown_to_blocks(content)
+    except AmbiguousMarkdownError as exception:
+        # the LLM is only needed for markdown the local converter cannot place
+        logger.info(f"Converting content to blocks with the LLM: {exception}")
 
     system_prompt = f"""You are an expert course converter. The user will give you a content in markdown format. You will need to convert the content into a structured format as given below.
 
@@ -527,7 +910,7 @@ The `content` field of each block should have multiple blocks only when parts of
 
 The final output should be a JSON in the following format:
 
-{Output.model_json_schema()}"""
+{get_json_schema(MigratedContent)}"""
 
     messages = [
         {"role": "system", "content": system_prompt},
@@ -538,7 +921,7 @@ The final output should be a JSON in the following format:
         api_key=settings.openai_api_key,
         model=openai_plan_to_model_name["text-mini"],
         messages=messages,
-        response_model=Output,
+        response_model=get_response_model(MigratedContent),
         max_completion_tokens=16000,
     )
 
@@ -553,67 +936,190 @@ The final output should be a JSON in the following format:
     return blocks
 
 
-async def add_generated_module(course_id: int, module: BaseModel):
-    websocket_manager = get_manager()
-    color = random.choice(
-        [
-            "#2d3748",  # Slate blue
-            "#433c4c",  # Deep purple
-            "#4a5568",  # Cool gray
-            "#312e51",  # Indigo
-            "#364135",  # Forest green
-            "#4c393a",  # Burgundy
-            "#334155",  # Navy blue
-            "#553c2d",  # Rust brown
-            "#37303f",  # Plum
-            "#3c4b64",  # Steel blue
-            "#463c46",  # Mauve
-            "#3c322d",  # Coffee
-        ]
-    )
-    module_id, ordering = await add_milestone_to_course(course_id, module.name, color)
+module_colors = [
+    "#2d3748",  # Slate blue
+    "#433c4c",  # Deep purple
+    "#4a5568",  # Cool gray
+    "#312e51",  # Indigo
+    "#364135",  # Forest green
+    "#4c393a",  # Burgundy
+    "#334155",  # Navy blue
+    "#553c2d",  # Rust brown
+    "#37303f",  # Plum
+    "#3c4b64",  # Steel blue
+    "#463c46",  # Mauve
+    "#3c322d",  # Coffee
+]
+
+
+class CourseStructureWriter:
+    """
+    Buffers the modules and draft tasks found while a course structure is streamed
+    and writes them in batches, at most every `flush_interval` seconds or as soon as
+    `max_items` are waiting, so that reading the stream is not held up by a
+    transaction and a websocket message for every item. Each batch is announced
+    with a single `structure_items_created` event, preceded by the legacy
+    `module_created` and `task_created` events of its items while
+    `course_structure_legacy_events` is on.
+
+    Modules and tasks are referred to by the index returned when adding them; their
+    ids are in `module_ids` and `task_ids` once written. The ids are also recorded
+    on the generation job `job_uuid` so that a retry can remove what a failed
+    attempt wrote.
+    """
+
+    def __init__(
+        self,
+        course_id: int,
+        job_uuid: Optional[str] = None,
+        flush_interval: float = course_structure_flush_interval_seconds,
+        max_items: int = course_structure_flush_max_items,
+    ):
+        self.course_id = course_id
+        self.job_uuid = job_uuid
+        self.flush_interval = flush_interval
+        self.max_items = max_items
+        self.module_ids: List[Optional[int]] = []
+        self.task_ids: List[Optional[int]] = []
+        self._pending_modules: List[Dict] = []
+        self._pending_tasks: List[Dict] = []
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self._flusher.cancel()
+        await asyncio.gather(self._flusher, return_exceptions=True)
+
+        # write what has been found so far even if the stream failed
+        try:
+            self._raise_if_failed()
+            await self.flush()
+        except Exception as exception:
+            if exc is None:
+                raise
+            logger.error(
+                f"Failed to write the structure of course {self.course_id}: {exception!r}"
+            )
 
-    # Send WebSocket update after each module is created
-    await websocket_manager.send_item_update(
-        course_id,
-        {
-            "event": "module_created",
-            "module": {
-                "id": module_id,
-                "name": module.name,
-                "color": color,
-                "ordering": ordering,
-            },
-        },
-    )
+    def _raise_if_failed(self):
+        if (
+            self._flusher is not None
+            and self._flusher.done()
+            and not self._flusher.cancelled()
+            and self._flusher.exception() is not None
+        ):
+            raise self._flusher.exception()
+
+    def _added(self):
+        self._raise_if_failed()
+
+        if len(self._pending_modules) + len(self._pending_tasks) >= self.max_items:
+            self._full.set()
+
+    def add_module(self, name: str) -> int:
+        index = len(self.module_ids)
+        self.module_ids.append(None)
+        self._pending_modules.append(
+            {"index": index, "name": name, "color": random.choice(module_colors)}
+        )
+        self._added()
+        return index
+
+    def add_task(self, module_index: int, task: BaseModel) -> int:
+        index = len(self.task_ids)
+        self.task_ids.append(None)
+        self._pending_tasks.append(
+            {
+                "index": index,
+                "module_index": module_index,
+                "title": task.name,
+                "type": task.type,
+            }
+        )
+        self._added()
+        return index
 
-    return module_id
+    async def _flush_periodically(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
 
+            await self.flush()
 
-async def add_generated_draft_task(course_id: int, module_id: int, task: BaseModel):
-    task_id, task_ordering = await create_draft_task_for_course(
-        task.name,
-        task.type,
-        course_id,
-        module_id,
-    )
+    async def flush(self):
+        async with self._lock:
+            self._full.clear()
 
-    websocket_manager = get_manager()
+            modules, self._pending_modules = self._pending_modules, []
+            tasks, self._pending_tasks = self._pending_tasks, []
 
-    await websocket_manager.send_item_update(
-        course_id,
-        {
-            "event": "task_created",
-            "task": {
-                "id": task_id,
-                "module_id": module_id,
-                "ordering": task_ordering,
-                "type": str(task.type),
-                "name": task.name,
+            if not modules and not tasks:
+                return
+
+            # modules of this batch are referred to by their position in it
+            batch_indices = {module["index"]: i for i, module in enumerate(modules)}
+            for task in tasks:
+                task["milestone_id"] = self.module_ids[task["module_index"]]
+                task["milestone_index"] = batch_indices.get(task["module_index"])
+
+            added_modules, added_tasks = (
+                await add_milestones_and_draft_tasks_to_course(
+                    self.course_id, modules, tasks, job_uuid=self.job_uuid
+                )
+            )
+
+            created_modules = []
+            for module, (module_id, ordering) in zip(modules, added_modules):
+                self.module_ids[module["index"]] = module_id
+                created_modules.append(
+                    {
+                        "id": module_id,
+                        "name": module["name"],
+                        "color": module["color"],
+                        "ordering": ordering,
+                    }
+                )
+
+            created_tasks = []
+            for task, (task_id, ordering) in zip(tasks, added_tasks):
+                self.task_ids[task["index"]] = task_id
+                created_tasks.append(
+                    {
+                        "id": task_id,
+                        "module_id": self.module_ids[task["module_index"]],
+                        "ordering": ordering,
+                        "type": str(task["type"]),
+                        "name": task["title"],
+                    }
+                )
+
+        websocket_manager = get_manager()
+
+        if course_structure_legacy_events:
+            for module in created_modules:
+                websocket_manager.publish(
+                    self.course_id, {"event": "module_created", "module": module}
+                )
+            for task in created_tasks:
+                websocket_manager.publish(
+                    self.course_id, {"event": "task_created", "task": task}
+                )
+
+        websocket_manager.publish(
+            self.course_id,
+            {
+                "event": "structure_items_created",
+                "modules": created_modules,
+                "tasks": created_tasks,
             },
-        },
-    )
-    return task_id
+        )
 
 
 async def _generate_course_structure(
@@ -625,30 +1131,6 @@ async def _generate_course_structure(
     course_job_uuid: str,
     job_details: Dict,
 ):
-    class Task(BaseModel):
-        name: str = Field(description="The name of the task")
-        description: str = Field(
-            description="a detailed description of what should the content of that task be"
-        )
-        type: Literal[TaskType.LEARNING_MATERIAL, TaskType.QUIZ] | str = Field(
-            description="The type of task"
-        )
-
-    class Concept(BaseModel):
-        name: str = Field(description="The name of the concept")
-        description: str = Field(
-            description="The description for what the concept is about"
-        )
-        tasks: List[Task] = Field(description="A list of tasks for the concept")
-
-    class Module(BaseModel):
-        name: str = Field(description="The name of the module")
-        concepts: List[Concept] = Field(description="A list of concepts for the module")
-
-    class Output(BaseModel):
-        # name: str = Field(description="The name of the course")
-        modules: List[Module] = Field(description="A list of modules for the course")
-
     system_prompt = f"""You are an expert course creator. The user will give you some instructions for creating a course along with the reference material to be used as the source for the course content.
 
 You need to thoroughly analyse the reference material given to you and come up with a structure for the course. Each course should be structured into modules where each modules represents a full topic.
@@ -667,7 +1149,7 @@ Make sure to never skip a single concept from the reference material provided.
 
 The final output should be a JSON in the following format:
 
-{Output.model_json_schema()}
+{get_json_schema(CourseStructure)}
 
 Keep the sequences of modules, concepts, and tasks in mind.
 
@@ -695,67 +1177,69 @@ Do not include the type of task in the name of the task."""
         {"role": "user", "content": course_structure_generation_prompt},
     ]
 
-    stream = await stream_llm_with_instructor(
-        api_key=settings.openai_api_key,
-        model=openai_plan_to_model_name["text"],
-        messages=messages,
-        response_model=Output,
-        max_completion_tokens=16000,
-    )
-
-    module_ids = []
+    with llm_request_context(
+        LLMPriority.BACKGROUND, await get_org_id_for_course(course_id)
+    ):
+        stream = await stream_llm_with_instructor(
+            api_key=settings.openai_api_key,
+            model=openai_plan_to_model_name["text"],
+            messages=messages,
+            response_model=get_response_model(CourseStructure),
+            max_completion_tokens=16000,
+        )
 
+    # indices of the tasks added to the writer for each concept of each module
     module_concepts = defaultdict(lambda: defaultdict(list))
 
     output = None
 
-    async for chunk in stream:
-        if not chunk or not chunk.modules:
-            continue
-
-        for index, module in enumerate(chunk.modules):
-            if not module or not module.name or not module.concepts:
+    async with CourseStructureWriter(course_id, course_job_uuid) as writer:
+        async for chunk in stream:
+            if not chunk or not chunk.modules:
                 continue
 
-            if index >= len(module_ids):
-                module_id = await add_generated_module(course_id, module)
-                module_ids.append(module_id)
-            else:
-                module_id = module_ids[index]
+            for index, module in enumerate(chunk.modules):
+                if not module or not module.name or not module.concepts:
+                    continue
 
-            task_index = 0
+                if index >= len(writer.module_ids):
+                    writer.add_module(module.name)
 
-            for concept_index, concept in enumerate(module.concepts):
-                if (
-                    not concept
-                    or not concept.tasks
-                    or concept_index < len(module_concepts[module_id]) - 1
-                ):
-                    continue
+                task_index = 0
 
-                for task_index, task in enumerate(concept.tasks):
+                for concept_index, concept in enumerate(module.concepts):
                     if (
-                        not task
-                        or not task.name
-                        or not task.type
-                        or task.type not in [TaskType.LEARNING_MATERIAL, TaskType.QUIZ]
-                        or task_index < len(module_concepts[module_id][concept_index])
+                        not concept
+                        or not concept.tasks
+                        or concept_index < len(module_concepts[index]) - 1
                     ):
                         continue
 
-                    task_id = await add_generated_draft_task(course_id, module_id, task)
-                    module_concepts[module_id][concept_index].append(task_id)
-
-        # output = chunk
+                    for task_index, task in enumerate(concept.tasks):
+                        if (
+                            not task
+                            or not task.name
+                            or not task.type
+                            or task.type
+                            not in [TaskType.LEARNING_MATERIAL, TaskType.QUIZ]
+                            or task_index < len(module_concepts[index][concept_index])
+                        ):
+                            continue
+
+                        module_concepts[index][concept_index].append(
+                            writer.add_task(index, task)
+                        )
 
     output = chunk.model_dump()
 
     for index, module in enumerate(output["modules"]):
-        module["id"] = module_ids[index]
+        module["id"] = writer.module_ids[index]
 
         for concept_index, concept in enumerate(module["concepts"]):
             for task_index, task in enumerate(concept["tasks"]):
-                task["id"] = module_concepts[module["id"]][concept_index][task_index]
+                task["id"] = writer.task_ids[
+                    module_concepts[index][concept_index][task_index]
+                ]
 
     job_details["course_structure"] = output
     await update_course_generation_job_status_and_details(
@@ -764,9 +1248,7 @@ Do not include the type of task in the name of the task."""
         job_details,
     )
 
-    websocket_manager = get_manager()
-
-    await websocket_manager.send_item_update(
+    get_manager().publish(
         course_id,
         {
             "event": "course_structure_completed",
@@ -778,165 +1260,29 @@ Do not include the type of task in the name of the task."""
 @router.post("/generate/course/{course_id}/structure")
 async def generate_course_structure(
     course_id: int,
-    background_tasks: BackgroundTasks,
     request: GenerateCourseStructureRequest,
 ):
-    openai_client = openai.AsyncOpenAI(
-        api_key=settings.openai_api_key,
+    content_hash, file_id = await ingest_reference_material(
+        request.reference_material_s3_key
     )
 
-    if settings.s3_folder_name:
-        reference_material = download_file_from_s3_as_bytes(
-            request.reference_material_s3_key
-        )
-    else:
-        with open(
-            os.path.join(
-                settings.local_upload_folder, request.reference_material_s3_key
-            ),
-            "rb",
-        ) as f:
-            reference_material = f.read()
-
-    # Create a temporary file to pass to OpenAI
-    with tempfile.NamedTemporaryFile(suffix=".pdf") as temp_file:
-        temp_file.write(reference_material)
-        temp_file.flush()
-
-        file = await openai_client.files.create(
-            file=open(temp_file.name, "rb"),
-            purpose="user_data",
-        )
-
-    job_details = {**request.model_dump(), "openai_file_id": file.id}
+    job_details = {
+        **request.model_dump(),
+        "openai_file_id": file_id,
+        "reference_material_hash": content_hash,
+    }
     job_uuid = await store_course_generation_request(
         course_id,
         job_details,
     )
 
-    background_tasks.add_task(
-        _generate_course_structure,
-        request.course_description,
-        request.intended_audience,
-        request.instructions,
-        file.id,
-        course_id,
-        job_uuid,
-        job_details,
-    )
+    generation_worker.notify()
 
     return {"job_uuid": job_uuid}
 
 
-def task_generation_schemas():
-
-    class BlockProps(BaseModel):
-        level: Optional[Literal[2, 3]] = Field(
-            description="The level of a heading block"
-        )
-        checked: Optional[bool] = Field(
-            description="Whether the block is checked (for a checkListItem block)"
-        )
-        language: Optional[str] = Field(
-            description="The language of the code block (for a codeBlock block); always the full name of the language in lowercase (e.g. python, javascript, sql, html, css, etc.)"
-        )
-
-    class BlockContentStyle(BaseModel):
-        bold: Optional[bool] = Field(description="Whether the text is bold")
-        italic: Optional[bool] = Field(description="Whether the text is italic")
-        underline: Optional[bool] = Field(description="Whether the text is underlined")
-
-    class BlockContent(BaseModel):
-        text: str = Field(
-            description="The text of the block; if the block is a code block, this should contain the code with newlines and tabs as appropriate"
-        )
-        styles: BlockContentStyle | dict = Field(
-            default={}, description="The styles of the block content"
-        )
-
-    class Block(BaseModel):
-        type: Literal[
-            "heading",
-            "paragraph",
-            "bulletListItem",
-            "numberedListItem",
-            "codeBlock",
-            "checkListItem",
-        ] = Field(description="The type of block")
-        props: Optional[BlockProps | dict] = Field(
-            default={}, description="The properties of the block"
-        )
-        content: Optional[List[BlockContent]] = Field(
-            description="The content of the block"
-        )
-
-    class LearningMaterial(BaseModel):
-        blocks: List[Block] = Field(
-            description="The content of the learning material as blocks"
-        )
-
-    class Criterion(BaseModel):
-        name: str = Field(
-            description="The name of the criterion (e.g. grammar, relevance, clarity, confidence, pronunciation, brevity, etc.), keep it to 1-2 words unless absolutely necessary to extend beyond that"
-        )
-        description: str = Field(
-            description="The description/rubric for how to assess this criterion - the more detailed it is, the better the evaluation will be, but avoid making it unnecessarily big - only as descriptive as it needs to be but nothing more"
-        )
-        min_score: int = Field(
-            description="The minimum score possible to achieve for this criterion (e.g. 0)"
-        )
-        max_score: int = Field(
-            description="The maximum score possible to achieve for this criterion (e.g. 5)"
-        )
-
-    class Scorecard(BaseModel):
-        title: str = Field(
-            description="what does the scorecard assess (e.g. written communication, interviewing skills, product pitch, etc.)"
-        )
-        criteria: List[Criterion] = Field(
-            description="The list of criteria for the scorecard."
-        )
-
-    class Question(BaseModel):
-        question_type: Literal["objective", "subjective", "coding"] = Field(
-            description='The type of question; "objective" means that the question has a fixed correct answer and the learner\'s response must precisely match it. "subjective" means that the question is subjective, with no fixed correct answer. "coding" - a specific type of "objective" question for programming questions that require one to write code.'
-        )
-        answer_type: Optional[Literal["text", "audio"]] = Field(
-            description='The type of answer; "text" means the student has to submit textual answer where "audio" means student has to submit audio answer. Ignore this field for questionType = "coding".',
-        )
-        coding_languages: Optional[
-            List[Literal["HTML", "CSS", "JS", "Python", "React", "Node", "SQL"]]
-        ] = Field(
-            description='The languages that a student need to submit their code in for questionType=coding. It is a list because a student might have to submit their code in multiple languages as well (e.g. HTML, CSS, JS). This should only be included for questionType = "coding".',
-        )
-        blocks: List[Block] = Field(
-            description="The actual question details as individual blocks. Every part of the question should be included here. Do not assume that there is another field to capture different parts of the question. This is the only field that should be used to capture the question details. This means that if the question is an MCQ, all the options should be included here and not in another field. Extend the same idea to other question types."
-        )
-        correct_answer: Optional[List[Block]] = Field(
-            description='The actual correct answer to compare a student\'s response with. Ignore this field for questionType = "subjective".',
-        )
-        scorecard: Optional[Scorecard] = Field(
-            description='The scorecard for subjective questions. Ignore this field for questionType = "objective" or "coding".',
-        )
-        context: List[Block] = Field(
-            description="A short text that is not the question itself. This is used to add instructions for how the student should be given feedback or the overall purpose of that question. It can also include the raw content from the reference material to be used for giving feedback to the student that may not be present in the question content (hidden from the student) but is critical for providing good feedback."
-        )
-
-    class Quiz(BaseModel):
-        questions: List[Question] = Field(
-            description="A list of questions for the quiz"
-        )
-
-    return LearningMaterial, Quiz
-
-
 def get_system_prompt_for_task_generation(task_type):
-    LearningMaterial, Quiz = task_generation_schemas()
-    schema = (
-        LearningMaterial.model_json_schema()
-        if task_type == "learning_material"
-        else Quiz.model_json_schema()
-    )
+    schema = get_json_schema(get_task_generation_model(task_type))
 
     quiz_prompt = """Each quiz/exam contains multiple questions for testing the understanding of the learner on the actual concept.
 
@@ -1010,18 +1356,22 @@ Task to generate:
         {"role": "user", "content": generation_prompt},
     ]
 
-    LearningMaterial, Quiz = task_generation_schemas()
-    response_model = (
-        LearningMaterial if task["type"] == TaskType.LEARNING_MATERIAL else Quiz
-    )
+    async def call(model: str):
+        async with llm_scheduler.admit(model, messages, 16000):
+            return await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_model=get_response_model(
+                    get_task_generation_model(task["type"])
+                ),
+                max_completion_tokens=16000,
+                store=True,
+            )
 
-    output = await client.chat.completions.create(
-        model=model,
-        messages=messages,
-        response_model=response_model,
-        max_completion_tokens=16000,
-        store=True,
-    )
+    with llm_request_context(
+        LLMPriority.BACKGROUND, await get_org_id_for_course(course_id)
+    ):
+        output = await call_llm_with_retries(call, model)
 
     task["details"] = output.model_dump(exclude_none=True)
 
@@ -1034,16 +1384,18 @@ Task to generate:
         task_job_uuid, GenerateTaskJobStatus.COMPLETED
     )
 
-    course_jobs_status = await get_course_task_generation_jobs_status(course_id)
 
-    websocket_manager = get_manager()
+async def notify_course_task_generated(
+    task_id: int, course_job_uuid: str, course_id: int
+):
+    course_jobs_status = await get_course_task_generation_jobs_status(course_id)
 
-    await websocket_manager.send_item_update(
+    get_manager().publish(
         course_id,
         {
             "event": "task_completed",
             "task": {
-                "id": task["id"],
+                "id": task_id,
             },
             "total_completed": course_jobs_status[str(GenerateTaskJobStatus.COMPLETED)],
         },
@@ -1055,6 +1407,68 @@ Task to generate:
         )
 
 
+async def run_course_structure_generation_job(job: Dict):
+    job_details = job["job_details"]
+
+    # a retry starts from scratch, so drop what an earlier attempt wrote
+    if job_details.get("written_milestone_ids") or job_details.get("written_task_ids"):
+        milestone_ids, task_ids = await delete_partial_course_structure(job["uuid"])
+        job_details.pop("written_milestone_ids", None)
+        job_details.pop("written_task_ids", None)
+
+        get_manager().publish(
+            job["course_id"],
+            {
+                "event": "structure_items_deleted",
+                "module_ids": milestone_ids,
+                "task_ids": task_ids,
+            },
+        )
+
+    await _generate_course_structure(
+        job_details["course_description"],
+        job_details["intended_audience"],
+        job_details["instructions"],
+        await get_reference_material_file_id(job_details),
+        job["course_id"],
+        job["uuid"],
+        job_details,
+    )
+
+
+async def run_task_generation_job(job: Dict):
+    job_details = job["job_details"]
+
+    await generate_course_task(
+        get_instructor_client(settings.openai_api_key),
+        job_details["task"],
+        job_details["concept"],
+        await get_reference_material_file_id(job_details),
+        job["uuid"],
+        job_details["course_job_uuid"],
+        job_details["course_id"],
+    )
+
+    await notify_course_task_generated(
+        job_details["task"]["id"],
+        job_details["course_job_uuid"],
+        job_details["course_id"],
+    )
+
+
+async def on_task_generation_job_failed(job: Dict):
+    # a task that could not be generated should not keep its course from completing
+    job_details = job["job_details"]
+    course_jobs_status = await get_course_task_generation_jobs_status(
+        job_details["course_id"]
+    )
+
+    if not course_jobs_status[str(GenerateTaskJobStatus.STARTED)]:
+        await update_course_generation_job_status(
+            job_details["course_job_uuid"], GenerateCourseJobStatus.COMPLETED
+        )
+
+
 @router.post("/generate/course/{course_id}/tasks")
 async def generate_course_tasks(
     course_id: int,
@@ -1062,111 +1476,30 @@ async def generate_course_tasks(
 ):
     job_details = await get_course_generation_job_details(job_uuid)
 
-    client = instructor.from_openai(
-        openai.AsyncOpenAI(
-            api_key=settings.openai_api_key,
-        )
-    )
-
-    # Create a list to hold all task coroutines
-    tasks = []
-
     for module in job_details["course_structure"]["modules"]:
         for concept in module["concepts"]:
             for task in concept["tasks"]:
-                task_job_uuid = await store_task_generation_request(
+                task_job_details = {
+                    "task": task,
+                    "concept": concept,
+                    "openai_file_id": job_details["openai_file_id"],
+                    "reference_material_hash": job_details.get(
+                        "reference_material_hash"
+                    ),
+                    "reference_material_s3_key": job_details.get(
+                        "reference_material_s3_key"
+                    ),
+                    "course_job_uuid": job_uuid,
+                    "course_id": course_id,
+                }
+                await store_task_generation_request(
                     task["id"],
                     course_id,
-                    {
-                        "task": task,
-                        "concept": concept,
-                        "openai_file_id": job_details["openai_file_id"],
-                        "course_job_uuid": job_uuid,
-                        "course_id": course_id,
-                    },
-                )
-                # Add task to the list instead of adding to background_tasks
-                tasks.append(
-                    generate_course_task(
-                        client,
-                        task,
-                        concept,
-                        job_details["openai_file_id"],
-                        task_job_uuid,
-                        job_uuid,
-                        course_id,
-                    )
+                    task_job_details,
                 )
 
-    # Create a function to run all tasks in parallel
-    async def run_tasks_in_parallel():
-        try:
-            # Run all tasks concurrently using asyncio.gather
-            await async_batch_gather(tasks, description="Generating tasks")
-        except Exception as e:
-            logger.error(f"Error in parallel task execution: {e}")
-
-    # Start the parallel execution in the background without awaiting it
-    asyncio.create_task(run_tasks_in_parallel())
+    generation_worker.notify()
 
     return {
         "success": True,
     }
-
-
-async def resume_pending_course_structure_generation_jobs():
-    incomplete_course_structure_jobs = (
-        await get_all_pending_course_structure_generation_jobs()
-    )
-
-    if not incomplete_course_structure_jobs:
-        return
-
-    tasks = []
-
-    for job in incomplete_course_structure_jobs:
-        tasks.append(
-            _generate_course_structure(
-                job["job_details"]["course_description"],
-                job["job_details"]["intended_audience"],
-                job["job_details"]["instructions"],
-                job["job_details"]["openai_file_id"],
-                job["course_id"],
-                job["uuid"],
-                job["job_details"],
-            )
-        )
-
-    await async_batch_gather(
-        tasks, description="Resuming course structure generation jobs"
-    )
-
-
-async def resume_pending_task_generation_jobs():
-    incomplete_course_jobs = await get_all_pending_task_generation_jobs()
-
-    if not incomplete_course_jobs:
-        return
-
-    tasks = []
-
-    client = instructor.from_openai(
-        openai.AsyncOpenAI(
-            api_key=settings.openai_api_key,
-        )
-    )
-
-    for job in incomplete_course_jobs:
-        tasks.append(
-            generate_course_task(
-                client,
-                job["job_details"]["task"],
-                job["job_details"]["concept"],
-                job["job_details"]["openai_file_id"],
-                job["uuid"],
-                job["job_details"]["course_job_uuid"],
-                job["job_details"]["course_id"],
-            )
-        )
-
-    await async_batch_gather(tasks, description="Resuming task generation jobs")
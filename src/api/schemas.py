@@ -0,0 +1,322 @@
+from functools import lru_cache
+from typing import Dict, List, Literal, Optional, Type
+from pydantic import BaseModel, Field
+from langchain_core.output_parsers import PydanticOutputParser
+from instructor.function_calls import OpenAISchema, openai_schema
+from instructor.utils import classproperty
+from api.models import QuestionType, TaskType
+
+# Response models for every structured LLM call, defined once at import. Their JSON
+# schemas and format instructions are generated on first use and reused after that.
+
+
+# ===== /ai/chat =====
+
+
+class ObjectiveQuestionFeedback(BaseModel):
+    analysis: str = Field(description="A detailed analysis of the student's response")
+    feedback: str = Field(
+        description="Feedback on the student's response; add newline characters to the feedback to make it more readable where necessary"
+    )
+    is_correct: bool = Field(
+        description="Whether the student's response correctly solves the original task that the student is supposed to solve. For this to be true, the original task needs to be completely solved and not just partially solved. Giving the right answer to one step of the task does not count as solving the entire task."
+    )
+
+
+class ScorecardRowFeedback(BaseModel):
+    correct: Optional[str] = Field(
+        description="What worked well in the student's response for this category based on the scoring criteria"
+    )
+    wrong: Optional[str] = Field(
+        description="What needs improvement in the student's response for this category based on the scoring criteria"
+    )
+
+
+class ScorecardRow(BaseModel):
+    category: str = Field(
+        description="Category from the scoring criteria for which the feedback is being provided"
+    )
+    feedback: ScorecardRowFeedback = Field(
+        description="Detailed feedback for the student's response for this category"
+    )
+    score: int = Field(
+        description="Score given within the min/max range for this category based on the student's response - the score given should be in alignment with the feedback provided"
+    )
+    max_score: int = Field(
+        description="Maximum score possible for this category as per the scoring criteria"
+    )
+    pass_score: int = Field(
+        description="Pass score possible for this category as per the scoring criteria"
+    )
+
+
+class SubjectiveQuestionFeedback(BaseModel):
+    feedback: str = Field(
+        description="A single, comprehensive summary based on the scoring criteria"
+    )
+    scorecard: Optional[List[ScorecardRow]] = Field(
+        description="List of rows with one row for each category from scoring criteria; only include this in the response if the student's response is an answer to the task"
+    )
+
+
+class LearningMaterialResponse(BaseModel):
+    response: str = Field(
+        description="Response to the student's query; add proper formatting to the response to make it more readable where necessary"
+    )
+
+
+class RouterDecision(BaseModel):
+    use_reasoning_model: bool = Field(
+        description="Whether to use a reasoning model to evaluate the student's response"
+    )
+
+
+class RewrittenQuery(BaseModel):
+    rewritten_query: str = Field(
+        description="The rewritten query/message of the student"
+    )
+
+
+class ChatHistorySummary(BaseModel):
+    summary: str = Field(
+        description="The updated summary of the conversation with the student"
+    )
+
+
+# ===== content migration =====
+
+
+class MigrationBlockProps(BaseModel):
+    level: Optional[Literal[1, 2, 3]] = Field(
+        description="The level of a heading block"
+    )
+    checked: Optional[bool] = Field(
+        description="Whether the block is checked (for a checkListItem block)"
+    )
+    language: Optional[str] = Field(
+        description="The language of the code block (for a codeBlock block); always the full name of the language in lowercase (e.g. python, javascript, sql, html, css, etc.)"
+    )
+    name: Optional[str] = Field(description="The name of the image (for an image block)")
+    url: Optional[str] = Field(description="The URL of the image (for an image block)")
+
+
+class BlockContentStyle(BaseModel):
+    bold: Optional[bool] = Field(description="Whether the text is bold")
+    italic: Optional[bool] = Field(description="Whether the text is italic")
+    underline: Optional[bool] = Field(description="Whether the text is underlined")
+
+
+class MigrationBlockContentText(BaseModel):
+    type: Literal["text"] = Field(description="The type of the block content")
+    text: str = Field(
+        description="The text of the block; if the block is a code block, this should contain the code with newlines and tabs as appropriate"
+    )
+    styles: BlockContentStyle | dict = Field(
+        default={}, description="The styles of the block content"
+    )
+
+
+class MigrationBlockContentLink(BaseModel):
+    type: Literal["link"] = Field(description="The type of the block content")
+    href: str = Field(description="The URL of the link")
+    content: List[MigrationBlockContentText] = Field(
+        description="The content of the link"
+    )
+
+
+class MigrationBlock(BaseModel):
+    type: Literal[
+        "heading",
+        "paragraph",
+        "bulletListItem",
+        "numberedListItem",
+        "codeBlock",
+        "checkListItem",
+        "image",
+    ] = Field(description="The type of block")
+    props: Optional[MigrationBlockProps | dict] = Field(
+        default={}, description="The properties of the block"
+    )
+    content: List[MigrationBlockContentText | MigrationBlockContentLink] = Field(
+        description="The content of the block; empty for image blocks"
+    )
+
+
+class MigratedContent(BaseModel):
+    blocks: List[MigrationBlock] = Field(description="The blocks of the content")
+
+
+# ===== course structure generation =====
+
+
+class CourseTask(BaseModel):
+    name: str = Field(description="The name of the task")
+    description: str = Field(
+        description="a detailed description of what should the content of that task be"
+    )
+    # the enum members themselves are unhashable and cannot be used in a Literal
+    type: Literal["learning_material", "quiz"] | str = Field(
+        description="The type of task"
+    )
+
+
+class CourseConcept(BaseModel):
+    name: str = Field(description="The name of the concept")
+    description: str = Field(description="The description for what the concept is about")
+    tasks: List[CourseTask] = Field(description="A list of tasks for the concept")
+
+
+class CourseModule(BaseModel):
+    name: str = Field(description="The name of the module")
+    concepts: List[CourseConcept] = Field(
+        description="A list of concepts for the module"
+    )
+
+
+class CourseStructure(BaseModel):
+    modules: List[CourseModule] = Field(description="A list of modules for the course")
+
+
+# ===== course task generation =====
+
+
+class BlockProps(BaseModel):
+    level: Optional[Literal[2, 3]] = Field(description="The level of a heading block")
+    checked: Optional[bool] = Field(
+        description="Whether the block is checked (for a checkListItem block)"
+    )
+    language: Optional[str] = Field(
+        description="The language of the code block (for a codeBlock block); always the full name of the language in lowercase (e.g. python, javascript, sql, html, css, etc.)"
+    )
+
+
+class BlockContent(BaseModel):
+    text: str = Field(
+        description="The text of the block; if the block is a code block, this should contain the code with newlines and tabs as appropriate"
+    )
+    styles: BlockContentStyle | dict = Field(
+        default={}, description="The styles of the block content"
+    )
+
+
+class Block(BaseModel):
+    type: Literal[
+        "heading",
+        "paragraph",
+        "bulletListItem",
+        "numberedListItem",
+        "codeBlock",
+        "checkListItem",
+    ] = Field(description="The type of block")
+    props: Optional[BlockProps | dict] = Field(
+        default={}, description="The properties of the block"
+    )
+    content: Optional[List[BlockContent]] = Field(
+        description="The content of the block"
+    )
+
+
+class LearningMaterial(BaseModel):
+    blocks: List[Block] = Field(
+        description="The content of the learning material as blocks"
+    )
+
+
+class Criterion(BaseModel):
+    name: str = Field(
+        description="The name of the criterion (e.g. grammar, relevance, clarity, confidence, pronunciation, brevity, etc.), keep it to 1-2 words unless absolutely necessary to extend beyond that"
+    )
+    description: str = Field(
+        description="The description/rubric for how to assess this criterion - the more detailed it is, the better the evaluation will be, but avoid making it unnecessarily big - only as descriptive as it needs to be but nothing more"
+    )
+    min_score: int = Field(
+        description="The minimum score possible to achieve for this criterion (e.g. 0)"
+    )
+    max_score: int = Field(
+        description="The maximum score possible to achieve for this criterion (e.g. 5)"
+    )
+
+
+class Scorecard(BaseModel):
+    title: str = Field(
+        description="what does the scorecard assess (e.g. written communication, interviewing skills, product pitch, etc.)"
+    )
+    criteria: List[Criterion] = Field(
+        description="The list of criteria for the scorecard."
+    )
+
+
+class Question(BaseModel):
+    question_type: Literal["objective", "subjective", "coding"] = Field(
+        description='The type of question; "objective" means that the question has a fixed correct answer and the learner\'s response must precisely match it. "subjective" means that the question is subjective, with no fixed correct answer. "coding" - a specific type of "objective" question for programming questions that require one to write code.'
+    )
+    answer_type: Optional[Literal["text", "audio"]] = Field(
+        description='The type of answer; "text" means the student has to submit textual answer where "audio" means student has to submit audio answer. Ignore this field for questionType = "coding".',
+    )
+    coding_languages: Optional[
+        List[Literal["HTML", "CSS", "JS", "Python", "React", "Node", "SQL"]]
+    ] = Field(
+        description='The languages that a student need to submit their code in for questionType=coding. It is a list because a student might have to submit their code in multiple languages as well (e.g. HTML, CSS, JS). This should only be included for questionType = "coding".',
+    )
+    blocks: List[Block] = Field(
+        description="The actual question details as individual blocks. Every part of the question should be included here. Do not assume that there is another field to capture different parts of the question. This is the only field that should be used to capture the question details. This means that if the question is an MCQ, all the options should be included here and not in another field. Extend the same idea to other question types."
+    )
+    correct_answer: Optional[List[Block]] = Field(
+        description='The actual correct answer to compare a student\'s response with. Ignore this field for questionType = "subjective".',
+    )
+    scorecard: Optional[Scorecard] = Field(
+        description='The scorecard for subjective questions. Ignore this field for questionType = "objective" or "coding".',
+    )
+    context: List[Block] = Field(
+        description="A short text that is not the question itself. This is used to add instructions for how the student should be given feedback or the overall purpose of that question. It can also include the raw content from the reference material to be used for giving feedback to the student that may not be present in the question content (hidden from the student) but is critical for providing good feedback."
+    )
+
+
+class Quiz(BaseModel):
+    questions: List[Question] = Field(description="A list of questions for the quiz")
+
+
+# ===== registry =====
+
+
+@lru_cache(maxsize=None)
+def get_json_schema(model: Type[BaseModel]) -> Dict:
+    return model.model_json_schema()
+
+
+@lru_cache(maxsize=None)
+def get_format_instructions(model: Type[BaseModel]) -> str:
+    return PydanticOutputParser(pydantic_object=model).get_format_instructions()
+
+
+@lru_cache(maxsize=None)
+def get_response_model(model: Type[BaseModel]) -> Type[OpenAISchema]:
+    """
+    `model` wrapped the way instructor expects it, with its function-calling schema
+    generated once. Instructor otherwise wraps the model and regenerates the schema
+    on every call.
+    """
+    wrapped = openai_schema(model)
+    schema = wrapped.openai_schema
+
+    return type(wrapped)(
+        model.__name__,
+        (wrapped,),
+        {"openai_schema": classproperty(lambda cls: schema)},
+    )
+
+
+def get_chat_response_model(
+    task_type: TaskType, question_type: Optional[QuestionType]
+) -> Type[BaseModel]:
+    if task_type == TaskType.LEARNING_MATERIAL:
+        return LearningMaterialResponse
+
+    if question_type == QuestionType.OBJECTIVE:
+        return ObjectiveQuestionFeedback
+
+    return SubjectiveQuestionFeedback
+
+
+def get_task_generation_model(task_type: str) -> Type[BaseModel]:
+    return LearningMaterial if task_type == TaskType.LEARNING_MATERIAL else Quiz
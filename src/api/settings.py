@@ -27,6 +27,7 @@ class Settings(BaseSettings):
     slack_usage_stats_webhook_url: str | None = None
     phoenix_endpoint: str | None = None
     phoenix_api_key: str | None = None
+    platform_operator_user_ids: list[int] = []  # users allowed to use the admin routes
 
     model_config = SettingsConfigDict(env_file=join(root_dir, ".env"))
 
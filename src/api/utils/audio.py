@@ -1,5 +1,60 @@
 import base64
+import io
+from pydub import AudioSegment
+from pydub.silence import detect_leading_silence
+from api.config import (
+    audio_model_sample_rate,
+    audio_silence_threshold_dbfs,
+    audio_keep_silence_ms,
+)
+from api.utils.logging import logger
 
 
 def prepare_audio_input_for_ai(audio_data: bytes):
     return base64.b64encode(audio_data).decode("utf-8")
+
+
+def trim_silence(
+    audio: AudioSegment, silence_threshold_dbfs: float, keep_silence_ms: int
+) -> AudioSegment:
+    start = detect_leading_silence(audio, silence_threshold=silence_threshold_dbfs)
+    end = len(audio) - detect_leading_silence(
+        audio.reverse(), silence_threshold=silence_threshold_dbfs
+    )
+
+    # recordings that are silent throughout are left untouched
+    if start >= end:
+        return audio
+
+    return audio[max(start - keep_silence_ms, 0) : end + keep_silence_ms]
+
+
+def normalize_audio_for_ai(
+    audio_data: bytes,
+    sample_rate: int = audio_model_sample_rate,
+    silence_threshold_dbfs: float = audio_silence_threshold_dbfs,
+    keep_silence_ms: int = audio_keep_silence_ms,
+) -> bytes:
+    """
+    Downmix a WAV recording to mono 16-bit audio at `sample_rate` and trim leading and
+    trailing silence. Anything that can't be decoded as WAV is returned unchanged.
+    """
+    try:
+        audio = AudioSegment.from_file(io.BytesIO(audio_data), format="wav")
+    except Exception as exception:
+        logger.warning(f"Skipping audio normalization: {exception}")
+        return audio_data
+
+    audio = audio.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
+    audio = trim_silence(audio, silence_threshold_dbfs, keep_silence_ms)
+
+    buffer = io.BytesIO()
+    audio.export(buffer, format="wav")
+    normalized = buffer.getvalue()
+
+    # already compact recordings are not worth re-encoding
+    return normalized if len(normalized) < len(audio_data) else audio_data
+
+
+def prepare_normalized_audio_input_for_ai(audio_data: bytes) -> str:
+    return prepare_audio_input_for_ai(normalize_audio_for_ai(audio_data))
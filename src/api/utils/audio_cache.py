@@ -0,0 +1,240 @@
+import asyncio
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from api.config import (
+    audio_cache_dir,
+    audio_cache_max_memory_bytes,
+    audio_cache_max_disk_bytes,
+    audio_cache_max_concurrent_fetches,
+)
+from api.settings import settings
+from api.utils.audio import prepare_normalized_audio_input_for_ai
+from api.utils.logging import logger
+from api.utils.s3 import (
+    download_file_from_s3_as_bytes,
+    get_media_upload_s3_key_from_uuid,
+)
+
+# only names like upload uuids are used as file names in the disk cache
+SAFE_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def read_audio_upload(uuid: str) -> bytes:
+    if settings.s3_folder_name:
+        return download_file_from_s3_as_bytes(
+            get_media_upload_s3_key_from_uuid(uuid, "wav")
+        )
+
+    with open(os.path.join(settings.local_upload_folder, f"{uuid}.wav"), "rb") as f:
+        return f.read()
+
+
+class AudioMessageCache:
+    """
+    Audio recordings prepared for the LLM, keyed by upload uuid. Recordings never
+    change once uploaded, so entries are only ever evicted, never invalidated.
+
+    Prepared payloads are kept in an in-memory LRU bounded by `max_memory_bytes` and,
+    if `cache_dir` is set, in an on-disk LRU bounded by `max_disk_bytes`. Misses are
+    fetched and prepared in worker threads, with at most `max_concurrent_fetches`
+    running at once and concurrent requests for the same uuid sharing one fetch.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], bytes],
+        prepare: Callable[[bytes], str],
+        max_memory_bytes: int,
+        cache_dir: Optional[str] = None,
+        max_disk_bytes: int = 0,
+        max_concurrent_fetches: int = 8,
+    ):
+        self.fetch = fetch
+        self.prepare = prepare
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_concurrent_fetches = max_concurrent_fetches
+
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: Optional[OrderedDict[str, int]] = None
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._semaphore = None
+        self._loop = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_fetches)
+            self._in_flight = {}
+
+        return self._semaphore
+
+    def _remember(self, uuid: str, payload: str):
+        if len(payload) > self.max_memory_bytes:
+            return
+
+        self._memory[uuid] = payload
+        self._memory_bytes += len(payload)
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _uses_disk(self, uuid: str) -> bool:
+        return bool(self.cache_dir) and bool(SAFE_KEY_PATTERN.match(uuid))
+
+    def _disk_path(self, uuid: str) -> str:
+        return os.path.join(self.cache_dir, f"{uuid}.b64")
+
+    def _load_disk_index(self):
+        """Index existing cache files, least recently used first."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".b64"):
+                stat = entry.stat()
+                uuid = entry.name[: -len(".b64")]
+                entries.append((stat.st_mtime, uuid, stat.st_size))
+
+        self._disk = OrderedDict((uuid, size) for _, uuid, size in sorted(entries))
+        self._disk_bytes = sum(self._disk.values())
+
+    def _read_from_disk(self, uuid: str) -> Optional[str]:
+        with self._disk_lock:
+            if self._disk is None:
+                self._load_disk_index()
+
+            if uuid not in self._disk:
+                return None
+
+        path = self._disk_path(uuid)
+        try:
+            with open(path, "r") as f:
+                payload = f.read()
+            # mtime doubles as the last access time for the LRU order on restart
+            os.utime(path)
+        except OSError:
+            with self._disk_lock:
+                self._disk_bytes -= self._disk.pop(uuid, 0)
+            return None
+
+        with self._disk_lock:
+            if uuid in self._disk:
+                self._disk.move_to_end(uuid)
+
+        return payload
+
+    def _write_to_disk(self, uuid: str, payload: str):
+        size = len(payload)
+        if size > self.max_disk_bytes:
+            return
+
+        path = self._disk_path(uuid)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError as exception:
+            logger.warning(f"Failed to write {uuid} to the audio cache: {exception}")
+            return
+
+        evicted = []
+        with self._disk_lock:
+            self._disk_bytes += size - self._disk.pop(uuid, 0)
+            self._disk[uuid] = size
+
+            while self._disk_bytes > self.max_disk_bytes and self._disk:
+                evicted_uuid, evicted_size = self._disk.popitem(last=False)
+                self._disk_bytes -= evicted_size
+                evicted.append(evicted_uuid)
+
+        for evicted_uuid in evicted:
+            try:
+                os.remove(self._disk_path(evicted_uuid))
+            except OSError:
+                pass
+
+    def _load(self, uuid: str) -> Tuple[str, bool]:
+        """
+        Look the payload up on disk, fetching and preparing it on a miss. Runs in a
+        worker thread; returns the payload and whether it came from the disk cache.
+        """
+        if self._uses_disk(uuid):
+            payload = self._read_from_disk(uuid)
+            if payload is not None:
+                return payload, True
+
+        payload = self.prepare(self.fetch(uuid))
+
+        if self._uses_disk(uuid):
+            self._write_to_disk(uuid, payload)
+
+        return payload, False
+
+    async def _load_once(self, uuid: str) -> str:
+        async with self._get_semaphore():
+            payload, from_disk = await asyncio.to_thread(self._load, uuid)
+
+        if from_disk:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+
+        self._remember(uuid, payload)
+        return payload
+
+    async def get(self, uuid: str) -> str:
+        if uuid in self._memory:
+            self._memory.move_to_end(uuid)
+            self.memory_hits += 1
+            return self._memory[uuid]
+
+        self._get_semaphore()
+
+        if uuid not in self._in_flight:
+            future = asyncio.ensure_future(self._load_once(uuid))
+            self._in_flight[uuid] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(uuid, None))
+
+        return await asyncio.shield(self._in_flight[uuid])
+
+    async def get_many(self, uuids: List[str]) -> Dict[str, str]:
+        uuids = list(dict.fromkeys(uuids))
+        payloads = await asyncio.gather(*[self.get(uuid) for uuid in uuids])
+        return dict(zip(uuids, payloads))
+
+    def stats(self) -> Dict:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk) if self._disk is not None else None,
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+audio_message_cache = AudioMessageCache(
+    read_audio_upload,
+    prepare_normalized_audio_input_for_ai,
+    audio_cache_max_memory_bytes,
+    # local uploads are already on disk, so only recordings on s3 are spilled to disk
+    cache_dir=audio_cache_dir if settings.s3_folder_name else None,
+    max_disk_bytes=audio_cache_max_disk_bytes,
+    max_concurrent_fetches=audio_cache_max_concurrent_fetches,
+)
@@ -0,0 +1,133 @@
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from api.config import (
+    chat_history_token_budget,
+    chat_history_window_ratio,
+    chat_history_audio_message_tokens,
+)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the environment
+    tiktoken = None
+
+# tokens added by the chat format around every message and for priming the reply
+message_overhead_tokens = 3
+reply_overhead_tokens = 3
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    if tiktoken is None:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # newer model snapshots are not always known to the installed tiktoken
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count the tokens in `text` for `model`, locally.
+
+    Falls back to a four-characters-per-token estimate when tiktoken is not
+    installed.
+    """
+    if not text:
+        return 0
+
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // 4)
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: Dict, model: str) -> int:
+    content = message["content"]
+
+    if isinstance(content, list):
+        # multi-part content; audio is billed by duration, not by its base64 size
+        tokens = 0
+        for part in content:
+            if part.get("type") == "text":
+                tokens += count_tokens(part["text"], model)
+            else:
+                tokens += chat_history_audio_message_tokens
+    else:
+        tokens = count_tokens(content, model)
+
+    return tokens + message_overhead_tokens
+
+
+def count_messages_tokens(messages: List[Dict], model: str) -> int:
+    return (
+        sum(count_message_tokens(message, model) for message in messages)
+        + reply_overhead_tokens
+    )
+
+
+def get_history_token_budget(*model_plans: str) -> int:
+    """
+    Return the history budget that fits every one of `model_plans`, for when the
+    model that will see the history is only decided later.
+    """
+    return min(chat_history_token_budget[model_plan] for model_plan in model_plans)
+
+
+def split_chat_history(
+    messages: List[Dict], budget: int, count: Callable[[Dict], int]
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split `messages` into the older messages and the longest run of recent
+    messages that fits within `budget` tokens.
+
+    The recent messages never start with an assistant message so that the window
+    does not open with a reply to a turn the model cannot see.
+    """
+    total = 0
+    start = len(messages)
+
+    while start > 0:
+        tokens = count(messages[start - 1])
+        if total + tokens > budget:
+            break
+
+        total += tokens
+        start -= 1
+
+    while start < len(messages) and messages[start]["role"] != "user":
+        start += 1
+
+    return messages[:start], messages[start:]
+
+
+def window_chat_history(
+    messages: List[Dict],
+    budget: int,
+    count: Callable[[Dict], int],
+    summarized_until_id: Optional[int] = None,
+    window_ratio: float = chat_history_window_ratio,
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Decide which messages to send verbatim and which to fold into the summary.
+
+    `summarized_until_id` is the id of the last message covered by the existing
+    summary, if any. Messages after it are sent verbatim while they fit within
+    `budget`. Once they do not, only `window_ratio` of the budget is kept
+    verbatim so that the next few turns fit again without another summary.
+
+    Returns the messages that still need to be folded into the summary and the
+    messages to send verbatim.
+    """
+    if summarized_until_id is not None:
+        messages = [
+            message for message in messages if message["id"] > summarized_until_id
+        ]
+
+    if sum(count(message) for message in messages) <= budget:
+        return [], messages
+
+    return split_chat_history(messages, int(budget * window_ratio), count)
@@ -1,38 +1,125 @@
-from typing import List, Coroutine
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Coroutine
 import asyncio
 from tqdm.asyncio import tqdm_asyncio
 
 
-async def async_batch_gather(
+async def run_with_bounded_concurrency(
     coroutines: List[Coroutine],
-    batch_size: int = 25,
-    description: str = "Processing batch",
-):
-    total_num = len(coroutines)
-    # outputs = [None] * total_num
-    results = []
+    max_concurrency: int = 25,
+    return_exceptions: bool = False,
+    description: str = "Processing",
+) -> List:
+    """
+    Run `coroutines` with at most `max_concurrency` of them in flight, starting the
+    next one as soon as any of them finishes, and return their results in order.
 
-    # Process in batches to limit memory usage
-    for i in range(0, total_num, batch_size):
-        batch = coroutines[i : i + batch_size]
-        batch_results = await tqdm_asyncio.gather(
-            *batch,
-            desc=f"{description} {i}-{i+len(batch)}/{total_num}",
-        )
-        results.extend(batch_results)
+    If `return_exceptions` is False, the first failure cancels the rest and is
+    raised; otherwise failures are returned in place of results. Cancelling the
+    caller cancels the coroutines in flight and closes the ones that have not
+    started.
+    """
+    results = [None] * len(coroutines)
+    pending = iter(enumerate(coroutines))
+    in_flight: Dict[asyncio.Future, int] = {}
 
-        # for completed_task in asyncio.as_completed(batch):
-        #     task_row_index, output = await completed_task
+    def start_next():
+        for index, coroutine in pending:
+            in_flight[asyncio.ensure_future(coroutine)] = index
+            return
 
-        #     outputs[task_row_index] = output
-        #     pbar.update(1)
+    progress = tqdm_asyncio(total=len(coroutines), desc=description)
 
-        # Give a little time for memory to be freed up
-        await asyncio.sleep(1)
+    try:
+        for _ in range(max_concurrency):
+            start_next()
 
-    return results
+        while in_flight:
+            done, _ = await asyncio.wait(
+                in_flight, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                index = in_flight.pop(task)
+                exception = task.exception()
+
+                if exception is not None and not return_exceptions:
+                    raise exception
+
+                results[index] = task.result() if exception is None else exception
+                progress.update(1)
+
+                start_next()
+
+        return results
+    finally:
+        progress.close()
+
+        for task in in_flight:
+            task.cancel()
+
+        for _, coroutine in pending:
+            coroutine.close()
 
 
 async def async_index_wrapper(func, index, *args, **kwargs):
     output = await func(*args, **kwargs)
     return index, output
+
+
+_STREAM_END = object()
+
+
+async def stream_speculatively(
+    decision: Awaitable,
+    open_stream: Callable[[Any], AsyncGenerator],
+    speculative_choice: Any,
+    on_decision_error: Callable[[Exception], None] = None,
+) -> AsyncGenerator:
+    """
+    Start `open_stream(speculative_choice)` right away while `decision` is still
+    pending. Chunks are buffered until the decision arrives: if it matches the
+    speculative choice they are released and the stream continues, otherwise the
+    speculative stream is cancelled and `open_stream(decision)` is streamed instead.
+
+    If the decision fails and `on_decision_error` is given, it is called with the
+    error and the speculative stream is kept; otherwise the error is raised.
+    """
+    decision = asyncio.ensure_future(decision)
+    queue = asyncio.Queue()
+
+    async def consume():
+        try:
+            async for chunk in open_stream(speculative_choice):
+                await queue.put((chunk, None))
+        except Exception as exception:
+            await queue.put((None, exception))
+        else:
+            await queue.put((_STREAM_END, None))
+
+    consumer = asyncio.create_task(consume())
+
+    try:
+        try:
+            choice = await decision
+        except Exception as exception:
+            if on_decision_error is None:
+                raise
+            on_decision_error(exception)
+            choice = speculative_choice
+
+        if choice != speculative_choice:
+            consumer.cancel()
+            async for chunk in open_stream(choice):
+                yield chunk
+            return
+
+        while True:
+            chunk, exception = await queue.get()
+            if exception is not None:
+                raise exception
+            if chunk is _STREAM_END:
+                return
+            yield chunk
+    finally:
+        decision.cancel()
+        consumer.cancel()
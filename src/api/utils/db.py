@@ -1,31 +1,452 @@
+import asyncio
+import re
 import sqlite3
-from typing import List, Tuple
-from api.config import sqlite_db_path
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Tuple
+from api.config import (
+    sqlite_db_path,
+    sqlite_pool_size,
+    sqlite_pool_health_check_interval,
+    sqlite_storage_mode,
+    sqlite_writer_max_batch_size,
+)
 from api.utils.logging import logger
+from api.utils.sql_profiler import profile_connection, profile_cursor
 import aiosqlite
 from contextlib import asynccontextmanager
 
 
-def trace_callback(sql):
-    # Record the start time and SQL
-    logger.info(f"Executing operation: {sql}")
+async def open_db_connection(
+    db_path: str, query_only: bool = False
+) -> aiosqlite.Connection:
+    connection = aiosqlite.connect(db_path)
+    # connections are long-lived, so their worker thread must not keep the
+    # interpreter alive on shutdown
+    connection.daemon = True
+    conn = await connection
+
+    try:
+        await conn.execute("PRAGMA synchronous=NORMAL;")
+        if query_only:
+            await conn.execute("PRAGMA query_only=ON;")
+    except Exception:
+        await conn.close()
+        raise
+
+    return conn
+
+
+class ConnectionPool:
+    """
+    Keeps up to `size` idle aiosqlite connections open so that a query does not pay for
+    a new worker thread and the per-connection PRAGMA setup every time.
+
+    Checkouts never wait: if no idle connection is available a new one is opened, and it
+    is closed on return when the pool is already full. This keeps nested checkouts (a
+    db function calling another while holding a connection) from deadlocking.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int,
+        health_check_interval: float,
+        query_only: bool = False,
+    ):
+        self.db_path = db_path
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.query_only = query_only
+        self._idle = deque()
+        self.num_opened = 0
+        self.num_reused = 0
+        self.num_discarded = 0
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        conn = await open_db_connection(self.db_path, query_only=self.query_only)
+        self.num_opened += 1
+        return conn
+
+    async def _is_healthy(self, conn: aiosqlite.Connection, last_used_at: float):
+        if not conn.is_alive():
+            return False
+
+        if time.monotonic() - last_used_at < self.health_check_interval:
+            return True
+
+        try:
+            await conn.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def _discard(self, conn: aiosqlite.Connection):
+        self.num_discarded += 1
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    async def checkout(self) -> aiosqlite.Connection:
+        while self._idle:
+            conn, last_used_at = self._idle.pop()
+
+            if await self._is_healthy(conn, last_used_at):
+                self.num_reused += 1
+                return conn
+
+            await self._discard(conn)
+
+        return await self._open_connection()
+
+    async def checkin(self, conn: aiosqlite.Connection, discard: bool = False):
+        if not discard and conn.in_transaction:
+            # never hand out a connection with someone else's uncommitted work
+            try:
+                await conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or len(self._idle) >= self.size:
+            await self._discard(conn)
+            return
+
+        self._idle.append((conn, time.monotonic()))
+
+    async def close(self):
+        while self._idle:
+            conn, _ = self._idle.pop()
+            await self._discard(conn)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "opened": self.num_opened,
+            "reused": self.num_reused,
+            "discarded": self.num_discarded,
+        }
+
+
+class SQLiteWriter:
+    """
+    Owns the only connection that writes to the database in single_writer mode.
+
+    Writes submitted through `submit` are queued and committed together in a single
+    transaction (group commit), each inside its own savepoint so that one failing
+    write does not fail the rest of its batch. Code that needs a multi-statement
+    transaction of its own gets exclusive use of the connection through `session`.
+    """
+
+    def __init__(self, db_path: str, max_batch_size: int):
+        self.db_path = db_path
+        self.max_batch_size = max_batch_size
+        self.loop = asyncio.get_running_loop()
+        self._conn = None
+        self._queue = asyncio.Queue()
+        self._lock = asyncio.Lock()
+        self._holder = None
+        self._worker = None
+        self.num_batches = 0
+        self.num_writes = 0
+        self.max_queue_depth = 0
+        self.commit_latencies = deque(maxlen=1000)
+
+    async def _get_connection(self) -> aiosqlite.Connection:
+        if self._conn is None or not self._conn.is_alive():
+            self._conn = await open_db_connection(self.db_path)
+
+        return self._conn
+
+    def _holds_session(self) -> bool:
+        return self._holder is not None and self._holder is asyncio.current_task()
+
+    async def submit(self, operation: Callable[[aiosqlite.Cursor], Awaitable]):
+        """Queue `operation(cursor)` for the next group commit and wait for its result."""
+        if self._holds_session():
+            # the caller already has the connection inside its own transaction
+            cursor = await self._conn.cursor()
+            return await operation(profile_cursor(cursor))
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        future = self.loop.create_future()
+        self._queue.put_nowait((operation, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                async with self._lock:
+                    await self._commit_batch(batch)
+            except asyncio.CancelledError:
+                self._fail_writes(batch)
+                raise
+
+    def _fail_writes(self, batch):
+        # the writes are never committed, so their callers must not keep waiting
+        for _, future in batch:
+            try:
+                if not future.done():
+                    future.set_exception(RuntimeError("Database writer closed"))
+            except RuntimeError:
+                # its event loop is already closed
+                pass
+
+    async def _commit_batch(self, batch):
+        outcomes = []
+        conn = None
+        try:
+            conn = await self._get_connection()
+            cursor = await conn.cursor()
+            await cursor.execute("BEGIN")
+
+            for operation, future in batch:
+                if future.cancelled():
+                    continue
+
+                await cursor.execute("SAVEPOINT queued_write")
+                try:
+                    result = await operation(profile_cursor(cursor))
+                except Exception as e:
+                    await cursor.execute("ROLLBACK TO queued_write")
+                    outcomes.append((future, None, e))
+                else:
+                    outcomes.append((future, result, None))
+                await cursor.execute("RELEASE queued_write")
+
+            commit_start = time.monotonic()
+            await conn.commit()
+            self.commit_latencies.append(time.monotonic() - commit_start)
+        except Exception as e:
+            logger.error(f"Group commit of {len(batch)} writes failed: {e}")
+            if conn is not None:
+                try:
+                    await conn.rollback()
+                except Exception:
+                    self._conn = None
+
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.num_batches += 1
+        self.num_writes += len(outcomes)
+
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @asynccontextmanager
+    async def session(self):
+        if self._holds_session():
+            yield self._conn
+            return
+
+        async with self._lock:
+            self._holder = asyncio.current_task()
+            conn = None
+            try:
+                conn = await self._get_connection()
+                yield conn
+            except Exception:
+                if conn is not None:
+                    await conn.rollback()
+                raise
+            finally:
+                self._holder = None
+                if conn is not None and conn.in_transaction:
+                    await conn.rollback()
+
+    async def close(self):
+        if self._worker is not None:
+            try:
+                self._worker.cancel()
+            except RuntimeError:
+                # its event loop is already closed
+                pass
+            self._worker = None
+
+        queued = []
+        while not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        self._fail_writes(queued)
+
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def stats(self):
+        latencies = sorted(self.commit_latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[int(fraction * (len(latencies) - 1))] * 1000, 3)
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.num_batches,
+            "writes": self.num_writes,
+            "avg_batch_size": (
+                round(self.num_writes / self.num_batches, 2) if self.num_batches else 0
+            ),
+            "commit_latency_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": percentile(1),
+            },
+        }
+
+
+pool = ConnectionPool(
+    sqlite_db_path, sqlite_pool_size, sqlite_pool_health_check_interval
+)
+read_pool = ConnectionPool(
+    sqlite_db_path,
+    sqlite_pool_size,
+    sqlite_pool_health_check_interval,
+    query_only=True,
+)
+writer = None
+
+
+def is_single_writer_mode() -> bool:
+    return sqlite_storage_mode == "single_writer"
+
+
+async def get_db_writer() -> SQLiteWriter:
+    global writer
+
+    # asyncio primitives are bound to the loop they were created on
+    if writer is None or writer.loop is not asyncio.get_running_loop():
+        stale_writer = writer
+        writer = SQLiteWriter(sqlite_db_path, sqlite_writer_max_batch_size)
+
+        if stale_writer is not None:
+            # its connection would otherwise hold on to the database next to the
+            # new writer's
+            await stale_writer.close()
+
+    return writer
+
+
+def get_db_engine_stats():
+    stats = {"mode": sqlite_storage_mode, "pool": pool.stats()}
+
+    if is_single_writer_mode():
+        stats["read_pool"] = read_pool.stats()
+        stats["writer"] = writer.stats() if writer is not None else None
+
+    return stats
+
+
+async def close_db_pool():
+    global writer
+
+    await pool.close()
+    await read_pool.close()
+
+    if writer is not None:
+        await writer.close()
+        writer = None
 
 
 @asynccontextmanager
-async def get_new_db_connection():
+async def _pooled_connection(connection_pool: ConnectionPool):
     conn = None
+    discard = False
     try:
-        conn = await aiosqlite.connect(sqlite_db_path)
-        await conn.execute("PRAGMA synchronous=NORMAL;")
-        await conn.set_trace_callback(trace_callback)
+        conn = await connection_pool.checkout()
         yield conn
     except Exception as e:
         if conn:
-            await conn.rollback()  # Rollback on any exception
+            try:
+                await conn.rollback()  # Rollback on any exception
+            except Exception:
+                discard = True
         raise  # Re-raise the exception to propagate the error
     finally:
         if conn:
-            await conn.close()
+            await connection_pool.checkin(conn, discard=discard)
+
+
+@asynccontextmanager
+async def get_new_db_connection():
+    if is_single_writer_mode():
+        db_writer = await get_db_writer()
+        async with db_writer.session() as conn:
+            yield profile_connection(conn)
+        return
+
+    async with _pooled_connection(pool) as conn:
+        yield profile_connection(conn)
+
+
+@asynccontextmanager
+async def get_db_read_connection():
+    """Connection for code paths that only run SELECTs."""
+    if is_single_writer_mode():
+        async with _pooled_connection(read_pool) as conn:
+            yield profile_connection(conn)
+        return
+
+    async with get_new_db_connection() as conn:
+        yield conn
+
+
+READ_STATEMENT_VERBS = ("SELECT", "VALUES", "EXPLAIN")
+MAIN_STATEMENT_VERB_PATTERN = re.compile(
+    r"\b(SELECT|VALUES|INSERT|REPLACE|UPDATE|DELETE)\b"
+)
+
+
+def get_main_statement_verb(operation: str) -> str:
+    """
+    The verb of the statement itself: for `WITH` statements the first verb outside
+    of the parentheses and string literals of the common table expressions.
+    """
+    statement = operation.lstrip().upper()
+    if not statement.startswith("WITH"):
+        return statement.split(None, 1)[0] if statement else ""
+
+    top_level = []
+    depth = 0
+    quote = None
+    for char in statement:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', "`"):
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0:
+            top_level.append(char)
+
+    match = MAIN_STATEMENT_VERB_PATTERN.search("".join(top_level))
+    return match.group(1) if match else ""
+
+
+def is_read_query(operation: str) -> bool:
+    return get_main_statement_verb(operation) in READ_STATEMENT_VERBS
 
 
 def set_db_defaults():
@@ -42,6 +463,27 @@ def set_db_defaults():
         print("Defaults already set.")
 
 
+async def _run_db_operation(
+    cursor, operation, params, fetch_one, fetch_all, get_last_row_id
+):
+    if params:
+        await cursor.execute(operation, params)
+    else:
+        await cursor.execute(operation)
+
+    if fetch_one:
+        result = await cursor.fetchone()
+    elif fetch_all:
+        result = await cursor.fetchall()
+    else:
+        result = None
+
+    if get_last_row_id:
+        return cursor.lastrowid
+
+    return result
+
+
 async def execute_db_operation(
     operation,
     params=None,
@@ -49,30 +491,42 @@ async def execute_db_operation(
     fetch_all=False,
     get_last_row_id=False,
 ):
+    if is_single_writer_mode():
+        if is_read_query(operation):
+            async with get_db_read_connection() as conn:
+                cursor = await conn.cursor()
+                return await _run_db_operation(
+                    cursor, operation, params, fetch_one, fetch_all, get_last_row_id
+                )
+
+        db_writer = await get_db_writer()
+        return await db_writer.submit(
+            lambda cursor: _run_db_operation(
+                cursor, operation, params, fetch_one, fetch_all, get_last_row_id
+            )
+        )
+
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
 
-        if params:
-            await cursor.execute(operation, params)
-        else:
-            await cursor.execute(operation)
-
-        if fetch_one:
-            result = await cursor.fetchone()
-        elif fetch_all:
-            result = await cursor.fetchall()
-        else:
-            result = None
+        result = await _run_db_operation(
+            cursor, operation, params, fetch_one, fetch_all, get_last_row_id
+        )
 
         await conn.commit()
 
-        if get_last_row_id:
-            return cursor.lastrowid
-
         return result
 
 
 async def execute_many_db_operation(operation, params_list):
+    if is_single_writer_mode():
+
+        async def run_many(cursor):
+            await cursor.executemany(operation, params_list)
+
+        db_writer = await get_db_writer()
+        return await db_writer.submit(run_many)
+
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
 
@@ -86,6 +540,15 @@ async def execute_multiple_db_operations(commands_and_params: List[Tuple[str, Tu
     Each command is a tuple of (sql_command, params).
     All commands are executed in a single transaction.
     """
+    if is_single_writer_mode():
+
+        async def run_commands(cursor):
+            for command, params in commands_and_params:
+                await cursor.execute(command, params)
+
+        db_writer = await get_db_writer()
+        return await db_writer.submit(run_commands)
+
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
 
@@ -0,0 +1,141 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+def escape_json_pointer(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def is_settled(previous: Any, current: Any) -> bool:
+    """
+    Constant-time check for a value that comes before the latest change in the
+    document. Partial parsing has already moved past it, so it can only have been
+    replaced by a value of another type or have grown.
+    """
+    if type(previous) is not type(current):
+        return False
+
+    if isinstance(current, (str, list, dict)):
+        return len(previous) == len(current)
+
+    return previous == current
+
+
+def diff_json(
+    previous: Any,
+    current: Any,
+    path: str = "",
+    frontier: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    JSON-Patch style operations that turn `previous` into `current`, plus an "append"
+    op for strings that only grew, which is how partial LLM outputs evolve.
+
+    `frontier` holds the path segments of the latest change, if known. Values
+    before it in the document are only checked with `is_settled` and only the
+    subtree of the frontier and the values after it are diffed in full, so that
+    the cost of each diff does not grow with everything generated so far.
+    """
+    if frontier is None and previous == current:
+        return []
+
+    if isinstance(previous, dict) and isinstance(current, dict):
+        frontier_key = frontier[0] if frontier else None
+        if frontier_key is not None and not any(
+            escape_json_pointer(key) == frontier_key for key in current
+        ):
+            frontier_key = None
+
+        ops = []
+        before_frontier = frontier_key is not None
+        for key, value in current.items():
+            key_token = escape_json_pointer(key)
+            key_path = f"{path}/{key_token}"
+            is_frontier = before_frontier and key_token == frontier_key
+            if is_frontier:
+                before_frontier = False
+
+            if key not in previous:
+                ops.append({"op": "add", "path": key_path, "value": value})
+            elif is_frontier:
+                ops += diff_json(previous[key], value, key_path, frontier[1:])
+            elif not before_frontier or not is_settled(previous[key], value):
+                ops += diff_json(previous[key], value, key_path)
+
+        for key in previous:
+            if key not in current:
+                ops.append(
+                    {"op": "remove", "path": f"{path}/{escape_json_pointer(key)}"}
+                )
+
+        return ops
+
+    if (
+        isinstance(previous, list)
+        and isinstance(current, list)
+        and len(current) >= len(previous)
+    ):
+        frontier_index = None
+        if frontier and frontier[0].isdigit() and int(frontier[0]) < len(previous):
+            frontier_index = int(frontier[0])
+
+        ops = []
+        for index, value in enumerate(current):
+            index_path = f"{path}/{index}"
+            if index >= len(previous):
+                ops.append({"op": "add", "path": index_path, "value": value})
+            elif index == frontier_index:
+                ops += diff_json(previous[index], value, index_path, frontier[1:])
+            elif (
+                frontier_index is None
+                or index > frontier_index
+                or not is_settled(previous[index], value)
+            ):
+                ops += diff_json(previous[index], value, index_path)
+
+        return ops
+
+    if previous == current:
+        return []
+
+    if (
+        isinstance(previous, str)
+        and isinstance(current, str)
+        and current.startswith(previous)
+    ):
+        return [{"op": "append", "path": path, "value": current[len(previous) :]}]
+
+    return [{"op": "replace", "path": path, "value": current}]
+
+
+class JSONDeltaEncoder:
+    """
+    Encodes successive snapshots of a growing object as NDJSON lines holding only what
+    changed since the previous snapshot, followed by one full snapshot at the end so
+    that clients can verify or resync their reconstructed object.
+    """
+
+    def __init__(self):
+        self.last = None
+        self.started = False
+        # path segments of the latest change; partial outputs grow from there
+        self.frontier: List[str] = []
+
+    def encode(self, current: Dict) -> Optional[str]:
+        if not self.started:
+            self.started = True
+            ops = [{"op": "replace", "path": "", "value": current}]
+        else:
+            ops = diff_json(self.last, current, frontier=self.frontier)
+
+        self.last = current
+
+        if not ops:
+            return None
+
+        self.frontier = ops[-1]["path"].split("/")[1:]
+
+        return json.dumps({"type": "delta", "ops": ops}) + "\n"
+
+    def finish(self) -> str:
+        return json.dumps({"type": "snapshot", "value": self.last}) + "\n"
@@ -0,0 +1,513 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# markdown that has no counterpart among the blocks the editor supports or that
+# could be read more than one way; content using it is left to the LLM
+AMBIGUOUS_LINE_PATTERNS = [
+    (re.compile(r"^ {0,3}>"), "block quote"),
+    (re.compile(r"^\s*\|.*\|\s*$"), "table"),
+    (re.compile(r"^ {0,3}</?[A-Za-z!]"), "html"),
+    (re.compile(r"^ {0,3}\[[^\]]+\]:\s*\S"), "link reference definition"),
+]
+
+FENCE_PATTERN = re.compile(r"^( *)(`{3,}|~{3,})\s*([^`\s]*)[^`]*$")
+HEADING_PATTERN = re.compile(r"^ {0,3}(#{1,6})(?:\s+(.*?))?(?:\s+#+)?\s*$")
+SETEXT_PATTERN = re.compile(r"^ {0,3}(=+|-+)\s*$")
+THEMATIC_BREAK_PATTERN = re.compile(r"^ {0,3}([-*_])(?:\s*\1){2,}\s*$")
+LIST_ITEM_PATTERN = re.compile(r"^( *)([-*+]|\d{1,9}[.)])(?:( +)(.*))?$")
+CHECKBOX_PATTERN = re.compile(r"^\[([ xX])\](?: +(.*))?$")
+IMAGE_PATTERN = re.compile(r'^ {0,3}!\[([^\]]*)\]\(\s*<?([^\s>)]+)>?(?:\s+"[^"]*")?\s*\)\s*$')
+LINK_DESTINATION_PATTERN = re.compile(r'\(\s*<?([^\s>)]+)>?(?:\s+"[^"]*")?\s*\)')
+AUTOLINK_PATTERN = re.compile(r"<((?:https?|mailto):[^\s<>]+)>")
+
+# full names for the languages code blocks are most often tagged with
+CODE_LANGUAGE_ALIASES = {
+    "py": "python",
+    "python3": "python",
+    "js": "javascript",
+    "jsx": "javascript",
+    "ts": "typescript",
+    "tsx": "typescript",
+    "sh": "bash",
+    "shell": "bash",
+    "zsh": "bash",
+    "rb": "ruby",
+    "cs": "csharp",
+    "c#": "csharp",
+    "c++": "cpp",
+    "golang": "go",
+    "kt": "kotlin",
+    "rs": "rust",
+    "yml": "yaml",
+    "md": "markdown",
+}
+
+EMPHASIS_DELIMITERS = [
+    ("***", {"bold": True, "italic": True}),
+    ("___", {"bold": True, "italic": True}),
+    ("**", {"bold": True}),
+    ("__", {"bold": True}),
+    ("~~", {"strike": True}),
+    ("*", {"italic": True}),
+    ("_", {"italic": True}),
+]
+
+ESCAPABLE = set("\\`*_{}[]()#+-.!|~<>\"'")
+
+
+class AmbiguousMarkdownError(ValueError):
+    """Raised for markdown that cannot be converted to blocks unambiguously."""
+
+
+def get_text_item(text: str, styles: Dict) -> Dict:
+    return {"type": "text", "text": text, "styles": dict(styles)}
+
+
+def merge_text_items(items: List[Dict]) -> List[Dict]:
+    merged = []
+
+    for item in items:
+        if not item.get("text", True):
+            continue
+
+        if (
+            merged
+            and item["type"] == "text"
+            and merged[-1]["type"] == "text"
+            and merged[-1]["styles"] == item["styles"]
+        ):
+            merged[-1]["text"] += item["text"]
+        else:
+            merged.append(item)
+
+    return merged
+
+
+def find_closing_bracket(text: str, start: int) -> int:
+    """Index of the `]` matching the `[` at `start`, or -1."""
+    depth = 0
+    index = start
+
+    while index < len(text):
+        char = text[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+            if depth == 0:
+                return index
+        index += 1
+
+    return -1
+
+
+def find_closing_delimiter(text: str, delimiter: str, start: int) -> int:
+    """
+    Index of the delimiter closing an emphasis opened just before `start`, or -1.
+    A closing delimiter must follow a non-space character and, for `_`, must not be
+    inside a word.
+    """
+    index = start
+
+    while True:
+        index = text.find(delimiter, index)
+        if index == -1:
+            return -1
+
+        end = index + len(delimiter)
+        if (
+            index > start
+            and not text[index - 1].isspace()
+            and text[index - 1] != "\\"
+            and not (text[end : end + 1] == delimiter[0])
+            and not (delimiter[0] == "_" and text[end : end + 1].isalnum())
+        ):
+            return index
+
+        index += 1
+
+
+def parse_inline(
+    text: str, styles: Optional[Dict] = None, in_link: bool = False
+) -> List[Dict]:
+    """Convert inline markdown to the text and link items of a block."""
+    styles = styles or {}
+    items = []
+    buffer = []
+
+    def flush_buffer():
+        if buffer:
+            items.append(get_text_item("".join(buffer), styles))
+            buffer.clear()
+
+    index = 0
+    while index < len(text):
+        char = text[index]
+
+        if char == "\\" and index + 1 < len(text) and text[index + 1] in ESCAPABLE:
+            buffer.append(text[index + 1])
+            index += 2
+            continue
+
+        if char == "`":
+            run = len(re.match(r"`+", text[index:]).group())
+            closing = text.find("`" * run, index + run)
+            if closing != -1:
+                flush_buffer()
+                code = text[index + run : closing]
+                if code.startswith(" ") and code.endswith(" ") and code.strip():
+                    code = code[1:-1]
+                items.append(get_text_item(code, {**styles, "code": True}))
+                index = closing + run
+                continue
+
+            buffer.append(text[index : index + run])
+            index += run
+            continue
+
+        if char == "!" and text[index + 1 : index + 2] == "[":
+            raise AmbiguousMarkdownError("image inside text")
+
+        if char == "[":
+            closing = find_closing_bracket(text, index)
+            if closing != -1:
+                label = text[index + 1 : closing]
+                destination = LINK_DESTINATION_PATTERN.match(text, closing + 1)
+
+                if destination:
+                    if in_link:
+                        raise AmbiguousMarkdownError("link inside a link")
+
+                    flush_buffer()
+                    items.append(
+                        {
+                            "type": "link",
+                            "href": destination.group(1),
+                            "content": parse_inline(label, styles, in_link=True)
+                            or [get_text_item(destination.group(1), styles)],
+                        }
+                    )
+                    index = destination.end()
+                    continue
+
+                if label.startswith("^") or text[closing + 1 : closing + 2] == "[":
+                    raise AmbiguousMarkdownError("reference link or footnote")
+
+        if char == "<":
+            autolink = AUTOLINK_PATTERN.match(text, index)
+            if autolink:
+                flush_buffer()
+                items.append(
+                    {
+                        "type": "link",
+                        "href": autolink.group(1),
+                        "content": [get_text_item(autolink.group(1), styles)],
+                    }
+                )
+                index = autolink.end()
+                continue
+
+            if re.match(r"</?[A-Za-z][A-Za-z0-9-]*(\s[^>]*)?/?>", text[index:]):
+                raise AmbiguousMarkdownError("inline html")
+
+        if char in "*_~":
+            for delimiter, delimiter_styles in EMPHASIS_DELIMITERS:
+                if not text.startswith(delimiter, index):
+                    continue
+
+                start = index + len(delimiter)
+                # an opening delimiter is followed by text and, for `_`, not inside
+                # a word
+                if (
+                    start >= len(text)
+                    or text[start].isspace()
+                    or (
+                        delimiter[0] == "_"
+                        and index > 0
+                        and text[index - 1].isalnum()
+                    )
+                ):
+                    continue
+
+                closing = find_closing_delimiter(text, delimiter, start)
+                if closing == -1:
+                    continue
+
+                flush_buffer()
+                items.extend(
+                    parse_inline(
+                        text[start:closing], {**styles, **delimiter_styles}, in_link
+                    )
+                )
+                index = closing + len(delimiter)
+                break
+            else:
+                # no emphasis here; keep the whole run of delimiters as text
+                run = len(re.match(rf"\{char}+", text[index:]).group())
+                buffer.append(text[index : index + run])
+                index += run
+            continue
+
+        buffer.append(char)
+        index += 1
+
+    flush_buffer()
+    return merge_text_items(items)
+
+
+def get_block(block_type: str, props: Dict, content: List[Dict]) -> Dict:
+    return {"type": block_type, "props": props, "content": content, "children": []}
+
+
+def get_text_block(block_type: str, props: Dict, text: str) -> Dict:
+    return get_block(block_type, props, parse_inline(text))
+
+
+def get_code_block(language: str, lines: List[str]) -> Dict:
+    props = {"language": language} if language else {}
+    return get_block("codeBlock", props, [get_text_item("\n".join(lines), {})])
+
+
+def get_indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+class ListEntry:
+    def __init__(self, marker_indent: int, content_indent: int, block: Dict, text: str):
+        self.marker_indent = marker_indent
+        self.content_indent = content_indent
+        self.block = block
+        self.lines = [text]
+        self.children: List[Dict] = []
+
+
+class MarkdownBlockParser:
+    """
+    Converts markdown to editor blocks one line at a time. `feed` returns the
+    top-level blocks completed by each line, so content can be converted as it is
+    read. Raises `AmbiguousMarkdownError` for markdown it does not convert (block
+    quotes, tables, html, reference links, indented code and images inside text).
+
+    Supports headings, paragraphs, (nested) bullet, numbered and check lists, fenced
+    code blocks, images on their own line, links and bold, italic, strikethrough
+    and code text. Lines of a paragraph are kept as separate lines of one block and
+    thematic breaks are dropped.
+    """
+
+    def __init__(self):
+        self._paragraph: List[str] = []
+        self._lists: List[ListEntry] = []
+        self._code: Optional[Dict] = None
+        self._after_blank = False
+
+    def _close_paragraph(self) -> List[Dict]:
+        if not self._paragraph:
+            return []
+
+        text = "\n".join(line.strip() for line in self._paragraph)
+        self._paragraph = []
+        return [get_text_block("paragraph", {}, text)]
+
+    def _close_list_entry(self) -> List[Dict]:
+        entry = self._lists.pop()
+        entry.block["content"] = parse_inline(
+            "\n".join(line.strip() for line in entry.lines)
+        )
+        entry.block["children"] = entry.children
+
+        return [] if self._lists else [entry.block]
+
+    def _close_lists(self, marker_indent: int = -1) -> List[Dict]:
+        blocks = []
+        while self._lists and self._lists[-1].marker_indent >= marker_indent:
+            blocks.extend(self._close_list_entry())
+        return blocks
+
+    def _open_list_entry(self, marker_indent: int, content_indent: int, block: Dict, text: str):
+        entry = ListEntry(marker_indent, content_indent, block, text)
+
+        if self._lists:
+            self._lists[-1].children.append(block)
+
+        self._lists.append(entry)
+
+    def _open_list_item(self, match: re.Match) -> List[Dict]:
+        marker_indent = len(match.group(1))
+        marker = match.group(2)
+        text = match.group(4) or ""
+        content_indent = marker_indent + len(marker) + len(match.group(3) or " ")
+
+        blocks = self._close_lists(marker_indent)
+
+        checkbox = CHECKBOX_PATTERN.match(text) if marker in "-*+" else None
+        if checkbox:
+            block = get_block(
+                "checkListItem", {"checked": checkbox.group(1) != " "}, []
+            )
+            text = checkbox.group(2) or ""
+        elif marker in "-*+":
+            block = get_block("bulletListItem", {}, [])
+        else:
+            block = get_block("numberedListItem", {}, [])
+
+        self._open_list_entry(marker_indent, content_indent, block, text)
+        return blocks
+
+    def _feed_code(self, line: str) -> List[Dict]:
+        fence = self._code["fence"]
+        stripped = line.strip()
+
+        if (
+            stripped.startswith(fence)
+            and set(stripped) == {fence[0]}
+            and get_indent(line) < 4
+        ):
+            code = self._code
+            self._code = None
+            return [get_code_block(code["language"], code["lines"])]
+
+        # drop the indentation of the opening fence from each line
+        indent = min(self._code["indent"], get_indent(line))
+        self._code["lines"].append(line[indent:])
+        return []
+
+    def feed(self, line: str) -> List[Dict]:
+        line = line.rstrip("\r\n").replace("\t", "    ")
+
+        if self._code is not None:
+            return self._feed_code(line)
+
+        if not line.strip():
+            self._after_blank = True
+            if self._lists:
+                return []
+            return self._close_paragraph()
+
+        for pattern, construct in AMBIGUOUS_LINE_PATTERNS:
+            if pattern.match(line):
+                raise AmbiguousMarkdownError(construct)
+
+        after_blank = self._after_blank
+        self._after_blank = False
+        indent = get_indent(line)
+        list_item = LIST_ITEM_PATTERN.match(line)
+
+        # a thematic break made of dashes or asterisks also looks like a list item
+        if THEMATIC_BREAK_PATTERN.match(line) and not (
+            self._paragraph and SETEXT_PATTERN.match(line)
+        ):
+            list_item = None
+
+        if self._lists:
+            if list_item:
+                return self._open_list_item(list_item)
+
+            if FENCE_PATTERN.match(line) and indent > 0:
+                raise AmbiguousMarkdownError("code block inside a list")
+
+            if not after_blank and not (
+                FENCE_PATTERN.match(line)
+                or HEADING_PATTERN.match(line)
+                or IMAGE_PATTERN.match(line)
+                or THEMATIC_BREAK_PATTERN.match(line)
+            ):
+                # lazy continuation of the innermost item
+                self._lists[-1].lines.append(line)
+                return []
+
+            if after_blank and indent >= self._lists[0].content_indent:
+                # a further paragraph of the deepest item it is indented under
+                blocks = []
+                while indent < self._lists[-1].content_indent:
+                    blocks.extend(self._close_list_entry())
+
+                self._open_list_entry(
+                    indent, indent, get_block("paragraph", {}, []), line
+                )
+                return blocks
+
+            blocks = self._close_lists()
+            return blocks + self.feed(line)
+
+        fence = FENCE_PATTERN.match(line)
+        if fence and indent < 4:
+            blocks = self._close_paragraph()
+            language = fence.group(3).lower()
+            self._code = {
+                "fence": fence.group(2),
+                "indent": indent,
+                "language": CODE_LANGUAGE_ALIASES.get(language, language),
+                "lines": [],
+            }
+            return blocks
+
+        if indent >= 4 and not self._paragraph:
+            raise AmbiguousMarkdownError("indented code block")
+
+        setext = SETEXT_PATTERN.match(line)
+        if setext and self._paragraph:
+            text = "\n".join(line.strip() for line in self._paragraph)
+            self._paragraph = []
+            level = 1 if setext.group(1).startswith("=") else 2
+            return [get_text_block("heading", {"level": level}, text)]
+
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            blocks = self._close_paragraph()
+            # the editor has three heading levels
+            level = min(len(heading.group(1)), 3)
+            return blocks + [
+                get_text_block("heading", {"level": level}, heading.group(2) or "")
+            ]
+
+        if THEMATIC_BREAK_PATTERN.match(line):
+            return self._close_paragraph()
+
+        image = IMAGE_PATTERN.match(line)
+        if image:
+            blocks = self._close_paragraph()
+            return blocks + [
+                get_block(
+                    "image",
+                    {
+                        "name": image.group(1),
+                        "url": image.group(2),
+                        "showPreview": True,
+                        "caption": "",
+                        "previewWidth": 512,
+                    },
+                    [],
+                )
+            ]
+
+        if list_item and (list_item.group(4) or not self._paragraph):
+            blocks = self._close_paragraph()
+            return blocks + self._open_list_item(list_item)
+
+        self._paragraph.append(line)
+        return []
+
+    def close(self) -> List[Dict]:
+        if self._code is not None:
+            # an unclosed fence runs to the end of the content
+            code = self._code
+            self._code = None
+            return [get_code_block(code["language"], code["lines"])]
+
+        return self._close_lists() + self._close_paragraph()
+
+
+def iter_markdown_blocks(lines: Iterable[str]) -> Iterator[Dict]:
+    parser = MarkdownBlockParser()
+
+    for line in lines:
+        yield from parser.feed(line)
+
+    yield from parser.close()
+
+
+def convert_markdown_to_blocks(content: str) -> List[Dict]:
+    return list(iter_markdown_blocks(content.split("\n")))
@@ -0,0 +1,158 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from api.config import (
+    prompt_context_cache_max_entries,
+    prompt_context_cache_max_chars,
+    prompt_context_cache_ttl_seconds,
+)
+
+
+class PromptContextCache:
+    """
+    LRU cache of rendered prompt context strings.
+
+    Entries are keyed by the ids of the content they were rendered from along with
+    the current version of each id. Writers bump the version of whatever they modify
+    so that stale entries are never read again and simply age out of the LRU. Only
+    the versions of ids that cached entries were rendered from are kept, since
+    there is nothing stale to invalidate for the others.
+    Versions are tracked in-process, so entries also expire `ttl_seconds` after
+    being rendered: edits made through another process are picked up once the
+    entries rendered before them expire.
+    """
+
+    def __init__(self, max_entries: int, max_chars: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl_seconds = ttl_seconds
+        # values by key, along with the time they expire at
+        self._entries: OrderedDict[Tuple, Tuple[str, float]] = OrderedDict()
+        self._versions: Dict[Tuple[str, int], int] = {}
+        # number of cached entries rendered from each (kind, id)
+        self._ref_counts: Dict[Tuple[str, int], int] = defaultdict(int)
+        self._chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, kind: str, id: int) -> int:
+        return self._versions.get((kind, int(id)), 0)
+
+    def bump_version(self, kind: str, *ids: int):
+        for id in ids:
+            if id is None:
+                continue
+
+            ref = (kind, int(id))
+            if ref in self._ref_counts:
+                self._versions[ref] = self._versions.get(ref, 0) + 1
+
+    def _key(self, namespace: str, refs: Iterable[Tuple[str, int]]) -> Tuple:
+        return (namespace,) + tuple(
+            (kind, int(id), self.version(kind, id)) for kind, id in refs
+        )
+
+    def get(self, namespace: str, refs: Iterable[Tuple[str, int]]) -> Optional[str]:
+        key = self._key(namespace, refs)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[1] <= time.monotonic():
+            self._pop(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _hold(self, key: Tuple):
+        for kind, id, _ in key[1:]:
+            self._ref_counts[(kind, id)] += 1
+
+    def _release(self, key: Tuple):
+        for kind, id, _ in key[1:]:
+            ref = (kind, id)
+            self._ref_counts[ref] -= 1
+            if not self._ref_counts[ref]:
+                # no entry rendered from this id is left to be invalidated
+                del self._ref_counts[ref]
+                self._versions.pop(ref, None)
+
+    def _pop(self, key: Tuple) -> str:
+        value, _ = self._entries.pop(key)
+        self._chars -= len(value)
+        self._release(key)
+        return value
+
+    def set(self, namespace: str, refs: Iterable[Tuple[str, int]], value: str):
+        key = self._key(namespace, refs)
+
+        if len(value) > self.max_chars:
+            if key in self._entries:
+                self._pop(key)
+            return
+
+        # held before replacing an existing entry so that its versions are kept
+        self._hold(key)
+        if key in self._entries:
+            self._pop(key)
+
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._chars += len(value)
+
+        while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get_or_render(
+        self,
+        namespace: str,
+        refs: Iterable[Tuple[str, int]],
+        render: Callable[[], str],
+    ) -> str:
+        """
+        Return the cached rendering for the given (kind, id) refs at their current
+        versions, calling `render` and caching its result on a miss.
+        """
+        refs = list(refs)
+        value = self.get(namespace, refs)
+
+        if value is None:
+            value = render()
+            self.set(namespace, refs, value)
+
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._versions.clear()
+        self._ref_counts.clear()
+        self._chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "chars": self._chars,
+            "max_entries": self.max_entries,
+            "max_chars": self.max_chars,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+prompt_context_cache = PromptContextCache(
+    prompt_context_cache_max_entries,
+    prompt_context_cache_max_chars,
+    prompt_context_cache_ttl_seconds,
+)
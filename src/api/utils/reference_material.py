@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import Dict, Iterator, Tuple
+from api.config import (
+    reference_material_chunk_bytes,
+    reference_material_spool_max_bytes,
+    provider_file_ttl_seconds,
+)
+from api.db.provider_file import get_provider_file_id, store_provider_file_id
+from api.llm import get_openai_client
+from api.settings import settings
+from api.utils.logging import logger
+from api.utils.s3 import iter_file_chunks_from_s3
+
+
+def iter_reference_material_chunks(key: str) -> Iterator[bytes]:
+    if settings.s3_folder_name:
+        yield from iter_file_chunks_from_s3(key, reference_material_chunk_bytes)
+        return
+
+    with open(os.path.join(settings.local_upload_folder, key), "rb") as f:
+        while chunk := f.read(reference_material_chunk_bytes):
+            yield chunk
+
+
+def spool_reference_material(key: str) -> Tuple[str, tempfile.SpooledTemporaryFile]:
+    """
+    Copy a reference material into a temporary file, chunk by chunk, while hashing
+    it. Runs in a worker thread; returns the sha256 of the content and the file,
+    rewound.
+    """
+    content_hash = hashlib.sha256()
+    spooled = tempfile.SpooledTemporaryFile(max_size=reference_material_spool_max_bytes)
+
+    try:
+        for chunk in iter_reference_material_chunks(key):
+            content_hash.update(chunk)
+            spooled.write(chunk)
+    except Exception:
+        spooled.close()
+        raise
+
+    spooled.seek(0)
+    return content_hash.hexdigest(), spooled
+
+
+# uploads in progress in this process, so that concurrent requests for the same
+# material share one upload
+uploads_in_flight: Dict[str, asyncio.Future] = {}
+
+
+async def upload_reference_material(
+    content_hash: str, spooled: tempfile.SpooledTemporaryFile
+) -> str:
+    file = await get_openai_client(settings.openai_api_key).files.create(
+        file=(f"{content_hash}.pdf", spooled),
+        purpose="user_data",
+    )
+
+    await store_provider_file_id(content_hash, file.id, provider_file_ttl_seconds)
+    logger.info(f"Uploaded reference material {content_hash} as {file.id}")
+
+    return file.id
+
+
+async def ingest_reference_material(key: str) -> Tuple[str, str]:
+    """
+    Make the reference material stored under `key` available to the LLM provider.
+    The material is uploaded only if no unexpired upload with the same content
+    exists. Returns the content hash and the provider file id.
+    """
+    content_hash, spooled = await asyncio.to_thread(spool_reference_material, key)
+
+    try:
+        file_id = await get_provider_file_id(content_hash)
+        if file_id:
+            return content_hash, file_id
+
+        upload = uploads_in_flight.get(content_hash)
+        if upload is None:
+            upload = asyncio.ensure_future(
+                upload_reference_material(content_hash, spooled)
+            )
+            uploads_in_flight[content_hash] = upload
+
+            def on_uploaded(_, spooled=spooled):
+                uploads_in_flight.pop(content_hash, None)
+                spooled.close()
+
+            # the upload owns the file now, even if this caller goes away
+            upload.add_done_callback(on_uploaded)
+            spooled = None
+    finally:
+        if spooled is not None:
+            spooled.close()
+
+    return content_hash, await asyncio.shield(upload)
+
+
+async def get_reference_material_file_id(job_details: Dict) -> str:
+    """
+    Provider file id of the reference material of a generation job, uploading the
+    material again if the upload it was created with has expired.
+    """
+    content_hash = job_details.get("reference_material_hash")
+
+    # jobs created before uploads were deduplicated only know their file id
+    if not content_hash:
+        return job_details["openai_file_id"]
+
+    file_id = await get_provider_file_id(content_hash)
+    if file_id:
+        return file_id
+
+    _, file_id = await ingest_reference_material(
+        job_details["reference_material_s3_key"]
+    )
+    return file_id
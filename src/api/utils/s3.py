@@ -1,6 +1,7 @@
 import os
 from os.path import join
 import uuid
+from typing import Iterator
 import boto3
 import boto3.session
 from api.settings import settings
@@ -73,6 +74,18 @@ def download_file_from_s3_as_bytes(key: str):
     return response["Body"].read()
 
 
+def iter_file_chunks_from_s3(key: str, chunk_size: int) -> Iterator[bytes]:
+    """
+    Download a file from S3 bucket in chunks of `chunk_size` bytes
+    """
+    bucket_name = settings.s3_bucket_name
+    session = boto3.Session()
+    s3_client = session.client("s3")
+
+    response = s3_client.get_object(Bucket=bucket_name, Key=key)
+    yield from response["Body"].iter_chunks(chunk_size)
+
+
 def generate_s3_uuid():
     return str(uuid.uuid4())
 
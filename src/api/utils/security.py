@@ -3,6 +3,7 @@ from typing import List, Dict, Optional
 from fastapi.security import OAuth2PasswordBearer
 from api.db.user import get_user_role_in_org
 from api.utils.db import get_new_db_connection
+from api.settings import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -43,4 +44,14 @@ def role_checker(allowed_roles: List[str]):
                 detail="You do not have permission to perform this action."
             )
         return user_id, org_id # Return user_id and org_id for use in the route
-    return check_roles
\ No newline at end of file
+    return check_roles
+
+async def require_platform_operator(user: Dict = Depends(get_current_user)) -> int:
+    # platform operators are configured per deployment and are independent of any org role
+    user_id = user.get("id")
+    if user_id not in settings.platform_operator_user_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action."
+        )
+    return user_id
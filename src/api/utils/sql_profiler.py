@@ -0,0 +1,287 @@
+import random
+import re
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from api.config import (
+    sql_profiler_sample_rate,
+    sql_slow_query_threshold_ms,
+    sql_profiler_max_fingerprints,
+)
+from api.utils.logging import logger
+
+# upper bounds (in ms) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+DB_MODULE_PATTERN = re.compile(r"(^|\.)api\.db(\.|$)")
+
+
+def fingerprint_sql(sql: str) -> str:
+    """Normalise a statement so that queries differing only in literals group together."""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\s+", " ", sql).strip()
+    # collapse IN (?, ?, ?) lists of any length
+    return re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?, ...)", sql)
+
+
+def find_db_caller() -> Optional[str]:
+    """Name of the innermost api.db function on the current call stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if DB_MODULE_PATTERN.search(module):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+
+    return None
+
+
+class StatementStats:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.callers = Counter()
+
+    def add(self, duration_ms: float, rows: Optional[int], caller: Optional[str]):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        if rows is not None and rows > 0:
+            self.rows += rows
+
+        bucket = len(LATENCY_BUCKETS_MS)
+        for index, upper_bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms < upper_bound:
+                bucket = index
+                break
+        self.buckets[bucket] += 1
+
+        if caller:
+            self.callers[caller] += 1
+
+    def to_dict(self) -> Dict:
+        bucket_labels = [f"<{bound}ms" for bound in LATENCY_BUCKETS_MS] + [
+            f">={LATENCY_BUCKETS_MS[-1]}ms"
+        ]
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "histogram": dict(zip(bucket_labels, self.buckets)),
+            "callers": dict(self.callers.most_common(5)),
+        }
+
+
+class SQLProfiler:
+    """
+    Collects per-statement timings into in-memory histograms for a sampled fraction
+    of db connection checkouts, and optionally logs every statement slower than a
+    threshold. Profiling is off unless a sample rate or threshold is configured.
+    """
+
+    sort_keys = {
+        "total": lambda stats: stats.total_ms,
+        "count": lambda stats: stats.count,
+        "max": lambda stats: stats.max_ms,
+        "avg": lambda stats: stats.total_ms / stats.count,
+    }
+
+    def __init__(
+        self,
+        sample_rate: float,
+        slow_query_threshold_ms: Optional[float],
+        max_fingerprints: int,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_query_threshold_ms = slow_query_threshold_ms
+        self.max_fingerprints = max_fingerprints
+        self.statements: Dict[str, StatementStats] = {}
+        self.num_dropped = 0
+
+    @property
+    def is_active(self) -> bool:
+        return self.sample_rate > 0 or self.slow_query_threshold_ms is not None
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def configure(
+        self,
+        sample_rate: Optional[float] = None,
+        slow_query_threshold_ms: Optional[float] = None,
+        disable_slow_query_log: bool = False,
+    ):
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+        if disable_slow_query_log:
+            self.slow_query_threshold_ms = None
+        elif slow_query_threshold_ms is not None:
+            self.slow_query_threshold_ms = slow_query_threshold_ms
+
+    def observe(
+        self, sql: str, duration_ms: float, rows: Optional[int], sampled: bool
+    ):
+        is_slow = (
+            self.slow_query_threshold_ms is not None
+            and duration_ms >= self.slow_query_threshold_ms
+        )
+        if not sampled and not is_slow:
+            return
+
+        fingerprint = fingerprint_sql(sql)
+        caller = find_db_caller()
+
+        if is_slow:
+            logger.warning(
+                f"Slow query ({duration_ms:.1f} ms, rows={rows}, caller={caller}): {fingerprint}"
+            )
+
+        if not sampled:
+            return
+
+        stats = self.statements.get(fingerprint)
+        if stats is None:
+            if len(self.statements) >= self.max_fingerprints:
+                self.num_dropped += 1
+                return
+
+            stats = self.statements[fingerprint] = StatementStats(fingerprint)
+
+        stats.add(duration_ms, rows, caller)
+
+    def report(self, top_n: int = 20, sort_by: str = "total") -> Dict:
+        ranked: List[StatementStats] = sorted(
+            self.statements.values(), key=self.sort_keys[sort_by], reverse=True
+        )
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_query_threshold_ms": self.slow_query_threshold_ms,
+            "num_fingerprints": len(self.statements),
+            "num_dropped": self.num_dropped,
+            "statements": [stats.to_dict() for stats in ranked[:top_n]],
+        }
+
+    def reset(self):
+        self.statements = {}
+        self.num_dropped = 0
+
+
+profiler = SQLProfiler(
+    sql_profiler_sample_rate,
+    sql_slow_query_threshold_ms,
+    sql_profiler_max_fingerprints,
+)
+
+
+class ProfiledCursor:
+    """Times the statements run through an aiosqlite cursor and reports them to the profiler."""
+
+    def __init__(self, cursor, sampled: bool):
+        self._cursor = cursor
+        self._sampled = sampled
+        # reads are reported once their rows have been fetched
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _report_pending(self, rows: Optional[int], extra_ms: float = 0):
+        if self._pending is None:
+            return
+
+        sql, duration_ms = self._pending
+        self._pending = None
+        profiler.observe(sql, duration_ms + extra_ms, rows, self._sampled)
+
+    async def _timed(self, sql: str, run):
+        self._report_pending(None)
+
+        start = time.perf_counter()
+        await run()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        if self._cursor.description is not None:
+            self._pending = (sql, duration_ms)
+        else:
+            rows = self._cursor.rowcount
+            profiler.observe(
+                sql, duration_ms, rows if rows >= 0 else None, self._sampled
+            )
+
+        return self
+
+    async def execute(self, sql: str, parameters=None):
+        return await self._timed(sql, lambda: self._cursor.execute(sql, parameters))
+
+    async def executemany(self, sql: str, parameters):
+        return await self._timed(
+            sql, lambda: self._cursor.executemany(sql, parameters)
+        )
+
+    async def _timed_fetch(self, fetch):
+        start = time.perf_counter()
+        result = await fetch()
+        extra_ms = (time.perf_counter() - start) * 1000
+
+        if isinstance(result, list):
+            rows = len(result)
+        else:
+            rows = 0 if result is None else 1
+        self._report_pending(rows, extra_ms)
+
+        return result
+
+    async def fetchone(self):
+        return await self._timed_fetch(self._cursor.fetchone)
+
+    async def fetchall(self):
+        return await self._timed_fetch(self._cursor.fetchall)
+
+    async def fetchmany(self, size=None):
+        return await self._timed_fetch(lambda: self._cursor.fetchmany(size))
+
+    async def close(self):
+        self._report_pending(None)
+        await self._cursor.close()
+
+
+class ProfiledConnection:
+    """Hands out ProfiledCursors while delegating everything else to the aiosqlite connection."""
+
+    def __init__(self, conn, sampled: bool):
+        self._conn = conn
+        self._sampled = sampled
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    async def cursor(self):
+        return ProfiledCursor(await self._conn.cursor(), self._sampled)
+
+    async def execute(self, sql: str, parameters=None):
+        cursor = await self.cursor()
+        return await cursor.execute(sql, parameters)
+
+
+def profile_connection(conn):
+    if not profiler.is_active:
+        return conn
+
+    return ProfiledConnection(conn, profiler.should_sample())
+
+
+def profile_cursor(cursor):
+    if not profiler.is_active:
+        return cursor
+
+    return ProfiledCursor(cursor, profiler.should_sample())
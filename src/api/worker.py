@@ -0,0 +1,33 @@
+import asyncio
+import signal
+from api.generation_worker import generation_worker
+from api.utils.db import close_db_pool
+from api.llm import close_llm_clients
+from api.utils.logging import logger
+from api.ws_manager import manager as websocket_manager
+
+
+async def main():
+    stopped = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+
+    # generation progress is published to the API processes through the event bus
+    await websocket_manager.start(receive=False)
+    generation_worker.start()
+    await stopped.wait()
+
+    logger.info(f"Stopping generation worker {generation_worker.worker_id}")
+    await generation_worker.stop()
+    await websocket_manager.stop()
+    await close_db_pool()
+    await close_llm_clients()
+
+
+if __name__ == "__main__":
+    # run the course generation jobs outside the API processes; set
+    # generation_worker_mode to "external" so that the API does not run them too,
+    # and websocket_event_bus to "sqlite" so that their progress reaches the clients
+    asyncio.run(main())
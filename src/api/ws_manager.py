@@ -1,60 +1,374 @@
-from typing import Dict, Set
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.routing import APIRouter
+from api.config import (
+    websocket_send_timeout_seconds,
+    websocket_queue_max_messages,
+    websocket_replay_buffer_size,
+    websocket_replay_max_courses,
+    websocket_replay_coalesce_seconds,
+    websocket_coalesced_replay_protocol_version,
+)
+from api.event_bus import EventBus, InProcessEventBus, create_event_bus
+from api.utils.logging import logger
 
 router = APIRouter(prefix="/ws")
 
+# close code sent to clients that are evicted for not keeping up (try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# evicted clients being closed, kept until the close finishes so that it is not
+# garbage collected midway
+closing_connections: Dict["ClientConnection", asyncio.Task] = {}
+
+
+class ClientConnection:
+    """
+    A connected client with its own bounded queue of outgoing messages, sent by a
+    dedicated task so that a slow client never delays the others.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_closed: Callable[["ClientConnection"], None],
+        send_timeout: float,
+        max_messages: int,
+    ):
+        self.websocket = websocket
+        self.on_closed = on_closed
+        self.send_timeout = send_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_messages)
+        self.sender = asyncio.create_task(self.send_messages())
+
+    def enqueue(self, message: str) -> bool:
+        """Queue a serialized message; returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+
+        return True
+
+    async def send_messages(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_text(message), self.send_timeout
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exception:
+            logger.warning(f"Dropping websocket client after failed send: {exception}")
+            self.on_closed(self)
+            await self.close()
+
+    async def close(self, code: int = 1000):
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=code), self.send_timeout
+            )
+        except Exception:
+            # the client is already gone
+            pass
+
+    def stop(self):
+        self.sender.cancel()
+
+    def evict(self):
+        """Drop a client that does not keep up with the messages sent to it."""
+        self.stop()
+        task = asyncio.create_task(self.close(SLOW_CONSUMER_CLOSE_CODE))
+        closing_connections[self] = task
+        task.add_done_callback(lambda _: closing_connections.pop(self, None))
+
+
+def serialize(item_data: Dict) -> str:
+    return json.dumps(item_data, separators=(",", ":"), ensure_ascii=False)
+
+
+class BufferedEvent:
+    def __init__(
+        self,
+        seq: int,
+        item_data: Dict,
+        message: str,
+        created_at: float,
+        originals: List[Tuple[int, str]],
+    ):
+        self.seq = seq
+        self.item_data = item_data
+        self.message = message
+        # when the first of the events coalesced into this one was buffered
+        self.created_at = created_at
+        # seq and message of each event coalesced into this one, for older clients
+        self.originals = originals
+
+
+class CourseEventBuffer:
+    """
+    The latest events of a course, in sequence order, for clients that resume
+    after missing some of them. Consecutive task_completed events that arrive
+    within `coalesce_seconds` of each other are replayed as one event listing all
+    their tasks to clients that support it.
+    """
+
+    def __init__(self, truncated_at: int, max_events: int, coalesce_seconds: float):
+        self.events: deque = deque(maxlen=max_events)
+        # sequence number up to which events of the course may be missing
+        self.truncated_at = truncated_at
+        self.coalesce_seconds = coalesce_seconds
+
+    @property
+    def last_seq(self) -> int:
+        return self.events[-1].seq if self.events else self.truncated_at
+
+    def coalesce(self, seq: int, item_data: Dict, message: str, now: float) -> bool:
+        if item_data.get("event") != "task_completed" or not self.events:
+            return False
+
+        last = self.events[-1]
+        if last.item_data.get("event") != "task_completed":
+            return False
+
+        if now - last.created_at > self.coalesce_seconds:
+            return False
+
+        tasks = last.item_data.get("tasks", [last.item_data["task"]])
+        coalesced = {**item_data, "tasks": tasks + [item_data["task"]]}
+        self.events[-1] = BufferedEvent(
+            seq,
+            coalesced,
+            serialize(coalesced),
+            last.created_at,
+            last.originals + [(seq, message)],
+        )
+        return True
+
+    def add(self, seq: int, item_data: Dict, message: str):
+        now = time.monotonic()
+        if self.coalesce(seq, item_data, message, now):
+            return
+
+        if len(self.events) == self.events.maxlen:
+            self.truncated_at = self.events[0].seq
+
+        self.events.append(
+            BufferedEvent(seq, item_data, message, now, [(seq, message)])
+        )
+
+    def get_events_since(self, seq: int, coalesced: bool) -> Optional[List[str]]:
+        """
+        The events after `seq`, or None if some of them are no longer buffered.
+        Without `coalesced`, the events coalesced together are returned one by one.
+        """
+        if seq < self.truncated_at:
+            return None
+
+        if coalesced:
+            return [event.message for event in self.events if event.seq > seq]
+
+        return [
+            message
+            for event in self.events
+            if event.seq > seq
+            for original_seq, message in event.originals
+            if original_seq > seq
+        ]
+
 
 # WebSocket connection manager to handle multiple client connections
 class ConnectionManager:
-    def __init__(self):
-        # Dictionary to store WebSocket connections by course_id
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
+    def __init__(
+        self,
+        bus: Optional[EventBus] = None,
+        send_timeout: float = websocket_send_timeout_seconds,
+        max_messages: int = websocket_queue_max_messages,
+        replay_buffer_size: int = websocket_replay_buffer_size,
+        replay_max_courses: int = websocket_replay_max_courses,
+        replay_coalesce_seconds: float = websocket_replay_coalesce_seconds,
+    ):
+        # carries updates between the processes that publish them and the
+        # processes the clients are connected to
+        self.bus = bus or InProcessEventBus()
+        self.send_timeout = send_timeout
+        self.max_messages = max_messages
+        self.replay_buffer_size = replay_buffer_size
+        self.replay_max_courses = replay_max_courses
+        self.replay_coalesce_seconds = replay_coalesce_seconds
+        # connections of each course_id by their websocket
+        self.active_connections: Dict[int, Dict[WebSocket, ClientConnection]] = {}
+        # recent events of each course, least recently updated course first
+        self.event_buffers: OrderedDict[int, CourseEventBuffer] = OrderedDict()
+        # sequence number up to which events of courses without a buffer may be
+        # missing: the latest event before this process started, or the latest
+        # event of a buffer dropped to make room for other courses
+        self.truncated_at = 0
+        self.last_seq = 0
 
-    async def connect(self, websocket: WebSocket, course_id: int):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        course_id: int,
+        since: Optional[int] = None,
+        protocol: int = 1,
+    ):
+        """
+        Accept a client. A client resuming after having received the events up to
+        `since` is first sent the events it missed, or a resync_required event if
+        they are no longer available, in which case it should re-fetch the course.
+        Only clients passing a recent enough `protocol` are sent coalesced events.
+        """
         await websocket.accept()
-        if course_id not in self.active_connections:
-            self.active_connections[course_id] = set()
-        self.active_connections[course_id].add(websocket)
+
+        connection = ClientConnection(
+            websocket,
+            lambda connection: self.remove(connection, course_id),
+            self.send_timeout,
+            self.max_messages,
+        )
+
+        # no event can be delivered between the replay and registering the client
+        if since is not None:
+            messages = self.get_events_since(course_id, since, protocol)
+
+            if messages is None or len(messages) > self.max_messages:
+                messages = [
+                    serialize({"event": "resync_required", "seq": self.last_seq})
+                ]
+
+            for message in messages:
+                connection.enqueue(message)
+
+        self.active_connections.setdefault(course_id, {})[websocket] = connection
+
+    def get_events_since(
+        self, course_id: int, seq: int, protocol: int = 1
+    ) -> Optional[List[str]]:
+        # a number from after the latest event comes from before a restart or from
+        # a process that has read further than this one
+        if seq > self.last_seq:
+            return None
+
+        buffer = self.event_buffers.get(course_id)
+        if buffer is None:
+            return [] if seq >= self.truncated_at else None
+
+        return buffer.get_events_since(
+            seq, protocol >= websocket_coalesced_replay_protocol_version
+        )
+
+    def buffer_event(self, seq: int, course_id: int, item_data: Dict, message: str):
+        buffer = self.event_buffers.get(course_id)
+
+        if buffer is None:
+            buffer = CourseEventBuffer(
+                self.truncated_at,
+                self.replay_buffer_size,
+                self.replay_coalesce_seconds,
+            )
+            self.event_buffers[course_id] = buffer
+
+            if len(self.event_buffers) > self.replay_max_courses:
+                _, dropped = self.event_buffers.popitem(last=False)
+                self.truncated_at = max(self.truncated_at, dropped.last_seq)
+        else:
+            self.event_buffers.move_to_end(course_id)
+
+        buffer.add(seq, item_data, message)
+
+    def remove(self, connection: ClientConnection, course_id: int):
+        connections = self.active_connections.get(course_id)
+        if not connections or connections.get(connection.websocket) is not connection:
+            return
+
+        del connections[connection.websocket]
+        if not connections:
+            del self.active_connections[course_id]
 
     def disconnect(self, websocket: WebSocket, course_id: int):
-        if course_id in self.active_connections:
-            self.active_connections[course_id].discard(websocket)
-            if not self.active_connections[course_id]:
-                del self.active_connections[course_id]
+        connection = self.active_connections.get(course_id, {}).get(websocket)
+        if connection is None:
+            return
 
-    async def send_item_update(self, course_id: int, item_data: Dict):
-        if course_id in self.active_connections:
-            disconnected_websockets = set()
-            for websocket in self.active_connections[course_id]:
-                try:
-                    await websocket.send_json(item_data)
-                except Exception as exception:
-                    print(exception)
+        self.remove(connection, course_id)
+        connection.stop()
+
+    async def start(self, receive: bool = True):
+        """
+        Start the event bus; processes without websocket clients (e.g. generation
+        workers) only publish and pass `receive=False`.
+        """
+        self.last_seq = await self.bus.start(self.deliver if receive else None)
+        self.truncated_at = self.last_seq
+        self.event_buffers.clear()
+
+    async def stop(self):
+        await self.bus.stop()
 
-                    # Mark for removal if sending fails
-                    disconnected_websockets.add(websocket)
+    def publish(self, course_id: int, item_data: Dict):
+        """
+        Publish an update to every client of the course, in any process, without
+        waiting for any of them. Each process serializes the update once for all of
+        its clients.
+        """
+        self.bus.publish(course_id, serialize(item_data))
 
-            # Remove disconnected websockets
-            for websocket in disconnected_websockets:
-                self.disconnect(websocket, course_id)
+    def deliver(self, seq: int, course_id: int, payload: str):
+        """
+        Buffer an update for replay and queue it, with its sequence number, for the
+        clients of the course connected to this process; clients whose queue is full
+        are evicted.
+        """
+        item_data = {**json.loads(payload), "seq": seq}
+        message = serialize(item_data)
+        self.last_seq = max(self.last_seq, seq)
+        self.buffer_event(seq, course_id, item_data, message)
+
+        connections = self.active_connections.get(course_id)
+        if not connections:
+            return
+
+        for connection in list(connections.values()):
+            if not connection.enqueue(message):
+                logger.warning(
+                    f"Evicting slow websocket client of course {course_id}"
+                )
+                self.remove(connection, course_id)
+                connection.evict()
+
+    async def send_item_update(self, course_id: int, item_data: Dict):
+        self.publish(course_id, item_data)
 
 
 # Create a connection manager instance
-manager = ConnectionManager()
+manager = ConnectionManager(create_event_bus())
 
 
 # WebSocket endpoint for course generation updates
 @router.websocket("/course/{course_id}/generation")
-async def websocket_course_generation(websocket: WebSocket, course_id: int):
-    try:
-        await manager.connect(websocket, course_id)
+async def websocket_course_generation(
+    websocket: WebSocket,
+    course_id: int,
+    since: Optional[int] = None,
+    protocol: int = 1,
+):
+    # clients pass the seq of the last event they received to resume after it
+    await manager.connect(websocket, course_id, since, protocol)
 
+    try:
         # Keep the connection alive until client disconnects
         while True:
             # Wait for any message from the client to detect disconnection
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, course_id)
 
 
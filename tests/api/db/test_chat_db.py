@@ -11,6 +11,8 @@ from src.api.db.chat import (
     update_message_timestamp,
     delete_user_chat_history_for_task,
     delete_all_chat_history,
+    get_chat_history_summary,
+    upsert_chat_history_summary,
 )
 from src.api.models import StoreMessageRequest, TaskType
 
@@ -292,3 +294,31 @@ class TestChatMessageOperations:
         await delete_all_chat_history()
 
         mock_execute.assert_called_once_with("DELETE FROM chat_history")
+
+
+@pytest.mark.asyncio
+class TestChatHistorySummary:
+    """Test the rolling chat history summary storage."""
+
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_get_chat_history_summary(self, mock_execute):
+        mock_execute.return_value = ("summary", 8)
+
+        result = await get_chat_history_summary(5, 3)
+
+        assert result == {"summary": "summary", "summarized_until_id": 8}
+        assert mock_execute.call_args[0][1] == (5, 3)
+
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_get_chat_history_summary_missing(self, mock_execute):
+        mock_execute.return_value = None
+
+        assert await get_chat_history_summary(5, 3) is None
+
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_upsert_chat_history_summary(self, mock_execute):
+        await upsert_chat_history_summary(5, 3, "summary", 8)
+
+        query, params = mock_execute.call_args[0]
+        assert "ON CONFLICT(user_id, question_id) DO UPDATE" in query
+        assert params == (3, 5, "summary", 8)
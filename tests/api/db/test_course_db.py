@@ -1,6 +1,6 @@
 import pytest
 import json
-from unittest.mock import patch, AsyncMock, MagicMock, ANY, call
+from unittest.mock import patch, AsyncMock, MagicMock, PropertyMock, ANY, call
 from datetime import datetime, timezone, timedelta
 from collections import defaultdict
 from src.api.db.course import (
@@ -14,6 +14,7 @@ from src.api.db.course import (
     get_tasks_for_course,
     get_milestones_for_course,
     add_milestone_to_course,
+    add_milestones_and_draft_tasks_to_course,
     update_milestone_orders,
     swap_milestone_ordering_for_course,
     swap_task_ordering_for_course,
@@ -25,7 +26,6 @@ from src.api.db.course import (
     get_course_generation_job_details,
     update_course_generation_job_status,
     update_course_generation_job_status_and_details,
-    get_all_pending_course_structure_generation_jobs,
     add_course_modules,
     transfer_course_to_org,
     duplicate_course_to_org,
@@ -388,6 +388,48 @@ class TestMilestoneOperations:
         assert milestone_id == 123
         assert ordering == 6
 
+    @patch("src.api.db.course.get_org_id_for_course")
+    @patch("src.api.db.course.get_new_db_connection")
+    async def test_add_milestones_and_draft_tasks_to_course(
+        self, mock_connection, mock_get_org
+    ):
+        """Test adding a batch of milestones and draft tasks in one transaction."""
+        mock_get_org.return_value = 1
+        mock_cursor = AsyncMock()
+        type(mock_cursor).lastrowid = PropertyMock(side_effect=[10, 20, 21, 22])
+        mock_cursor.fetchone.return_value = (2,)  # max milestone ordering
+        # existing milestone 5 has 4 tasks, one of them deleted
+        mock_cursor.fetchall.return_value = [(5, 4, 3)]
+        mock_conn = AsyncMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connection.return_value.__aenter__.return_value = mock_conn
+
+        milestones, tasks = await add_milestones_and_draft_tasks_to_course(
+            1,
+            [{"name": "Module", "color": "#123456"}],
+            [
+                {"title": "Old", "type": TaskType.QUIZ, "milestone_id": 5},
+                {
+                    "title": "New 1",
+                    "type": TaskType.LEARNING_MATERIAL,
+                    "milestone_id": None,
+                    "milestone_index": 0,
+                },
+                {"title": "New 2", "type": TaskType.QUIZ, "milestone_index": 0},
+            ],
+        )
+
+        assert milestones == [(10, 3)]
+        assert tasks == [(20, 3), (21, 0), (22, 1)]
+        mock_conn.commit.assert_called_once()
+
+        course_task_inserts = [
+            call.args[1]
+            for call in mock_cursor.execute.call_args_list
+            if "INSERT INTO course_tasks" in call.args[0]
+        ]
+        assert course_task_inserts == [(1, 20, 5, 4), (1, 21, 10, 0), (1, 22, 10, 1)]
+
     @patch("src.api.db.course.execute_many_db_operation")
     async def test_update_milestone_orders(self, mock_execute_many):
         """Test updating milestone orders."""
@@ -548,7 +590,7 @@ class TestCourseGeneration:
         assert isinstance(result, str)
         mock_cursor.execute.assert_called_once()
 
-    @patch("src.api.db.course.get_new_db_connection")
+    @patch("src.api.db.course.get_db_read_connection")
     async def test_get_course_generation_job_details_success(self, mock_connection):
         """Test getting course generation job details successfully."""
         mock_cursor = AsyncMock()
@@ -561,7 +603,7 @@ class TestCourseGeneration:
 
         assert result == {"prompt": "Generate course"}
 
-    @patch("src.api.db.course.get_new_db_connection")
+    @patch("src.api.db.course.get_db_read_connection")
     async def test_get_course_generation_job_details_not_found(self, mock_connection):
         """Test getting course generation job details when not found."""
         mock_cursor = AsyncMock()
@@ -604,30 +646,6 @@ class TestCourseGeneration:
 
         mock_cursor.execute.assert_called_once()
 
-    @patch("src.api.db.course.get_new_db_connection")
-    async def test_get_all_pending_course_structure_generation_jobs(
-        self, mock_connection
-    ):
-        """Test getting all pending course generation jobs."""
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchall.return_value = [
-            ("uuid1", 1, '{"prompt": "Course 1"}'),
-            ("uuid2", 2, '{"prompt": "Course 2"}'),
-        ]
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connection.return_value.__aenter__.return_value = mock_conn
-
-        result = await get_all_pending_course_structure_generation_jobs()
-
-        expected = [
-            {"uuid": "uuid1", "course_id": 1, "job_details": {"prompt": "Course 1"}},
-            {"uuid": "uuid2", "course_id": 2, "job_details": {"prompt": "Course 2"}},
-        ]
-
-        assert result == expected
-
-
 @pytest.mark.asyncio
 class TestCourseModules:
     """Test course module operations."""
@@ -681,20 +699,18 @@ class TestCourseTransfer:
     @patch("src.api.db.course.create_course")
     @patch("src.api.db.course.add_milestone_to_course")
     @patch("src.api.db.course.create_draft_task_for_course")
-    @patch("src.api.db.course.get_task")
+    @patch("src.api.db.course.get_tasks_bulk")
     @patch("src.api.db.course.update_learning_material_task")
     @patch("src.api.db.course.update_draft_quiz")
-    @patch("src.api.db.course.get_scorecard")
     @patch("src.api.db.course.create_scorecard")
     @patch("src.api.db.utils.execute_db_operation")
     async def test_duplicate_course_to_org(
         self,
         mock_execute_db_operation,
         mock_create_scorecard,
-        mock_get_scorecard,
         mock_update_quiz,
         mock_update_learning,
-        mock_get_task,
+        mock_get_tasks_bulk,
         mock_create_task,
         mock_add_milestone,
         mock_create_course,
@@ -769,6 +785,8 @@ class TestCourseTransfer:
             "title": "Original Scorecard",
             "criteria": [],
         }
+        for question in quiz_task["questions"]:
+            question["scorecard"] = original_scorecard
 
         new_scorecard = {"id": 123}
 
@@ -780,16 +798,26 @@ class TestCourseTransfer:
         mock_create_course.return_value = 456
         mock_add_milestone.return_value = (789, 0)
         mock_create_task.side_effect = [(10, None), (11, None)]
-        mock_get_task.side_effect = [learning_task, quiz_task]
-        mock_get_scorecard.return_value = original_scorecard
+        mock_get_tasks_bulk.return_value = {1: learning_task, 2: quiz_task}
         mock_create_scorecard.return_value = new_scorecard
 
         await duplicate_course_to_org(1, 999)
 
         mock_get_course.assert_called_once_with(1)
         mock_create_course.assert_called_once_with("Test Course", 999)
+        mock_get_tasks_bulk.assert_called_once_with([1, 2])
         mock_update_learning.assert_called_once()
         mock_update_quiz.assert_called_once()
+        # the shared scorecard is duplicated only once
+        mock_create_scorecard.assert_called_once()
+        assert mock_create_scorecard.call_args[0][0] == {
+            "title": "Original Scorecard",
+            "criteria": [],
+            "org_id": 999,
+        }
+        assert [
+            question["scorecard_id"] for question in quiz_task["questions"]
+        ] == [123, 123]
 
 
 @pytest.mark.asyncio
@@ -1067,7 +1095,7 @@ class TestMilestoneUnlockDates:
 class TestUserCourses:
     """Test user course operations."""
 
-    @patch("src.api.db.course.get_new_db_connection")
+    @patch("src.api.db.course.get_db_read_connection")
     @patch("src.api.db.course.get_user_cohorts")
     @patch("src.api.db.course.get_courses_for_cohort")
     @patch("src.api.db.course.get_user_organizations")
@@ -1121,7 +1149,7 @@ class TestUserCourses:
         assert result[1]["role"] == "mentor"
         assert result[2]["role"] == "admin"
 
-    @patch("src.api.db.course.get_new_db_connection")
+    @patch("src.api.db.course.get_db_read_connection")
     @patch("src.api.db.course.get_user_cohorts")
     @patch("src.api.db.course.get_user_organizations")
     async def test_get_user_courses_no_courses(
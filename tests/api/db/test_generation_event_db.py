@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import patch
+from src.api.db.generation_event import (
+    add_generation_events,
+    get_generation_events_after,
+    get_last_generation_event_id,
+    delete_generation_events_before,
+)
+
+
+@pytest.mark.asyncio
+class TestGenerationEventOperations:
+    """Test the table that carries generation events between processes."""
+
+    @patch("src.api.db.generation_event.time.time")
+    @patch("src.api.db.generation_event.execute_many_db_operation")
+    async def test_add_generation_events(self, mock_execute_many, mock_time):
+        """Test appending events in one batch."""
+        mock_time.return_value = 1000
+
+        await add_generation_events([(1, "first"), (2, "second")])
+
+        query, params = mock_execute_many.call_args.args
+        assert "INSERT INTO generation_events" in query
+        assert params == [(1, "first", 1000), (2, "second", 1000)]
+
+    @patch("src.api.db.generation_event.execute_db_operation")
+    async def test_get_generation_events_after(self, mock_execute):
+        """Test reading the events added after the last one seen."""
+        mock_execute.return_value = [(3, 1, "event")]
+
+        result = await get_generation_events_after(2, 100)
+
+        assert result == [(3, 1, "event")]
+        query, params = mock_execute.call_args.args
+        assert "WHERE id > ? ORDER BY id LIMIT ?" in query
+        assert params == (2, 100)
+
+    @patch("src.api.db.generation_event.execute_db_operation")
+    async def test_get_last_generation_event_id(self, mock_execute):
+        """Test getting the id of the latest event."""
+        mock_execute.return_value = (7,)
+
+        assert await get_last_generation_event_id() == 7
+
+    @patch("src.api.db.generation_event.execute_db_operation")
+    async def test_get_last_generation_event_id_without_events(self, mock_execute):
+        """Test that an empty table starts from 0."""
+        mock_execute.return_value = (None,)
+
+        assert await get_last_generation_event_id() == 0
+
+    @patch("src.api.db.generation_event.execute_db_operation")
+    async def test_delete_generation_events_before(self, mock_execute):
+        """Test pruning old events."""
+        await delete_generation_events_before(940)
+
+        query, params = mock_execute.call_args.args
+        assert "created_at < ?" in query
+        assert params == (940,)
@@ -0,0 +1,269 @@
+import json
+import pytest
+import aiosqlite
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+from src.api.db import (
+    create_task_generation_jobs_table,
+    create_task_generation_progress_table,
+    add_generation_job_lease_columns,
+)
+from src.api.db.generation_jobs import (
+    fail_expired_generation_jobs,
+    claim_generation_jobs,
+    renew_generation_job_lease,
+    fail_generation_job,
+)
+from src.api.config import (
+    task_generation_jobs_table_name as table_name,
+    task_generation_progress_table_name,
+)
+
+
+@pytest.fixture
+async def db_path(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async with aiosqlite.connect(path) as conn:
+        cursor = await conn.cursor()
+        await create_task_generation_jobs_table(cursor)
+        await add_generation_job_lease_columns(cursor, table_name)
+
+        for index in range(3):
+            await cursor.execute(
+                f"""INSERT INTO {table_name} (uuid, task_id, course_id, status, job_details)
+                VALUES (?, ?, ?, ?, ?)""",
+                (f"job-{index}", index, 1, "started", json.dumps({"index": index})),
+            )
+
+        await conn.commit()
+
+    @asynccontextmanager
+    async def get_connection():
+        async with aiosqlite.connect(path) as conn:
+            yield conn
+
+    with patch("src.api.db.generation_jobs.get_new_db_connection", get_connection):
+        yield path
+
+
+async def get_job(db_path, job_uuid):
+    async with aiosqlite.connect(db_path) as conn:
+        conn.row_factory = aiosqlite.Row
+        cursor = await conn.execute(
+            f"SELECT * FROM {table_name} WHERE uuid = ?", (job_uuid,)
+        )
+        return dict(await cursor.fetchone())
+
+
+async def claim(worker_id, limit=10, lease_seconds=60, max_attempts=3):
+    # as a worker does: fail the jobs out of attempts before claiming
+    await fail_expired_generation_jobs(table_name, "started", "failed", max_attempts)
+    return await claim_generation_jobs(
+        table_name, "started", worker_id, limit, lease_seconds, max_attempts
+    )
+
+
+@pytest.mark.asyncio
+class TestGenerationJobQueue:
+    """Test leasing generation jobs to workers."""
+
+    async def test_claim_generation_jobs(self, db_path):
+        """Test that jobs are claimed in order with a lease and an attempt."""
+        jobs = await claim("worker-1", limit=2)
+
+        assert [job["uuid"] for job in jobs] == ["job-0", "job-1"]
+        assert jobs[0] == {
+            "uuid": "job-0",
+            "course_id": 1,
+            "job_details": {"index": 0},
+            "attempts": 1,
+        }
+
+        job = await get_job(db_path, "job-0")
+        assert job["locked_by"] == "worker-1"
+        assert job["locked_until"] is not None
+
+    async def test_leased_jobs_are_not_claimed_again(self, db_path):
+        """Test that two workers never claim the same job."""
+        first = await claim("worker-1", limit=2)
+        second = await claim("worker-2")
+
+        assert [job["uuid"] for job in first] == ["job-0", "job-1"]
+        assert [job["uuid"] for job in second] == ["job-2"]
+        assert await claim("worker-3") == []
+
+    async def test_expired_lease_is_claimed_again(self, db_path):
+        """Test that the job of a worker that stopped renewing its lease is reclaimed."""
+        await claim("worker-1", lease_seconds=-1)
+
+        jobs = await claim("worker-2")
+
+        assert len(jobs) == 3
+        assert all(job["attempts"] == 2 for job in jobs)
+
+    async def test_expired_lease_on_last_attempt_marks_job_failed(self, db_path):
+        """Test that a job whose lease expires on its last attempt is dead-lettered."""
+        await claim("worker-1", lease_seconds=-1, max_attempts=1)
+
+        assert await claim("worker-2", max_attempts=1) == []
+
+        job = await get_job(db_path, "job-0")
+        assert job["status"] == "failed"
+        assert job["last_error"] == "lease expired"
+        assert job["locked_by"] is None
+
+    async def test_fail_expired_generation_jobs_returns_failed_jobs(self, db_path):
+        """Test that dead-lettered jobs are returned so their failure can be reported."""
+        await claim("worker-1", limit=1, lease_seconds=-1, max_attempts=1)
+
+        failed = await fail_expired_generation_jobs(table_name, "started", "failed", 1)
+
+        assert [job["uuid"] for job in failed] == ["job-0"]
+        assert failed[0]["job_details"] == {"index": 0}
+
+    async def test_jobs_out_of_attempts_are_not_claimed(self, db_path):
+        """Test that a job whose lease expired on its last attempt is never claimed again."""
+        await claim("worker-1", limit=1, lease_seconds=-1, max_attempts=1)
+
+        jobs = await claim_generation_jobs(table_name, "started", "worker-2", 10, 60, 1)
+
+        assert "job-0" not in [job["uuid"] for job in jobs]
+
+    async def test_renew_generation_job_lease(self, db_path):
+        """Test that only the worker holding the lease can renew it."""
+        await claim("worker-1", limit=1)
+
+        assert await renew_generation_job_lease(table_name, "job-0", "worker-1", 60)
+        assert not await renew_generation_job_lease(
+            table_name, "job-0", "worker-2", 60
+        )
+
+    async def test_fail_generation_job_schedules_retry(self, db_path):
+        """Test that a failed attempt releases the job until its retry delay passes."""
+        await claim("worker-1", limit=1)
+
+        failed = await fail_generation_job(
+            table_name, "job-0", "worker-1", "boom", 60, 3, "failed"
+        )
+
+        assert not failed
+        job = await get_job(db_path, "job-0")
+        assert job["status"] == "started"
+        assert job["locked_by"] is None
+        assert job["last_error"] == "boom"
+        assert "job-0" not in [job["uuid"] for job in await claim("worker-2")]
+
+    async def test_fail_generation_job_retries_when_due(self, db_path):
+        """Test that a failed job is claimed again once its retry delay has passed."""
+        await claim("worker-1", limit=1)
+        await fail_generation_job(table_name, "job-0", "worker-1", "boom", 0, 3, "failed")
+
+        jobs = await claim("worker-2", limit=1)
+
+        assert jobs[0]["uuid"] == "job-0"
+        assert jobs[0]["attempts"] == 2
+
+    async def test_fail_generation_job_on_last_attempt(self, db_path):
+        """Test that a job is marked failed once it has used all its attempts."""
+        await claim("worker-1", limit=1, max_attempts=1)
+
+        failed = await fail_generation_job(
+            table_name, "job-0", "worker-1", "boom", 0, 1, "failed"
+        )
+
+        assert failed
+        assert (await get_job(db_path, "job-0"))["status"] == "failed"
+
+    async def test_fail_generation_job_without_lease(self, db_path):
+        """Test that a worker that lost the lease cannot fail the job."""
+        await claim("worker-1", limit=1)
+
+        assert not await fail_generation_job(
+            table_name, "job-0", "worker-2", "boom", 0, 1, "failed"
+        )
+        assert (await get_job(db_path, "job-0"))["locked_by"] == "worker-1"
+
+    async def test_add_generation_job_lease_columns_to_existing_table(self, tmp_path):
+        """Test that the lease columns are added to job tables created before them."""
+        async with aiosqlite.connect(str(tmp_path / "old.db")) as conn:
+            cursor = await conn.cursor()
+            await cursor.execute(
+                f"""CREATE TABLE {table_name} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    uuid TEXT NOT NULL,
+                    status TEXT NOT NULL
+                )"""
+            )
+
+            await add_generation_job_lease_columns(cursor, table_name)
+            await add_generation_job_lease_columns(cursor, table_name)
+
+            await cursor.execute(f"PRAGMA table_info({table_name})")
+            columns = [column[1] for column in await cursor.fetchall()]
+
+        for column in ["attempts", "locked_by", "locked_until", "run_after", "last_error"]:
+            assert column in columns
+
+
+@pytest.mark.asyncio
+class TestTaskGenerationProgress:
+    """Test the per-course task generation counters."""
+
+    async def get_progress(self, cursor):
+        await cursor.execute(
+            f"""SELECT course_id, status, count FROM {task_generation_progress_table_name}
+            WHERE count > 0 ORDER BY course_id, status"""
+        )
+        return await cursor.fetchall()
+
+    async def add_job(self, cursor, job_uuid, course_id, status="started"):
+        await cursor.execute(
+            f"""INSERT INTO {table_name} (uuid, task_id, course_id, status)
+            VALUES (?, ?, ?, ?)""",
+            (job_uuid, 1, course_id, status),
+        )
+
+    async def test_progress_follows_job_status(self, tmp_path):
+        """Test that the counters follow inserts, status changes and deletes."""
+        async with aiosqlite.connect(str(tmp_path / "progress.db")) as conn:
+            cursor = await conn.cursor()
+            await create_task_generation_jobs_table(cursor)
+            await create_task_generation_progress_table(cursor)
+
+            for index in range(3):
+                await self.add_job(cursor, f"job-{index}", 1)
+            await self.add_job(cursor, "other", 2)
+
+            assert await self.get_progress(cursor) == [(1, "started", 3), (2, "started", 1)]
+
+            await cursor.execute(
+                f"UPDATE {table_name} SET status = 'completed' WHERE uuid IN ('job-0', 'job-1')"
+            )
+            # setting the same status again is not counted twice
+            await cursor.execute(
+                f"UPDATE {table_name} SET status = 'completed' WHERE uuid = 'job-0'"
+            )
+            await cursor.execute(f"DELETE FROM {table_name} WHERE uuid = 'other'")
+
+            assert await self.get_progress(cursor) == [
+                (1, "completed", 2),
+                (1, "started", 1),
+            ]
+
+    async def test_progress_counts_existing_jobs(self, tmp_path):
+        """Test that jobs created before the counters existed are counted once."""
+        async with aiosqlite.connect(str(tmp_path / "progress.db")) as conn:
+            cursor = await conn.cursor()
+            await create_task_generation_jobs_table(cursor)
+
+            await self.add_job(cursor, "job-0", 1)
+            await self.add_job(cursor, "job-1", 1, "completed")
+
+            await create_task_generation_progress_table(cursor)
+            await create_task_generation_progress_table(cursor)
+
+            assert await self.get_progress(cursor) == [
+                (1, "completed", 1),
+                (1, "started", 1),
+            ]
@@ -20,6 +20,7 @@ from src.api.db import (
     create_course_generation_jobs_table,
     create_task_generation_jobs_table,
     create_code_drafts_table,
+    create_chat_history_summaries_table,
     init_db,
     delete_useless_tables,
 )
@@ -260,6 +261,18 @@ class TestTableCreationFunctions:
 
         assert any("CREATE TABLE IF NOT EXISTS code_drafts" in call for call in calls)
 
+    async def test_create_chat_history_summaries_table(self):
+        """Test creating chat history summaries table."""
+        mock_cursor = AsyncMock()
+
+        await create_chat_history_summaries_table(mock_cursor)
+
+        mock_cursor.execute.assert_called_once()
+        assert (
+            "CREATE TABLE IF NOT EXISTS chat_history_summaries"
+            in mock_cursor.execute.call_args[0][0]
+        )
+
 
 @pytest.mark.asyncio
 class TestDatabaseInitialization:
@@ -96,7 +96,7 @@ class TestOrganizationOperations:
         ):
             await create_organization_with_user("Test Org", "test-org", 1)
 
-    @patch("src.api.db.org.get_new_db_connection")
+    @patch("src.api.db.org.get_db_read_connection")
     async def test_get_all_orgs(self, mock_db_conn):
         """Test retrieving all organizations."""
         mock_cursor = AsyncMock()
@@ -0,0 +1,39 @@
+import pytest
+from unittest.mock import patch
+from src.api.db.provider_file import get_provider_file_id, store_provider_file_id
+
+
+@pytest.mark.asyncio
+class TestProviderFileOperations:
+    """Test the index of files uploaded to the LLM provider."""
+
+    @patch("src.api.db.provider_file.execute_db_operation")
+    async def test_get_provider_file_id(self, mock_execute):
+        """Test getting the file id of an unexpired upload."""
+        mock_execute.return_value = ("file-1",)
+
+        result = await get_provider_file_id("hash")
+
+        assert result == "file-1"
+        query, params = mock_execute.call_args.args
+        assert "expires_at > ?" in query
+        assert params[0] == "hash"
+
+    @patch("src.api.db.provider_file.execute_db_operation")
+    async def test_get_provider_file_id_not_found(self, mock_execute):
+        """Test getting the file id of a material without an unexpired upload."""
+        mock_execute.return_value = None
+
+        assert await get_provider_file_id("hash") is None
+
+    @patch("src.api.db.provider_file.time.time")
+    @patch("src.api.db.provider_file.execute_db_operation")
+    async def test_store_provider_file_id(self, mock_execute, mock_time):
+        """Test storing an upload with its expiry."""
+        mock_time.return_value = 1000
+
+        await store_provider_file_id("hash", "file-1", 60)
+
+        query, params = mock_execute.call_args.args
+        assert "ON CONFLICT(content_hash) DO UPDATE" in query
+        assert params == ("hash", "file-1", 1060)
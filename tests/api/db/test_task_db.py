@@ -8,8 +8,9 @@ from src.api.db.task import (
     convert_question_db_to_dict,
     get_scorecard,
     get_question,
-    get_basic_task_details,
+    get_task_from_db,
     get_task,
+    get_tasks_bulk,
     get_task_metadata,
     does_task_exist,
     prepare_blocks_for_publish,
@@ -27,7 +28,6 @@ from src.api.db.task import (
     store_task_generation_request,
     update_task_generation_job_status,
     get_course_task_generation_jobs_status,
-    get_all_pending_task_generation_jobs,
     drop_task_completions_table,
     get_all_scorecards_for_org,
     create_scorecard,
@@ -231,7 +231,7 @@ class TestTaskOperations:
         assert result is None
 
     @patch("src.api.db.task.execute_db_operation")
-    async def test_get_basic_task_details_success(self, mock_execute):
+    async def test_get_task_from_db_success(self, mock_execute):
         """Test successful basic task details retrieval."""
         mock_execute.return_value = (
             1,
@@ -242,7 +242,7 @@ class TestTaskOperations:
             None,
         )
 
-        result = await get_basic_task_details(1)
+        result = await get_task_from_db(1)
 
         expected = {
             "id": 1,
@@ -256,15 +256,15 @@ class TestTaskOperations:
         assert result == expected
 
     @patch("src.api.db.task.execute_db_operation")
-    async def test_get_basic_task_details_not_found(self, mock_execute):
+    async def test_get_task_from_db_not_found(self, mock_execute):
         """Test basic task details when not found."""
         mock_execute.return_value = None
 
-        result = await get_basic_task_details(999)
+        result = await get_task_from_db(999)
 
         assert result is None
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.execute_db_operation")
     async def test_get_task_learning_material(self, mock_execute, mock_get_basic):
         """Test getting learning material task."""
@@ -293,7 +293,7 @@ class TestTaskOperations:
 
         assert result == expected
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.execute_db_operation")
     @patch("src.api.db.task.convert_question_db_to_dict")
     async def test_get_task_quiz(self, mock_convert, mock_execute, mock_get_basic):
@@ -347,7 +347,7 @@ class TestTaskOperations:
 
         assert result == expected
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     async def test_get_task_not_found(self, mock_get_basic):
         """Test getting task when not found."""
         mock_get_basic.return_value = None
@@ -426,13 +426,15 @@ class TestTaskOperations:
         blocks = [{"type": "text", "content": "Hello"}]
         scheduled_at = datetime.now()
 
-        result = await update_learning_material_task(
-            1, "Updated Task", blocks, scheduled_at
-        )
+        with patch("src.api.db.task.prompt_context_cache") as mock_cache:
+            result = await update_learning_material_task(
+                1, "Updated Task", blocks, scheduled_at
+            )
 
         assert result == mock_task
         mock_cursor.execute.assert_called_once()
         mock_conn_instance.commit.assert_called_once()
+        mock_cache.bump_version.assert_called_once_with("task", 1)
 
     @patch("src.api.db.task.does_task_exist")
     async def test_update_learning_material_task_not_found(self, mock_task_exists):
@@ -444,7 +446,7 @@ class TestTaskOperations:
         assert result is False
 
     @patch("src.api.db.task.does_task_exist")
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.get_new_db_connection")
     @patch("src.api.db.task.get_task")
     async def test_update_draft_quiz_success(
@@ -494,11 +496,11 @@ class TestTaskOperations:
         assert result is False
 
     @patch("src.api.db.task.does_task_exist")
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     async def test_update_draft_quiz_task_exists_but_basic_details_none(
         self, mock_get_basic, mock_task_exists
     ):
-        """Test update_draft_quiz when task exists but get_basic_task_details returns None - covers line 348."""
+        """Test update_draft_quiz when task exists but get_task_from_db returns None - covers line 348."""
         mock_task_exists.return_value = True  # Task exists according to first check
         mock_get_basic.return_value = None  # But basic details returns None
 
@@ -563,25 +565,36 @@ class TestTaskOperations:
 
         assert result is False
 
+    @patch("src.api.db.task.prompt_context_cache")
     @patch("src.api.db.task.execute_db_operation")
-    async def test_delete_task(self, mock_execute):
+    async def test_delete_task(self, mock_execute, mock_cache):
         """Test task deletion."""
+        mock_execute.side_effect = [None, [(10,), (11,)]]
+
         await delete_task(1)
 
-        mock_execute.assert_called_once()
-        args = mock_execute.call_args[0]
+        args = mock_execute.call_args_list[0][0]
         assert "UPDATE tasks" in args[0]
         assert "deleted_at" in args[0]
+        mock_cache.bump_version.assert_has_calls(
+            [call("task", 1), call("question", 10, 11)]
+        )
 
+    @patch("src.api.db.task.prompt_context_cache")
     @patch("src.api.db.task.execute_db_operation")
-    async def test_delete_tasks(self, mock_execute):
+    async def test_delete_tasks(self, mock_execute, mock_cache):
         """Test multiple tasks deletion."""
+        mock_execute.side_effect = [None, [(10,)]]
+
         await delete_tasks([1, 2, 3])
 
-        mock_execute.assert_called_once()
-        args = mock_execute.call_args[0]
+        args = mock_execute.call_args_list[0][0]
         assert "UPDATE tasks" in args[0]
         assert "deleted_at" in args[0]
+        assert mock_execute.call_args_list[1][0][1] == (1, 2, 3)
+        mock_cache.bump_version.assert_has_calls(
+            [call("task", 1, 2, 3), call("question", 10)]
+        )
 
     @patch("src.api.db.task.execute_db_operation")
     async def test_mark_task_completed(self, mock_execute):
@@ -673,14 +686,13 @@ class TestTaskOperations:
         mock_cursor.execute.assert_called_once()
         mock_conn_instance.commit.assert_called_once()
 
-    @patch("src.api.db.task.get_new_db_connection")
+    @patch("src.api.db.task.get_db_read_connection")
     async def test_get_course_task_generation_jobs_status(self, mock_db_conn):
         """Test getting course task generation jobs status."""
         mock_cursor = AsyncMock()
         mock_cursor.fetchall.return_value = [
-            (str(GenerateTaskJobStatus.COMPLETED),),
-            (str(GenerateTaskJobStatus.STARTED),),
-            (str(GenerateTaskJobStatus.COMPLETED),),
+            (str(GenerateTaskJobStatus.COMPLETED), 2),
+            (str(GenerateTaskJobStatus.STARTED), 1),
         ]
         mock_conn_instance = AsyncMock()
         mock_conn_instance.cursor.return_value = mock_cursor
@@ -696,27 +708,22 @@ class TestTaskOperations:
 
         assert result == expected
 
-    @patch("src.api.db.task.get_new_db_connection")
-    async def test_get_all_pending_task_generation_jobs(self, mock_db_conn):
-        """Test getting all pending task generation jobs."""
+    @patch("src.api.db.task.get_db_read_connection")
+    async def test_get_course_task_generation_jobs_status_no_jobs(self, mock_db_conn):
+        """Test getting the generation status of a course without jobs."""
         mock_cursor = AsyncMock()
-        mock_cursor.fetchall.return_value = [
-            ("uuid1", '{"type": "quiz"}'),
-            ("uuid2", '{"type": "learning_material"}'),
-        ]
+        mock_cursor.fetchall.return_value = []
         mock_conn_instance = AsyncMock()
         mock_conn_instance.cursor.return_value = mock_cursor
         mock_conn_instance.__aenter__.return_value = mock_conn_instance
         mock_db_conn.return_value = mock_conn_instance
 
-        result = await get_all_pending_task_generation_jobs()
-
-        expected = [
-            {"uuid": "uuid1", "job_details": {"type": "quiz"}},
-            {"uuid": "uuid2", "job_details": {"type": "learning_material"}},
-        ]
+        result = await get_course_task_generation_jobs_status(1)
 
-        assert result == expected
+        assert result == {
+            str(GenerateTaskJobStatus.COMPLETED): 0,
+            str(GenerateTaskJobStatus.STARTED): 0,
+        }
 
     @patch("src.api.db.task.get_new_db_connection")
     async def test_drop_task_completions_table(self, mock_db_conn):
@@ -1027,6 +1034,67 @@ class TestTaskOperations:
         assert questions[2]["scorecard"]["id"] == 1
 
 
+@pytest.mark.asyncio
+class TestGetTasksBulk:
+    """Test loading many tasks with a fixed number of queries."""
+
+    async def test_get_tasks_bulk_empty(self):
+        """Test that no queries are run for an empty list of task ids."""
+        with patch("src.api.db.task.execute_db_operation") as mock_execute:
+            assert await get_tasks_bulk([]) == {}
+
+        mock_execute.assert_not_called()
+
+    @patch("src.api.db.task.execute_db_operation")
+    async def test_get_tasks_bulk_mixed_tasks(self, mock_execute):
+        """Test loading learning material and quiz tasks with their scorecards."""
+        mock_execute.side_effect = [
+            [
+                (1, "LM", "learning_material", "published", 10, None, '[{"id": "b1"}]'),
+                (2, "Quiz", "quiz", "published", 10, None, None),
+            ],
+            [
+                (5, "subjective", "[]", None, "text", "chat", 7, None, None, None, True, "Q1", 2),
+                (6, "objective", "[]", '[{"id": "a"}]', "text", "chat", None, None, None, 1, True, "Q2", 2),
+            ],
+            [(7, "Scorecard", '[{"name": "clarity"}]', "published")],
+        ]
+
+        result = await get_tasks_bulk([1, "2", 1, 3])
+
+        assert mock_execute.call_count == 3
+        assert mock_execute.call_args_list[0][0][1] == (1, 2, 3)
+        assert mock_execute.call_args_list[1][0][1] == (2,)
+        assert mock_execute.call_args_list[2][0][1] == (7,)
+
+        assert set(result.keys()) == {1, 2}
+        assert result[1]["blocks"] == [{"id": "b1"}]
+        assert "questions" not in result[1]
+
+        questions = result[2]["questions"]
+        assert [question["id"] for question in questions] == [5, 6]
+        assert questions[0]["scorecard"] == {
+            "id": 7,
+            "title": "Scorecard",
+            "criteria": [{"name": "clarity"}],
+            "status": "published",
+        }
+        assert "scorecard" not in questions[1]
+        assert questions[1]["answer"] == [{"id": "a"}]
+
+    @patch("src.api.db.task.execute_db_operation")
+    async def test_get_tasks_bulk_learning_material_only(self, mock_execute):
+        """Test that questions are not queried when there are no quizzes."""
+        mock_execute.return_value = [
+            (1, "LM", "learning_material", "published", 10, None, None),
+        ]
+
+        result = await get_tasks_bulk([1])
+
+        mock_execute.assert_called_once()
+        assert result[1]["blocks"] == []
+
+
 @pytest.mark.asyncio
 class TestTaskUtilities:
     """Test task utility functions."""
@@ -1231,17 +1299,19 @@ class TestScorecardOperations:
 
         mock_scorecard_model = MockScorecard()
 
-        result = await update_scorecard(123, mock_scorecard_model)
+        with patch("src.api.db.task.prompt_context_cache") as mock_cache:
+            result = await update_scorecard(123, mock_scorecard_model)
 
         assert result == mock_scorecard
         mock_execute.assert_called_once()
+        mock_cache.bump_version.assert_called_once_with("scorecard", 123)
 
 
 @pytest.mark.asyncio
 class TestTaskDuplication:
     """Test task duplication operations."""
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.execute_db_operation")
     @patch("src.api.db.task.get_org_id_for_course")
     @patch("src.api.db.task.get_task")
@@ -1298,7 +1368,7 @@ class TestTaskDuplication:
 
         assert result == expected
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.execute_db_operation")
     @patch("src.api.db.task.get_org_id_for_course")
     @patch("src.api.db.task.get_task")
@@ -1367,7 +1437,7 @@ class TestTaskDuplication:
 
         assert result["ordering"] == 3
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     async def test_duplicate_task_not_found(self, mock_get_basic):
         """Test duplicating non-existent task."""
         mock_get_basic.return_value = None
@@ -1375,7 +1445,7 @@ class TestTaskDuplication:
         with pytest.raises(ValueError, match="Task does not exist"):
             await duplicate_task(999, 100, 200)
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.execute_db_operation")
     @patch("src.api.db.task.get_org_id_for_course")
     @patch("src.api.db.task.get_task")
@@ -1391,7 +1461,7 @@ class TestTaskDuplication:
         with pytest.raises(ValueError, match="Task is not in this module"):
             await duplicate_task(1, 100, 200)
 
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.execute_db_operation")
     @patch("src.api.db.task.get_org_id_for_course")
     @patch("src.api.db.task.get_task")
@@ -1446,7 +1516,7 @@ class TestTaskDuplication:
         mock_conn_instance.commit.assert_not_called()
 
     @patch("src.api.db.task.does_task_exist")
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.get_new_db_connection")
     @patch("src.api.db.task.get_task")
     async def test_update_draft_quiz_with_scorecard_publishing(
@@ -1537,7 +1607,7 @@ class TestTaskDuplication:
         assert result == [7, 8, 9]
 
     @patch("src.api.db.task.does_task_exist")
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.get_new_db_connection")
     @patch("src.api.db.task.get_task")
     async def test_update_draft_quiz_task_not_found(
@@ -1553,7 +1623,7 @@ class TestTaskDuplication:
         assert result is False
 
     @patch("src.api.db.task.does_task_exist")
-    @patch("src.api.db.task.get_basic_task_details")
+    @patch("src.api.db.task.get_task_from_db")
     @patch("src.api.db.task.get_new_db_connection")
     @patch("src.api.db.task.get_task")
     async def test_update_draft_quiz_with_pydantic_question(
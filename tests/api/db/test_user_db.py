@@ -342,16 +342,12 @@ class TestUserDatabaseOperations:
 class TestUserInsertOperations:
     """Test user insertion and update operations."""
 
-    @patch("src.api.db.user.get_new_db_connection")
     @patch("src.api.db.user.generate_random_color")
     @patch("src.api.db.user.send_slack_notification_for_new_user")
-    async def test_insert_or_return_user_new_user(
-        self, mock_slack, mock_color, mock_db_conn
-    ):
+    async def test_insert_or_return_user_new_user(self, mock_slack, mock_color):
         """Test inserting a new user."""
         mock_color.return_value = "#FF5733"
 
-        # Mock database connection and cursor
         mock_cursor = AsyncMock()
         mock_cursor.fetchone.side_effect = [
             None,  # User doesn't exist
@@ -365,10 +361,6 @@ class TestUserInsertOperations:
                 "2023-01-01 12:00:00",
             ),
         ]
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
 
         result = await insert_or_return_user(
             mock_cursor, "new@example.com", "New User", "User"
@@ -387,10 +379,8 @@ class TestUserInsertOperations:
         assert result == expected
         mock_slack.assert_called_once()
 
-    @patch("src.api.db.user.get_new_db_connection")
-    async def test_insert_or_return_user_existing_user(self, mock_db_conn):
+    async def test_insert_or_return_user_existing_user(self):
         """Test returning existing user."""
-        # Mock database connection and cursor
         mock_cursor = AsyncMock()
         mock_cursor.fetchone.return_value = (
             1,
@@ -0,0 +1,151 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from src.api.routes.admin import router
+from api.utils.security import require_platform_operator
+from src.api.utils.sql_profiler import SQLProfiler
+from fastapi import FastAPI
+
+# Create a test app with the admin router, authenticated as a platform operator
+app = FastAPI()
+app.include_router(router, prefix="/admin")
+app.dependency_overrides[require_platform_operator] = lambda: 1
+client = TestClient(app)
+
+unauthenticated_app = FastAPI()
+unauthenticated_app.include_router(router, prefix="/admin")
+unauthenticated_client = TestClient(unauthenticated_app)
+
+
+class TestAdminRoutes:
+    """Test admin route endpoints."""
+
+    @pytest.mark.parametrize(
+        "method,path",
+        [
+            ("get", "/admin/db/stats"),
+            ("get", "/admin/db/sql_profile"),
+            ("put", "/admin/db/sql_profile"),
+            ("delete", "/admin/db/sql_profile"),
+            ("get", "/admin/prompt_cache/stats"),
+            ("get", "/admin/audio_cache/stats"),
+            ("get", "/admin/llm_scheduler/stats"),
+        ],
+    )
+    def test_unauthenticated_requests_are_rejected(self, method, path):
+        """Test that the admin routes require an authenticated platform operator."""
+        with patch("src.api.routes.admin.profiler") as mock_profiler:
+            response = getattr(unauthenticated_client, method)(path)
+
+        assert response.status_code == 401
+        mock_profiler.reset.assert_not_called()
+        mock_profiler.configure.assert_not_called()
+
+    @pytest.mark.parametrize("role", ["MEMBER", "ADMIN"])
+    def test_org_users_are_rejected(self, role):
+        """Test that org members and org admins cannot use the admin routes."""
+        with patch(
+            "api.utils.security.get_user_role_in_org", return_value=role
+        ), patch("api.utils.security.settings.platform_operator_user_ids", [2]):
+            response = unauthenticated_client.delete(
+                "/admin/db/sql_profile?org_id=1", headers={"Authorization": "Bearer 1"}
+            )
+
+        assert response.status_code == 403
+
+    def test_platform_operator_requests_are_allowed(self):
+        """Test that configured platform operators can use the admin routes."""
+        with patch("api.utils.security.settings.platform_operator_user_ids", [1]):
+            response = unauthenticated_client.get(
+                "/admin/llm_scheduler/stats", headers={"Authorization": "Bearer 1"}
+            )
+
+        assert response.status_code == 200
+
+    @patch("src.api.routes.admin.get_db_engine_stats")
+    def test_get_db_stats(self, mock_get_db_engine_stats):
+        """Test that db engine stats are returned as is."""
+        mock_get_db_engine_stats.return_value = {"mode": "pooled", "pool": {"idle": 2}}
+
+        response = client.get("/admin/db/stats")
+
+        assert response.status_code == 200
+        assert response.json() == {"mode": "pooled", "pool": {"idle": 2}}
+
+    def test_get_sql_profile(self):
+        """Test the top-N slow query report."""
+        profiler = SQLProfiler(1.0, None, 10)
+        profiler.observe("SELECT 1 FROM a", 1.0, 1, sampled=True)
+        profiler.observe("SELECT 1 FROM b", 5.0, 1, sampled=True)
+
+        with patch("src.api.routes.admin.profiler", profiler):
+            response = client.get("/admin/db/sql_profile?top_n=1&sort_by=max")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["num_fingerprints"] == 2
+        assert [stats["fingerprint"] for stats in data["statements"]] == [
+            "SELECT ? FROM b"
+        ]
+
+    def test_get_sql_profile_invalid_sort(self):
+        """Test that an unknown sort key is rejected."""
+        response = client.get("/admin/db/sql_profile?sort_by=rows")
+
+        assert response.status_code == 400
+
+    def test_update_and_reset_sql_profiler(self):
+        """Test runtime reconfiguration and reset of the profiler."""
+        profiler = SQLProfiler(0.0, None, 10)
+
+        with patch("src.api.routes.admin.profiler", profiler):
+            response = client.put(
+                "/admin/db/sql_profile",
+                json={"sample_rate": 0.25, "slow_query_threshold_ms": 200},
+            )
+            assert response.status_code == 200
+            assert response.json() == {
+                "sample_rate": 0.25,
+                "slow_query_threshold_ms": 200,
+            }
+
+            profiler.observe("SELECT 1", 1.0, 1, sampled=True)
+            response = client.delete("/admin/db/sql_profile")
+            assert response.status_code == 200
+            assert profiler.report()["num_fingerprints"] == 0
+
+    def test_update_sql_profiler_rejects_invalid_rate(self):
+        """Test that sample rates outside [0, 1] are rejected."""
+        response = client.put("/admin/db/sql_profile", json={"sample_rate": 2})
+
+        assert response.status_code == 422
+
+    @patch("src.api.routes.admin.prompt_context_cache")
+    def test_get_prompt_cache_stats(self, mock_cache):
+        """Test that prompt cache metrics are returned as is."""
+        mock_cache.stats.return_value = {"hits": 3, "misses": 1}
+
+        response = client.get("/admin/prompt_cache/stats")
+
+        assert response.status_code == 200
+        assert response.json() == {"hits": 3, "misses": 1}
+
+    @patch("src.api.routes.admin.audio_message_cache")
+    def test_get_audio_cache_stats(self, mock_cache):
+        """Test that audio cache metrics are returned as is."""
+        mock_cache.stats.return_value = {"memory_hits": 2, "misses": 1}
+
+        response = client.get("/admin/audio_cache/stats")
+
+        assert response.status_code == 200
+        assert response.json() == {"memory_hits": 2, "misses": 1}
+
+    @patch("src.api.routes.admin.llm_scheduler")
+    def test_get_llm_scheduler_stats(self, mock_scheduler):
+        """Test that LLM scheduler metrics are returned as is."""
+        mock_scheduler.stats.return_value = {"queued": {"background": 4}}
+
+        response = client.get("/admin/llm_scheduler/stats")
+
+        assert response.status_code == 200
+        assert response.json() == {"queued": {"background": 4}}
@@ -0,0 +1,902 @@
+import asyncio
+import json
+import pytest
+import aiosqlite
+import openai
+from contextlib import asynccontextmanager
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from src.api.routes.ai import (
+    router,
+    AIChatRequest,
+    TaskType,
+    QuestionType,
+    TaskInputType,
+    prefetch_chat_context,
+    get_cached_question_context,
+    choose_model_plan_heuristically,
+    should_rewrite_query,
+    window_chat_history_for_prompt,
+    chat_history_summary_refreshes,
+    LLMPriority,
+    CourseStructureWriter,
+    migrate_content_to_blocks,
+    run_course_structure_generation_job,
+    generate_course_task,
+)
+from src.api.schemas import CourseStructure, CourseModule, CourseConcept, CourseTask
+from src.api.db import (
+    create_milestones_table,
+    create_course_milestones_table,
+    create_tasks_table,
+    create_course_tasks_table,
+    create_course_generation_jobs_table,
+)
+from src.api.utils.prompt_cache import PromptContextCache
+
+app = FastAPI()
+app.include_router(router, prefix="/ai")
+client = TestClient(app)
+
+
+class TestPrefetchChatContext:
+    """Test the concurrent context prefetch for /ai/chat."""
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.get_task_metadata")
+    @patch("src.api.routes.ai.get_task")
+    async def test_learning_material(self, mock_get_task, mock_get_task_metadata):
+        """Test that the task and its metadata are fetched together."""
+        mock_get_task.return_value = {"id": 1, "blocks": []}
+        mock_get_task_metadata.return_value = {"course": {"id": 2}}
+
+        request = AIChatRequest(
+            user_response="hi",
+            task_type=TaskType.LEARNING_MATERIAL,
+            chat_history=[],
+            user_id=3,
+            task_id=1,
+        )
+
+        context = await prefetch_chat_context(request)
+
+        assert context == {
+            "task": {"id": 1, "blocks": []},
+            "task_metadata": {"course": {"id": 2}},
+        }
+        mock_get_task.assert_called_once_with(1)
+        mock_get_task_metadata.assert_called_once_with(1)
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.get_chat_history_summary")
+    @patch("src.api.routes.ai.get_tasks_bulk")
+    @patch("src.api.routes.ai.get_task_metadata")
+    @patch("src.api.routes.ai.get_question_chat_history_for_user")
+    @patch("src.api.routes.ai.get_question")
+    async def test_quiz_lookups_run_concurrently(
+        self,
+        mock_get_question,
+        mock_get_chat_history,
+        mock_get_task_metadata,
+        mock_get_tasks_bulk,
+        mock_get_chat_history_summary,
+    ):
+        """Test that chat history and metadata do not wait on the question chain."""
+        question_started = asyncio.Event()
+        others_started = []
+
+        async def get_question(question_id):
+            question_started.set()
+            # only completes if the other lookups were started concurrently
+            while len(others_started) < 2:
+                await asyncio.sleep(0)
+            return {"id": question_id, "context": {"linkedMaterialIds": ["7"]}}
+
+        async def get_chat_history(question_id, user_id):
+            others_started.append("chat_history")
+            return [{"role": "user", "content": "hi"}]
+
+        async def get_task_metadata(task_id):
+            others_started.append("task_metadata")
+            return None
+
+        mock_get_question.side_effect = get_question
+        mock_get_chat_history.side_effect = get_chat_history
+        mock_get_task_metadata.side_effect = get_task_metadata
+        mock_get_tasks_bulk.return_value = {7: {"id": 7, "blocks": []}}
+        mock_get_chat_history_summary.return_value = None
+
+        request = AIChatRequest(
+            user_response="hi",
+            task_type=TaskType.QUIZ,
+            question_id=5,
+            user_id=3,
+            task_id=1,
+        )
+
+        context = await asyncio.wait_for(prefetch_chat_context(request), timeout=1)
+
+        assert question_started.is_set()
+        assert context["question"]["id"] == 5
+        assert context["linked_tasks"] == {7: {"id": 7, "blocks": []}}
+        assert context["chat_history"] == [{"role": "user", "content": "hi"}]
+        assert context["chat_history_summary"] is None
+        assert context["task_metadata"] is None
+        mock_get_chat_history.assert_called_once_with(5, 3)
+        mock_get_chat_history_summary.assert_called_once_with(5, 3)
+        mock_get_tasks_bulk.assert_called_once_with(["7"])
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.get_chat_history_summary")
+    @patch("src.api.routes.ai.get_tasks_bulk")
+    @patch("src.api.routes.ai.get_task_metadata")
+    @patch("src.api.routes.ai.get_question")
+    async def test_missing_question_skips_linked_materials(
+        self,
+        mock_get_question,
+        mock_get_task_metadata,
+        mock_get_tasks_bulk,
+        mock_get_chat_history_summary,
+    ):
+        """Test that a missing question does not trigger linked material lookups."""
+        mock_get_question.return_value = None
+        mock_get_task_metadata.return_value = None
+        mock_get_chat_history_summary.return_value = None
+
+        with patch(
+            "src.api.routes.ai.get_question_chat_history_for_user"
+        ) as mock_get_chat_history:
+            mock_get_chat_history.return_value = []
+
+            request = AIChatRequest(
+                user_response="hi",
+                task_type=TaskType.QUIZ,
+                question_id=5,
+                user_id=3,
+                task_id=1,
+            )
+
+            context = await prefetch_chat_context(request)
+
+        assert context["question"] is None
+        assert context["linked_tasks"] == {}
+        mock_get_tasks_bulk.assert_not_called()
+
+
+class TestCachedQuestionContext:
+    """Test the versioned prompt context cache used by /ai/chat."""
+
+    def get_question(self, answer_text):
+        return {
+            "id": 5,
+            "type": QuestionType.OBJECTIVE,
+            "blocks": [],
+            "answer": [answer_text],
+            "scorecard_id": None,
+            "context": {"blocks": [], "linkedMaterialIds": ["7"]},
+        }
+
+    @patch("src.api.routes.ai.construct_description_from_blocks")
+    def test_context_reused_until_versions_change(self, mock_construct):
+        """Test that context is rendered once per question/linked material version."""
+        mock_construct.side_effect = lambda blocks: ",".join(map(str, blocks))
+        cache = PromptContextCache(10, 10000, 60)
+        linked_tasks = {7: {"id": 7, "blocks": ["material"]}}
+
+        with patch("src.api.routes.ai.prompt_context_cache", cache):
+            details, knowledge_base = get_cached_question_context(
+                self.get_question("answer"), linked_tasks
+            )
+            assert "answer" in details
+            assert knowledge_base == "material"
+
+            get_cached_question_context(self.get_question("edited"), linked_tasks)
+            assert cache.stats()["hits"] == 2
+
+            cache.bump_version("question", 5)
+            details, _ = get_cached_question_context(
+                self.get_question("edited"), linked_tasks
+            )
+            assert "edited" in details
+
+            cache.bump_version("task", 7)
+            _, knowledge_base = get_cached_question_context(
+                self.get_question("edited"), {7: {"id": 7, "blocks": ["updated"]}}
+            )
+            assert knowledge_base == "updated"
+
+
+class TestWindowChatHistoryForPrompt:
+    """Test the token-budgeted chat history sent with each /ai/chat turn."""
+
+    def get_request(self, **kwargs):
+        return AIChatRequest(
+            user_response="hi",
+            task_type=TaskType.QUIZ,
+            question_id=5,
+            user_id=3,
+            task_id=1,
+            **kwargs,
+        )
+
+    def get_history(self, num_messages):
+        return [
+            {
+                "id": id,
+                "role": "user" if id % 2 else "assistant",
+                "content": f"message {id}",
+            }
+            for id in range(1, num_messages + 1)
+        ]
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.upsert_chat_history_summary")
+    @patch("src.api.routes.ai.summarize_chat_history")
+    async def test_history_within_budget_is_sent_verbatim(
+        self, mock_summarize, mock_upsert
+    ):
+        chat_history, summary, stats = await window_chat_history_for_prompt(
+            self.get_request(), self.get_history(4), None, "session", {}
+        )
+
+        assert chat_history == [
+            {"role": message["role"], "content": message["content"]}
+            for message in self.get_history(4)
+        ]
+        assert summary is None
+        assert stats["history_messages"] == 4
+        assert stats["history_summarized_messages"] == 0
+        mock_summarize.assert_not_called()
+        mock_upsert.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.count_message_tokens")
+    @patch("src.api.routes.ai.get_history_token_budget")
+    @patch("src.api.routes.ai.upsert_chat_history_summary")
+    @patch("src.api.routes.ai.summarize_chat_history")
+    async def test_older_turns_are_folded_into_summary(
+        self, mock_summarize, mock_upsert, mock_get_budget, mock_count_tokens
+    ):
+        # 4 messages fit within half of the budget
+        mock_count_tokens.return_value = 6
+        mock_get_budget.return_value = 50
+        mock_summarize.return_value = "new summary"
+
+        chat_history, summary, stats = await window_chat_history_for_prompt(
+            self.get_request(),
+            self.get_history(12),
+            {"summary": "old summary", "summarized_until_id": 2},
+            "session",
+            {},
+        )
+
+        # the stored summary is used without waiting for the refresh
+        assert summary == "old summary"
+        mock_upsert.assert_not_called()
+        assert [message["content"] for message in chat_history] == [
+            f"message {id}" for id in range(9, 13)
+        ]
+        assert stats["history_summarized_messages"] == 6
+
+        await chat_history_summary_refreshes[(5, 3)]
+        assert mock_summarize.call_args[0][0] == "old summary"
+        assert [message["id"] for message in mock_summarize.call_args[0][1]] == [
+            3,
+            4,
+            5,
+            6,
+            7,
+            8,
+        ]
+        mock_upsert.assert_called_once_with(5, 3, "new summary", 8)
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.count_message_tokens", return_value=6)
+    @patch("src.api.routes.ai.get_history_token_budget", return_value=50)
+    @patch("src.api.routes.ai.upsert_chat_history_summary")
+    @patch("src.api.routes.ai.summarize_chat_history")
+    async def test_one_summary_refresh_at_a_time(
+        self, mock_summarize, mock_upsert, mock_get_budget, mock_count_tokens
+    ):
+        """Test that turns sent while a refresh is in flight do not start another."""
+        release = asyncio.Event()
+
+        async def summarize(*args):
+            await release.wait()
+            return "new summary"
+
+        mock_summarize.side_effect = summarize
+
+        for _ in range(2):
+            await window_chat_history_for_prompt(
+                self.get_request(), self.get_history(12), None, "session", {}
+            )
+            await asyncio.sleep(0)
+
+        refresh = chat_history_summary_refreshes[(5, 3)]
+        release.set()
+        await refresh
+
+        mock_summarize.assert_called_once()
+        mock_upsert.assert_called_once_with(5, 3, "new summary", 8)
+        assert (5, 3) not in chat_history_summary_refreshes
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.llm_request_context")
+    @patch("src.api.routes.ai.get_llm_request_context")
+    @patch("src.api.routes.ai.count_message_tokens", return_value=6)
+    @patch("src.api.routes.ai.get_history_token_budget", return_value=50)
+    @patch("src.api.routes.ai.upsert_chat_history_summary")
+    @patch("src.api.routes.ai.summarize_chat_history")
+    async def test_summary_refresh_runs_as_background_work(
+        self,
+        mock_summarize,
+        mock_upsert,
+        mock_get_budget,
+        mock_count_tokens,
+        mock_get_context,
+        mock_context,
+    ):
+        """Test that the refresh is admitted as background work of the same org."""
+        mock_get_context.return_value = (LLMPriority.INTERACTIVE, 9)
+
+        await window_chat_history_for_prompt(
+            self.get_request(), self.get_history(12), None, "session", {}
+        )
+        await chat_history_summary_refreshes[(5, 3)]
+
+        mock_context.assert_called_once_with(LLMPriority.BACKGROUND, 9)
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.count_message_tokens", return_value=6)
+    @patch("src.api.routes.ai.get_history_token_budget", return_value=50)
+    @patch("src.api.routes.ai.upsert_chat_history_summary")
+    @patch("src.api.routes.ai.summarize_chat_history")
+    async def test_failed_summary_refresh_is_logged(
+        self, mock_summarize, mock_upsert, mock_get_budget, mock_count_tokens
+    ):
+        """Test that a failed refresh keeps the stored summary."""
+        mock_summarize.side_effect = Exception("rate limited")
+
+        await window_chat_history_for_prompt(
+            self.get_request(), self.get_history(12), None, "session", {}
+        )
+        await chat_history_summary_refreshes[(5, 3)]
+
+        mock_upsert.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("src.api.routes.ai.summarize_chat_history")
+    async def test_summary_of_deleted_history_is_ignored(self, mock_summarize):
+        chat_history, summary, _ = await window_chat_history_for_prompt(
+            self.get_request(),
+            [{"id": 20, "role": "user", "content": "hi"}],
+            {"summary": "old summary", "summarized_until_id": 8},
+            "session",
+            {},
+        )
+
+        assert summary is None
+        assert chat_history == [{"role": "user", "content": "hi"}]
+        mock_summarize.assert_not_called()
+
+
+class TestPipelineHeuristics:
+    """Test the heuristics used to skip the router and query rewrite hops."""
+
+    def get_question(self, **kwargs):
+        return {
+            "type": QuestionType.OBJECTIVE,
+            "input_type": TaskInputType.TEXT,
+            "coding_languages": None,
+            **kwargs,
+        }
+
+    def get_history(self, num_user_turns):
+        history = []
+        for _ in range(num_user_turns):
+            history += [
+                {"role": "user", "content": "answer"},
+                {"role": "assistant", "content": "feedback"},
+            ]
+        return history
+
+    def test_learning_material_uses_text_model(self):
+        assert choose_model_plan_heuristically(None, self.get_history(10)) == "text"
+
+    def test_code_questions_use_reasoning_model(self):
+        question = self.get_question(input_type=TaskInputType.CODE)
+        assert choose_model_plan_heuristically(question, self.get_history(0)) == (
+            "reasoning"
+        )
+
+        question = self.get_question(coding_languages=["python"])
+        assert choose_model_plan_heuristically(question, self.get_history(0)) == (
+            "reasoning"
+        )
+
+    def test_long_objective_conversations_use_reasoning_model(self):
+        question = self.get_question()
+
+        assert choose_model_plan_heuristically(question, self.get_history(5)) == "text"
+        assert (
+            choose_model_plan_heuristically(question, self.get_history(6))
+            == "reasoning"
+        )
+
+        question = self.get_question(type=QuestionType.OPEN_ENDED)
+        assert choose_model_plan_heuristically(question, self.get_history(6)) == "text"
+
+    def test_should_rewrite_query(self):
+        # nothing to resolve against on the first turn
+        assert should_rewrite_query(self.get_history(0), "why?") is False
+        assert should_rewrite_query(self.get_history(1), "why?") is True
+        assert should_rewrite_query(self.get_history(1), "word " * 20) is False
+
+
+class Chunk(BaseModel):
+    response: str
+
+
+def post_chat(mock_stream_llm, chunks=("hello",), **request_kwargs):
+    """Post a learning material chat turn and return the parsed ndjson lines."""
+
+    async def stream():
+        for chunk in chunks:
+            yield Chunk(response=chunk)
+
+    mock_stream_llm.return_value = stream()
+
+    with patch("src.api.routes.ai.prefetch_chat_context") as mock_prefetch:
+        mock_prefetch.return_value = {
+            "task": {"id": 1, "blocks": []},
+            "task_metadata": None,
+        }
+
+        response = client.post(
+            "/ai/chat",
+            json={
+                "user_response": "what is this about",
+                "task_type": "learning_material",
+                "chat_history": [],
+                "user_id": 3,
+                "task_id": 1,
+                **request_kwargs,
+            },
+        )
+
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestChatPipelineModes:
+    """Test how /ai/chat sequences the router and feedback calls per pipeline mode."""
+
+    @patch("src.api.routes.ai.chat_pipeline_mode", "sequential")
+    @patch("src.api.routes.ai.run_llm_with_instructor")
+    @patch("src.api.routes.ai.route_model_plan")
+    @patch("src.api.routes.ai.stream_llm_with_instructor")
+    def test_sequential(self, mock_stream_llm, mock_route, mock_run_llm):
+        """Test that the router and query rewrite run before streaming."""
+        mock_route.return_value = "reasoning"
+        mock_run_llm.return_value = AsyncMock(rewritten_query="rewritten")
+
+        assert post_chat(mock_stream_llm) == [{"response": "hello"}]
+
+        mock_run_llm.assert_called_once()
+        mock_route.assert_called_once()
+        assert mock_stream_llm.call_args[1]["model"] == "o3-mini-2025-01-31"
+
+    @patch("src.api.routes.ai.chat_pipeline_mode", "heuristic")
+    @patch("src.api.routes.ai.run_llm_with_instructor")
+    @patch("src.api.routes.ai.route_model_plan")
+    @patch("src.api.routes.ai.stream_llm_with_instructor")
+    def test_heuristic(self, mock_stream_llm, mock_route, mock_run_llm):
+        """Test that the router and first-turn query rewrite are skipped."""
+        assert post_chat(mock_stream_llm) == [{"response": "hello"}]
+
+        mock_run_llm.assert_not_called()
+        mock_route.assert_not_called()
+        assert mock_stream_llm.call_args[1]["model"] == "gpt-4.1-2025-04-14"
+
+    @patch("src.api.routes.ai.chat_pipeline_mode", "speculative")
+    @patch("src.api.routes.ai.route_model_plan")
+    @patch("src.api.routes.ai.stream_llm_with_instructor")
+    def test_speculative_router_agrees(self, mock_stream_llm, mock_route):
+        """Test that the text model stream is kept when the router agrees."""
+        mock_route.return_value = "text"
+
+        assert post_chat(mock_stream_llm) == [{"response": "hello"}]
+
+        mock_route.assert_called_once()
+        mock_stream_llm.assert_called_once()
+        assert mock_stream_llm.call_args[1]["model"] == "gpt-4.1-2025-04-14"
+
+
+class TestChatStreamProtocol:
+    """Test the full-object and delta streaming protocols of /ai/chat."""
+
+    @patch("src.api.routes.ai.chat_pipeline_mode", "heuristic")
+    @patch("src.api.routes.ai.stream_llm_with_instructor")
+    def test_full_protocol_is_default(self, mock_stream_llm):
+        lines = post_chat(mock_stream_llm, chunks=("He", "Hello"))
+
+        assert lines == [{"response": "He"}, {"response": "Hello"}]
+
+    @patch("src.api.routes.ai.chat_pipeline_mode", "heuristic")
+    @patch("src.api.routes.ai.stream_llm_with_instructor")
+    def test_delta_protocol(self, mock_stream_llm):
+        lines = post_chat(
+            mock_stream_llm,
+            chunks=("He", "He", "Hello"),
+            stream_protocol="delta",
+        )
+
+        assert lines == [
+            {
+                "type": "delta",
+                "ops": [{"op": "replace", "path": "", "value": {"response": "He"}}],
+            },
+            {
+                "type": "delta",
+                "ops": [{"op": "append", "path": "/response", "value": "llo"}],
+            },
+            {"type": "snapshot", "value": {"response": "Hello"}},
+        ]
+
+
+class TestChatPromptLayout:
+    """Test that the prompt keeps its stable parts ahead of the conversation."""
+
+    @patch("src.api.routes.ai.chat_pipeline_mode", "heuristic")
+    @patch("src.api.routes.ai.run_llm_with_instructor")
+    @patch("src.api.routes.ai.stream_llm_with_instructor")
+    def test_task_context_precedes_history(self, mock_stream_llm, mock_run_llm):
+        mock_run_llm.return_value = AsyncMock(rewritten_query="rewritten query")
+
+        post_chat(
+            mock_stream_llm,
+            chat_history=[
+                {"role": "user", "content": "first question"},
+                {"role": "assistant", "content": "first answer"},
+            ],
+        )
+
+        messages = mock_stream_llm.call_args[1]["messages"]
+
+        assert messages[0]["role"] == "system"
+        assert messages[1]["content"].startswith("Reference Material:")
+        assert "first question" in messages[2]["content"]
+        assert "first answer" in messages[3]["content"]
+        # the follow-up is rewritten in place as the latest message
+        assert "rewritten query" in messages[-1]["content"]
+        assert "on_usage" in mock_stream_llm.call_args[1]
+
+        # the rewrite shares the same prefix after its own system prompt
+        rewrite_messages = mock_run_llm.call_args[1]["messages"]
+        assert rewrite_messages[1:] == messages[1:]
+
+
+class StructureTask(BaseModel):
+    name: str
+    type: str
+
+
+@pytest.mark.asyncio
+class TestCourseStructureWriter:
+    """Test the write-behind stage of course structure generation."""
+
+    def get_added(self, modules, tasks):
+        return (
+            [(100 + index, index) for index in range(len(modules))],
+            [(200 + index, index) for index in range(len(tasks))],
+        )
+
+    @patch("src.api.routes.ai.get_manager")
+    @patch("src.api.routes.ai.add_milestones_and_draft_tasks_to_course")
+    async def test_items_are_written_in_one_batch(self, mock_add, mock_get_manager):
+        """Test that items found between flushes are written and announced together."""
+        mock_add.side_effect = lambda course_id, modules, tasks, **kwargs: self.get_added(
+            modules, tasks
+        )
+        mock_manager = MagicMock()
+        mock_get_manager.return_value = mock_manager
+
+        async with CourseStructureWriter(1, flush_interval=60) as writer:
+            module = writer.add_module("Module")
+            first = writer.add_task(module, StructureTask(name="A", type="quiz"))
+            second = writer.add_task(module, StructureTask(name="B", type="quiz"))
+
+        mock_add.assert_called_once()
+        _, modules, tasks = mock_add.call_args.args
+        assert [task["milestone_index"] for task in tasks] == [0, 0]
+        assert writer.module_ids == [100]
+        assert [writer.task_ids[first], writer.task_ids[second]] == [200, 201]
+
+        events = [call.args[1] for call in mock_manager.publish.call_args_list]
+        assert [event["event"] for event in events] == [
+            "module_created",
+            "task_created",
+            "task_created",
+            "structure_items_created",
+        ]
+        event = events[-1]
+        assert [module["id"] for module in event["modules"]] == [100]
+        assert [task["module_id"] for task in event["tasks"]] == [100, 100]
+        # the legacy events carry the same items
+        assert events[0]["module"] == event["modules"][0]
+        assert [events[1]["task"], events[2]["task"]] == event["tasks"]
+
+    @patch("src.api.routes.ai.course_structure_legacy_events", False)
+    @patch("src.api.routes.ai.get_manager")
+    @patch("src.api.routes.ai.add_milestones_and_draft_tasks_to_course")
+    async def test_legacy_events_can_be_turned_off(self, mock_add, mock_get_manager):
+        """Test that only the batched event is sent once legacy events are off."""
+        mock_add.side_effect = lambda course_id, modules, tasks, **kwargs: self.get_added(
+            modules, tasks
+        )
+        mock_manager = MagicMock()
+        mock_get_manager.return_value = mock_manager
+
+        async with CourseStructureWriter(1, flush_interval=60) as writer:
+            module = writer.add_module("Module")
+            writer.add_task(module, StructureTask(name="A", type="quiz"))
+
+        mock_manager.publish.assert_called_once()
+        assert (
+            mock_manager.publish.call_args.args[1]["event"] == "structure_items_created"
+        )
+
+    @patch("src.api.routes.ai.get_manager")
+    @patch("src.api.routes.ai.add_milestones_and_draft_tasks_to_course")
+    async def test_tasks_of_written_modules_use_their_ids(
+        self, mock_add, mock_get_manager
+    ):
+        """Test that tasks added after their module was written refer to its id."""
+        mock_add.side_effect = lambda course_id, modules, tasks, **kwargs: self.get_added(
+            modules, tasks
+        )
+        mock_get_manager.return_value = MagicMock()
+
+        async with CourseStructureWriter(1, flush_interval=60) as writer:
+            module = writer.add_module("Module")
+            await writer.flush()
+            writer.add_task(module, StructureTask(name="A", type="quiz"))
+
+        _, modules, tasks = mock_add.call_args.args
+        assert modules == []
+        assert tasks[0]["milestone_id"] == 100
+        assert tasks[0]["milestone_index"] is None
+
+    @patch("src.api.routes.ai.get_manager")
+    @patch("src.api.routes.ai.add_milestones_and_draft_tasks_to_course")
+    async def test_flushes_once_max_items_are_waiting(
+        self, mock_add, mock_get_manager
+    ):
+        """Test that a full buffer is written without waiting for the interval."""
+        mock_add.side_effect = lambda course_id, modules, tasks, **kwargs: self.get_added(
+            modules, tasks
+        )
+        mock_get_manager.return_value = MagicMock()
+
+        async with CourseStructureWriter(1, flush_interval=60, max_items=2) as writer:
+            writer.add_module("First")
+            writer.add_module("Second")
+
+            for _ in range(10):
+                await asyncio.sleep(0)
+
+            assert writer.module_ids == [100, 101]
+
+    @patch("src.api.routes.ai.get_manager")
+    @patch("src.api.routes.ai.add_milestones_and_draft_tasks_to_course")
+    async def test_write_failure_is_raised(self, mock_add, mock_get_manager):
+        """Test that a failed background write fails the generation."""
+        mock_add.side_effect = Exception("database is locked")
+        mock_get_manager.return_value = MagicMock()
+
+        with pytest.raises(Exception, match="database is locked"):
+            async with CourseStructureWriter(1, flush_interval=60, max_items=1) as writer:
+                writer.add_module("First")
+
+                for _ in range(10):
+                    await asyncio.sleep(0)
+
+                writer.add_module("Second")
+
+
+@pytest.mark.asyncio
+class TestMigrateContentToBlocks:
+    """Test converting legacy markdown content to blocks."""
+
+    @patch("src.api.routes.ai.run_llm_with_instructor")
+    async def test_markdown_is_converted_locally(self, mock_run_llm):
+        """Test that markdown the local converter handles does not call the LLM."""
+        blocks = await migrate_content_to_blocks("# Title\n\n- **item**")
+
+        assert [block["type"] for block in blocks] == ["heading", "bulletListItem"]
+        mock_run_llm.assert_not_called()
+
+    @patch("src.api.routes.ai.run_llm_with_instructor")
+    async def test_ambiguous_markdown_falls_back_to_the_llm(self, mock_run_llm):
+        """Test that markdown the local converter flags is converted by the LLM."""
+        mock_run_llm.return_value = MagicMock()
+        mock_run_llm.return_value.model_dump.return_value = {
+            "blocks": [
+                {"type": "paragraph", "props": {}, "content": []},
+                {"type": "image", "props": {"url": "x.png"}, "content": []},
+            ]
+        }
+
+        blocks = await migrate_content_to_blocks("| a | b |\n|---|---|")
+
+        mock_run_llm.assert_called_once()
+        assert blocks[1]["props"] == {
+            "url": "x.png",
+            "showPreview": True,
+            "caption": "",
+            "previewWidth": 512,
+        }
+
+
+@pytest.mark.asyncio
+class TestGenerateCourseTask:
+    """Test generating the details of a single course task."""
+
+    @patch("api.llm.get_retry_delay", return_value=0)
+    @patch("src.api.routes.ai.update_task_generation_job_status")
+    @patch("src.api.routes.ai.add_generated_learning_material")
+    @patch("src.api.routes.ai.get_org_id_for_course", return_value=1)
+    async def test_transient_failure_is_retried(
+        self, mock_get_org_id, mock_add_material, mock_update_status, mock_delay
+    ):
+        """Test that the call goes through the shared retry and circuit breaker path."""
+        output = MagicMock()
+        output.model_dump.return_value = {"blocks": []}
+        instructor_client = MagicMock()
+        instructor_client.chat.completions.create = AsyncMock(
+            side_effect=[openai.APIConnectionError(request=MagicMock()), output]
+        )
+        task = {"id": 7, "name": "Intro", "type": TaskType.LEARNING_MATERIAL}
+
+        await generate_course_task(
+            instructor_client, task, {"name": "Concept"}, "file", "task", "course", 1
+        )
+
+        assert instructor_client.chat.completions.create.await_count == 2
+        assert task["details"] == {"blocks": []}
+        mock_add_material.assert_awaited_once_with(7, task)
+
+
+class TestCourseStructureJobRetry:
+    """Test that a retried course structure job does not duplicate the structure."""
+
+    def get_structure(self, module_names):
+        return CourseStructure(
+            modules=[
+                CourseModule(
+                    name=name,
+                    concepts=[
+                        CourseConcept(
+                            name="Concept",
+                            description="",
+                            tasks=[
+                                CourseTask(
+                                    name=f"{name} task",
+                                    description="",
+                                    type="learning_material",
+                                )
+                            ],
+                        )
+                    ],
+                )
+                for name in module_names
+            ]
+        )
+
+    async def count(self, db_path, table_name):
+        async with aiosqlite.connect(db_path) as conn:
+            cursor = await conn.execute(f"SELECT COUNT(*) FROM {table_name}")
+            return (await cursor.fetchone())[0]
+
+    async def get_job(self, db_path):
+        async with aiosqlite.connect(db_path) as conn:
+            cursor = await conn.execute(
+                "SELECT job_details FROM course_generation_jobs WHERE uuid = 'job'"
+            )
+            return {
+                "uuid": "job",
+                "course_id": 1,
+                "job_details": json.loads((await cursor.fetchone())[0]),
+            }
+
+    @pytest.mark.asyncio
+    async def test_retry_after_partial_write_does_not_duplicate(self, tmp_path):
+        """Test that a job that failed after writing part of the structure starts over."""
+        db_path = str(tmp_path / "course.db")
+
+        async with aiosqlite.connect(db_path) as conn:
+            cursor = await conn.cursor()
+            await create_milestones_table(cursor)
+            await create_course_milestones_table(cursor)
+            await create_tasks_table(cursor)
+            await create_course_tasks_table(cursor)
+            await create_course_generation_jobs_table(cursor)
+            await cursor.execute(
+                """INSERT INTO course_generation_jobs (uuid, course_id, status, job_details)
+                VALUES ('job', 1, 'started', ?)""",
+                (
+                    json.dumps(
+                        {
+                            "course_description": "",
+                            "intended_audience": "",
+                            "instructions": "",
+                        }
+                    ),
+                ),
+            )
+            await conn.commit()
+
+        @asynccontextmanager
+        async def get_connection():
+            async with aiosqlite.connect(db_path) as conn:
+                yield conn
+
+        partial = self.get_structure(["First"])
+        complete = self.get_structure(["First", "Second"])
+
+        async def failing_stream():
+            yield partial
+            await asyncio.sleep(0)
+            raise Exception("stream interrupted")
+
+        async def complete_stream():
+            yield complete
+
+        mock_manager = MagicMock()
+
+        # the route uses the db module imported as `api`
+        with patch("api.db.course.get_new_db_connection", get_connection), patch(
+            "api.db.course.get_org_id_for_course", AsyncMock(return_value=1)
+        ), patch(
+            "src.api.routes.ai.get_org_id_for_course", AsyncMock(return_value=1)
+        ), patch(
+            "src.api.routes.ai.get_reference_material_file_id",
+            AsyncMock(return_value="file-1"),
+        ), patch(
+            "src.api.routes.ai.update_course_generation_job_status_and_details"
+        ) as mock_update, patch(
+            "src.api.routes.ai.get_manager", return_value=mock_manager
+        ), patch(
+            "src.api.routes.ai.stream_llm_with_instructor"
+        ) as mock_stream:
+            mock_stream.return_value = failing_stream()
+            with pytest.raises(Exception, match="stream interrupted"):
+                await run_course_structure_generation_job(await self.get_job(db_path))
+
+            assert await self.count(db_path, "milestones") == 1
+            assert await self.count(db_path, "course_tasks") == 1
+
+            mock_stream.return_value = complete_stream()
+            await run_course_structure_generation_job(await self.get_job(db_path))
+
+        assert await self.count(db_path, "milestones") == 2
+        assert await self.count(db_path, "course_milestones") == 2
+        assert await self.count(db_path, "tasks") == 2
+        assert await self.count(db_path, "course_tasks") == 2
+
+        deleted = [
+            call.args[1]
+            for call in mock_manager.publish.call_args_list
+            if call.args[1]["event"] == "structure_items_deleted"
+        ]
+        assert len(deleted) == 1
+        assert len(deleted[0]["module_ids"]) == 1
+
+        details = mock_update.call_args.args[2]
+        assert [module["name"] for module in details["course_structure"]["modules"]] == [
+            "First",
+            "Second",
+        ]
@@ -0,0 +1,179 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from src.api.event_bus import (
+    InProcessEventBus,
+    SQLiteEventBus,
+    create_event_bus,
+)
+
+
+class FakeEventsTable:
+    """The generation events table, shared by the buses of several processes."""
+
+    def __init__(self):
+        self.events = []
+
+    async def add(self, events):
+        for course_id, payload in events:
+            self.events.append((len(self.events) + 1, course_id, payload))
+
+    async def get_after(self, event_id, limit):
+        return [event for event in self.events if event[0] > event_id][:limit]
+
+    async def get_last_id(self):
+        return len(self.events)
+
+
+@pytest.fixture
+def events_table():
+    table = FakeEventsTable()
+
+    with patch("src.api.event_bus.add_generation_events", table.add), patch(
+        "src.api.event_bus.get_generation_events_after", table.get_after
+    ), patch(
+        "src.api.event_bus.get_last_generation_event_id", table.get_last_id
+    ), patch(
+        "src.api.event_bus.delete_generation_events_before", AsyncMock()
+    ):
+        yield table
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+class TestInProcessEventBus:
+    async def test_publish_calls_handler(self):
+        """Test that events are delivered to the publishing process right away."""
+        bus = InProcessEventBus()
+        handler = MagicMock()
+        start_seq = await bus.start(handler)
+
+        bus.publish(1, "event")
+
+        handler.assert_called_once_with(start_seq + 1, 1, "event")
+
+    @patch("src.api.event_bus.time.time")
+    async def test_sequence_numbers_increase_across_restarts(self, mock_time):
+        """Test that events are numbered after the events of earlier runs."""
+        mock_time.return_value = 1000
+        handler = MagicMock()
+
+        assert await InProcessEventBus().start(handler) == 1000000
+
+        mock_time.return_value = 1001
+        bus = InProcessEventBus()
+        await bus.start(handler)
+        bus.publish(1, "event")
+
+        assert handler.call_args.args[0] == 1001001
+
+    async def test_publish_without_handler(self):
+        """Test that publishing without a subscriber does nothing."""
+        bus = InProcessEventBus()
+        await bus.start()
+
+        bus.publish(1, "event")
+
+
+@pytest.mark.asyncio
+class TestSQLiteEventBus:
+    async def test_events_reach_every_process(self, events_table):
+        """Test that events published by one process reach the others in order."""
+        api_handlers = [MagicMock(), MagicMock()]
+        api_buses = [SQLiteEventBus(poll_seconds=0) for _ in api_handlers]
+        for bus, handler in zip(api_buses, api_handlers):
+            await bus.start(handler)
+        worker_bus = SQLiteEventBus(poll_seconds=0)
+        await worker_bus.start()
+
+        worker_bus.publish(1, "first")
+        worker_bus.publish(2, "second")
+        await settle()
+
+        for handler in api_handlers:
+            assert [call.args for call in handler.call_args_list] == [
+                (1, 1, "first"),
+                (2, 2, "second"),
+            ]
+
+        for bus in api_buses + [worker_bus]:
+            await bus.stop()
+
+    async def test_earlier_events_are_not_delivered(self, events_table):
+        """Test that a process only receives events published after it started."""
+        await events_table.add([(1, "old")])
+        handler = MagicMock()
+        bus = SQLiteEventBus(poll_seconds=0)
+
+        assert await bus.start(handler) == 1
+        await settle()
+        await bus.stop()
+
+        handler.assert_not_called()
+
+    async def test_events_are_read_in_batches(self, events_table):
+        """Test that a backlog larger than a batch is read in one poll."""
+        handler = MagicMock()
+        bus = SQLiteEventBus(poll_seconds=60, batch_size=2)
+        bus.handler = handler
+        await events_table.add([(1, str(index)) for index in range(5)])
+
+        await bus.read_new_events()
+
+        assert handler.call_count == 5
+        assert bus.last_event_id == 5
+
+    async def test_stop_writes_pending_events(self, events_table):
+        """Test that events published just before stopping are not lost."""
+        bus = SQLiteEventBus()
+        await bus.start()
+
+        bus.publish(1, "last")
+        await bus.stop()
+
+        assert events_table.events == [(1, 1, "last")]
+
+    async def test_publish_before_start_is_dropped(self, events_table):
+        """Test that publishing on a bus that is not running does not queue events."""
+        bus = SQLiteEventBus()
+
+        bus.publish(1, "event")
+
+        assert bus.pending == []
+
+    async def test_failed_write_is_logged(self, events_table):
+        """Test that a failed write does not stop the writer."""
+        bus = SQLiteEventBus()
+        await bus.start()
+
+        with patch(
+            "src.api.event_bus.add_generation_events",
+            AsyncMock(side_effect=[Exception("database is locked"), None]),
+        ) as mock_add:
+            bus.publish(1, "first")
+            await settle()
+            bus.publish(1, "second")
+            await settle()
+
+        assert mock_add.await_count == 2
+        await bus.stop()
+
+    @patch("src.api.event_bus.delete_generation_events_before")
+    async def test_old_events_are_pruned(self, mock_delete):
+        """Test that events older than the retention are deleted at most once per period."""
+        bus = SQLiteEventBus(retention_seconds=60)
+
+        with patch("src.api.event_bus.time.time", return_value=1000):
+            await bus.prune_events()
+            await bus.prune_events()
+
+        mock_delete.assert_awaited_once_with(940)
+
+
+def test_create_event_bus():
+    assert isinstance(create_event_bus("sqlite"), SQLiteEventBus)
+    assert isinstance(create_event_bus("in_process"), InProcessEventBus)
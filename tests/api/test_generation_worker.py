@@ -0,0 +1,179 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from src.api.generation_worker import GenerationJobWorker, GenerationJobKind
+
+
+def get_worker(**kwargs):
+    options = {
+        "concurrency": 2,
+        "poll_seconds": 0.01,
+        "lease_seconds": 60,
+        "heartbeat_seconds": 60,
+        "timeout_seconds": 5,
+        "max_attempts": 3,
+        "retry_delay_seconds": 10,
+        "worker_id": "worker-1",
+    }
+    options.update(kwargs)
+    return GenerationJobWorker(**options)
+
+
+def get_kind(run, on_failed=None):
+    return GenerationJobKind("task", "jobs", "started", "failed", run, on_failed)
+
+
+@pytest.mark.asyncio
+class TestGenerationJobWorker:
+    """Test running leased generation jobs."""
+
+    @patch("src.api.generation_worker.fail_generation_job")
+    async def test_run_job_success(self, mock_fail):
+        """Test that a job that succeeds is not failed."""
+        run = AsyncMock()
+        job = {"uuid": "job-1", "attempts": 1}
+
+        await get_worker().run_job(get_kind(run), job)
+
+        run.assert_awaited_once_with(job)
+        mock_fail.assert_not_called()
+
+    @patch("src.api.generation_worker.fail_generation_job")
+    async def test_run_job_failure_is_retried_with_backoff(self, mock_fail):
+        """Test that a failed attempt is released with an exponential retry delay."""
+        mock_fail.return_value = False
+        on_failed = AsyncMock()
+        job = {"uuid": "job-1", "attempts": 3}
+
+        await get_worker().run_job(
+            get_kind(AsyncMock(side_effect=ValueError("boom")), on_failed), job
+        )
+
+        mock_fail.assert_awaited_once_with(
+            "jobs", "job-1", "worker-1", "ValueError('boom')", 40, 3, "failed"
+        )
+        on_failed.assert_not_called()
+
+    @patch("src.api.generation_worker.fail_generation_job")
+    async def test_run_job_dead_lettered(self, mock_fail):
+        """Test that the failure handler runs once a job has used all its attempts."""
+        mock_fail.return_value = True
+        on_failed = AsyncMock()
+        job = {"uuid": "job-1", "attempts": 3}
+
+        await get_worker().run_job(
+            get_kind(AsyncMock(side_effect=ValueError("boom")), on_failed), job
+        )
+
+        on_failed.assert_awaited_once_with(job)
+
+    @patch("src.api.generation_worker.renew_generation_job_lease")
+    @patch("src.api.generation_worker.fail_generation_job")
+    async def test_run_job_cancelled_when_lease_lost(self, mock_fail, mock_renew):
+        """Test that a job is abandoned once its lease is held by another worker."""
+        mock_renew.return_value = False
+        cancelled = asyncio.Event()
+
+        async def run(job):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        await get_worker(heartbeat_seconds=0.01).run_job(
+            get_kind(run), {"uuid": "job-1", "attempts": 1}
+        )
+
+        assert cancelled.is_set()
+        mock_fail.assert_not_called()
+
+    @patch("src.api.generation_worker.fail_expired_generation_jobs")
+    @patch("src.api.generation_worker.claim_generation_jobs")
+    async def test_claim_limited_to_free_slots(self, mock_claim, mock_fail_expired):
+        """Test that a worker claims no more jobs than it has free slots."""
+        release = asyncio.Event()
+
+        async def run(job):
+            await release.wait()
+
+        mock_claim.return_value = [{"uuid": "job-1", "attempts": 1}]
+        mock_fail_expired.return_value = []
+        worker = get_worker(concurrency=2)
+
+        with patch(
+            "src.api.generation_worker.generation_job_kinds",
+            [get_kind(run), get_kind(run), get_kind(run)],
+        ):
+            assert await worker.claim() == 2
+
+        assert [call.args[3] for call in mock_claim.await_args_list] == [2, 1]
+
+        release.set()
+        await worker.stop()
+
+    @patch("src.api.generation_worker.renew_generation_job_lease")
+    @patch("src.api.generation_worker.fail_generation_job")
+    async def test_heartbeat_retries_failed_renewal(self, mock_fail, mock_renew):
+        """Test that a failed lease renewal is retried while the lease is still valid."""
+        failures = [Exception("database is locked")]
+
+        async def renew(*args):
+            if failures:
+                raise failures.pop()
+            return True
+
+        mock_renew.side_effect = renew
+
+        async def run(job):
+            await asyncio.sleep(0.05)
+
+        job = {"uuid": "job-1", "attempts": 1}
+        await get_worker(heartbeat_seconds=0.01, lease_seconds=60).run_job(
+            get_kind(run), job
+        )
+
+        assert mock_renew.await_count >= 2
+        assert not job.get("lease_lost")
+        mock_fail.assert_not_called()
+
+    @patch("src.api.generation_worker.renew_generation_job_lease")
+    @patch("src.api.generation_worker.fail_generation_job")
+    async def test_job_cancelled_when_renewal_keeps_failing(self, mock_fail, mock_renew):
+        """Test that a job is abandoned once its lease may have expired."""
+        mock_renew.side_effect = Exception("database is locked")
+        cancelled = asyncio.Event()
+
+        async def run(job):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        job = {"uuid": "job-1", "attempts": 1}
+        await get_worker(heartbeat_seconds=0.01, lease_seconds=0.03).run_job(
+            get_kind(run), job
+        )
+
+        assert cancelled.is_set()
+        assert job["lease_lost"]
+        mock_fail.assert_not_called()
+
+    @patch("src.api.generation_worker.fail_expired_generation_jobs")
+    @patch("src.api.generation_worker.claim_generation_jobs")
+    async def test_expired_jobs_report_failure(self, mock_claim, mock_fail_expired):
+        """Test that jobs dead-lettered after their lease expired report their failure."""
+        job = {"uuid": "job-1", "attempts": 3}
+        mock_fail_expired.return_value = [job]
+        mock_claim.return_value = []
+        on_failed = AsyncMock(side_effect=Exception("websocket down"))
+
+        with patch(
+            "src.api.generation_worker.generation_job_kinds",
+            [get_kind(AsyncMock(), on_failed)],
+        ):
+            assert await get_worker().claim() == 0
+
+        on_failed.assert_awaited_once_with(job)
+        assert mock_fail_expired.await_args.args == ("jobs", "started", "failed", 3)
@@ -1,12 +1,32 @@
+import asyncio
+import httpx
+import openai
 import pytest
+from collections import defaultdict
+from instructor.exceptions import InstructorRetryException
 from unittest.mock import patch, MagicMock, AsyncMock
 from pydantic import BaseModel
+from openai.types.chat import ChatCompletionChunk
 from src.api.llm import (
     is_reasoning_model,
     validate_openai_api_key,
     run_llm_with_instructor,
     stream_llm_with_instructor,
     stream_llm_with_openai,
+    LLMClientRegistry,
+    close_llm_clients,
+    get_cached_prompt_tokens,
+    llm_request_context,
+    LLMPriority,
+    LLMScheduler,
+    TokenBucket,
+    CircuitBreaker,
+    RetryBudget,
+    LLMUnavailableError,
+    is_retryable_llm_error,
+    get_retry_delay,
+    call_llm_with_retries,
+    stream_llm_with_retries,
 )
 
 
@@ -119,11 +139,10 @@ class TestRunLlmWithInstructor:
     class MockResponseModel(BaseModel):
         response: str
 
-    @patch("src.api.llm.instructor.from_openai")
-    @patch("src.api.llm.openai.AsyncOpenAI")
+    @patch("src.api.llm.get_instructor_client")
     @patch("src.api.llm.is_reasoning_model")
     async def test_run_llm_with_instructor_non_reasoning(
-        self, mock_is_reasoning, mock_async_openai, mock_instructor
+        self, mock_is_reasoning, mock_instructor
     ):
         """Test run_llm_with_instructor with non-reasoning model."""
         # Setup mocks
@@ -144,19 +163,17 @@ class TestRunLlmWithInstructor:
 
         # Assertions
         assert result == mock_response
-        mock_async_openai.assert_called_once_with(api_key="test_key")
-        mock_instructor.assert_called_once()
+        mock_instructor.assert_called_once_with("test_key")
         mock_client.chat.completions.create.assert_called_once()
 
         # Check that temperature was set for non-reasoning model
         call_kwargs = mock_client.chat.completions.create.call_args[1]
         assert call_kwargs["temperature"] == 0
 
-    @patch("src.api.llm.instructor.from_openai")
-    @patch("src.api.llm.openai.AsyncOpenAI")
+    @patch("src.api.llm.get_instructor_client")
     @patch("src.api.llm.is_reasoning_model")
     async def test_run_llm_with_instructor_reasoning(
-        self, mock_is_reasoning, mock_async_openai, mock_instructor
+        self, mock_is_reasoning, mock_instructor
     ):
         """Test run_llm_with_instructor with reasoning model."""
         # Setup mocks
@@ -177,8 +194,7 @@ class TestRunLlmWithInstructor:
 
         # Assertions
         assert result == mock_response
-        mock_async_openai.assert_called_once_with(api_key="test_key")
-        mock_instructor.assert_called_once()
+        mock_instructor.assert_called_once_with("test_key")
         mock_client.chat.completions.create.assert_called_once()
 
         # Check that temperature was NOT set for reasoning model
@@ -193,19 +209,21 @@ class TestStreamLlmWithInstructor:
     class MockResponseModel(BaseModel):
         response: str
 
-    @patch("src.api.llm.instructor.from_openai")
-    @patch("src.api.llm.openai.AsyncOpenAI")
+    @patch("src.api.llm.get_instructor_client")
     @patch("src.api.llm.is_reasoning_model")
     async def test_stream_llm_with_instructor_success(
-        self, mock_is_reasoning, mock_async_openai, mock_instructor
+        self, mock_is_reasoning, mock_instructor
     ):
         """Test stream_llm_with_instructor function."""
         # Setup mocks
         mock_is_reasoning.return_value = False
         mock_client = MagicMock()
         mock_instructor.return_value = mock_client
-        mock_stream = AsyncMock()
-        mock_client.chat.completions.create_partial.return_value = mock_stream
+
+        async def mock_stream():
+            yield "chunk"
+
+        mock_client.chat.completions.create_partial.return_value = mock_stream()
 
         # Call the function
         result = await stream_llm_with_instructor(
@@ -218,9 +236,8 @@ class TestStreamLlmWithInstructor:
         )
 
         # Assertions
-        assert result == mock_stream
-        mock_async_openai.assert_called_once_with(api_key="test_key")
-        mock_instructor.assert_called_once()
+        assert [chunk async for chunk in result] == ["chunk"]
+        mock_instructor.assert_called_once_with("test_key")
         mock_client.chat.completions.create_partial.assert_called_once()
 
         # Check that extra kwargs were passed
@@ -229,17 +246,81 @@ class TestStreamLlmWithInstructor:
         assert call_kwargs["stream"] is True
 
 
+    @patch("src.api.llm.get_openai_client")
+    async def test_stream_llm_with_instructor_reports_usage(self, mock_openai_client):
+        """Test that the usage chunk at the end of the stream is reported."""
+
+        def get_chunk(arguments=None, usage=None):
+            chunk = {
+                "id": "1",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "gpt-4",
+                "choices": [],
+                "usage": usage,
+            }
+            if arguments is not None:
+                chunk["choices"] = [
+                    {
+                        "index": 0,
+                        "delta": {
+                            "tool_calls": [
+                                {"index": 0, "function": {"arguments": arguments}}
+                            ]
+                        },
+                    }
+                ]
+            return ChatCompletionChunk.model_validate(chunk)
+
+        async def completion():
+            yield get_chunk('{"response": "Hel')
+            yield get_chunk('lo"}')
+            yield get_chunk(
+                usage={
+                    "prompt_tokens": 100,
+                    "completion_tokens": 5,
+                    "total_tokens": 105,
+                    "prompt_tokens_details": {"cached_tokens": 64},
+                }
+            )
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(return_value=completion())
+        mock_openai_client.return_value = mock_client
+        usages = []
+
+        stream = await stream_llm_with_instructor(
+            api_key="test_key",
+            model="gpt-4",
+            messages=[{"role": "user", "content": "hello"}],
+            response_model=self.MockResponseModel,
+            max_completion_tokens=100,
+            on_usage=usages.append,
+        )
+        chunks = [chunk async for chunk in stream]
+
+        assert chunks[-1].response == "Hello"
+        assert len(usages) == 1
+        assert get_cached_prompt_tokens(usages[0]) == 64
+
+        call_kwargs = mock_client.chat.completions.create.call_args[1]
+        assert call_kwargs["stream"] is True
+        assert call_kwargs["stream_options"] == {"include_usage": True}
+
+
 class TestStreamLlmWithOpenai:
     """Test the stream_llm_with_openai function."""
 
-    @patch("src.api.llm.openai.OpenAI")
+    @patch("src.api.llm.llm_clients")
     @patch("src.api.llm.is_reasoning_model")
-    def test_stream_llm_with_openai_non_reasoning(self, mock_is_reasoning, mock_openai):
+    def test_stream_llm_with_openai_non_reasoning(
+        self, mock_is_reasoning, mock_llm_clients
+    ):
         """Test stream_llm_with_openai with non-reasoning model."""
         # Setup mocks
         mock_is_reasoning.return_value = False
         mock_client = MagicMock()
-        mock_openai.return_value = mock_client
+        mock_llm_clients.get_sync_client.return_value = mock_client
         mock_stream = MagicMock()
         mock_client.chat.completions.create.return_value = mock_stream
 
@@ -253,7 +334,7 @@ class TestStreamLlmWithOpenai:
 
         # Assertions
         assert result == mock_stream
-        mock_openai.assert_called_once_with(api_key="test_key")
+        mock_llm_clients.get_sync_client.assert_called_once_with("test_key")
         mock_client.chat.completions.create.assert_called_once()
 
         # Check that temperature was set and stream is True
@@ -261,14 +342,16 @@ class TestStreamLlmWithOpenai:
         assert call_kwargs["temperature"] == 0
         assert call_kwargs["stream"] is True
 
-    @patch("src.api.llm.openai.OpenAI")
+    @patch("src.api.llm.llm_clients")
     @patch("src.api.llm.is_reasoning_model")
-    def test_stream_llm_with_openai_reasoning(self, mock_is_reasoning, mock_openai):
+    def test_stream_llm_with_openai_reasoning(
+        self, mock_is_reasoning, mock_llm_clients
+    ):
         """Test stream_llm_with_openai with reasoning model."""
         # Setup mocks
         mock_is_reasoning.return_value = True
         mock_client = MagicMock()
-        mock_openai.return_value = mock_client
+        mock_llm_clients.get_sync_client.return_value = mock_client
         mock_stream = MagicMock()
         mock_client.chat.completions.create.return_value = mock_stream
 
@@ -282,10 +365,520 @@ class TestStreamLlmWithOpenai:
 
         # Assertions
         assert result == mock_stream
-        mock_openai.assert_called_once_with(api_key="test_key")
+        mock_llm_clients.get_sync_client.assert_called_once_with("test_key")
         mock_client.chat.completions.create.assert_called_once()
 
         # Check that temperature was NOT set for reasoning model
         call_kwargs = mock_client.chat.completions.create.call_args[1]
         assert "temperature" not in call_kwargs
         assert call_kwargs["stream"] is True
+
+
+@pytest.mark.asyncio
+class TestLLMClientRegistry:
+    """Test the shared OpenAI client registry."""
+
+    async def test_async_client_reused_per_api_key(self):
+        """Test that the same client is returned for the same api key."""
+        registry = LLMClientRegistry(10, 5, 30)
+
+        client = registry.get_async_client("key_1")
+
+        assert registry.get_async_client("key_1") is client
+        assert registry.get_async_client("key_2") is not client
+        assert client.api_key == "key_1"
+
+        await registry.close()
+
+    async def test_instructor_client_wraps_shared_client(self):
+        """Test that the instructor client is cached along with its openai client."""
+        registry = LLMClientRegistry(10, 5, 30)
+
+        instructor_client = registry.get_instructor_client("key")
+
+        assert registry.get_instructor_client("key") is instructor_client
+        assert instructor_client.client is registry.get_async_client("key")
+
+        await registry.close()
+
+    async def test_closed_client_is_replaced(self):
+        """Test that a fresh client is created once the shared one is closed."""
+        registry = LLMClientRegistry(10, 5, 30)
+
+        client = registry.get_async_client("key")
+        await client.close()
+
+        new_client = registry.get_async_client("key")
+        assert new_client is not client
+        assert registry.get_instructor_client("key").client is new_client
+
+        await registry.close()
+
+    async def test_close(self):
+        """Test that close shuts every client down and empties the registry."""
+        registry = LLMClientRegistry(10, 5, 30)
+        async_client = registry.get_async_client("key")
+        sync_client = registry.get_sync_client("key")
+
+        await registry.close()
+
+        assert async_client.is_closed()
+        assert sync_client.is_closed()
+        assert registry.get_async_client("key") is not async_client
+
+        await registry.close()
+
+    def test_async_client_recreated_on_new_event_loop(self):
+        """Test that clients bound to one event loop are not reused on another."""
+        registry = LLMClientRegistry(10, 5, 30)
+
+        async def get_client():
+            return registry.get_async_client("key")
+
+        first = asyncio.run(get_client())
+        second = asyncio.run(get_client())
+
+        assert first is not second
+
+    def test_sync_client_pool_limits(self):
+        """Test that sync clients share a pool configured with the registry limits."""
+        registry = LLMClientRegistry(10, 5, 30)
+
+        client = registry.get_sync_client("key")
+
+        assert registry.get_sync_client("key") is client
+        assert registry.limits.max_connections == 10
+        assert registry.limits.max_keepalive_connections == 5
+        client.close()
+
+    @patch("src.api.llm.llm_clients")
+    async def test_close_llm_clients(self, mock_llm_clients):
+        """Test that close_llm_clients closes the module level registry."""
+        mock_llm_clients.close = AsyncMock()
+
+        await close_llm_clients()
+
+        mock_llm_clients.close.assert_awaited_once()
+
+
+def make_scheduler(**kwargs):
+    config = {
+        "requests_per_minute": 1000,
+        "tokens_per_minute": 1_000_000,
+        "org_requests_per_minute": 1000,
+        "org_tokens_per_minute": 1_000_000,
+        "model_max_concurrency": {"default": 4},
+        "background_share": 0.5,
+    }
+    config.update(kwargs)
+    return LLMScheduler(**config)
+
+
+class TestTokenBucket:
+    def test_wait_time(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated_at
+
+        assert bucket.wait_time(60, now) == 0
+        bucket.take(60)
+        assert bucket.wait_time(1, now) == pytest.approx(1)
+        assert bucket.wait_time(1, now + 1) == 0
+
+    def test_reserve_is_kept(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated_at
+
+        assert bucket.wait_time(30, now, reserve=0.5) == 0
+        assert bucket.wait_time(31, now, reserve=0.5) == 0
+        bucket.take(30)
+        assert bucket.wait_time(1, now, reserve=0.5) == pytest.approx(1)
+        assert bucket.wait_time(1, now) == 0
+
+    def test_oversized_request_is_capped(self):
+        bucket = TokenBucket(60)
+
+        assert bucket.wait_time(1000, bucket.updated_at) == 0
+
+
+class TestLLMScheduler:
+    async def test_interactive_goes_ahead_of_queued_background(self):
+        scheduler = make_scheduler(
+            model_max_concurrency={"default": 1}, background_share=1
+        )
+        first = await scheduler.acquire("m", 10, LLMPriority.BACKGROUND)
+
+        order = []
+
+        async def call(priority):
+            ticket = await scheduler.acquire("m", 10, priority)
+            order.append(priority)
+            scheduler.release(ticket)
+
+        background = asyncio.create_task(call(LLMPriority.BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call(LLMPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+
+        assert scheduler.stats()["queued"] == {"background": 1, "interactive": 1}
+
+        scheduler.release(first)
+        await asyncio.gather(background, interactive)
+
+        assert order == [LLMPriority.INTERACTIVE, LLMPriority.BACKGROUND]
+
+    async def test_background_leaves_slots_for_interactive(self):
+        scheduler = make_scheduler()
+        background = [
+            await scheduler.acquire("m", 10, LLMPriority.BACKGROUND) for _ in range(2)
+        ]
+
+        waiting = asyncio.create_task(
+            scheduler.acquire("m", 10, LLMPriority.BACKGROUND)
+        )
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        interactive = await asyncio.wait_for(
+            scheduler.acquire("m", 10, LLMPriority.INTERACTIVE), timeout=1
+        )
+        assert scheduler.stats()["in_flight"] == {"m": 3}
+
+        scheduler.release(background[0])
+        await asyncio.wait_for(waiting, timeout=1)
+
+        for ticket in background[1:] + [interactive, waiting.result()]:
+            scheduler.release(ticket)
+        assert scheduler.stats()["in_flight"] == {}
+
+    async def test_concurrency_is_per_model(self):
+        scheduler = make_scheduler(model_max_concurrency={"default": 1, "big": 2})
+
+        await scheduler.acquire("small", 10)
+        await asyncio.wait_for(scheduler.acquire("other", 10), timeout=1)
+        await asyncio.wait_for(scheduler.acquire("big", 10), timeout=1)
+        await asyncio.wait_for(scheduler.acquire("big", 10), timeout=1)
+
+        assert scheduler.stats()["in_flight"] == {"small": 1, "other": 1, "big": 2}
+
+    async def test_org_token_limit(self):
+        scheduler = make_scheduler(org_tokens_per_minute=600)
+
+        await scheduler.acquire("m", 600, org_id=1)
+        waiting = asyncio.create_task(scheduler.acquire("m", 60, org_id=1))
+        await asyncio.sleep(0)
+
+        # another org is not held back by the first one's limit
+        await asyncio.wait_for(scheduler.acquire("m", 600, org_id=2), timeout=1)
+        assert not waiting.done()
+
+        # 60 tokens refill in 6 seconds at 600 per minute
+        assert scheduler._timer is not None
+        waiting.cancel()
+
+    async def test_cancelled_waiter_is_dropped(self):
+        scheduler = make_scheduler(model_max_concurrency={"default": 1})
+        first = await scheduler.acquire("m", 10)
+
+        waiting = asyncio.create_task(scheduler.acquire("m", 10))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        scheduler.release(first)
+
+        assert scheduler.stats()["queued"] == {}
+        assert scheduler.stats()["in_flight"] == {}
+
+    async def test_request_context(self):
+        scheduler = make_scheduler()
+
+        with llm_request_context(LLMPriority.BACKGROUND, org_id=7):
+            ticket = await scheduler.acquire("m", 10)
+
+        assert ticket.priority == LLMPriority.BACKGROUND
+        assert ticket.org_id == 7
+
+        ticket = await scheduler.acquire("m", 10)
+        assert ticket.priority == LLMPriority.INTERACTIVE
+        assert ticket.org_id is None
+
+    async def test_stats(self):
+        scheduler = make_scheduler()
+
+        scheduler.release(await scheduler.acquire("m", 10))
+
+        stats = scheduler.stats()
+        assert stats["admitted"] == {"interactive": 1}
+        assert stats["mean_queue_ms"]["interactive"] >= 0
+        assert stats["max_queue_ms"]["interactive"] >= 0
+
+    @patch("src.api.llm.get_instructor_client")
+    async def test_stream_holds_slot_until_exhausted(self, mock_instructor):
+        scheduler = make_scheduler()
+
+        async def mock_stream():
+            yield "chunk"
+
+        mock_instructor.return_value.chat.completions.create_partial.return_value = (
+            mock_stream()
+        )
+
+        with patch("src.api.llm.llm_scheduler", scheduler):
+            stream = await stream_llm_with_instructor(
+                api_key="test_key",
+                model="gpt-4",
+                messages=[{"role": "user", "content": "hello"}],
+                response_model=TestStreamLlmWithInstructor.MockResponseModel,
+                max_completion_tokens=100,
+            )
+
+            assert scheduler.stats()["in_flight"] == {"gpt-4": 1}
+            assert [chunk async for chunk in stream] == ["chunk"]
+            assert scheduler.stats()["in_flight"] == {}
+
+
+def make_status_error(status_code, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, request=request, headers=headers)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+@pytest.fixture
+def llm_breakers():
+    breakers = defaultdict(lambda: CircuitBreaker(2, 30))
+
+    with patch("src.api.llm.llm_circuit_breakers", breakers), patch(
+        "src.api.llm.llm_retry_budget", RetryBudget(0.2, 10)
+    ), patch("src.api.llm.llm_fallback_models", {"primary": "fallback"}), patch(
+        "src.api.llm.get_retry_delay", return_value=0
+    ):
+        yield breakers
+
+
+class TestLLMErrorClassification:
+    def test_retryable_errors(self):
+        request = httpx.Request("POST", "https://api.openai.com")
+
+        assert is_retryable_llm_error(make_status_error(500)) is True
+        assert is_retryable_llm_error(make_status_error(429)) is True
+        assert is_retryable_llm_error(openai.APIConnectionError(request=request))
+        assert is_retryable_llm_error(httpx.ReadError("reset"))
+        assert is_retryable_llm_error(
+            InstructorRetryException(
+                make_status_error(503), n_attempts=1, total_usage=0
+            )
+        )
+
+    def test_non_retryable_errors(self):
+        assert is_retryable_llm_error(make_status_error(400)) is False
+        assert is_retryable_llm_error(make_status_error(401)) is False
+        assert is_retryable_llm_error(ValueError("invalid")) is False
+        assert not is_retryable_llm_error(
+            InstructorRetryException(
+                ValueError("invalid"), n_attempts=1, total_usage=0
+            )
+        )
+
+    def test_retry_delay_respects_retry_after(self):
+        delay = get_retry_delay(make_status_error(429, {"retry-after": "3"}), 1)
+
+        assert delay == 3
+
+
+class TestRetryBudget:
+    def test_retries_are_capped(self):
+        budget = RetryBudget(0.5, 1)
+
+        assert budget.try_spend() is True
+        assert budget.try_spend() is False
+
+        budget.record_call()
+        budget.record_call()
+        assert budget.try_spend() is True
+        assert budget.try_spend() is False
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(2, 30)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.allow() is True
+
+        breaker.record_failure()
+        assert breaker.allow() is False
+
+    def test_single_trial_after_reset(self):
+        breaker = CircuitBreaker(1, 30)
+        breaker.record_failure()
+        breaker.opened_at -= 30
+
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+
+        breaker.record_success()
+        assert breaker.allow() is True
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(2, 30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.opened_at -= 30
+
+        assert breaker.allow() is True
+        breaker.record_failure()
+        assert breaker.allow() is False
+
+
+class TestCallLlmWithRetries:
+    async def test_transient_failure_is_retried(self, llm_breakers):
+        call = AsyncMock(side_effect=[make_status_error(503), "output"])
+
+        assert await call_llm_with_retries(call, "primary") == "output"
+        assert call.call_count == 2
+        assert llm_breakers["primary"].failures == 0
+
+    async def test_invalid_request_is_not_retried(self, llm_breakers):
+        call = AsyncMock(side_effect=make_status_error(400))
+
+        with pytest.raises(openai.APIStatusError):
+            await call_llm_with_retries(call, "primary")
+
+        assert call.call_count == 1
+        assert llm_breakers["primary"].failures == 0
+
+    async def test_attempts_are_capped(self, llm_breakers):
+        call = AsyncMock(side_effect=make_status_error(503))
+
+        with patch("src.api.llm.llm_max_attempts", 2), pytest.raises(
+            openai.APIStatusError
+        ):
+            await call_llm_with_retries(call, "primary")
+
+        assert call.call_count == 2
+
+    async def test_open_circuit_falls_back(self, llm_breakers):
+        llm_breakers["primary"].record_failure()
+        llm_breakers["primary"].record_failure()
+        call = AsyncMock(return_value="output")
+
+        assert await call_llm_with_retries(call, "primary") == "output"
+        call.assert_called_once_with("fallback")
+
+    async def test_fails_fast_without_fallback(self, llm_breakers):
+        for model in ["primary", "fallback"]:
+            llm_breakers[model].record_failure()
+            llm_breakers[model].record_failure()
+        call = AsyncMock()
+
+        with pytest.raises(LLMUnavailableError):
+            await call_llm_with_retries(call, "primary")
+
+        call.assert_not_called()
+
+    async def test_hedged_call(self, llm_breakers):
+        calls = []
+
+        async def call(model):
+            calls.append(model)
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return len(calls)
+
+        result = await asyncio.wait_for(
+            call_llm_with_retries(call, "primary", hedge_after=0.01), timeout=1
+        )
+
+        assert result == 2
+        assert calls == ["primary", "primary"]
+
+
+class TestStreamLlmWithRetries:
+    async def test_failure_before_first_chunk_is_retried(self, llm_breakers):
+        attempts = []
+
+        async def stream(fail):
+            if fail:
+                raise httpx.ReadError("reset")
+            yield "chunk"
+
+        async def open_stream(model):
+            attempts.append(model)
+            return stream(len(attempts) == 1)
+
+        chunks = [
+            chunk async for chunk in await stream_llm_with_retries(
+                open_stream, "primary"
+            )
+        ]
+
+        assert chunks == ["chunk"]
+        assert len(attempts) == 2
+
+    async def test_failure_after_first_chunk_is_raised(self, llm_breakers):
+        attempts = []
+
+        async def stream():
+            yield "chunk"
+            raise httpx.ReadError("reset")
+
+        async def open_stream(model):
+            attempts.append(model)
+            return stream()
+
+        chunks = []
+        with pytest.raises(httpx.ReadError):
+            async for chunk in await stream_llm_with_retries(open_stream, "primary"):
+                chunks.append(chunk)
+
+        assert chunks == ["chunk"]
+        assert len(attempts) == 1
+        assert llm_breakers["primary"].failures == 1
+
+    @patch("src.api.llm.get_instructor_client")
+    async def test_reopened_stream_keeps_the_request_context(
+        self, mock_instructor, llm_breakers
+    ):
+        """Test that a stream reopened while it is consumed outside of its context is still admitted as background work of the org."""
+        scheduler = make_scheduler()
+
+        async def failing_stream():
+            raise httpx.ReadError("reset")
+            yield
+
+        async def complete_stream():
+            yield "chunk"
+
+        mock_instructor.return_value.chat.completions.create_partial.side_effect = [
+            failing_stream(),
+            complete_stream(),
+        ]
+        tickets = []
+        acquire = scheduler.acquire
+
+        async def record_acquire(*args, **kwargs):
+            ticket = await acquire(*args, **kwargs)
+            tickets.append(ticket)
+            return ticket
+
+        with patch("src.api.llm.llm_scheduler", scheduler), patch.object(
+            scheduler, "acquire", record_acquire
+        ):
+            with llm_request_context(LLMPriority.BACKGROUND, 7):
+                stream = await stream_llm_with_instructor(
+                    api_key="test_key",
+                    model="primary",
+                    messages=[{"role": "user", "content": "hello"}],
+                    response_model=TestStreamLlmWithInstructor.MockResponseModel,
+                    max_completion_tokens=100,
+                )
+
+            assert [chunk async for chunk in stream] == ["chunk"]
+
+        assert [(ticket.priority, ticket.org_id) for ticket in tickets] == [
+            (LLMPriority.BACKGROUND, 7),
+            (LLMPriority.BACKGROUND, 7),
+        ]
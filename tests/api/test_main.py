@@ -10,16 +10,25 @@ class TestLifespan:
 
     @patch("src.api.main.scheduler")
     @patch("src.api.main.os.makedirs")
-    @patch("src.api.main.asyncio.create_task")
+    @patch("src.api.main.generation_worker")
+    @patch("src.api.main.websocket_manager")
     @patch("src.api.main.settings")
     async def test_lifespan_startup_and_shutdown(
-        self, mock_settings, mock_create_task, mock_makedirs, mock_scheduler
+        self,
+        mock_settings,
+        mock_websocket_manager,
+        mock_generation_worker,
+        mock_makedirs,
+        mock_scheduler,
     ):
         """Test the lifespan context manager startup and shutdown."""
         from src.api.main import lifespan
 
         # Setup mocks
         mock_settings.local_upload_folder = "/test/uploads"
+        mock_generation_worker.stop = AsyncMock()
+        mock_websocket_manager.start = AsyncMock()
+        mock_websocket_manager.stop = AsyncMock()
         mock_app = MagicMock()
 
         # Test the lifespan context manager
@@ -27,10 +36,38 @@ class TestLifespan:
             # Verify startup actions
             mock_scheduler.start.assert_called_once()
             mock_makedirs.assert_called_once_with("/test/uploads", exist_ok=True)
-            assert mock_create_task.call_count == 2  # Two async tasks created
+            mock_generation_worker.start.assert_called_once()
+            mock_websocket_manager.start.assert_awaited_once()
 
         # Verify shutdown actions
         mock_scheduler.shutdown.assert_called_once()
+        mock_generation_worker.stop.assert_awaited_once()
+        mock_websocket_manager.stop.assert_awaited_once()
+
+    @patch("src.api.main.scheduler")
+    @patch("src.api.main.os.makedirs")
+    @patch("src.api.main.generation_worker")
+    @patch("src.api.main.generation_worker_mode", "external")
+    @patch("src.api.main.websocket_manager")
+    @patch("src.api.main.settings")
+    async def test_lifespan_external_generation_worker(
+        self,
+        mock_settings,
+        mock_websocket_manager,
+        mock_generation_worker,
+        mock_makedirs,
+        mock_scheduler,
+    ):
+        """Test that the generation worker is not started in external mode."""
+        from src.api.main import lifespan
+
+        mock_settings.local_upload_folder = "/test/uploads"
+        mock_generation_worker.stop = AsyncMock()
+        mock_websocket_manager.start = AsyncMock()
+        mock_websocket_manager.stop = AsyncMock()
+
+        async with lifespan(MagicMock()):
+            mock_generation_worker.start.assert_not_called()
 
 
 class TestAppConfiguration:
@@ -0,0 +1,70 @@
+from src.api.prompts import (
+    build_chat_messages,
+    get_chat_system_prompt,
+    get_task_context_for_prompt,
+    knowledge_base_instructions,
+    QuestionType,
+    TaskType,
+)
+
+
+class TestChatSystemPrompt:
+    def test_prompt_is_built_once_per_variant(self):
+        prompt = get_chat_system_prompt(
+            TaskType.QUIZ, QuestionType.OBJECTIVE, "format", True
+        )
+
+        assert prompt is get_chat_system_prompt(
+            TaskType.QUIZ, QuestionType.OBJECTIVE, "format", True
+        )
+        assert "Task solution" in prompt
+        assert "format" in prompt
+
+    def test_knowledge_base_instructions(self):
+        with_knowledge_base = get_chat_system_prompt(
+            TaskType.QUIZ, QuestionType.OPEN_ENDED, "format", True
+        )
+        without_knowledge_base = get_chat_system_prompt(
+            TaskType.QUIZ, QuestionType.OPEN_ENDED, "format", False
+        )
+
+        assert "Scoring Criteria" in with_knowledge_base
+        assert knowledge_base_instructions in with_knowledge_base
+        assert knowledge_base_instructions not in without_knowledge_base
+
+    def test_learning_material_prompt(self):
+        prompt = get_chat_system_prompt(
+            TaskType.LEARNING_MATERIAL, None, "format", False
+        )
+
+        assert prompt.startswith("You are a teaching assistant.")
+
+
+class TestBuildChatMessages:
+    def test_task_context(self):
+        assert get_task_context_for_prompt("details") == "details"
+        assert get_task_context_for_prompt("details", "facts") == (
+            "details\n\nKnowledge Base:\n```\nfacts\n```"
+        )
+
+    def test_stable_parts_come_first(self):
+        history = [
+            {"role": "user", "content": "answer"},
+            {"role": "assistant", "content": "feedback"},
+        ]
+        latest = {"role": "user", "content": "latest"}
+
+        messages = build_chat_messages("system", "context", history, latest, "summary")
+
+        assert messages[0] == {"role": "system", "content": "system"}
+        assert messages[1] == {"role": "user", "content": "context"}
+        assert "summary" in messages[2]["content"]
+        assert messages[3:] == history + [latest]
+
+    def test_without_system_prompt_or_summary(self):
+        latest = {"role": "user", "content": "latest"}
+
+        assert build_chat_messages(None, "context", [], latest) == [
+            {"role": "user", "content": "context"},
+            latest,
+        ]
@@ -113,10 +113,10 @@ class TestGetTasksForCourse:
     @patch("src.api.public.get_course_org_id")
     @patch("src.api.public.validate_api_key")
     @patch("src.api.public.get_course_from_db")
-    @patch("src.api.public.get_task_from_db")
+    @patch("src.api.public.get_tasks_bulk")
     def test_get_tasks_for_course_success_learning_material(
         self,
-        mock_get_task,
+        mock_get_tasks_bulk,
         mock_get_course,
         mock_validate,
         mock_get_course_org_id,
@@ -166,8 +166,8 @@ class TestGetTasksForCourse:
         mock_get_course.return_value = mock_course_data
 
         # Mock task details
-        mock_get_task.side_effect = [
-            {
+        mock_get_tasks_bulk.return_value = {
+            1: {
                 "id": 1,
                 "blocks": [
                     {
@@ -176,7 +176,7 @@ class TestGetTasksForCourse:
                     }
                 ],
             },  # Learning material
-            {
+            2: {
                 "id": 2,
                 "questions": [
                     {
@@ -195,7 +195,7 @@ class TestGetTasksForCourse:
                     }
                 ],
             },  # Quiz
-        ]
+        }
 
         # Make request
         response = client.get("/course/1", headers={"api-key": "valid_key"})
@@ -209,6 +209,7 @@ class TestGetTasksForCourse:
         assert "blocks" in result["milestones"][0]["tasks"][0]
         assert "questions" in result["milestones"][0]["tasks"][1]
         assert result["milestones"][0]["tasks"][1]["questions"][0]["title"] == "question"
+        mock_get_tasks_bulk.assert_called_once_with([1, 2])
 
     @patch("src.api.public.get_org_id_from_api_key")
     def test_get_tasks_for_course_invalid_api_key(self, mock_get_org_id):
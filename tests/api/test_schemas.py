@@ -0,0 +1,58 @@
+from src.api.schemas import (
+    get_chat_response_model,
+    get_format_instructions,
+    get_json_schema,
+    get_response_model,
+    get_task_generation_model,
+    LearningMaterial,
+    LearningMaterialResponse,
+    ObjectiveQuestionFeedback,
+    QuestionType,
+    Quiz,
+    RouterDecision,
+    SubjectiveQuestionFeedback,
+    TaskType,
+)
+
+
+class TestResponseModelRegistry:
+    def test_response_model_is_built_once(self):
+        response_model = get_response_model(RouterDecision)
+
+        assert response_model is get_response_model(RouterDecision)
+        assert issubclass(response_model, RouterDecision)
+        assert response_model.openai_schema is response_model.openai_schema
+        assert response_model.openai_schema["name"] == "RouterDecision"
+
+    def test_response_model_validates_like_the_model(self):
+        response_model = get_response_model(RouterDecision)
+
+        decision = response_model(use_reasoning_model=True)
+
+        assert isinstance(decision, RouterDecision)
+        assert decision.use_reasoning_model is True
+
+    def test_json_schema_and_format_instructions_are_cached(self):
+        assert get_json_schema(Quiz) is get_json_schema(Quiz)
+        assert get_format_instructions(Quiz) is get_format_instructions(Quiz)
+        assert "questions" in get_format_instructions(Quiz)
+
+
+class TestModelSelection:
+    def test_chat_response_model(self):
+        assert (
+            get_chat_response_model(TaskType.LEARNING_MATERIAL, None)
+            is LearningMaterialResponse
+        )
+        assert (
+            get_chat_response_model(TaskType.QUIZ, QuestionType.OBJECTIVE)
+            is ObjectiveQuestionFeedback
+        )
+        assert (
+            get_chat_response_model(TaskType.QUIZ, QuestionType.OPEN_ENDED)
+            is SubjectiveQuestionFeedback
+        )
+
+    def test_task_generation_model(self):
+        assert get_task_generation_model("learning_material") is LearningMaterial
+        assert get_task_generation_model("quiz") is Quiz
@@ -0,0 +1,345 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from src.api.ws_manager import (
+    ConnectionManager,
+    SLOW_CONSUMER_CLOSE_CODE,
+    closing_connections,
+)
+
+
+def make_websocket(send_text=None):
+    websocket = MagicMock()
+    websocket.accept = AsyncMock()
+    websocket.close = AsyncMock()
+    websocket.send_text = AsyncMock(side_effect=send_text)
+    return websocket
+
+
+async def block_forever(message):
+    await asyncio.Event().wait()
+
+
+async def start_manager(**kwargs):
+    manager = ConnectionManager(**kwargs)
+    await manager.start()
+    return manager
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture(autouse=True)
+async def stop_senders():
+    yield
+
+    for task in asyncio.all_tasks():
+        if task.get_coro().__qualname__ == "ClientConnection.send_messages":
+            task.cancel()
+    await settle()
+
+
+@pytest.mark.asyncio
+class TestConnectionManager:
+    """Test fanning course generation updates out to websocket clients."""
+
+    async def test_publish_sends_serialized_update_to_every_client(self):
+        """Test that an update is serialized once and reaches every client."""
+        manager = await start_manager()
+        websockets = [make_websocket(), make_websocket()]
+        for websocket in websockets:
+            await manager.connect(websocket, 1)
+        other = make_websocket()
+        await manager.connect(other, 2)
+
+        manager.publish(1, {"event": "task_completed", "name": "é"})
+        await settle()
+
+        for websocket in websockets:
+            websocket.send_text.assert_awaited_once_with(
+                f'{{"event":"task_completed","name":"é","seq":{manager.last_seq}}}'
+            )
+        other.send_text.assert_not_called()
+
+    async def test_publish_does_not_wait_for_clients(self):
+        """Test that a blocked client delays neither the publisher nor other clients."""
+        manager = await start_manager()
+        blocked = asyncio.Event()
+
+        async def send_text(message):
+            await blocked.wait()
+
+        slow = make_websocket(send_text)
+        fast = make_websocket()
+        await manager.connect(slow, 1)
+        await manager.connect(fast, 1)
+
+        manager.publish(1, {"event": "first"})
+        manager.publish(1, {"event": "second"})
+        await settle()
+
+        assert fast.send_text.await_count == 2
+        assert slow.send_text.await_count == 1
+        blocked.set()
+        await settle()
+        assert slow.send_text.await_count == 2
+
+    async def test_client_that_times_out_is_dropped(self):
+        """Test that a client that does not accept a message in time is disconnected."""
+        manager = await start_manager(send_timeout=0.01)
+        slow = make_websocket(block_forever)
+        await manager.connect(slow, 1)
+
+        manager.publish(1, {"event": "first"})
+        await asyncio.sleep(0.05)
+
+        assert manager.active_connections == {}
+        slow.close.assert_awaited_once()
+
+    async def test_client_with_full_queue_is_evicted(self):
+        """Test that a client that falls too far behind is evicted."""
+        manager = await start_manager(max_messages=1)
+        slow = make_websocket(block_forever)
+        fast = make_websocket()
+        await manager.connect(slow, 1)
+        await manager.connect(fast, 1)
+
+        for index in range(3):
+            manager.publish(1, {"index": index})
+            await settle()
+
+        assert list(manager.active_connections[1]) == [fast]
+        assert fast.send_text.await_count == 3
+        slow.close.assert_awaited_once_with(code=SLOW_CONSUMER_CLOSE_CODE)
+
+    async def test_evicted_client_is_kept_until_closed(self):
+        """Test that the close of an evicted client is referenced until it finishes."""
+        manager = await start_manager(max_messages=1)
+        closed = asyncio.Event()
+
+        async def close(code):
+            await closed.wait()
+
+        slow = make_websocket(block_forever)
+        slow.close = AsyncMock(side_effect=close)
+        await manager.connect(slow, 1)
+
+        for index in range(3):
+            manager.publish(1, {"index": index})
+            await settle()
+
+        assert len(closing_connections) == 1
+
+        closed.set()
+        await settle()
+
+        assert closing_connections == {}
+        slow.close.assert_awaited_once_with(code=SLOW_CONSUMER_CLOSE_CODE)
+
+    async def test_disconnect(self):
+        """Test that disconnecting stops sending to the client."""
+        manager = await start_manager()
+        websocket = make_websocket()
+        await manager.connect(websocket, 1)
+
+        manager.disconnect(websocket, 1)
+        manager.disconnect(websocket, 1)
+        manager.publish(1, {"event": "first"})
+        await settle()
+
+        assert manager.active_connections == {}
+        websocket.send_text.assert_not_called()
+
+    async def test_failed_send_drops_client(self):
+        """Test that a client whose connection broke is removed."""
+        manager = await start_manager()
+        websocket = make_websocket(Exception("connection closed"))
+        await manager.connect(websocket, 1)
+
+        await manager.send_item_update(1, {"event": "first"})
+        await settle()
+
+        assert manager.active_connections == {}
+
+    async def test_updates_go_through_the_event_bus(self):
+        """Test that updates are published on the bus and delivered from it."""
+        bus = MagicMock()
+        bus.start = AsyncMock(return_value=10)
+        manager = ConnectionManager(bus)
+        await manager.start()
+        websocket = make_websocket()
+        await manager.connect(websocket, 1)
+
+        manager.publish(1, {"event": "first"})
+
+        bus.publish.assert_called_once_with(1, '{"event":"first"}')
+        websocket.send_text.assert_not_called()
+
+        bus.start.call_args.args[0](11, 1, '{"event":"first"}')
+        await settle()
+        websocket.send_text.assert_awaited_once_with('{"event":"first","seq":11}')
+
+    async def test_publish_only_manager_does_not_receive(self):
+        """Test that processes without clients start the bus without a handler."""
+        bus = MagicMock()
+        bus.start = AsyncMock(return_value=0)
+
+        await ConnectionManager(bus).start(receive=False)
+
+        bus.start.assert_awaited_once_with(None)
+
+
+def event(name, **fields):
+    return json.dumps({"event": name, **fields})
+
+
+async def start_replay_manager(**kwargs):
+    bus = MagicMock()
+    bus.start = AsyncMock(return_value=10)
+    manager = ConnectionManager(bus, **kwargs)
+    await manager.start()
+    return manager
+
+
+async def get_sent(manager, course_id, since, protocol=1):
+    websocket = make_websocket()
+    await manager.connect(websocket, course_id, since, protocol)
+    await settle()
+    return [json.loads(call.args[0]) for call in websocket.send_text.await_args_list]
+
+
+@pytest.mark.asyncio
+class TestEventReplay:
+    """Test resuming course generation updates after missing some of them."""
+
+    async def test_resume_replays_missed_events(self):
+        """Test that a client resuming gets the events after the last one it received."""
+        manager = await start_replay_manager()
+        manager.deliver(11, 1, event("course_structure_completed"))
+        manager.deliver(12, 2, event("other_course"))
+        manager.deliver(13, 1, event("structure_items_created"))
+
+        assert await get_sent(manager, 1, 11) == [
+            {"event": "structure_items_created", "seq": 13}
+        ]
+        assert [item["seq"] for item in await get_sent(manager, 1, 10)] == [11, 13]
+        assert await get_sent(manager, 1, 13) == []
+
+    async def test_connect_without_since_does_not_replay(self):
+        """Test that new clients only get new events."""
+        manager = await start_replay_manager()
+        manager.deliver(11, 1, event("course_structure_completed"))
+
+        assert await get_sent(manager, 1, None) == []
+
+    async def test_course_without_events_since_start(self):
+        """Test that resuming a course without new events replays nothing."""
+        manager = await start_replay_manager()
+
+        assert await get_sent(manager, 1, 10) == []
+
+    @pytest.mark.parametrize("since", [5, 20])
+    async def test_unknown_position_requires_resync(self, since):
+        """Test that clients resuming from before the start or after the latest event resync."""
+        manager = await start_replay_manager()
+        manager.deliver(11, 1, event("course_structure_completed"))
+        manager.deliver(12, 1, event("structure_items_created"))
+
+        sent = await get_sent(manager, 1, since)
+
+        assert sent == [{"event": "resync_required", "seq": 12}]
+
+    async def test_truncated_buffer_requires_resync(self):
+        """Test that a client that missed more than the buffer holds resyncs."""
+        manager = await start_replay_manager(replay_buffer_size=2)
+        for seq in [11, 12, 13]:
+            manager.deliver(seq, 1, event("structure_items_created"))
+
+        assert await get_sent(manager, 1, 10) == [
+            {"event": "resync_required", "seq": 13}
+        ]
+        assert [item["seq"] for item in await get_sent(manager, 1, 11)] == [12, 13]
+
+    async def test_dropped_course_buffer_requires_resync(self):
+        """Test that the least recently updated course is dropped to bound memory."""
+        manager = await start_replay_manager(replay_max_courses=2)
+        manager.deliver(11, 1, event("first"))
+        manager.deliver(12, 2, event("second"))
+        manager.deliver(13, 3, event("third"))
+
+        assert list(manager.event_buffers) == [2, 3]
+        assert (await get_sent(manager, 1, 10))[0]["event"] == "resync_required"
+        assert await get_sent(manager, 1, 11) == []
+        assert [item["seq"] for item in await get_sent(manager, 2, 10)] == [12]
+
+    async def test_consecutive_task_completed_events_are_coalesced(self):
+        """Test that a burst of task completions is replayed as one event."""
+        manager = await start_replay_manager()
+        manager.deliver(11, 1, event("structure_items_created"))
+        for seq, task_id in [(12, 1), (13, 2), (14, 3)]:
+            manager.deliver(
+                seq,
+                1,
+                event("task_completed", task={"id": task_id}, total_completed=task_id),
+            )
+
+        assert await get_sent(manager, 1, 10, protocol=2) == [
+            {"event": "structure_items_created", "seq": 11},
+            {
+                "event": "task_completed",
+                "task": {"id": 3},
+                "tasks": [{"id": 1}, {"id": 2}, {"id": 3}],
+                "total_completed": 3,
+                "seq": 14,
+            },
+        ]
+
+    async def test_older_clients_are_replayed_every_coalesced_event(self):
+        """Test that clients without coalescing support get each task in `task`."""
+        manager = await start_replay_manager()
+        for seq, task_id in [(11, 1), (12, 2), (13, 3)]:
+            manager.deliver(seq, 1, event("task_completed", task={"id": task_id}))
+
+        assert await get_sent(manager, 1, 10) == [
+            {"event": "task_completed", "task": {"id": 1}, "seq": 11},
+            {"event": "task_completed", "task": {"id": 2}, "seq": 12},
+            {"event": "task_completed", "task": {"id": 3}, "seq": 13},
+        ]
+        assert [item["task"]["id"] for item in await get_sent(manager, 1, 11)] == [
+            2,
+            3,
+        ]
+
+    async def test_live_clients_get_every_event(self):
+        """Test that coalescing only applies to replays."""
+        manager = await start_replay_manager()
+        websocket = make_websocket()
+        await manager.connect(websocket, 1)
+
+        for seq, task_id in [(11, 1), (12, 2)]:
+            manager.deliver(seq, 1, event("task_completed", task={"id": task_id}))
+        await settle()
+
+        assert websocket.send_text.await_count == 2
+
+    @patch("src.api.ws_manager.time.monotonic")
+    async def test_task_completed_events_far_apart_are_kept(self, mock_monotonic):
+        """Test that only events close together are coalesced."""
+        manager = await start_replay_manager(replay_coalesce_seconds=2)
+        mock_monotonic.return_value = 100
+        manager.deliver(11, 1, event("task_completed", task={"id": 1}))
+        mock_monotonic.return_value = 103
+        manager.deliver(12, 1, event("task_completed", task={"id": 2}))
+
+        assert [item["seq"] for item in await get_sent(manager, 1, 10)] == [11, 12]
+
+    async def test_large_replay_requires_resync(self):
+        """Test that a replay that would not fit in the client queue is replaced by a resync."""
+        manager = await start_replay_manager(max_messages=1)
+        manager.deliver(11, 1, event("first"))
+        manager.deliver(12, 1, event("second"))
+
+        assert (await get_sent(manager, 1, 10))[0]["event"] == "resync_required"
@@ -1,6 +1,13 @@
+import io
 import pytest
 import base64
-from src.api.utils.audio import prepare_audio_input_for_ai
+from pydub import AudioSegment
+from pydub.generators import Sine
+from src.api.utils.audio import (
+    prepare_audio_input_for_ai,
+    normalize_audio_for_ai,
+    prepare_normalized_audio_input_for_ai,
+)
 
 
 class TestAudioUtils:
@@ -30,3 +37,73 @@ class TestAudioUtils:
         # Check the result
         assert result == ""
         assert isinstance(result, str)
+
+
+def make_wav(duration_ms=1000, leading_silence_ms=0, trailing_silence_ms=0):
+    tone = (
+        Sine(440, sample_rate=48000)
+        .to_audio_segment(duration=duration_ms, volume=-10)
+        .set_channels(2)
+    )
+    leading_silence = AudioSegment.silent(duration=leading_silence_ms, frame_rate=48000)
+    trailing_silence = AudioSegment.silent(
+        duration=trailing_silence_ms, frame_rate=48000
+    )
+    audio = (
+        leading_silence.set_channels(2) + tone + trailing_silence.set_channels(2)
+    )
+    buffer = io.BytesIO()
+    audio.export(buffer, format="wav")
+    return buffer.getvalue()
+
+
+def load_wav(audio_data: bytes) -> AudioSegment:
+    return AudioSegment.from_file(io.BytesIO(audio_data), format="wav")
+
+
+class TestNormalizeAudio:
+    def test_downmix_and_resample(self):
+        """Test that recordings are converted to mono 16-bit audio at the model rate."""
+        audio_data = make_wav()
+
+        normalized = normalize_audio_for_ai(audio_data, sample_rate=16000)
+        audio = load_wav(normalized)
+
+        assert audio.channels == 1
+        assert audio.frame_rate == 16000
+        assert audio.sample_width == 2
+        # stereo 48kHz -> mono 16kHz
+        assert len(normalized) * 5 < len(audio_data)
+
+    def test_trims_silence(self):
+        """Test that leading and trailing silence is trimmed with some padding kept."""
+        audio_data = make_wav(
+            duration_ms=1000, leading_silence_ms=2000, trailing_silence_ms=3000
+        )
+
+        audio = load_wav(
+            normalize_audio_for_ai(audio_data, sample_rate=16000, keep_silence_ms=100)
+        )
+
+        assert 1150 <= len(audio) <= 1250
+
+    def test_silent_recording_kept(self):
+        """Test that recordings with no speech are not trimmed to nothing."""
+        buffer = io.BytesIO()
+        AudioSegment.silent(duration=500, frame_rate=16000).export(buffer, format="wav")
+
+        audio = load_wav(normalize_audio_for_ai(buffer.getvalue(), sample_rate=16000))
+
+        assert len(audio) == 500
+
+    def test_invalid_audio_returned_unchanged(self):
+        """Test that audio which is not a WAV file is passed through."""
+        assert normalize_audio_for_ai(b"not a wav file") == b"not a wav file"
+
+    def test_prepare_normalized_audio_input_for_ai(self):
+        """Test that the normalized recording is base64 encoded."""
+        audio_data = make_wav()
+
+        result = prepare_normalized_audio_input_for_ai(audio_data)
+
+        assert load_wav(base64.b64decode(result)).channels == 1
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from src.api.utils.audio_cache import AudioMessageCache, read_audio_upload
+
+
+def make_cache(fetched, **kwargs):
+    def fetch(uuid):
+        fetched.append(uuid)
+        return uuid.encode()
+
+    return AudioMessageCache(
+        fetch,
+        lambda data: data.decode().upper(),
+        kwargs.pop("max_memory_bytes", 100),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+class TestAudioMessageCache:
+    async def test_memory_hit(self):
+        """Test that a recording is fetched and prepared only once."""
+        fetched = []
+        cache = make_cache(fetched)
+
+        assert await cache.get("abc") == "ABC"
+        assert await cache.get("abc") == "ABC"
+
+        assert fetched == ["abc"]
+        assert cache.stats()["memory_hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    async def test_get_many_fetches_concurrently_and_dedupes(self):
+        """Test that distinct uuids are fetched in parallel and duplicates share a fetch."""
+        started = []
+        both_started = threading.Event()
+
+        def fetch(uuid):
+            started.append(uuid)
+            if len(set(started)) == 2:
+                both_started.set()
+            # only returns if the other fetch is running at the same time
+            assert both_started.wait(timeout=2)
+            return uuid.encode()
+
+        cache = AudioMessageCache(fetch, lambda data: data.decode(), 100)
+
+        result = await cache.get_many(["a", "b", "a"])
+
+        assert result == {"a": "a", "b": "b"}
+        assert sorted(started) == ["a", "b"]
+
+    async def test_concurrent_fetch_limit(self):
+        """Test that at most max_concurrent_fetches fetches run at once."""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def fetch(uuid):
+            with lock:
+                running.append(uuid)
+                peak.append(len(running))
+            threading.Event().wait(0.01)
+            with lock:
+                running.remove(uuid)
+            return b"x"
+
+        cache = AudioMessageCache(
+            fetch, lambda data: data.decode(), 100, max_concurrent_fetches=2
+        )
+
+        await cache.get_many([str(index) for index in range(6)])
+
+        assert max(peak) <= 2
+
+    async def test_memory_bound(self):
+        """Test that the least recently used payloads are evicted from memory."""
+        fetched = []
+        cache = make_cache(fetched, max_memory_bytes=6)
+
+        await cache.get("aaa")
+        await cache.get("bbb")
+        await cache.get("aaa")
+        await cache.get("ccc")
+
+        stats = cache.stats()
+        assert stats["memory_bytes"] <= 6
+        assert stats["memory_entries"] == 2
+
+        await cache.get("bbb")
+        assert fetched == ["aaa", "bbb", "ccc", "bbb"]
+
+    async def test_fetch_failure_is_not_cached(self):
+        """Test that a failed fetch is retried on the next request."""
+        fetch = MagicMock(side_effect=[Exception("s3 down"), b"data"])
+        cache = AudioMessageCache(fetch, lambda data: data.decode(), 100)
+
+        with pytest.raises(Exception):
+            await cache.get("abc")
+
+        assert await cache.get("abc") == "data"
+
+    async def test_disk_tier(self, tmp_path):
+        """Test that payloads survive a restart through the disk cache."""
+        fetched = []
+        cache = make_cache(fetched, cache_dir=str(tmp_path), max_disk_bytes=100)
+        await cache.get("abc")
+
+        restarted = make_cache(fetched, cache_dir=str(tmp_path), max_disk_bytes=100)
+
+        assert await restarted.get("abc") == "ABC"
+        assert fetched == ["abc"]
+        assert restarted.stats()["disk_hits"] == 1
+
+    async def test_disk_bound(self, tmp_path):
+        """Test that the disk cache evicts the least recently used files."""
+        fetched = []
+        cache = make_cache(
+            fetched, max_memory_bytes=0, cache_dir=str(tmp_path), max_disk_bytes=6
+        )
+
+        await cache.get("aaa")
+        await cache.get("bbb")
+        await cache.get("aaa")
+        await cache.get("ccc")
+
+        assert sorted(os.listdir(tmp_path)) == ["aaa.b64", "ccc.b64"]
+        assert cache.stats()["disk_bytes"] == 6
+
+    async def test_unsafe_keys_skip_disk(self, tmp_path):
+        """Test that keys which are not plain uuids are never used as file names."""
+        fetched = []
+        cache = make_cache(fetched, cache_dir=str(tmp_path), max_disk_bytes=100)
+
+        assert await cache.get("../abc") == "../ABC"
+        assert os.listdir(tmp_path) == []
+
+
+class TestReadAudioUpload:
+    @patch("src.api.utils.audio_cache.get_media_upload_s3_key_from_uuid")
+    @patch("src.api.utils.audio_cache.download_file_from_s3_as_bytes")
+    @patch("src.api.utils.audio_cache.settings")
+    def test_reads_from_s3(self, mock_settings, mock_download, mock_get_key):
+        mock_settings.s3_folder_name = "folder"
+        mock_get_key.return_value = "folder/media/abc.wav"
+        mock_download.return_value = b"audio"
+
+        assert read_audio_upload("abc") == b"audio"
+        mock_get_key.assert_called_once_with("abc", "wav")
+        mock_download.assert_called_once_with("folder/media/abc.wav")
+
+    @patch("src.api.utils.audio_cache.settings")
+    def test_reads_from_local_uploads(self, mock_settings, tmp_path):
+        mock_settings.s3_folder_name = None
+        mock_settings.local_upload_folder = str(tmp_path)
+        (tmp_path / "abc.wav").write_bytes(b"audio")
+
+        assert read_audio_upload("abc") == b"audio"
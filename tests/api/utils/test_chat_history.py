@@ -0,0 +1,96 @@
+from unittest.mock import patch
+from src.api.utils.chat_history import (
+    count_tokens,
+    count_message_tokens,
+    count_messages_tokens,
+    get_history_token_budget,
+    split_chat_history,
+    window_chat_history,
+)
+
+
+def count(message):
+    return len(message["content"])
+
+
+def get_history(*contents):
+    return [
+        {
+            "id": index + 1,
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": content,
+        }
+        for index, content in enumerate(contents)
+    ]
+
+
+class TestCountTokens:
+    @patch("src.api.utils.chat_history.get_encoding", return_value=None)
+    def test_estimate_without_tiktoken(self, mock_get_encoding):
+        assert count_tokens("", "gpt-4.1") == 0
+        assert count_tokens("abcd", "gpt-4.1") == 1
+        assert count_tokens("abcde", "gpt-4.1") == 2
+
+    @patch("src.api.utils.chat_history.count_tokens", return_value=2)
+    @patch("src.api.utils.chat_history.chat_history_audio_message_tokens", 100)
+    def test_message_tokens(self, mock_count_tokens):
+        assert count_message_tokens({"role": "user", "content": "hi"}, "m") == 5
+
+        audio_message = {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Student's Response:"},
+                {"type": "input_audio", "input_audio": {"data": "x" * 10000}},
+            ],
+        }
+        # audio is counted with the fixed estimate, not by its payload size
+        assert count_message_tokens(audio_message, "m") == 105
+
+        assert count_messages_tokens([{"role": "user", "content": "hi"}] * 2, "m") == (
+            13
+        )
+
+
+class TestWindowChatHistory:
+    def test_budget_fits_every_plan(self):
+        with patch(
+            "src.api.utils.chat_history.chat_history_token_budget",
+            {"text": 100, "reasoning": 50},
+        ):
+            assert get_history_token_budget("text") == 100
+            assert get_history_token_budget("text", "reasoning") == 50
+
+    def test_split_keeps_recent_messages_within_budget(self):
+        history = get_history("aaaa", "bb", "cc", "dd", "e")
+
+        older, recent = split_chat_history(history, 5, count)
+        assert [message["id"] for message in older] == [1, 2]
+        assert [message["id"] for message in recent] == [3, 4, 5]
+
+    def test_split_does_not_start_with_assistant_message(self):
+        history = get_history("aaaa", "bb", "c")
+
+        older, recent = split_chat_history(history, 3, count)
+        assert [message["id"] for message in older] == [1, 2]
+        assert [message["id"] for message in recent] == [3]
+
+    def test_history_within_budget_is_not_split(self):
+        history = get_history("aa", "bb", "cc")
+
+        assert window_chat_history(history, 6, count) == ([], history)
+
+    def test_window_shrinks_to_ratio_once_over_budget(self):
+        history = get_history("aa", "bb", "cc", "dd", "ee")
+
+        to_summarize, recent = window_chat_history(history, 8, count, window_ratio=0.5)
+        assert [message["id"] for message in to_summarize] == [1, 2, 3, 4]
+        assert [message["id"] for message in recent] == [5]
+
+    def test_already_summarized_messages_are_skipped(self):
+        history = get_history("aa", "bb", "cc", "dd", "ee")
+
+        to_summarize, recent = window_chat_history(
+            history, 6, count, summarized_until_id=2
+        )
+        assert to_summarize == []
+        assert [message["id"] for message in recent] == [3, 4, 5]
@@ -1,84 +1,128 @@
 import pytest
 import asyncio
 from unittest.mock import patch, AsyncMock
-from src.api.utils.concurrency import async_batch_gather, async_index_wrapper
+from src.api.utils.concurrency import (
+    run_with_bounded_concurrency,
+    async_index_wrapper,
+    stream_speculatively,
+)
 
 
 @pytest.mark.asyncio
-class TestAsyncBatchGather:
-    @patch("src.api.utils.concurrency.tqdm_asyncio")
-    async def test_async_batch_gather_full_batch(self, mock_tqdm_asyncio):
-        """Test async_batch_gather with a full batch."""
-        # Create mock coroutines
-        mock_coro1 = AsyncMock()
-        mock_coro2 = AsyncMock()
-        mock_coro3 = AsyncMock()
-
-        # Setup the mock gather result
-        mock_tqdm_asyncio.gather = AsyncMock()
-        mock_tqdm_asyncio.gather.return_value = ["result1", "result2", "result3"]
-
-        # Call the function with a batch size equal to the number of coroutines
-        result = await async_batch_gather(
-            [mock_coro1, mock_coro2, mock_coro3], batch_size=3, description="Test batch"
-        )
+class TestRunWithBoundedConcurrency:
+    async def test_results_in_order(self):
+        """Test that results are returned in input order regardless of finish order."""
 
-        # Check the results
-        assert result == ["result1", "result2", "result3"]
-        mock_tqdm_asyncio.gather.assert_called_once_with(
-            mock_coro1, mock_coro2, mock_coro3, desc="Test batch 0-3/3"
+        async def work(value, delay):
+            await asyncio.sleep(delay)
+            return value
+
+        result = await run_with_bounded_concurrency(
+            [work(1, 0.02), work(2, 0), work(3, 0.01)], max_concurrency=3
         )
 
-    @patch("src.api.utils.concurrency.tqdm_asyncio")
-    @patch("src.api.utils.concurrency.asyncio.sleep")
-    async def test_async_batch_gather_multiple_batches(
-        self, mock_sleep, mock_tqdm_asyncio
-    ):
-        """Test async_batch_gather with multiple batches."""
-        # Create mock coroutines
-        coroutines = [AsyncMock() for _ in range(5)]
-
-        # Setup the mock gather results for each batch
-        mock_tqdm_asyncio.gather = AsyncMock()
-        # Make sure we provide enough return values for all calls
-        # First call with batch size 2, second call with batch size 2, third call with batch size 1
-        mock_tqdm_asyncio.gather.side_effect = [
-            ["result1", "result2"],
-            ["result3", "result4"],
-            ["result5"],
-        ]
+        assert result == [1, 2, 3]
 
-        # Call the function with a batch size smaller than the number of coroutines
-        result = await async_batch_gather(
-            coroutines, batch_size=2, description="Test batch"
-        )
+    async def test_next_starts_when_a_slot_frees(self):
+        """Test that a slow coroutine does not hold back the ones after it."""
+        running = 0
+        max_running = 0
+        finished = []
+        slow_release = asyncio.Event()
 
-        # Check the results
-        assert result == ["result1", "result2", "result3", "result4", "result5"]
+        async def work(value, slow=False):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            if slow:
+                await slow_release.wait()
+            else:
+                await asyncio.sleep(0)
+            running -= 1
+            finished.append(value)
+            if len(finished) == 4:
+                slow_release.set()
+            return value
 
-        # Check that gather was called with the correct batches
-        assert mock_tqdm_asyncio.gather.call_count == 3
-        mock_tqdm_asyncio.gather.assert_any_call(
-            coroutines[0], coroutines[1], desc="Test batch 0-2/5"
+        result = await asyncio.wait_for(
+            run_with_bounded_concurrency(
+                [work(0, slow=True)] + [work(value) for value in range(1, 5)],
+                max_concurrency=2,
+            ),
+            timeout=1,
         )
-        mock_tqdm_asyncio.gather.assert_any_call(
-            coroutines[2], coroutines[3], desc="Test batch 2-4/5"
+
+        assert result == [0, 1, 2, 3, 4]
+        assert max_running == 2
+        # every fast coroutine ran alongside the slow one
+        assert finished == [1, 2, 3, 4, 0]
+
+    async def test_return_exceptions(self):
+        """Test that failures are returned in place of results and the rest continue."""
+
+        async def work(value):
+            if value is None:
+                raise ValueError("failed")
+            return value
+
+        result = await run_with_bounded_concurrency(
+            [work(None), work(2)], max_concurrency=1, return_exceptions=True
         )
-        mock_tqdm_asyncio.gather.assert_any_call(coroutines[4], desc="Test batch 4-5/5")
 
-        # Check that sleep was called the correct number of times (once after each batch except the last)
-        assert mock_sleep.call_count == 3
-        mock_sleep.assert_called_with(1)
+        assert isinstance(result[0], ValueError)
+        assert result[1] == 2
 
-    @patch("src.api.utils.concurrency.tqdm_asyncio")
-    async def test_async_batch_gather_empty(self, mock_tqdm_asyncio):
-        """Test async_batch_gather with an empty list of coroutines."""
-        # Call the function with an empty list
-        result = await async_batch_gather([], batch_size=2)
+    async def test_failure_cancels_the_rest(self):
+        """Test that the first failure is raised and everything else is stopped."""
+        cancelled = []
 
-        # Check the results
-        assert result == []
-        mock_tqdm_asyncio.gather.assert_not_called()
+        async def fail():
+            raise ValueError("failed")
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        not_started = slow()
+
+        with pytest.raises(ValueError):
+            await run_with_bounded_concurrency(
+                [slow(), fail(), not_started], max_concurrency=2
+            )
+
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+        assert not_started.cr_frame is None
+
+    async def test_cancellation(self):
+        """Test that cancelling the caller cancels the coroutines in flight."""
+        cancelled = []
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        run = asyncio.create_task(run_with_bounded_concurrency([slow()]))
+        await started.wait()
+        run.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await run
+
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+
+    async def test_empty(self):
+        """Test with an empty list of coroutines."""
+        assert await run_with_bounded_concurrency([]) == []
 
 
 @pytest.mark.asyncio
@@ -95,3 +139,123 @@ class TestAsyncIndexWrapper:
 
         # Check the results
         assert result == (42, "test-value")
+
+
+@pytest.mark.asyncio
+class TestStreamSpeculatively:
+    def make_open_stream(self, opened, cancelled):
+        async def open_stream(choice):
+            opened.append(choice)
+            try:
+                for index in range(3):
+                    await asyncio.sleep(0)
+                    yield f"{choice}-{index}"
+            except asyncio.CancelledError:
+                cancelled.append(choice)
+                raise
+
+        return open_stream
+
+    async def test_decision_matches_speculation(self):
+        """Test that buffered speculative chunks are released when the decision agrees."""
+        opened, cancelled = [], []
+        decided = asyncio.Event()
+
+        async def decision():
+            await asyncio.sleep(0.01)
+            decided.set()
+            return "text"
+
+        chunks = [
+            chunk
+            async for chunk in stream_speculatively(
+                decision(), self.make_open_stream(opened, cancelled), "text"
+            )
+        ]
+
+        assert decided.is_set()
+        assert chunks == ["text-0", "text-1", "text-2"]
+        assert opened == ["text"]
+        assert cancelled == []
+
+    async def test_decision_overrides_speculation(self):
+        """Test that the speculative stream is cancelled when the decision differs."""
+        opened, cancelled = [], []
+        release = asyncio.Event()
+
+        async def decision():
+            # wait until the speculative stream has been opened
+            while not opened:
+                await asyncio.sleep(0)
+            return "reasoning"
+
+        async def open_stream(choice):
+            opened.append(choice)
+            try:
+                if choice == "text":
+                    yield "text-0"
+                    await release.wait()
+                yield f"{choice}-final"
+            except asyncio.CancelledError:
+                cancelled.append(choice)
+                raise
+
+        chunks = [
+            chunk
+            async for chunk in stream_speculatively(decision(), open_stream, "text")
+        ]
+        await asyncio.sleep(0)
+
+        assert chunks == ["reasoning-final"]
+        assert opened == ["text", "reasoning"]
+        assert cancelled == ["text"]
+
+    async def test_decision_error_raised(self):
+        """Test that a failed decision is raised without an error handler."""
+        opened, cancelled = [], []
+
+        async def decision():
+            raise ValueError("router failed")
+
+        with pytest.raises(ValueError):
+            async for _ in stream_speculatively(
+                decision(), self.make_open_stream(opened, cancelled), "text"
+            ):
+                pass
+
+    async def test_decision_error_falls_back_to_speculation(self):
+        """Test that the speculative stream is kept when the error is handled."""
+        opened, cancelled, errors = [], [], []
+
+        async def decision():
+            raise ValueError("router failed")
+
+        chunks = [
+            chunk
+            async for chunk in stream_speculatively(
+                decision(),
+                self.make_open_stream(opened, cancelled),
+                "text",
+                on_decision_error=errors.append,
+            )
+        ]
+
+        assert chunks == ["text-0", "text-1", "text-2"]
+        assert len(errors) == 1
+
+    async def test_stream_error_propagates(self):
+        """Test that errors from the speculative stream reach the consumer."""
+
+        async def decision():
+            return "text"
+
+        async def open_stream(choice):
+            yield "text-0"
+            raise RuntimeError("stream failed")
+
+        chunks = []
+        with pytest.raises(RuntimeError):
+            async for chunk in stream_speculatively(decision(), open_stream, "text"):
+                chunks.append(chunk)
+
+        assert chunks == ["text-0"]
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import sqlite3
 import aiosqlite
@@ -10,11 +11,28 @@ from src.api.utils.db import (
     execute_multiple_db_operations,
     serialise_list_to_str,
     deserialise_list_from_str,
-    trace_callback,
     check_table_exists,
+    ConnectionPool,
+    SQLiteWriter,
+    is_read_query,
+    get_db_writer,
 )
 
 
+class PendingConnection:
+    """Stands in for the unstarted connection returned by aiosqlite.connect."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.daemon = False
+
+    def __await__(self):
+        async def _connect():
+            return self.conn
+
+        return _connect().__await__()
+
+
 class TestSerialiseDeserialise:
     def test_serialise_list_to_str(self):
         """Test serialising a list to a comma-separated string."""
@@ -49,15 +67,6 @@ class TestSerialiseDeserialise:
         assert result == []
 
 
-class TestTraceCallback:
-    @patch("src.api.utils.db.logger")
-    def test_trace_callback(self, mock_logger):
-        """Test that trace_callback logs SQL operations."""
-        sql = "SELECT * FROM test"
-        trace_callback(sql)
-        mock_logger.info.assert_called_once_with(f"Executing operation: {sql}")
-
-
 @pytest.mark.asyncio
 class TestCheckTableExists:
     async def test_check_table_exists_true(self):
@@ -104,7 +113,6 @@ class TestDbConnections:
             assert conn == mock_conn
             # Now mock the methods used inside the context manager
             mock_conn.execute.assert_called_once_with("PRAGMA synchronous=NORMAL;")
-            mock_conn.set_trace_callback.assert_called_once()
 
         # Check that close was called after exiting the context
         mock_conn.close.assert_called_once()
@@ -282,27 +290,20 @@ class TestDbConnectionExceptions:
         # Setup mock connection
         mock_conn = AsyncMock()
 
-        # Create an async coroutine function that returns the mock connection
-        async def mock_connect_coroutine(*args, **kwargs):
-            return mock_conn
+        # Make connect return an awaitable that resolves to the mock connection
+        mock_connect.return_value = PendingConnection(mock_conn)
 
-        # Make connect return the coroutine
-        mock_connect.return_value = mock_connect_coroutine()
+        # Make the connection setup PRAGMA raise an exception
+        mock_conn.execute.side_effect = Exception("PRAGMA error")
 
-        # Make execute work normally but set_trace_callback raise an exception
-        mock_conn.execute.return_value = AsyncMock()
-        mock_conn.set_trace_callback.side_effect = Exception("Trace callback error")
-
-        # Test that exception is re-raised and rollback is called
-        with pytest.raises(Exception, match="Trace callback error"):
+        # Test that exception is re-raised
+        with pytest.raises(Exception, match="PRAGMA error"):
             async with get_new_db_connection() as conn:
                 pass
 
         # Verify connect was called
         mock_connect.assert_called_once()
-        # Verify rollback was called since conn was not None
-        mock_conn.rollback.assert_called_once()
-        # Verify close was called in finally block
+        # Verify the half set up connection was closed instead of being pooled
         mock_conn.close.assert_called_once()
 
     @patch("src.api.utils.db.aiosqlite.connect")
@@ -320,6 +321,271 @@ class TestDbConnectionExceptions:
         mock_connect.assert_called_once()
 
 
+@pytest.mark.asyncio
+class TestConnectionPool:
+    def _mock_connection(self, in_transaction=False):
+        mock_conn = AsyncMock()
+        mock_conn.is_alive = MagicMock(return_value=True)
+        mock_conn.in_transaction = in_transaction
+        return mock_conn
+
+    @patch("src.api.utils.db.aiosqlite.connect")
+    async def test_checkout_opens_and_sets_up_connection(self, mock_connect):
+        """Test that a new connection is opened and set up once when the pool is empty."""
+        mock_conn = self._mock_connection()
+        pending = PendingConnection(mock_conn)
+        mock_connect.return_value = pending
+        pool = ConnectionPool("test.db", size=2, health_check_interval=30)
+
+        conn = await pool.checkout()
+
+        assert conn == mock_conn
+        assert pending.daemon is True
+        mock_connect.assert_called_once_with("test.db")
+        mock_conn.execute.assert_called_once_with("PRAGMA synchronous=NORMAL;")
+        mock_conn.set_trace_callback.assert_not_called()
+        assert pool.stats()["opened"] == 1
+
+    @patch("src.api.utils.db.aiosqlite.connect")
+    async def test_checkin_then_checkout_reuses_connection(self, mock_connect):
+        """Test that a returned connection is reused without reconnecting."""
+        mock_conn = self._mock_connection()
+        mock_connect.return_value = PendingConnection(mock_conn)
+        pool = ConnectionPool("test.db", size=2, health_check_interval=30)
+
+        conn = await pool.checkout()
+        await pool.checkin(conn)
+        reused_conn = await pool.checkout()
+
+        assert reused_conn == mock_conn
+        mock_connect.assert_called_once()
+        # no ping for a connection that was used recently
+        mock_conn.execute.assert_called_once_with("PRAGMA synchronous=NORMAL;")
+        assert pool.stats()["reused"] == 1
+
+    async def test_checkin_rolls_back_open_transaction(self):
+        """Test that uncommitted work is rolled back before a connection is pooled."""
+        mock_conn = self._mock_connection(in_transaction=True)
+        pool = ConnectionPool("test.db", size=2, health_check_interval=30)
+
+        await pool.checkin(mock_conn)
+
+        mock_conn.rollback.assert_called_once()
+        mock_conn.close.assert_not_called()
+        assert pool.stats()["idle"] == 1
+
+    async def test_checkin_closes_connection_when_pool_full(self):
+        """Test that connections beyond the pool size are closed on return."""
+        pool = ConnectionPool("test.db", size=1, health_check_interval=30)
+        first_conn = self._mock_connection()
+        second_conn = self._mock_connection()
+
+        await pool.checkin(first_conn)
+        await pool.checkin(second_conn)
+
+        first_conn.close.assert_not_called()
+        second_conn.close.assert_called_once()
+        assert pool.stats()["idle"] == 1
+
+    @patch("src.api.utils.db.aiosqlite.connect")
+    async def test_checkout_discards_unhealthy_connection(self, mock_connect):
+        """Test that a stale connection failing its ping is replaced."""
+        stale_conn = self._mock_connection()
+        stale_conn.execute.side_effect = Exception("disk I/O error")
+        fresh_conn = self._mock_connection()
+        mock_connect.return_value = PendingConnection(fresh_conn)
+        pool = ConnectionPool("test.db", size=2, health_check_interval=0)
+
+        await pool.checkin(stale_conn)
+        conn = await pool.checkout()
+
+        assert conn == fresh_conn
+        stale_conn.execute.assert_called_once_with("SELECT 1")
+        stale_conn.close.assert_called_once()
+        assert pool.stats()["discarded"] == 1
+
+    async def test_checkout_discards_dead_connection(self):
+        """Test that a connection whose worker thread has stopped is not reused."""
+        dead_conn = self._mock_connection()
+        dead_conn.is_alive.return_value = False
+        pool = ConnectionPool("test.db", size=2, health_check_interval=30)
+        pool._open_connection = AsyncMock(return_value="new_conn")
+
+        await pool.checkin(dead_conn)
+        conn = await pool.checkout()
+
+        assert conn == "new_conn"
+        dead_conn.close.assert_called_once()
+
+    async def test_close_closes_idle_connections(self):
+        """Test that closing the pool closes every idle connection."""
+        pool = ConnectionPool("test.db", size=2, health_check_interval=30)
+        conns = [self._mock_connection(), self._mock_connection()]
+        for conn in conns:
+            await pool.checkin(conn)
+
+        await pool.close()
+
+        for conn in conns:
+            conn.close.assert_called_once()
+        assert pool.stats()["idle"] == 0
+
+
+def create_test_db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("CREATE TABLE items (value INTEGER UNIQUE)")
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.asyncio
+class TestSQLiteWriter:
+    async def _insert(self, writer, value):
+        async def operation(cursor):
+            await cursor.execute("INSERT INTO items (value) VALUES (?)", (value,))
+            return cursor.lastrowid
+
+        return await writer.submit(operation)
+
+    def _count(self, db_path):
+        conn = sqlite3.connect(db_path)
+        count = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        conn.close()
+        return count
+
+    async def test_submit_group_commits_queued_writes(self, tmp_path):
+        """Test that concurrently submitted writes are committed in shared batches."""
+        db_path = str(tmp_path / "test.db")
+        create_test_db(db_path)
+        writer = SQLiteWriter(db_path, max_batch_size=64)
+
+        row_ids = await asyncio.gather(*[self._insert(writer, i) for i in range(20)])
+
+        assert sorted(row_ids) == list(range(1, 21))
+        assert self._count(db_path) == 20
+        stats = writer.stats()
+        assert stats["writes"] == 20
+        assert stats["batches"] < 20
+        assert stats["max_queue_depth"] >= 2
+        assert stats["queue_depth"] == 0
+        assert stats["commit_latency_ms"]["max"] is not None
+
+        await writer.close()
+
+    async def test_failed_write_does_not_fail_its_batch(self, tmp_path):
+        """Test that a failing write is rolled back without affecting the others."""
+        db_path = str(tmp_path / "test.db")
+        create_test_db(db_path)
+        writer = SQLiteWriter(db_path, max_batch_size=64)
+
+        results = await asyncio.gather(
+            self._insert(writer, 1),
+            self._insert(writer, 1),
+            self._insert(writer, 2),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[1], sqlite3.IntegrityError)
+        assert self._count(db_path) == 2
+
+        await writer.close()
+
+    async def test_session_is_exclusive_and_reentrant(self, tmp_path):
+        """Test that writes submitted inside a session join the session transaction."""
+        db_path = str(tmp_path / "test.db")
+        create_test_db(db_path)
+        writer = SQLiteWriter(db_path, max_batch_size=64)
+
+        async with writer.session() as conn:
+            cursor = await conn.cursor()
+            await cursor.execute("INSERT INTO items (value) VALUES (1)")
+            await self._insert(writer, 2)
+            async with writer.session() as nested_conn:
+                assert nested_conn is conn
+            await conn.commit()
+
+        assert self._count(db_path) == 2
+
+        await writer.close()
+
+    async def test_close_fails_queued_writes(self, tmp_path):
+        """Test that writes still queued when the writer closes do not hang."""
+        db_path = str(tmp_path / "test.db")
+        create_test_db(db_path)
+        writer = SQLiteWriter(db_path, max_batch_size=64)
+
+        async with writer._lock:
+            # the first write waits for the lock in a batch, the second in the queue
+            first = asyncio.create_task(self._insert(writer, 1))
+            for _ in range(3):
+                await asyncio.sleep(0)
+            assert writer._queue.empty()
+            second = asyncio.create_task(self._insert(writer, 2))
+            await asyncio.sleep(0)
+
+            await writer.close()
+
+        for insert in [first, second]:
+            with pytest.raises(RuntimeError):
+                await insert
+        assert self._count(db_path) == 0
+
+    async def test_session_rolls_back_uncommitted_work(self, tmp_path):
+        """Test that a session left with an open transaction is rolled back."""
+        db_path = str(tmp_path / "test.db")
+        create_test_db(db_path)
+        writer = SQLiteWriter(db_path, max_batch_size=64)
+
+        async with writer.session() as conn:
+            cursor = await conn.cursor()
+            await cursor.execute("INSERT INTO items (value) VALUES (1)")
+
+        assert self._count(db_path) == 0
+
+        await writer.close()
+
+
+@pytest.mark.asyncio
+class TestQueryOnlyPool:
+    async def test_query_only_connection_rejects_writes(self, tmp_path):
+        """Test that reader pool connections cannot write."""
+        db_path = str(tmp_path / "test.db")
+        create_test_db(db_path)
+        read_pool = ConnectionPool(
+            db_path, size=1, health_check_interval=30, query_only=True
+        )
+
+        conn = await read_pool.checkout()
+        with pytest.raises(sqlite3.OperationalError):
+            await conn.execute("INSERT INTO items (value) VALUES (1)")
+        await read_pool.checkin(conn)
+
+        await read_pool.close()
+
+
+def test_is_read_query():
+    """Test that only SELECT statements are routed to the reader pool."""
+    assert is_read_query("\n    SELECT * FROM items")
+    assert is_read_query("with x AS (SELECT 1) SELECT * FROM x")
+    assert not is_read_query("INSERT INTO items (value) VALUES (1)")
+    assert not is_read_query("UPDATE items SET value = 2 RETURNING value")
+
+
+def test_is_read_query_classifies_with_statements_by_main_verb():
+    """Test that common table expressions do not hide the statement's verb."""
+    assert is_read_query("WITH RECURSIVE x(n) AS (VALUES (1)) SELECT n FROM x")
+    assert not is_read_query(
+        "WITH x AS (SELECT value FROM items) INSERT INTO items SELECT value + 1 FROM x"
+    )
+    assert not is_read_query(
+        "with x AS (SELECT 'a) select' AS v) DELETE FROM items WHERE value IN x"
+    )
+    assert not is_read_query(
+        "WITH x AS (SELECT 1) UPDATE items SET value = (SELECT 1 FROM x)"
+    )
+
+
 # Test for set_db_defaults would require mocking sqlite3.connect and executescript
 # which is more complex as it's not an async function
 class TestSetDbDefaults:
@@ -350,3 +616,23 @@ class TestSetDbDefaults:
 
         # Check that executescript was not called
         mock_conn.executescript.assert_not_called()
+
+
+@patch("src.api.utils.db.writer", None)
+@patch("src.api.utils.db.SQLiteWriter")
+def test_get_db_writer_closes_writer_of_previous_event_loop(mock_writer_class):
+    """Test that a writer bound to another event loop is closed before replacing it."""
+    old_writer = MagicMock()
+    old_writer.close = AsyncMock()
+    new_writer = MagicMock()
+    new_writer.loop = None
+    mock_writer_class.side_effect = [old_writer, new_writer]
+
+    async def get_writer():
+        writer = await get_db_writer()
+        writer.loop = asyncio.get_running_loop()
+        return writer
+
+    assert asyncio.run(get_writer()) is old_writer
+    assert asyncio.run(get_writer()) is new_writer
+    old_writer.close.assert_awaited_once()
@@ -0,0 +1,186 @@
+import json
+from src.api.utils.json_delta import diff_json, JSONDeltaEncoder
+
+
+def apply_ops(document, ops):
+    """Reference client: applies delta ops to a reconstructed document."""
+    for op in ops:
+        if op["path"] == "":
+            document = op["value"]
+            continue
+
+        keys = [
+            key.replace("~1", "/").replace("~0", "~")
+            for key in op["path"].split("/")[1:]
+        ]
+        parent = document
+        for key in keys[:-1]:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+
+        key = int(keys[-1]) if isinstance(parent, list) else keys[-1]
+
+        if op["op"] == "append":
+            parent[key] += op["value"]
+        elif op["op"] == "remove":
+            del parent[key]
+        elif isinstance(parent, list) and key == len(parent):
+            parent.append(op["value"])
+        else:
+            parent[key] = op["value"]
+
+    return document
+
+
+class CountedString(str):
+    """Counts how often a diff compares it by value."""
+
+    comparisons = 0
+
+    def __eq__(self, other):
+        CountedString.comparisons += 1
+        return str.__eq__(self, other)
+
+    __hash__ = str.__hash__
+
+
+class TestDiffJson:
+    def test_no_changes(self):
+        assert diff_json({"a": "x"}, {"a": "x"}) == []
+
+    def test_string_growth_is_an_append(self):
+        assert diff_json({"feedback": "Go"}, {"feedback": "Good job"}) == [
+            {"op": "append", "path": "/feedback", "value": "od job"}
+        ]
+
+    def test_new_keys_and_list_items_are_added(self):
+        previous = {"scorecard": [{"category": "A"}]}
+        current = {
+            "scorecard": [{"category": "A", "score": 3}, {"category": "B"}],
+            "is_correct": True,
+        }
+
+        assert diff_json(previous, current) == [
+            {"op": "add", "path": "/scorecard/0/score", "value": 3},
+            {"op": "add", "path": "/scorecard/1", "value": {"category": "B"}},
+            {"op": "add", "path": "/is_correct", "value": True},
+        ]
+
+    def test_non_monotonic_changes_are_replaced(self):
+        assert diff_json({"a": "abc"}, {"a": "abd"}) == [
+            {"op": "replace", "path": "/a", "value": "abd"}
+        ]
+        assert diff_json({"a": None}, {"a": "x"}) == [
+            {"op": "replace", "path": "/a", "value": "x"}
+        ]
+        assert diff_json({"a": [1, 2]}, {"a": [1]}) == [
+            {"op": "replace", "path": "/a", "value": [1]}
+        ]
+        assert diff_json({"a": 1, "b": 2}, {"a": 1}) == [
+            {"op": "remove", "path": "/b"}
+        ]
+
+    def test_keys_are_escaped(self):
+        assert diff_json({}, {"a/b~c": 1}) == [
+            {"op": "add", "path": "/a~1b~0c", "value": 1}
+        ]
+
+
+    def test_values_before_the_frontier_are_not_compared(self):
+        """Test that only the subtree of the latest change is diffed in full."""
+        previous = {"done": [CountedString("a"), CountedString("b")], "text": "ab"}
+        current = {"done": [CountedString("a"), CountedString("b")], "text": "abc"}
+        CountedString.comparisons = 0
+
+        assert diff_json(previous, current, frontier=["text"]) == [
+            {"op": "append", "path": "/text", "value": "c"}
+        ]
+        assert CountedString.comparisons == 0
+
+        diff_json(previous, current)
+        assert CountedString.comparisons > 0
+
+    def test_values_before_the_frontier_that_grew_are_diffed(self):
+        """Test that values that change after the frontier moved on are not missed."""
+        previous = {"feedback": None, "scorecard": [{"score": 1}]}
+        current = {"feedback": "Go", "scorecard": [{"score": 1}, {"score": 2}]}
+
+        assert diff_json(previous, current, frontier=["scorecard", "0"]) == [
+            {"op": "replace", "path": "/feedback", "value": "Go"},
+            {"op": "add", "path": "/scorecard/1", "value": {"score": 2}},
+        ]
+
+    def test_unknown_frontier_falls_back_to_a_full_diff(self):
+        """Test that a frontier that is no longer in the document is ignored."""
+        previous = {"a": {"b": None}, "c": 1}
+        current = {"a": {"b": 2}, "c": 1}
+
+        assert diff_json(previous, current, frontier=["removed"]) == [
+            {"op": "replace", "path": "/a/b", "value": 2}
+        ]
+
+
+class TestJSONDeltaEncoder:
+    def test_reconstructs_partial_stream(self):
+        """Test that applying every delta reproduces the final snapshot."""
+        snapshots = [
+            {"feedback": None, "scorecard": None},
+            {"feedback": "Nice", "scorecard": None},
+            {"feedback": "Nice work", "scorecard": []},
+            {"feedback": "Nice work", "scorecard": []},
+            {
+                "feedback": "Nice work!",
+                "scorecard": [{"category": "Clarity", "feedback": {"correct": "Cl"}}],
+            },
+            {
+                "feedback": "Nice work!",
+                "scorecard": [
+                    {"category": "Clarity", "feedback": {"correct": "Clear"}},
+                    {"category": "Depth", "feedback": None},
+                ],
+            },
+        ]
+
+        encoder = JSONDeltaEncoder()
+        lines = [encoder.encode(snapshot) for snapshot in snapshots]
+
+        # unchanged snapshots produce no line
+        assert lines[3] is None
+
+        document = None
+        for line in lines:
+            if line is None:
+                continue
+            message = json.loads(line)
+            assert message["type"] == "delta"
+            document = apply_ops(document, message["ops"])
+
+        final = json.loads(encoder.finish())
+        assert final == {"type": "snapshot", "value": snapshots[-1]}
+        assert document == snapshots[-1]
+
+    def test_follows_the_frontier(self):
+        """Test that the encoder diffs from the path of the latest change."""
+        encoder = JSONDeltaEncoder()
+        encoder.encode({"items": [CountedString("x")], "text": None})
+        encoder.encode({"items": [CountedString("x")], "text": "a"})
+        assert encoder.frontier == ["text"]
+
+        CountedString.comparisons = 0
+        line = encoder.encode({"items": [CountedString("x")], "text": "ab"})
+
+        assert json.loads(line)["ops"] == [
+            {"op": "append", "path": "/text", "value": "b"}
+        ]
+        assert CountedString.comparisons == 0
+
+    def test_deltas_are_smaller_than_full_objects(self):
+        encoder = JSONDeltaEncoder()
+        text = ""
+        delta_bytes = full_bytes = 0
+
+        for _ in range(200):
+            text += "word "
+            delta_bytes += len(encoder.encode({"feedback": text}))
+            full_bytes += len(json.dumps({"feedback": text}))
+
+        assert delta_bytes * 5 < full_bytes
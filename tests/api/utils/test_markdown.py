@@ -0,0 +1,239 @@
+import pytest
+from src.api.utils.markdown import (
+    AmbiguousMarkdownError,
+    MarkdownBlockParser,
+    convert_markdown_to_blocks,
+    iter_markdown_blocks,
+    parse_inline,
+)
+
+
+def text(value, **styles):
+    return {"type": "text", "text": value, "styles": styles}
+
+
+class TestParseInline:
+    def test_plain_text(self):
+        assert parse_inline("just text") == [text("just text")]
+
+    def test_styles(self):
+        assert parse_inline("a **b** *c* ~~d~~ `e` ***f***") == [
+            text("a "),
+            text("b", bold=True),
+            text(" "),
+            text("c", italic=True),
+            text(" "),
+            text("d", strike=True),
+            text(" "),
+            text("e", code=True),
+            text(" "),
+            text("f", bold=True, italic=True),
+        ]
+
+    def test_nested_styles(self):
+        assert parse_inline("**bold _and italic_**") == [
+            text("bold ", bold=True),
+            text("and italic", bold=True, italic=True),
+        ]
+
+    def test_delimiters_without_emphasis_are_text(self):
+        assert parse_inline("2 * 3 * 4 and snake_case_name and **open") == [
+            text("2 * 3 * 4 and snake_case_name and **open")
+        ]
+
+    def test_escapes(self):
+        assert parse_inline(r"\*not italic\* and \[not a link\]") == [
+            text("*not italic* and [not a link]")
+        ]
+
+    def test_code_is_not_parsed(self):
+        assert parse_inline("`**x** [a](b)`") == [text("**x** [a](b)", code=True)]
+
+    def test_links(self):
+        assert parse_inline("see [the **docs**](https://x.com) or <https://y.com>") == [
+            text("see "),
+            {
+                "type": "link",
+                "href": "https://x.com",
+                "content": [text("the "), text("docs", bold=True)],
+            },
+            text(" or "),
+            {
+                "type": "link",
+                "href": "https://y.com",
+                "content": [text("https://y.com")],
+            },
+        ]
+
+    def test_brackets_without_link_are_text(self):
+        assert parse_inline("list[0] and [note]") == [text("list[0] and [note]")]
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            "an ![image](x.png) inside text",
+            "a [reference][1] link",
+            "a footnote[^1]",
+            "some <span>html</span>",
+        ],
+    )
+    def test_ambiguous_inline_markdown(self, value):
+        with pytest.raises(AmbiguousMarkdownError):
+            parse_inline(value)
+
+
+class TestConvertMarkdownToBlocks:
+    def test_headings(self):
+        blocks = convert_markdown_to_blocks("# One\n## Two ##\n#### Four\nSetext\n===")
+
+        assert [(block["type"], block["props"]) for block in blocks] == [
+            ("heading", {"level": 1}),
+            ("heading", {"level": 2}),
+            ("heading", {"level": 3}),
+            ("heading", {"level": 1}),
+        ]
+        assert blocks[1]["content"] == [text("Two")]
+        assert blocks[3]["content"] == [text("Setext")]
+
+    def test_paragraph_lines_are_kept(self):
+        blocks = convert_markdown_to_blocks("first line\nsecond line\n\nnext paragraph")
+
+        assert blocks == [
+            {
+                "type": "paragraph",
+                "props": {},
+                "content": [text("first line\nsecond line")],
+                "children": [],
+            },
+            {
+                "type": "paragraph",
+                "props": {},
+                "content": [text("next paragraph")],
+                "children": [],
+            },
+        ]
+
+    def test_lists(self):
+        blocks = convert_markdown_to_blocks(
+            "- one\n- two\n  continued\n    - nested\n1. first\n2) second\n- [ ] todo\n- [x] done"
+        )
+
+        assert [block["type"] for block in blocks] == [
+            "bulletListItem",
+            "bulletListItem",
+            "numberedListItem",
+            "numberedListItem",
+            "checkListItem",
+            "checkListItem",
+        ]
+        assert blocks[1]["content"] == [text("two\ncontinued")]
+        assert blocks[1]["children"][0]["content"] == [text("nested")]
+        assert blocks[4]["props"] == {"checked": False}
+        assert blocks[5]["props"] == {"checked": True}
+        assert blocks[5]["content"] == [text("done")]
+
+    def test_list_item_paragraphs(self):
+        blocks = convert_markdown_to_blocks("- item\n\n  more about it\n\nafter")
+
+        assert blocks[0]["children"] == [
+            {
+                "type": "paragraph",
+                "props": {},
+                "content": [text("more about it")],
+                "children": [],
+            }
+        ]
+        assert blocks[1]["content"] == [text("after")]
+
+    def test_code_blocks(self):
+        blocks = convert_markdown_to_blocks(
+            "```py\ndef f():\n    return '**x**'\n```\n~~~\nplain\n~~~"
+        )
+
+        assert blocks == [
+            {
+                "type": "codeBlock",
+                "props": {"language": "python"},
+                "content": [text("def f():\n    return '**x**'")],
+                "children": [],
+            },
+            {
+                "type": "codeBlock",
+                "props": {},
+                "content": [text("plain")],
+                "children": [],
+            },
+        ]
+
+    def test_unclosed_code_block_runs_to_the_end(self):
+        blocks = convert_markdown_to_blocks("```sql\nSELECT 1;")
+
+        assert blocks[0]["content"] == [text("SELECT 1;")]
+        assert blocks[0]["props"] == {"language": "sql"}
+
+    def test_images(self):
+        blocks = convert_markdown_to_blocks('![A diagram](https://x.com/a.png "title")')
+
+        assert blocks == [
+            {
+                "type": "image",
+                "props": {
+                    "name": "A diagram",
+                    "url": "https://x.com/a.png",
+                    "showPreview": True,
+                    "caption": "",
+                    "previewWidth": 512,
+                },
+                "content": [],
+                "children": [],
+            }
+        ]
+
+    def test_thematic_breaks_are_dropped(self):
+        blocks = convert_markdown_to_blocks("before\n\n---\n\n* * *\nafter")
+
+        assert [block["content"] for block in blocks] == [
+            [text("before")],
+            [text("after")],
+        ]
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            "> a quote",
+            "| a | b |\n|---|---|",
+            "<div>html</div>",
+            "[1]: https://x.com",
+            "    indented code",
+            "- item\n\n  ```\n  code\n  ```",
+        ],
+    )
+    def test_ambiguous_markdown(self, content):
+        with pytest.raises(AmbiguousMarkdownError):
+            convert_markdown_to_blocks(content)
+
+
+class TestStreaming:
+    def test_blocks_are_returned_as_they_complete(self):
+        parser = MarkdownBlockParser()
+
+        assert parser.feed("# Title") == [
+            {
+                "type": "heading",
+                "props": {"level": 1},
+                "content": [text("Title")],
+                "children": [],
+            }
+        ]
+        assert parser.feed("a paragraph") == []
+        assert len(parser.feed("")) == 1
+        assert parser.feed("- item") == []
+        assert parser.close()[0]["type"] == "bulletListItem"
+
+    def test_iter_markdown_blocks_from_lines(self):
+        lines = iter(["# Title\n", "text\r\n"])
+
+        blocks = list(iter_markdown_blocks(lines))
+
+        assert [block["type"] for block in blocks] == ["heading", "paragraph"]
+        assert blocks[1]["content"] == [text("text")]
@@ -0,0 +1,126 @@
+from unittest.mock import MagicMock, patch
+from src.api.utils.prompt_cache import PromptContextCache
+
+
+class TestPromptContextCache:
+    def test_hit_and_miss(self):
+        """Test that a rendering is reused until its version changes."""
+        cache = PromptContextCache(10, 1000, 60)
+        render = MagicMock(return_value="context")
+
+        assert cache.get_or_render("details", [("question", 1)], render) == "context"
+        assert cache.get_or_render("details", [("question", 1)], render) == "context"
+
+        render.assert_called_once()
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_bump_version_invalidates_dependent_entries(self):
+        """Test that bumping any referenced id forces a re-render."""
+        cache = PromptContextCache(10, 1000, 60)
+        refs = [("question", 1), ("task", 2)]
+
+        cache.get_or_render("kb", refs, lambda: "old")
+        cache.bump_version("task", 2)
+
+        assert cache.get_or_render("kb", refs, lambda: "new") == "new"
+        # unrelated ids are unaffected
+        cache.bump_version("task", 3)
+        assert cache.get_or_render("kb", refs, lambda: "newer") == "new"
+
+    def test_ids_are_normalised(self):
+        """Test that string ids from block context share entries with int ids."""
+        cache = PromptContextCache(10, 1000, 60)
+
+        cache.get_or_render("kb", [("task", "2")], lambda: "value")
+        cache.bump_version("task", 2)
+
+        assert cache.version("task", "2") == 1
+        assert cache.get_or_render("kb", [("task", "2")], lambda: "new") == "new"
+
+    def test_lru_eviction_by_entries(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = PromptContextCache(2, 1000, 60)
+
+        cache.get_or_render("a", [], lambda: "1")
+        cache.get_or_render("b", [], lambda: "2")
+        cache.get_or_render("a", [], lambda: "x")
+        cache.get_or_render("c", [], lambda: "3")
+
+        assert cache.stats()["evictions"] == 1
+        assert cache.get_or_render("a", [], lambda: "x") == "1"
+        assert cache.get_or_render("b", [], lambda: "y") == "y"
+
+    def test_eviction_by_chars(self):
+        """Test that total characters stay within the configured bound."""
+        cache = PromptContextCache(10, 10, 60)
+
+        cache.get_or_render("a", [], lambda: "x" * 6)
+        cache.get_or_render("b", [], lambda: "y" * 6)
+
+        stats = cache.stats()
+        assert stats["entries"] == 1
+        assert stats["chars"] == 6
+
+        # values larger than the whole cache are returned but not stored
+        assert cache.get_or_render("c", [], lambda: "z" * 11) == "z" * 11
+        assert cache.stats()["entries"] == 1
+
+    def test_clear(self):
+        """Test that clear drops entries, counters and the versions they depended on."""
+        cache = PromptContextCache(10, 100, 60)
+        cache.get_or_render("a", [("task", 1)], lambda: "1")
+        cache.bump_version("task", 1)
+
+        cache.clear()
+
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["misses"] == 0
+        assert cache.version("task", 1) == 0
+        assert cache.get_or_render("a", [("task", 1)], lambda: "new") == "new"
+
+    def test_versions_are_only_kept_for_cached_ids(self):
+        """Test that versions are dropped once no entry depends on them."""
+        cache = PromptContextCache(1, 100, 60)
+
+        # nothing cached depends on the id, so there is nothing to invalidate
+        cache.bump_version("task", 1)
+        assert cache.version("task", 1) == 0
+
+        cache.get_or_render("a", [("task", 2)], lambda: "a")
+        cache.bump_version("task", 2)
+        cache.get_or_render("a", [("task", 2)], lambda: "a2")
+        assert cache.version("task", 2) == 1
+
+        # the entry depending on task 2 is evicted along with its version
+        cache.get_or_render("b", [("task", 3)], lambda: "b")
+        assert cache.version("task", 2) == 0
+        assert cache._versions == {}
+        assert cache.get_or_render("a", [("task", 2)], lambda: "a3") == "a3"
+
+    def test_versions_stay_bounded(self):
+        """Test that edits to many ids keep no more versions than cached entries."""
+        cache = PromptContextCache(2, 100, 60)
+
+        for id in range(100):
+            cache.get_or_render("a", [("task", id)], lambda: "old")
+            cache.bump_version("task", id)
+            cache.get_or_render("a", [("task", id)], lambda: "new")
+
+        assert len(cache._versions) <= 2
+
+    @patch("src.api.utils.prompt_cache.time.monotonic")
+    def test_entries_expire(self, mock_monotonic):
+        """Test that entries are re-rendered once their ttl has passed."""
+        cache = PromptContextCache(10, 100, 60)
+        mock_monotonic.return_value = 100
+        cache.get_or_render("a", [("task", 1)], lambda: "old")
+
+        mock_monotonic.return_value = 159
+        assert cache.get_or_render("a", [("task", 1)], lambda: "new") == "old"
+
+        mock_monotonic.return_value = 160
+        assert cache.get_or_render("a", [("task", 1)], lambda: "new") == "new"
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["chars"] == 3
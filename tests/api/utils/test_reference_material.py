@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from src.api.utils.reference_material import (
+    spool_reference_material,
+    ingest_reference_material,
+    get_reference_material_file_id,
+)
+
+CONTENT = b"%PDF reference material" * 100
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def local_material(tmp_path):
+    (tmp_path / "material.pdf").write_bytes(CONTENT)
+
+    with patch("src.api.utils.reference_material.settings") as mock_settings, patch(
+        "src.api.utils.reference_material.reference_material_chunk_bytes", 64
+    ):
+        mock_settings.s3_folder_name = None
+        mock_settings.local_upload_folder = str(tmp_path)
+        yield "material.pdf"
+
+
+class TestSpoolReferenceMaterial:
+    def test_spool_reference_material(self, local_material):
+        """Test that the material is copied and hashed chunk by chunk."""
+        content_hash, spooled = spool_reference_material(local_material)
+
+        assert content_hash == CONTENT_HASH
+        assert spooled.read() == CONTENT
+        spooled.close()
+
+    @patch("src.api.utils.reference_material.iter_file_chunks_from_s3")
+    @patch("src.api.utils.reference_material.settings")
+    def test_spool_reference_material_from_s3(self, mock_settings, mock_iter):
+        """Test that materials on s3 are streamed instead of downloaded at once."""
+        mock_settings.s3_folder_name = "folder"
+        mock_iter.return_value = iter([CONTENT[:10], CONTENT[10:]])
+
+        content_hash, spooled = spool_reference_material("key")
+
+        assert content_hash == CONTENT_HASH
+        assert spooled.read() == CONTENT
+        spooled.close()
+
+
+@pytest.mark.asyncio
+class TestIngestReferenceMaterial:
+    @patch("src.api.utils.reference_material.store_provider_file_id")
+    @patch("src.api.utils.reference_material.get_provider_file_id")
+    @patch("src.api.utils.reference_material.get_openai_client")
+    async def test_known_material_is_not_uploaded(
+        self, mock_get_client, mock_get_file_id, mock_store, local_material
+    ):
+        """Test that a material uploaded before is reused."""
+        mock_get_file_id.return_value = "file-1"
+
+        result = await ingest_reference_material(local_material)
+
+        assert result == (CONTENT_HASH, "file-1")
+        mock_get_file_id.assert_awaited_once_with(CONTENT_HASH)
+        mock_get_client.assert_not_called()
+        mock_store.assert_not_called()
+
+    @patch("src.api.utils.reference_material.store_provider_file_id")
+    @patch("src.api.utils.reference_material.get_provider_file_id")
+    @patch("src.api.utils.reference_material.get_openai_client")
+    async def test_new_material_is_uploaded_once(
+        self, mock_get_client, mock_get_file_id, mock_store, local_material
+    ):
+        """Test that concurrent ingestions of a new material share one upload."""
+        mock_get_file_id.return_value = None
+        uploaded = []
+
+        async def create(file, purpose):
+            uploaded.append(file[1].read())
+            await asyncio.sleep(0.01)
+            return MagicMock(id="file-2")
+
+        mock_get_client.return_value.files.create = AsyncMock(side_effect=create)
+
+        results = await asyncio.gather(
+            ingest_reference_material(local_material),
+            ingest_reference_material(local_material),
+        )
+
+        assert results == [(CONTENT_HASH, "file-2")] * 2
+        assert uploaded == [CONTENT]
+        mock_store.assert_awaited_once()
+        assert mock_store.await_args.args[:2] == (CONTENT_HASH, "file-2")
+
+
+@pytest.mark.asyncio
+class TestGetReferenceMaterialFileId:
+    async def test_jobs_without_hash_use_their_file_id(self):
+        """Test that jobs created before deduplication keep their file id."""
+        result = await get_reference_material_file_id({"openai_file_id": "file-1"})
+
+        assert result == "file-1"
+
+    @patch("src.api.utils.reference_material.ingest_reference_material")
+    @patch("src.api.utils.reference_material.get_provider_file_id")
+    async def test_current_upload_is_used(self, mock_get_file_id, mock_ingest):
+        """Test that the current upload of the material is used."""
+        mock_get_file_id.return_value = "file-2"
+
+        result = await get_reference_material_file_id(
+            {"openai_file_id": "file-1", "reference_material_hash": CONTENT_HASH}
+        )
+
+        assert result == "file-2"
+        mock_ingest.assert_not_called()
+
+    @patch("src.api.utils.reference_material.ingest_reference_material")
+    @patch("src.api.utils.reference_material.get_provider_file_id")
+    async def test_expired_upload_is_replaced(self, mock_get_file_id, mock_ingest):
+        """Test that the material is uploaded again once its upload has expired."""
+        mock_get_file_id.return_value = None
+        mock_ingest.return_value = (CONTENT_HASH, "file-3")
+
+        result = await get_reference_material_file_id(
+            {
+                "openai_file_id": "file-1",
+                "reference_material_hash": CONTENT_HASH,
+                "reference_material_s3_key": "material.pdf",
+            }
+        )
+
+        assert result == "file-3"
+        mock_ingest.assert_awaited_once_with("material.pdf")
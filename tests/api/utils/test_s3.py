@@ -6,6 +6,7 @@ from src.api.utils.s3 import (
     upload_file_to_s3,
     upload_audio_data_to_s3,
     download_file_from_s3_as_bytes,
+    iter_file_chunks_from_s3,
     generate_s3_uuid,
     get_media_upload_s3_dir,
     get_media_upload_s3_key_from_uuid,
@@ -130,6 +131,20 @@ class TestS3Utils:
         mock_session.return_value.client.assert_called_once_with("s3")
         mock_s3_client.get_object.assert_called_once()
 
+    @patch("src.api.utils.s3.boto3.Session")
+    def test_iter_file_chunks_from_s3(self, mock_session):
+        """Test downloading a file from S3 in chunks."""
+        mock_s3_client = MagicMock()
+        mock_session.return_value.client.return_value = mock_s3_client
+        mock_body = MagicMock()
+        mock_body.iter_chunks.return_value = iter([b"file ", b"content"])
+        mock_s3_client.get_object.return_value = {"Body": mock_body}
+
+        result = list(iter_file_chunks_from_s3("test/file.txt", 5))
+
+        assert result == [b"file ", b"content"]
+        mock_body.iter_chunks.assert_called_once_with(5)
+
     @patch("src.api.utils.s3.uuid.uuid4")
     def test_generate_s3_uuid(self, mock_uuid4):
         """Test generating a UUID for S3 keys."""
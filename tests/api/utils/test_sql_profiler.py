@@ -0,0 +1,174 @@
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from src.api.utils.sql_profiler import (
+    SQLProfiler,
+    ProfiledConnection,
+    fingerprint_sql,
+    profile_connection,
+)
+
+
+class TestFingerprintSql:
+    def test_fingerprint_replaces_literals_and_whitespace(self):
+        """Test that literals are stripped and whitespace collapsed."""
+        sql = """
+        SELECT id FROM tasks
+        WHERE org_id = 12 AND title = 'It''s' AND score > 1.5
+        """
+        assert (
+            fingerprint_sql(sql)
+            == "SELECT id FROM tasks WHERE org_id = ? AND title = ? AND score > ?"
+        )
+
+    def test_fingerprint_collapses_in_lists(self):
+        """Test that IN lists of different lengths share a fingerprint."""
+        assert fingerprint_sql(
+            "SELECT * FROM tasks WHERE id IN (1, 2, 3)"
+        ) == fingerprint_sql("SELECT * FROM tasks WHERE id IN (?,?)")
+
+    def test_fingerprint_keeps_identifiers_with_digits(self):
+        """Test that digits inside identifiers are preserved."""
+        assert fingerprint_sql("SELECT t1.id FROM t1") == "SELECT t1.id FROM t1"
+
+
+class TestSQLProfiler:
+    def test_profiler_inactive_by_default_config(self):
+        """Test that a profiler with no sample rate or threshold is inactive."""
+        profiler = SQLProfiler(0.0, None, 10)
+        assert profiler.is_active is False
+
+    def test_observe_records_sampled_statements(self):
+        """Test that sampled statements are aggregated by fingerprint."""
+        profiler = SQLProfiler(1.0, None, 10)
+
+        profiler.observe("SELECT * FROM tasks WHERE id = 1", 2.0, 1, sampled=True)
+        profiler.observe("SELECT * FROM tasks WHERE id = 2", 600.0, 1, sampled=True)
+        profiler.observe("DELETE FROM tasks WHERE id = 3", 1.0, 1, sampled=False)
+
+        report = profiler.report(top_n=5)
+
+        assert report["num_fingerprints"] == 1
+        stats = report["statements"][0]
+        assert stats["fingerprint"] == "SELECT * FROM tasks WHERE id = ?"
+        assert stats["count"] == 2
+        assert stats["rows"] == 2
+        assert stats["max_ms"] == 600.0
+        assert stats["avg_ms"] == 301.0
+        assert stats["histogram"]["<5ms"] == 1
+        assert stats["histogram"]["<1000ms"] == 1
+
+    def test_report_sorting_and_top_n(self):
+        """Test that the report is ranked by the requested key and truncated."""
+        profiler = SQLProfiler(1.0, None, 10)
+
+        for _ in range(3):
+            profiler.observe("SELECT 1 FROM a", 1.0, 1, sampled=True)
+        profiler.observe("SELECT 1 FROM b", 50.0, 1, sampled=True)
+
+        by_count = profiler.report(top_n=1, sort_by="count")["statements"]
+        by_max = profiler.report(top_n=1, sort_by="max")["statements"]
+
+        assert [stats["fingerprint"] for stats in by_count] == ["SELECT ? FROM a"]
+        assert [stats["fingerprint"] for stats in by_max] == ["SELECT ? FROM b"]
+
+    def test_max_fingerprints_bounds_memory(self):
+        """Test that new fingerprints beyond the cap are dropped."""
+        profiler = SQLProfiler(1.0, None, 1)
+
+        profiler.observe("SELECT 1 FROM a", 1.0, 1, sampled=True)
+        profiler.observe("SELECT 1 FROM b", 1.0, 1, sampled=True)
+
+        report = profiler.report()
+        assert report["num_fingerprints"] == 1
+        assert report["num_dropped"] == 1
+
+    @patch("src.api.utils.sql_profiler.logger")
+    def test_slow_query_logged_even_when_not_sampled(self, mock_logger):
+        """Test that the slow query log covers unsampled statements."""
+        profiler = SQLProfiler(0.0, 100, 10)
+
+        profiler.observe("SELECT * FROM tasks WHERE id = 1", 150.0, 1, sampled=False)
+        profiler.observe("SELECT * FROM tasks WHERE id = 1", 10.0, 1, sampled=False)
+
+        mock_logger.warning.assert_called_once()
+        assert "SELECT * FROM tasks WHERE id = ?" in mock_logger.warning.call_args[0][0]
+        assert profiler.report()["num_fingerprints"] == 0
+
+    def test_configure_and_reset(self):
+        """Test runtime reconfiguration and resetting collected stats."""
+        profiler = SQLProfiler(0.0, 100, 10)
+
+        profiler.configure(sample_rate=0.5)
+        assert profiler.sample_rate == 0.5
+        assert profiler.slow_query_threshold_ms == 100
+
+        profiler.configure(disable_slow_query_log=True)
+        assert profiler.slow_query_threshold_ms is None
+
+        profiler.observe("SELECT 1", 1.0, 1, sampled=True)
+        profiler.reset()
+        assert profiler.report()["num_fingerprints"] == 0
+
+
+@pytest.mark.asyncio
+class TestProfiledConnection:
+    async def test_profiled_cursor_reports_reads_after_fetch(self):
+        """Test that reads are reported with the number of fetched rows and their caller."""
+        raw_cursor = AsyncMock()
+        raw_cursor.description = (("id",),)
+        raw_cursor.fetchall.return_value = [(1,), (2,)]
+        raw_conn = AsyncMock()
+        raw_conn.cursor.return_value = raw_cursor
+
+        with patch("src.api.utils.sql_profiler.profiler") as mock_profiler:
+            conn = ProfiledConnection(raw_conn, sampled=True)
+            cursor = await conn.cursor()
+            assert await cursor.execute("SELECT id FROM tasks", (1,)) is cursor
+            mock_profiler.observe.assert_not_called()
+
+            assert await cursor.fetchall() == [(1,), (2,)]
+
+        raw_cursor.execute.assert_called_once_with("SELECT id FROM tasks", (1,))
+        sql, _, rows, sampled = mock_profiler.observe.call_args[0]
+        assert sql == "SELECT id FROM tasks"
+        assert rows == 2
+        assert sampled is True
+
+    async def test_profiled_cursor_reports_writes_immediately(self):
+        """Test that writes are reported with the affected row count."""
+        raw_cursor = AsyncMock()
+        raw_cursor.description = None
+        raw_cursor.rowcount = 3
+        raw_cursor.lastrowid = 7
+        raw_conn = AsyncMock()
+        raw_conn.cursor.return_value = raw_cursor
+
+        with patch("src.api.utils.sql_profiler.profiler") as mock_profiler:
+            cursor = await ProfiledConnection(raw_conn, sampled=False).cursor()
+            await cursor.execute("UPDATE tasks SET title = ?", ("x",))
+
+        assert mock_profiler.observe.call_args[0][2] == 3
+        assert cursor.lastrowid == 7
+
+    async def test_profiled_connection_delegates_other_methods(self):
+        """Test that commit and other attributes reach the wrapped connection."""
+        raw_conn = AsyncMock()
+        conn = ProfiledConnection(raw_conn, sampled=True)
+
+        await conn.commit()
+
+        raw_conn.commit.assert_called_once()
+
+    def test_profile_connection_is_noop_when_inactive(self):
+        """Test that connections are not wrapped when profiling is disabled."""
+        raw_conn = MagicMock()
+
+        with patch(
+            "src.api.utils.sql_profiler.profiler", SQLProfiler(0.0, None, 10)
+        ):
+            assert profile_connection(raw_conn) is raw_conn
+
+        with patch(
+            "src.api.utils.sql_profiler.profiler", SQLProfiler(1.0, None, 10)
+        ):
+            assert isinstance(profile_connection(raw_conn), ProfiledConnection)